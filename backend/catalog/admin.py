@@ -1,11 +1,10 @@
 import csv
 from django.http import HttpResponse
 from django.contrib import admin
-from django.db.models import Avg, Count
 from .models import (
     Brand, Series, Category, Product, ProductImage, ProductDocument, Collection, CollectionItem,
     Tag, Color, Country, ProductReview, ProductReviewComment, ProductReviewPhoto, ProductReviewVote, ProductQuestion,
-    SellerOffer, SellerInventory,
+    SellerOffer, SellerInventory, SearchSynonym,
 )
 
 @admin.register(Brand)
@@ -39,6 +38,14 @@ class CollectionItemInline(admin.TabularInline):
     extra = 1
 
 
+@admin.register(SearchSynonym)
+class SearchSynonymAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "phrase", "replacement", "is_active", "updated_at")
+    list_editable = ("is_active",)
+    list_filter = ("kind", "is_active")
+    search_fields = ("phrase", "replacement")
+
+
 @admin.register(Collection)
 class CollectionAdmin(admin.ModelAdmin):
     list_display = ("id", "name", "slug", "is_active", "is_featured")
@@ -90,19 +97,15 @@ class ProductAdmin(admin.ModelAdmin):
     inlines = [ProductImageInline, ProductDocumentInline, ProductReviewInline]
     actions = ("export_selected_rows",)
 
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.annotate(_rating_avg=Avg("reviews__rating"), _rating_count=Count("reviews"))
-
-    @admin.display(description="Рейтинг", ordering="_rating_avg")
+    @admin.display(description="Рейтинг", ordering="rating_avg")
     def rating_avg_display(self, obj):
-        if obj._rating_avg is None:
+        if not obj.rating_count:
             return "—"
-        return f"{obj._rating_avg:.1f}"
+        return f"{obj.rating_avg:.1f}"
 
-    @admin.display(description="Отзывов", ordering="_rating_count")
+    @admin.display(description="Отзывов", ordering="rating_count")
     def rating_count_display(self, obj):
-        return obj._rating_count
+        return obj.rating_count
 
     @admin.action(description="Экспортировать товары в CSV")
     def export_selected_rows(self, request, queryset):
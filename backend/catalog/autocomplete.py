@@ -0,0 +1,445 @@
+"""Per-worker prefix index for search-box completions.
+
+Product names (alone and with their brand), SKUs, barcodes, brands and
+categories are folded into sorted keys and written as a snapshot of flat
+`.npy` arrays; workers memory-map it, binary-search the key range of a prefix
+and take the heaviest entries in that range. Catalog changes made after the
+snapshot are applied from a small in-memory overlay that is rebuilt on a
+background thread when the catalog vocabulary version moves, so lookups keep
+answering from the current overlay meanwhile. The overlay also hides snapshot
+products that were deleted since. It holds at most
+`AUTOCOMPLETE_OVERLAY_MAX_PRODUCTS` changed products; past that it keeps the
+most recent ones and asks for a new snapshot.
+
+Layout under `AUTOCOMPLETE_INDEX_DIR` matches the semantic index: one
+directory per build plus a `CURRENT` file naming the live one.
+"""
+
+import heapq
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import unicodedata
+import uuid
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import BigIntegerField, Count, ExpressionWrapper, F
+from django.utils import timezone
+
+from . import versions
+from .models import Brand, Category, Product
+
+log = logging.getLogger("catalog")
+
+CURRENT_FILE = "CURRENT"
+MAX_KEY_CHARS = 120
+# Same base weight and boosts as the ES completion input in `product_doc`.
+PRODUCT_WEIGHT = 10
+NEW_BOOST = 2
+PROMO_BOOST = 1
+# Brand and category names are canonical completions and rank above single products.
+REFERENCE_WEIGHT = 20
+# Owner of an entry: a product id, REFERENCE for brand/category names, SHARED for text of several products.
+REFERENCE = 0
+SHARED = -1
+_MAX_UTF8 = b"\xff"
+# A worker without a published snapshot warns at most this often while completions stay empty.
+MISSING_WARNING_INTERVAL = 300
+# Deleted snapshot products are found by comparing live id counts per range of this many ids.
+DELETED_SCAN_BUCKET = 4096
+
+Entry = Tuple[str, int, int]  # display, weight, owner
+
+
+def fold(text: str) -> str:
+    """Case- and accent-insensitive key, like the index's folding normalizer."""
+    decomposed = unicodedata.normalize("NFKD", str(text or ""))
+    return " ".join("".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold().split())
+
+
+def _root() -> Path:
+    return Path(getattr(settings, "AUTOCOMPLETE_INDEX_DIR", Path(settings.BASE_DIR) / "var" / "autocomplete"))
+
+
+def _refresh_interval() -> float:
+    return float(getattr(settings, "AUTOCOMPLETE_REFRESH_SECONDS", 5))
+
+
+def _overlay_max_products() -> int:
+    return max(1, int(getattr(settings, "AUTOCOMPLETE_OVERLAY_MAX_PRODUCTS", 5000)))
+
+
+def _refresh_async() -> bool:
+    return bool(getattr(settings, "AUTOCOMPLETE_REFRESH_ASYNC", True))
+
+
+def product_entries(pid: int, name: str, brand: str, sku: str, barcode: str, is_new: bool, is_promo: bool) -> List[Entry]:
+    weight = PRODUCT_WEIGHT + (NEW_BOOST if is_new else 0) + (PROMO_BOOST if is_promo else 0)
+    phrases = [name, f"{brand} {name}" if brand and name else "", sku, barcode]
+    return [(" ".join(str(phrase).split()), weight, pid) for phrase in phrases if phrase and str(phrase).strip()]
+
+
+def _product_rows(qs, seen_ids: List[int] | None = None) -> Iterator[Entry]:
+    rows = qs.values_list("id", "name", "brand__name", "sku", "barcode", "is_new", "is_promo")
+    for row in rows.iterator(chunk_size=5000):
+        if seen_ids is not None:
+            seen_ids.append(row[0])
+        yield from product_entries(*row)
+
+
+def _reference_rows() -> Iterator[Entry]:
+    for model in (Brand, Category):
+        for name in model.objects.values_list("name", flat=True).iterator():
+            if name and name.strip():
+                yield " ".join(name.split()), REFERENCE_WEIGHT, REFERENCE
+
+
+def collect(entries: Iterable[Entry]) -> dict:
+    """Folded key -> (weight, display, owner); the heaviest display wins a shared key."""
+    merged: dict = {}
+    for display, weight, owner in entries:
+        key = fold(display)[:MAX_KEY_CHARS]
+        if not key:
+            continue
+        current = merged.get(key)
+        if current is None:
+            merged[key] = (weight, display, owner)
+            continue
+        if current[2] != owner:
+            owner = REFERENCE if REFERENCE in (current[2], owner) else SHARED
+        if weight > current[0]:
+            merged[key] = (weight, display, owner)
+        else:
+            merged[key] = (current[0], current[1], owner)
+    return merged
+
+
+def _pack(texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(item) for item in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def write_snapshot(path: Path, entries: dict, meta: dict, product_ids: Iterable[int] = ()) -> dict:
+    # Code point order equals UTF-8 byte order, which the binary search compares.
+    keys = sorted(entries)
+    key_blob, key_offsets = _pack(keys)
+    display_blob, display_offsets = _pack([entries[key][1] for key in keys])
+    path.mkdir(parents=True, exist_ok=True)
+    np.save(path / "keys.npy", key_blob)
+    np.save(path / "key_offsets.npy", key_offsets)
+    np.save(path / "displays.npy", display_blob)
+    np.save(path / "display_offsets.npy", display_offsets)
+    np.save(path / "weights.npy", np.array([entries[key][0] for key in keys], dtype=np.int32))
+    np.save(path / "owners.npy", np.array([entries[key][2] for key in keys], dtype=np.int64))
+    np.save(path / "product_ids.npy", np.unique(np.fromiter(product_ids, dtype=np.int64)))
+    meta = {**meta, "count": len(keys)}
+    (path / "meta.json").write_text(json.dumps(meta))
+    return meta
+
+
+class Snapshot:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / "meta.json").read_text())
+        self.keys = np.load(self.path / "keys.npy", mmap_mode="r")
+        self.key_offsets = np.load(self.path / "key_offsets.npy", mmap_mode="r")
+        self.displays = np.load(self.path / "displays.npy", mmap_mode="r")
+        self.display_offsets = np.load(self.path / "display_offsets.npy", mmap_mode="r")
+        self.weights = np.load(self.path / "weights.npy", mmap_mode="r")
+        self.owners = np.load(self.path / "owners.npy", mmap_mode="r")
+        product_ids = self.path / "product_ids.npy"
+        # Sorted ids of the products read into the snapshot; deletions are detected against them.
+        self.product_ids = (
+            np.load(product_ids, mmap_mode="r") if product_ids.exists() else np.zeros(0, dtype=np.int64)
+        )
+
+    def __len__(self) -> int:
+        return len(self.weights)
+
+    def key(self, i: int) -> bytes:
+        return self.keys[self.key_offsets[i] : self.key_offsets[i + 1]].tobytes()
+
+    def display(self, i: int) -> str:
+        return self.displays[self.display_offsets[i] : self.display_offsets[i + 1]].tobytes().decode("utf-8")
+
+    def _lower_bound(self, target: bytes) -> int:
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def top(self, prefix: str, limit: int, hidden: np.ndarray, hide_references: bool) -> List[Tuple[int, str, str]]:
+        """Heaviest `(weight, key, display)` entries whose key starts with `prefix`."""
+        target = prefix.encode("utf-8")
+        lo = self._lower_bound(target)
+        hi = self._lower_bound(target + _MAX_UTF8)
+        if lo >= hi:
+            return []
+        weights = np.asarray(self.weights[lo:hi])
+        if len(hidden) or hide_references:
+            owners = np.asarray(self.owners[lo:hi])
+            visible = ~np.isin(owners, hidden)
+            if hide_references:
+                visible &= owners != REFERENCE
+            weights = np.where(visible, weights, -1)
+        if len(weights) > limit:
+            # Equal weights go to the lowest keys so results do not depend on partition order.
+            kth = np.partition(weights, len(weights) - limit)[len(weights) - limit]
+            above = np.flatnonzero(weights > kth)
+            candidates = np.concatenate([above, np.flatnonzero(weights == kth)[: limit - len(above)]])
+        else:
+            candidates = np.arange(len(weights))
+        return [
+            (int(weights[i]), self.key(lo + int(i)).decode("utf-8"), self.display(lo + int(i)))
+            for i in candidates
+            if weights[i] >= 0
+        ]
+
+
+class Overlay:
+    """Entries of products changed after the snapshot, plus current brand and category names."""
+
+    def __init__(self, entries: dict, hidden_owners: Iterable[int], version: int):
+        self.keys = sorted(entries)
+        self.entries = entries
+        self.hidden = np.array(sorted(set(hidden_owners)), dtype=np.int64)
+        self.version = version
+        self.built_at = time.monotonic()
+
+    def top(self, prefix: str, limit: int) -> List[Tuple[int, str, str]]:
+        pos = bisect_left(self.keys, prefix)
+        matched = []
+        while pos < len(self.keys) and self.keys[pos].startswith(prefix):
+            weight, display, _owner = self.entries[self.keys[pos]]
+            matched.append((weight, self.keys[pos], display))
+            pos += 1
+        return heapq.nlargest(limit, matched, key=lambda item: item[0])
+
+
+class AutocompleteIndex:
+    def __init__(self, name: str, snapshot: Snapshot):
+        self.name = name
+        self.snapshot = snapshot
+        self.overlay: Overlay | None = None
+        self.version = int(snapshot.meta.get("version", 0))
+        self.synced_at = time.monotonic()
+
+    def suggest(self, query: str, limit: int = 8) -> List[str]:
+        prefix = fold(query)[:MAX_KEY_CHARS]
+        if not prefix:
+            return []
+        overlay = self.overlay
+        if overlay is None:
+            found = self.snapshot.top(prefix, limit, np.zeros(0, dtype=np.int64), False)
+        else:
+            found = self.snapshot.top(prefix, limit, overlay.hidden, True) + overlay.top(prefix, limit)
+        # Heaviest first; equal weights in key order so results are stable.
+        found.sort(key=lambda item: (-item[0], item[1]))
+        result: List[str] = []
+        seen = set()
+        for _weight, key, display in found:
+            if key not in seen:
+                seen.add(key)
+                result.append(display)
+            if len(result) >= limit:
+                break
+        return result
+
+    def refresh(self, version: int) -> None:
+        """Rebuild the overlay from products changed or deleted since the snapshot started."""
+        since = datetime.fromisoformat(self.snapshot.meta["started_at"]) - timedelta(
+            seconds=max(0, int(getattr(settings, "ES_INCREMENTAL_OVERLAP_SECONDS", 120)))
+        )
+        limit = _overlay_max_products()
+        recent = Product.objects.filter(updated_at__gte=since).order_by("-updated_at", "-id")
+        changed = list(recent.values_list("id", flat=True)[: limit + 1])
+        if len(changed) > limit:
+            # Older changes keep their snapshot entries until the requested snapshot replaces them.
+            changed = changed[:limit]
+            self.request_snapshot()
+        rows = list(_product_rows(Product.objects.filter(id__in=changed)))
+        owners = {owner for _, _, owner in rows}
+        deleted = deleted_product_ids(self.snapshot)
+        self.overlay = Overlay(collect([*rows, *_reference_rows()]), owners.union(deleted.tolist()), version)
+        self.version = version
+        log.info(
+            "autocomplete_overlay_built",
+            extra={"products": len(owners), "deleted": len(deleted), "entries": len(self.overlay.keys)},
+        )
+
+    def request_snapshot(self) -> None:
+        """Queue one snapshot rebuild per outgrown snapshot, whichever worker notices first."""
+        from .tasks import rebuild_autocomplete_index
+
+        try:
+            if not cache.add(f"catalog:autocomplete:rebuild:{self.name}", 1, timeout=3600):
+                return
+            log.info("autocomplete_overlay_full", extra={"index": self.name, "limit": _overlay_max_products()})
+            rebuild_autocomplete_index.delay()
+        except Exception:
+            log.exception("autocomplete_rebuild_schedule_failed", extra={"index": self.name})
+
+
+def deleted_product_ids(snapshot: Snapshot) -> np.ndarray:
+    """Snapshot products that no longer exist.
+
+    One grouped query counts live ids per `DELETED_SCAN_BUCKET` range; only ranges
+    whose count differs from the snapshot are listed and compared id by id.
+    """
+    ids = snapshot.product_ids
+    if not len(ids):
+        return np.zeros(0, dtype=np.int64)
+    expected = np.bincount(np.asarray(ids) // DELETED_SCAN_BUCKET)
+    live = np.zeros(len(expected), dtype=np.int64)
+    buckets = (
+        Product.objects.filter(id__lte=int(ids[-1]))
+        .annotate(bucket=ExpressionWrapper(F("id") / DELETED_SCAN_BUCKET, output_field=BigIntegerField()))
+        .values("bucket")
+        .annotate(live=Count("id"))
+        .values_list("bucket", "live")
+    )
+    for bucket, count in buckets:
+        live[int(bucket)] = count
+    deleted = []
+    for bucket in np.flatnonzero(live != expected):
+        low, high = int(bucket) * DELETED_SCAN_BUCKET, (int(bucket) + 1) * DELETED_SCAN_BUCKET
+        start, end = np.searchsorted(ids, [low, high])
+        existing = Product.objects.filter(id__gte=low, id__lt=high).values_list("id", flat=True)
+        deleted.append(np.setdiff1d(ids[start:end], np.fromiter(existing, dtype=np.int64)))
+    return np.concatenate(deleted) if deleted else np.zeros(0, dtype=np.int64)
+
+
+def build_index(*, keep: int = 1) -> dict:
+    """Snapshot every completion source, write a new directory and point `CURRENT` at it."""
+    started = time.monotonic()
+    meta = {
+        "started_at": timezone.now().isoformat(),
+        "version": versions.get_version(versions.VOCABULARY),
+    }
+    product_ids: List[int] = []
+    entries = collect([*_product_rows(Product.objects.order_by("id"), product_ids), *_reference_rows()])
+    root = _root()
+    name = f"v{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    meta = write_snapshot(root / name, entries, meta, product_ids)
+    tmp = root / f"{CURRENT_FILE}.{os.getpid()}"
+    tmp.write_text(name)
+    os.replace(tmp, root / CURRENT_FILE)
+    _prune(root, keep=keep, live=name)
+    meta.update(path=str(root / name), elapsed_s=round(time.monotonic() - started, 2))
+    log.info("autocomplete_index_built", extra=meta)
+    return meta
+
+
+def _prune(root: Path, keep: int, live: str) -> None:
+    old = sorted((p for p in root.iterdir() if p.is_dir() and p.name != live), reverse=True)
+    for path in old[max(0, keep) :]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+_loaded: AutocompleteIndex | None = None
+_lock = threading.Lock()
+_refreshing = False
+_missing_warned_at: float | None = None
+
+
+def load_index() -> AutocompleteIndex | None:
+    """Map the published snapshot for this worker; None if it was never built."""
+    global _loaded
+    try:
+        name = (_root() / CURRENT_FILE).read_text().strip()
+    except OSError:
+        return None
+    if _loaded is not None and _loaded.name == name:
+        return _loaded
+    with _lock:
+        if _loaded is None or _loaded.name != name:
+            try:
+                _loaded = AutocompleteIndex(name, Snapshot(_root() / name))
+            except Exception:
+                log.exception("autocomplete_index_load_failed", extra={"index": name})
+                return None
+        return _loaded
+
+
+def _refresh_overlay(index: AutocompleteIndex, version: int) -> None:
+    global _refreshing
+    try:
+        index.refresh(version)
+    except Exception:
+        log.exception("autocomplete_overlay_failed")
+    finally:
+        with _lock:
+            _refreshing = False
+
+
+def _refresh_in_background(index: AutocompleteIndex, version: int) -> None:
+    try:
+        _refresh_overlay(index, version)
+    finally:
+        connection.close()
+
+
+def get_index() -> AutocompleteIndex | None:
+    """The worker's index; a catalog change starts an overlay refresh at most once per interval.
+
+    `refresh` replaces `index.overlay` in one assignment and `suggest` reads it once,
+    so lookups running during a background refresh see the old overlay or the new one.
+    """
+    global _refreshing
+    index = load_index()
+    if index is None:
+        return None
+    version = versions.get_version(versions.VOCABULARY)
+    if index.version == version or time.monotonic() - index.synced_at < _refresh_interval():
+        return index
+    with _lock:
+        if _refreshing:
+            return index
+        _refreshing = True
+        # A failed refresh is retried after another interval, not on every request.
+        index.synced_at = time.monotonic()
+    if not _refresh_async():
+        _refresh_overlay(index, version)
+        return index
+    threading.Thread(
+        target=_refresh_in_background, args=(index, version), name="autocomplete-overlay", daemon=True
+    ).start()
+    return index
+
+
+def _warn_missing() -> None:
+    global _missing_warned_at
+    now = time.monotonic()
+    if _missing_warned_at is None or now - _missing_warned_at >= MISSING_WARNING_INTERVAL:
+        _missing_warned_at = now
+        log.warning("autocomplete_index_missing", extra={"path": str(_root())})
+
+
+def suggest(query: str, limit: int = 8) -> List[str]:
+    index = get_index()
+    if index is None:
+        _warn_missing()
+        return []
+    return index.suggest(query, limit)
+
+
+def reset_index() -> None:
+    global _loaded, _refreshing
+    _loaded = None
+    _refreshing = False
@@ -0,0 +1,105 @@
+"""Per-worker category tree for zero-query descendant and breadcrumb lookups.
+
+Categories also keep a materialized `path` ("/1/5/12/") so the database can
+select a subtree with one indexed prefix match. The in-memory tree is built
+from a single query and rebuilt when the `category_tree` version moves.
+"""
+
+import logging
+import threading
+from typing import Dict, Iterable, List
+
+from . import versions
+from .models import Category
+
+log = logging.getLogger("catalog")
+
+MAX_DEPTH = 20
+
+
+class CategoryTree:
+    def __init__(self, categories: Iterable[Category], version: int = 0):
+        self.version = version
+        self.nodes: Dict[int, Category] = {category.id: category for category in categories}
+        self.children: Dict[int, List[int]] = {}
+        for category_id in sorted(self.nodes):
+            parent_id = self.nodes[category_id].parent_id
+            if parent_id in self.nodes:
+                self.children.setdefault(parent_id, []).append(category_id)
+        self._descendants: Dict[int, List[int]] = {}
+
+    def __contains__(self, category_id: int) -> bool:
+        return category_id in self.nodes
+
+    def descendant_ids(self, category_id: int) -> List[int]:
+        """The category followed by its descendants, level by level."""
+        cached = self._descendants.get(category_id)
+        if cached is not None:
+            return list(cached)
+        ids = [category_id]
+        seen = {category_id}
+        frontier = [category_id]
+        for _ in range(MAX_DEPTH):
+            frontier = [child for node in frontier for child in self.children.get(node, ()) if child not in seen]
+            if not frontier:
+                break
+            seen.update(frontier)
+            ids.extend(frontier)
+        self._descendants[category_id] = ids
+        return list(ids)
+
+    def ancestors(self, category_id: int) -> List[Category]:
+        """Root-first chain ending at the category itself."""
+        trail: List[Category] = []
+        current = self.nodes.get(category_id)
+        seen = set()
+        while current is not None and current.id not in seen and len(trail) < MAX_DEPTH:
+            seen.add(current.id)
+            trail.append(current)
+            current = self.nodes.get(current.parent_id)
+        return list(reversed(trail))
+
+    def path(self, category_id: int) -> str:
+        return "/" + "".join(f"{node.id}/" for node in self.ancestors(category_id))
+
+
+def load_tree(version: int = 0) -> CategoryTree:
+    return CategoryTree(Category.objects.only("id", "name", "slug", "parent_id", "path"), version)
+
+
+_tree: CategoryTree | None = None
+_lock = threading.Lock()
+
+
+def get_tree(require: int | None = None) -> CategoryTree:
+    """The worker's tree, rebuilt after category writes or when `require` is missing from it."""
+    global _tree
+    version = versions.get_version(versions.CATEGORY_TREE)
+    current = _tree
+    if current is not None and current.version == version and (require is None or require in current):
+        return current
+    with _lock:
+        if _tree is current:
+            _tree = load_tree(version)
+            log.info("category_tree_loaded", extra={"version": version, "categories": len(_tree.nodes)})
+        return _tree
+
+
+def reset_tree() -> None:
+    global _tree
+    _tree = None
+
+
+def rebuild_paths() -> int:
+    """Recompute every stored path, e.g. after `bulk_create`, which bypasses `Category.save`."""
+    tree = load_tree()
+    changed = []
+    for category_id, category in tree.nodes.items():
+        path = tree.path(category_id)
+        if category.path != path:
+            category.path = path
+            changed.append(category)
+    Category.objects.bulk_update(changed, ["path"], batch_size=1000)
+    if changed:
+        versions.bump_version(versions.CATEGORY_TREE)
+    return len(changed)
@@ -0,0 +1,126 @@
+"""Circuit breaker for Elasticsearch searches, shared by all workers through the cache.
+
+Consecutive failures or slow responses trip the breaker; while it is open the
+search provider goes straight to the database fallback instead of waiting on
+ES timeouts. A background probe closes it once ES answers again. If the probe
+never runs, the open state simply expires after the cooldown and the next
+failure trips it again immediately (half-open).
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+log = logging.getLogger("catalog")
+
+FAILURES_KEY = "catalog:es_breaker:failures"
+OPEN_KEY = "catalog:es_breaker:open"
+HALF_OPEN_KEY = "catalog:es_breaker:half_open"
+PROBE_SCHEDULED_KEY = "catalog:es_breaker:probe_scheduled"
+
+
+def _threshold() -> int:
+    return max(1, int(getattr(settings, "ES_BREAKER_FAILURE_THRESHOLD", 5)))
+
+
+def _slow_seconds() -> float:
+    return float(getattr(settings, "ES_BREAKER_SLOW_SECONDS", 0.6))
+
+
+def _cooldown() -> int:
+    return max(1, int(getattr(settings, "ES_BREAKER_COOLDOWN_SECONDS", 30)))
+
+
+def is_open() -> bool:
+    try:
+        return cache.get(OPEN_KEY) is not None
+    except Exception:
+        return False
+
+
+def record_success(elapsed: float = 0.0) -> None:
+    if elapsed > _slow_seconds():
+        record_failure(f"slow:{elapsed:.3f}s")
+        return
+    try:
+        if cache.get(FAILURES_KEY):
+            cache.delete(FAILURES_KEY)
+        if cache.get(HALF_OPEN_KEY) is not None:
+            cache.delete(HALF_OPEN_KEY)
+    except Exception:
+        log.warning("es_breaker_cache_failed", exc_info=True)
+
+
+def record_failure(reason: str = "") -> None:
+    try:
+        half_open = cache.get(HALF_OPEN_KEY) is not None
+        cache.add(FAILURES_KEY, 0, timeout=_cooldown() * 4)
+        failures = cache.incr(FAILURES_KEY)
+    except Exception:
+        log.warning("es_breaker_cache_failed", exc_info=True)
+        return
+    if half_open or failures >= _threshold():
+        trip(reason)
+
+
+def trip(reason: str = "") -> None:
+    _open(reason)
+    schedule_probe()
+
+
+def _open(reason: str) -> None:
+    cooldown = _cooldown()
+    cache.set(OPEN_KEY, time.time() + cooldown, timeout=cooldown)
+    # Outlives the open window so the first failure after expiry re-trips at once.
+    cache.set(HALF_OPEN_KEY, 1, timeout=cooldown * 4)
+    cache.delete(FAILURES_KEY)
+    log.warning("es_breaker_opened", extra={"reason": reason, "cooldown": cooldown})
+
+
+def close() -> None:
+    cache.delete_many([OPEN_KEY, HALF_OPEN_KEY, FAILURES_KEY, PROBE_SCHEDULED_KEY])
+    log.info("es_breaker_closed")
+
+
+def schedule_probe() -> None:
+    delay = min(5, _cooldown())
+    if not cache.add(PROBE_SCHEDULED_KEY, 1, timeout=delay + 5):
+        return
+    from .tasks import probe_elasticsearch
+
+    try:
+        probe_elasticsearch.apply_async(countdown=delay)
+    except Exception:
+        # Without a broker the open state still expires on its own.
+        log.exception("es_breaker_probe_schedule_failed")
+
+
+def probe() -> bool | None:
+    """Ask ES for cluster health; close the breaker on success, keep it open otherwise.
+
+    Runs once shortly after the breaker trips and then from beat; does nothing
+    while the breaker is closed.
+    """
+    from . import es_client
+
+    cache.delete(PROBE_SCHEDULED_KEY)
+    if cache.get(HALF_OPEN_KEY) is None:
+        return None
+    try:
+        r = es_client.get(
+            f"{es_client._es_url()}/_cluster/health",
+            params={"filter_path": "status"},
+            timeout=max(es_client._timeout(), 2),
+        )
+        r.raise_for_status()
+        healthy = r.json().get("status") in {"green", "yellow"}
+    except Exception as exc:
+        log.info("es_breaker_probe_failed", extra={"reason": str(exc)})
+        healthy = False
+    if healthy:
+        close()
+        return True
+    _open("probe")
+    return False
@@ -0,0 +1,122 @@
+"""Propagate renames of denormalized parent rows into product documents.
+
+Product documents copy brand, series, category, country and store names. When
+one of those rows changes, only the affected products get a partial `_bulk`
+update carrying the fields derived from that parent. Brand, series and
+category names also feed the database `search_vector` column; a rename
+schedules its recompute the same way.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from .es_index import bulk_update_products
+from .fulltext import refresh_search_vectors
+from .index_queue import enqueue_product_ids, index_queryset
+from .models import Product
+
+log = logging.getLogger("catalog")
+
+# Parent kind -> (fields tracked on the parent row, document fields derived from it).
+CASCADES = {
+    "brand": (("name",), ("brand", "brand_facet", "search_terms", "semantic_terms", "semantic_text", "suggest")),
+    "series": (("name",), ("series", "search_terms")),
+    "category": (("name",), ("category", "search_terms", "semantic_terms", "semantic_text", "suggest")),
+    "country": (("name",), ("country_of_origin", "country_of_origin_keyword", "search_terms")),
+    "seller_store": (
+        ("name", "slug", "description"),
+        ("store_name", "store_description", "seller_facet", "search_terms", "suggest"),
+    ),
+}
+
+# Parents whose name is part of the product search_vector.
+SEARCH_VECTOR_KINDS = ("brand", "series", "category")
+
+_BEFORE_ATTR = "_es_cascade_before"
+
+
+def _chunk_size() -> int:
+    return max(1, int(getattr(settings, "ES_CASCADE_CHUNK_SIZE", 1000)))
+
+
+def affected_products(kind: str, pk: int):
+    if kind == "seller_store":
+        from commerce.models import SellerStore
+
+        return Product.objects.filter(seller_id__in=SellerStore.objects.filter(pk=pk).values("owner_id"))
+    lookup = "country_of_origin_id" if kind == "country" else f"{kind}_id"
+    return Product.objects.filter(**{lookup: pk})
+
+
+def remember_tracked_values(kind: str, instance) -> None:
+    """pre_save hook: keep the stored values of the tracked fields on the instance."""
+    if not instance.pk or not (getattr(settings, "ES_ENABLED", True) or kind in SEARCH_VECTOR_KINDS):
+        return
+    tracked, _ = CASCADES[kind]
+    before = type(instance).objects.filter(pk=instance.pk).values(*tracked).first()
+    setattr(instance, _BEFORE_ATTR, before)
+
+
+def schedule_cascade_if_changed(kind: str, instance, created: bool) -> bool:
+    """post_save hook: schedule a partial update when a tracked field actually changed."""
+    before = getattr(instance, _BEFORE_ATTR, None)
+    if created or before is None:
+        return False
+    tracked, _ = CASCADES[kind]
+    if all(before[field] == getattr(instance, field) for field in tracked):
+        return False
+    setattr(instance, _BEFORE_ATTR, None)
+    pk = instance.pk
+    if kind in SEARCH_VECTOR_KINDS:
+        transaction.on_commit(lambda: schedule_search_vector_refresh(kind, pk))
+    if not getattr(settings, "ES_ENABLED", True):
+        return False
+    transaction.on_commit(lambda: schedule_cascade(kind, pk))
+    return True
+
+
+def schedule_cascade(kind: str, pk: int) -> None:
+    from .tasks import cascade_parent_update
+
+    try:
+        cascade_parent_update.delay(kind, pk)
+    except Exception:
+        log.exception("es_cascade_schedule_failed", extra={"kind": kind, "pk": pk})
+        # The outbox still gets the products to ES, just with full documents.
+        enqueue_product_ids(affected_products(kind, pk).values_list("id", flat=True))
+
+
+def schedule_search_vector_refresh(kind: str, pk: int) -> None:
+    from .tasks import refresh_parent_search_vectors
+
+    try:
+        refresh_parent_search_vectors.delay(kind, pk)
+    except Exception:
+        log.exception("search_vector_schedule_failed", extra={"kind": kind, "pk": pk})
+        # Without a broker the batches run here rather than leaving stale vectors.
+        refresh_search_vectors(kind, pk)
+
+
+def partial_update_products(kind: str, pk: int, chunk_size: int | None = None) -> dict:
+    """Send partial updates for every product referencing parent `pk`, in `_bulk` chunks."""
+    _, doc_fields = CASCADES[kind]
+    chunk_size = chunk_size or _chunk_size()
+    qs = index_queryset().filter(id__in=affected_products(kind, pk).values("id")).order_by("id")
+    updated = 0
+    failed: list[int] = []
+    batch = []
+    for product in qs.iterator(chunk_size=chunk_size):
+        batch.append(product)
+        if len(batch) >= chunk_size:
+            failed.extend(bulk_update_products(batch, doc_fields))
+            updated += len(batch)
+            batch = []
+    if batch:
+        failed.extend(bulk_update_products(batch, doc_fields))
+        updated += len(batch)
+    if failed:
+        # Usually documents not indexed yet; a full sync creates them.
+        enqueue_product_ids(failed)
+    return {"updated": updated - len(failed), "requeued": len(failed)}
@@ -0,0 +1,124 @@
+"""Shared Elasticsearch HTTP client.
+
+Every ES call goes through one keep-alive `requests.Session` per process, so
+searches and bulk writes reuse pooled connections instead of opening a TCP
+connection per call. The session is rebuilt after a fork (Celery prefork,
+the parallel reindex pool) because sockets must not be shared across
+processes.
+"""
+
+import json
+import os
+import threading
+from typing import Iterable, List
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+_state: dict = {"pid": None, "session": None}
+_lock = threading.Lock()
+
+
+def _es_url() -> str:
+    return getattr(settings, "ES_URL", "http://es:9200").rstrip("/")
+
+
+def _es_index() -> str:
+    return getattr(settings, "ES_PRODUCTS_INDEX", "products")
+
+
+def _timeout() -> float:
+    return float(getattr(settings, "ES_TIMEOUT_SECONDS", 0.8))
+
+
+def _pool_maxsize() -> int:
+    return max(1, int(getattr(settings, "ES_POOL_MAXSIZE", 20)))
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    # Retries are left to callers: searches fall back to the database, writes to the outbox.
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=_pool_maxsize(), max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept": "application/json"})
+    return session
+
+
+def get_session() -> requests.Session:
+    pid = os.getpid()
+    if _state["session"] is None or _state["pid"] != pid:
+        with _lock:
+            if _state["session"] is None or _state["pid"] != pid:
+                _state["session"] = _build_session()
+                _state["pid"] = pid
+    return _state["session"]
+
+
+def reset_session() -> None:
+    with _lock:
+        session = _state["session"]
+        _state["session"] = None
+        _state["pid"] = None
+    if session is not None:
+        session.close()
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    return get_session().request(method, url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def head(url: str, **kwargs) -> requests.Response:
+    return request("HEAD", url, **kwargs)
+
+
+def put(url: str, **kwargs) -> requests.Response:
+    return request("PUT", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def delete(url: str, **kwargs) -> requests.Response:
+    return request("DELETE", url, **kwargs)
+
+
+def search(index: str, body: dict, *, filter_path: str = "", timeout: float | None = None) -> dict:
+    """Run one `_search`; `filter_path` trims the response to the keys the caller reads."""
+    params = {"filter_path": filter_path} if filter_path else None
+    r = post(f"{_es_url()}/{index}/_search", json=body, params=params, timeout=timeout or _timeout())
+    r.raise_for_status()
+    return r.json()
+
+
+def msearch(index: str, bodies: Iterable[dict], *, filter_path: str = "", timeout: float | None = None) -> List[dict]:
+    """Run several searches in one `_msearch` round trip.
+
+    Returns one response per body in order; a failed search comes back as a
+    dict with an `error` key instead of raising.
+    """
+    lines: List[str] = []
+    for body in bodies:
+        lines.append(json.dumps({"index": index}))
+        lines.append(json.dumps(body, ensure_ascii=False))
+    if not lines:
+        return []
+    params = None
+    if filter_path:
+        paths = [f"responses.{path}" for path in filter_path.split(",") if path]
+        params = {"filter_path": ",".join(paths + ["responses.error", "responses.status"])}
+    r = post(
+        f"{_es_url()}/_msearch",
+        data=("\n".join(lines) + "\n").encode("utf-8"),
+        headers={"Content-Type": "application/x-ndjson"},
+        params=params,
+        timeout=timeout or _timeout(),
+    )
+    r.raise_for_status()
+    return list(r.json().get("responses", []))
@@ -1,22 +1,17 @@
+import json
 import logging
-from typing import List
+from typing import Iterable, List
 
-import requests
 from django.conf import settings
+from django.core.cache import cache
 
-log = logging.getLogger("catalog")
-
-
-def _es_url() -> str:
-    return getattr(settings, "ES_URL", "http://es:9200").rstrip("/")
-
-
-def _es_index() -> str:
-    return getattr(settings, "ES_PRODUCTS_INDEX", "products")
+from . import es_client, synonyms
+from .es_client import _es_index, _es_url, _timeout
+from .models import SellerOffer
 
+log = logging.getLogger("catalog")
 
-def _timeout() -> float:
-    return float(getattr(settings, "ES_TIMEOUT_SECONDS", 0.8))
+SHADOW_INDEX_KEY = "catalog:es_index:shadow_indices"
 
 
 def _compact_terms(values: List[str]) -> List[str]:
@@ -34,12 +29,56 @@ def _compact_terms(values: List[str]) -> List[str]:
     return out
 
 
+def _product_tags(product) -> List[tuple]:
+    prefetched = getattr(product, "_prefetched_objects_cache", {}).get("tags")
+    if prefetched is not None:
+        return [(tag.id, tag.name, tag.slug) for tag in prefetched][:20]
+    tags_manager = getattr(product, "tags", None)
+    if tags_manager is None or not getattr(product, "pk", None):
+        return []
+    return list(tags_manager.values_list("id", "name", "slug")[:20])
+
+
+def _active_offers(product) -> list:
+    prefetched = getattr(product, "_prefetched_objects_cache", {}).get("seller_offers")
+    if prefetched is not None:
+        return [offer for offer in prefetched if offer.status == SellerOffer.Status.ACTIVE]
+    if not getattr(product, "pk", None):
+        return []
+    return list(product.seller_offers.filter(status=SellerOffer.Status.ACTIVE).prefetch_related("inventories"))
+
+
+def _catalog_fields(product, brand, store) -> dict:
+    """Filter, sort and facet fields used by the catalog listing engine."""
+    offers = _active_offers(product)
+    seller_id = getattr(product, "seller_id", None)
+    seller_ids = sorted({pid for pid in [seller_id, *(offer.seller_id for offer in offers)] if pid})
+    return {
+        "brand_id": getattr(product, "brand_id", None),
+        "series_id": getattr(product, "series_id", None),
+        "category_id": getattr(product, "category_id", None),
+        "seller_id": seller_id,
+        "seller_ids": seller_ids,
+        # Stored buy box, kept current by offer_service.refresh_buy_box; the database path filters on the same values.
+        "effective_price": float(getattr(product, "effective_price", 0) or 0),
+        "in_stock": int(getattr(product, "effective_stock_qty", 0) or 0) > 0,
+        "effective_lead_time_days": int(getattr(product, "effective_lead_time_days", 0) or 0),
+        # Stored aggregates, kept current by the review signals.
+        "rating_avg": float(getattr(product, "rating_avg", 0) or 0),
+        "rating_count": int(getattr(product, "rating_count", 0) or 0),
+        "name_sort": getattr(product, "name", ""),
+        # Facet keys carry the label so buckets render without a database lookup.
+        "brand_facet": f"{brand.name}|{brand.id}" if brand and getattr(brand, "id", None) else None,
+        "seller_facet": f"{store.name}|{store.slug}|{seller_id}" if store and getattr(store, "slug", "") and seller_id else None,
+    }
+
+
 def product_doc(product):
     store = getattr(getattr(product, "seller", None), "seller_store", None)
     country = getattr(product, "country_of_origin", None)
     country_name = getattr(country, "name", "") if country else ""
-    tags_manager = getattr(product, "tags", None)
-    tags = list(tags_manager.values_list("name", flat=True)[:20]) if tags_manager is not None and getattr(product, "pk", None) else []
+    tag_rows = _product_tags(product)
+    tags = [name for _, name, _ in tag_rows]
     series = getattr(product, "series", None)
     series_name = getattr(series, "name", "") if series else ""
     brand = getattr(product, "brand", None)
@@ -103,11 +142,13 @@ def product_doc(product):
         "purpose": getattr(product, "purpose", "") or "",
         "flavor": getattr(product, "flavor", "") or "",
         "tags": tags,
+        "tag_ids": [tag_id for tag_id, _, _ in tag_rows],
+        "tag_slugs": [slug for _, _, slug in tag_rows],
         "description": getattr(product, "description", "") or "",
         "price": float(getattr(product, "price", 0) or 0),
         "is_new": bool(getattr(product, "is_new", False)),
         "is_promo": bool(getattr(product, "is_promo", False)),
-        "in_stock": int(getattr(product, "stock_qty", 0) or 0) > 0,
+        "popularity": float(getattr(product, "popularity", 0) or 0),
         "search_terms": search_terms,
         "semantic_terms": semantic_terms,
         "semantic_text": " | ".join(semantic_terms),
@@ -115,15 +156,132 @@ def product_doc(product):
             "input": suggest_inputs,
             "weight": 10 + (2 if bool(getattr(product, "is_new", False)) else 0) + (1 if bool(getattr(product, "is_promo", False)) else 0),
         },
+        **_catalog_fields(product, brand, store),
     }
 
 
+# Text fields matched by live search; their query side expands merchandiser synonyms.
+SYNONYM_FIELDS = (
+    "name", "brand", "series", "category", "tags", "material", "purpose", "flavor",
+    "description", "store_name", "store_description",
+)
+
+
+def products_index_body() -> dict:
+    """Settings and mappings for a fresh products index, with the current synonym dictionary."""
+    body = {
+        "settings": {
+            "number_of_shards": 1,
+            "number_of_replicas": 0,
+            "analysis": {
+                "normalizer": {
+                    "folding_normalizer": {
+                        "type": "custom",
+                        "char_filter": [],
+                        "filter": ["lowercase", "asciifolding"],
+                    }
+                },
+                "analyzer": {
+                    "folding_text": {
+                        "type": "custom",
+                        "tokenizer": "standard",
+                        "filter": ["lowercase", "asciifolding"],
+                    }
+                },
+            }
+        },
+        "mappings": {
+            "properties": {
+                "id": {"type": "integer"},
+                "name": {"type": "text", "analyzer": "folding_text"},
+                "sku": {
+                    "type": "text",
+                    "analyzer": "folding_text",
+                    "fields": {
+                        "keyword": {
+                            "type": "keyword",
+                            "normalizer": "folding_normalizer",
+                        }
+                    },
+                },
+                "manufacturer_sku": {
+                    "type": "text",
+                    "analyzer": "folding_text",
+                    "fields": {"keyword": {"type": "keyword", "normalizer": "folding_normalizer"}},
+                },
+                "barcode": {
+                    "type": "text",
+                    "analyzer": "folding_text",
+                    "fields": {"keyword": {"type": "keyword", "normalizer": "folding_normalizer"}},
+                },
+                "brand": {"type": "text", "analyzer": "folding_text"},
+                "series": {"type": "text", "analyzer": "folding_text"},
+                "category": {"type": "text", "analyzer": "folding_text"},
+                "country_of_origin": {
+                    "type": "text",
+                    "analyzer": "folding_text",
+                    "fields": {
+                        "keyword": {
+                            "type": "keyword",
+                        }
+                    },
+                },
+                "country_of_origin_keyword": {
+                    "type": "keyword",
+                    "normalizer": "folding_normalizer",
+                },
+                "store_name": {"type": "text", "analyzer": "folding_text"},
+                "store_description": {"type": "text", "analyzer": "folding_text"},
+                "seller_username": {"type": "text", "analyzer": "folding_text"},
+                "material": {"type": "text", "analyzer": "folding_text"},
+                "purpose": {"type": "text", "analyzer": "folding_text"},
+                "flavor": {"type": "text", "analyzer": "folding_text"},
+                "tags": {"type": "text", "analyzer": "folding_text"},
+                "description": {"type": "text", "analyzer": "folding_text"},
+                "price": {"type": "double"},
+                "is_new": {"type": "boolean"},
+                "is_promo": {"type": "boolean"},
+                "popularity": {"type": "float"},
+                "in_stock": {"type": "boolean"},
+                "search_terms": {"type": "keyword", "normalizer": "folding_normalizer"},
+                "suggest": {"type": "completion", "analyzer": "folding_text"},
+                "brand_id": {"type": "integer"},
+                "series_id": {"type": "integer"},
+                "category_id": {"type": "integer"},
+                "tag_ids": {"type": "integer"},
+                "tag_slugs": {"type": "keyword"},
+                "seller_id": {"type": "integer"},
+                "seller_ids": {"type": "integer"},
+                "effective_price": {"type": "double"},
+                "effective_lead_time_days": {"type": "integer"},
+                "rating_avg": {"type": "float"},
+                "rating_count": {"type": "integer"},
+                "name_sort": {"type": "keyword", "normalizer": "folding_normalizer"},
+                "brand_facet": {"type": "keyword"},
+                "seller_facet": {"type": "keyword"},
+            }
+        },
+    }
+    rules = synonyms.load_dictionary().es_rules()
+    if rules:
+        analysis = body["settings"]["analysis"]
+        analysis["filter"] = {"catalog_synonyms": {"type": "synonym_graph", "synonyms": rules, "lenient": True}}
+        analysis["analyzer"]["folding_search"] = {
+            "type": "custom",
+            "tokenizer": "standard",
+            "filter": ["lowercase", "asciifolding", "catalog_synonyms"],
+        }
+        for field in SYNONYM_FIELDS:
+            body["mappings"]["properties"][field]["search_analyzer"] = "folding_search"
+    return body
+
+
 def upsert_product(product):
     if not getattr(settings, "ES_ENABLED", True):
         return
     url = f"{_es_url()}/{_es_index()}/_doc/{product.id}"
     try:
-        r = requests.put(url, json=product_doc(product), timeout=_timeout())
+        r = es_client.put(url, json=product_doc(product), timeout=_timeout())
         r.raise_for_status()
     except Exception as exc:
         log.warning("es_upsert_failed", extra={"product_id": product.id, "reason": str(exc)})
@@ -134,8 +292,106 @@ def delete_product(product_id: int):
         return
     url = f"{_es_url()}/{_es_index()}/_doc/{product_id}"
     try:
-        r = requests.delete(url, timeout=_timeout())
+        r = es_client.delete(url, timeout=_timeout())
         if r.status_code not in (200, 202, 404):
             r.raise_for_status()
     except Exception as exc:
         log.warning("es_delete_failed", extra={"product_id": product_id, "reason": str(exc)})
+
+
+def write_targets() -> List[str]:
+    """The live alias plus any index being rebuilt, so changes during a rebuild reach both."""
+    targets = [_es_index()]
+    try:
+        shadow = cache.get(SHADOW_INDEX_KEY) or []
+    except Exception:
+        log.warning("es_shadow_index_lookup_failed", exc_info=True)
+        shadow = []
+    for name in shadow:
+        if name not in targets:
+            targets.append(name)
+    return targets
+
+
+def set_shadow_index(name: str, timeout: int = 6 * 60 * 60) -> None:
+    shadow = [item for item in (cache.get(SHADOW_INDEX_KEY) or []) if item != name]
+    cache.set(SHADOW_INDEX_KEY, shadow + [name], timeout=timeout)
+
+
+def clear_shadow_index(name: str) -> None:
+    shadow = [item for item in (cache.get(SHADOW_INDEX_KEY) or []) if item != name]
+    if shadow:
+        cache.set(SHADOW_INDEX_KEY, shadow, timeout=6 * 60 * 60)
+    else:
+        cache.delete(SHADOW_INDEX_KEY)
+
+
+def _post_bulk(lines: List[str]) -> List[int]:
+    """POST NDJSON `lines` to `_bulk`; return ids of rejected actions, raise on transport errors."""
+    if not lines:
+        return []
+    payload = "\n".join(lines) + "\n"
+    r = es_client.post(
+        f"{_es_url()}/_bulk",
+        data=payload.encode("utf-8"),
+        headers={"Content-Type": "application/x-ndjson"},
+        timeout=max(_timeout(), 5),
+    )
+    r.raise_for_status()
+    data = r.json()
+    if not data.get("errors"):
+        return []
+    failed: List[int] = []
+    for item in data.get("items", []):
+        action, result = next(iter(item.items()))
+        status = int(result.get("status", 500))
+        if status < 300 or (action == "delete" and status == 404):
+            continue
+        try:
+            product_id = int(result.get("_id"))
+        except (TypeError, ValueError):
+            continue
+        if product_id not in failed:
+            failed.append(product_id)
+    if failed:
+        log.warning("es_bulk_partial_failure", extra={"failed_count": len(failed)})
+    return failed
+
+
+def bulk_sync_products(products: Iterable, delete_ids: Iterable[int] = (), indices: List[str] | None = None) -> List[int]:
+    """Send index/delete actions for a batch in a single `_bulk` request.
+
+    Returns ids whose individual actions were rejected by Elasticsearch so the
+    caller can retry them; transport errors are raised.
+    """
+    targets = indices or write_targets()
+    docs = [(product.id, json.dumps(product_doc(product), ensure_ascii=False)) for product in products]
+    delete_ids = list(delete_ids)
+    lines: List[str] = []
+    for index in targets:
+        for product_id, doc in docs:
+            lines.append(json.dumps({"index": {"_index": index, "_id": product_id}}))
+            lines.append(doc)
+        for product_id in delete_ids:
+            lines.append(json.dumps({"delete": {"_index": index, "_id": product_id}}))
+    return _post_bulk(lines)
+
+
+def bulk_update_products(products: Iterable, fields: Iterable[str], indices: List[str] | None = None) -> List[int]:
+    """Send partial `update` actions carrying only `fields` of each product's document.
+
+    Documents missing from an index come back as failures (404) so the caller can
+    fall back to a full index of those products.
+    """
+    targets = indices or write_targets()
+    fields = list(fields)
+    docs = []
+    for product in products:
+        doc = product_doc(product)
+        docs.append((product.id, json.dumps({"doc": {field: doc[field] for field in fields}}, ensure_ascii=False)))
+    lines: List[str] = []
+    for index in targets:
+        for product_id, partial in docs:
+            lines.append(json.dumps({"update": {"_index": index, "_id": product_id, "retry_on_conflict": 3}}))
+            lines.append(partial)
+    return _post_bulk(lines)
@@ -0,0 +1,203 @@
+"""Zero-downtime rebuild of the products index behind an alias.
+
+A fresh versioned index is filled in parallel while the live alias keeps
+serving reads; queued product changes are dual-written to both indices, and
+the alias is switched atomically once the new index is verified.
+"""
+
+import logging
+import math
+import multiprocessing
+from typing import Callable, List, Tuple
+
+from django.db import connections
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from . import es_client
+from .es_index import (
+    _es_index,
+    _es_url,
+    _timeout,
+    bulk_sync_products,
+    clear_shadow_index,
+    products_index_body,
+    set_shadow_index,
+)
+from .index_queue import enqueue_product_ids, index_queryset
+from .models import Product
+
+log = logging.getLogger("catalog")
+
+
+class ReindexError(RuntimeError):
+    pass
+
+
+def _admin_timeout() -> int:
+    return max(_timeout(), 30)
+
+
+def _check(resp, what: str) -> None:
+    if resp.status_code >= 300:
+        raise ReindexError(f"{what} failed: {resp.status_code} {resp.text[:300]}")
+
+
+def alias_state(alias: str) -> Tuple[List[str], bool]:
+    """Return indices currently behind `alias` and whether `alias` is a legacy concrete index."""
+    resp = es_client.get(f"{_es_url()}/_alias/{alias}", timeout=_admin_timeout())
+    if resp.status_code == 200:
+        return sorted(resp.json().keys()), False
+    if resp.status_code != 404:
+        _check(resp, f"alias lookup {alias}")
+    head = es_client.head(f"{_es_url()}/{alias}", timeout=_admin_timeout())
+    return [], head.status_code == 200
+
+
+def create_index(name: str) -> None:
+    body = products_index_body()
+    # Refreshing during a bulk load only produces segments that are merged away.
+    body["settings"]["refresh_interval"] = "-1"
+    _check(es_client.put(f"{_es_url()}/{name}", json=body, timeout=_admin_timeout()), f"create index {name}")
+
+
+def finalize_index(name: str) -> None:
+    _check(
+        es_client.put(
+            f"{_es_url()}/{name}/_settings",
+            json={"index": {"refresh_interval": "1s"}},
+            timeout=_admin_timeout(),
+        ),
+        f"settings {name}",
+    )
+    _check(es_client.post(f"{_es_url()}/{name}/_refresh", timeout=_admin_timeout()), f"refresh {name}")
+
+
+def index_doc_count(name: str) -> int:
+    resp = es_client.get(f"{_es_url()}/{name}/_count", timeout=_admin_timeout())
+    _check(resp, f"count {name}")
+    return int(resp.json().get("count", 0))
+
+
+def delete_index(name: str) -> None:
+    try:
+        es_client.delete(f"{_es_url()}/{name}", timeout=_admin_timeout())
+    except Exception:
+        log.warning("es_reindex_delete_failed", extra={"index": name}, exc_info=True)
+
+
+def swap_alias(alias: str, new_index: str, old_indices: List[str], legacy_concrete: bool) -> None:
+    actions = [{"remove": {"index": old, "alias": alias}} for old in old_indices if old != new_index]
+    if legacy_concrete:
+        # A concrete index with the alias name must go in the same request the alias appears in.
+        actions.append({"remove_index": {"index": alias}})
+    actions.append({"add": {"index": new_index, "alias": alias}})
+    _check(
+        es_client.post(f"{_es_url()}/_aliases", json={"actions": actions}, timeout=_admin_timeout()),
+        f"alias swap {alias}",
+    )
+
+
+def prune_old_indices(alias: str, keep: int, exclude: str) -> List[str]:
+    """Delete versioned indices of `alias` beyond the `keep` most recent, never touching `exclude`."""
+    resp = es_client.get(f"{_es_url()}/{alias}_v*", params={"filter_path": "*.settings.index.provided_name"}, timeout=_admin_timeout())
+    if resp.status_code >= 300:
+        return []
+    live, _ = alias_state(alias)
+    candidates = sorted((name for name in resp.json().keys() if name != exclude and name not in live), reverse=True)
+    removed = candidates[max(0, keep) :]
+    for name in removed:
+        delete_index(name)
+    return removed
+
+
+def id_slices(parts: int) -> List[Tuple[int, int]]:
+    """Split the product primary-key range into half-open `[lo, hi)` slices."""
+    bounds = Product.objects.aggregate(lo=Min("id"), hi=Max("id"))
+    lo, hi = bounds["lo"], bounds["hi"]
+    if lo is None:
+        return []
+    step = max(1, math.ceil((hi - lo + 1) / max(1, parts)))
+    return [(start, min(start + step, hi + 1)) for start in range(lo, hi + 1, step)]
+
+
+def _send(index_name: str, batch: list) -> int:
+    failed = bulk_sync_products(batch, indices=[index_name])
+    if failed:
+        raise ReindexError(f"{len(failed)} documents rejected by {index_name}")
+    return len(batch)
+
+
+def index_id_range(index_name: str, id_range: Tuple[int, int], chunk_size: int) -> int:
+    lo, hi = id_range
+    qs = index_queryset().filter(id__gte=lo, id__lt=hi).order_by("id")
+    count = 0
+    batch = []
+    for product in qs.iterator(chunk_size=chunk_size):
+        batch.append(product)
+        if len(batch) >= chunk_size:
+            count += _send(index_name, batch)
+            batch = []
+    if batch:
+        count += _send(index_name, batch)
+    return count
+
+
+def _index_slice_worker(job: Tuple[str, Tuple[int, int], int]) -> int:
+    return index_id_range(*job)
+
+
+def _fill_index(index_name: str, workers: int, chunk_size: int) -> int:
+    # Several slices per worker keep the pool busy when ids are unevenly dense.
+    jobs = [(index_name, id_range, chunk_size) for id_range in id_slices(workers * 4)]
+    if workers <= 1 or len(jobs) <= 1:
+        return sum(_index_slice_worker(job) for job in jobs)
+    # Forked workers must not share the parent's database sockets.
+    connections.close_all()
+    with multiprocessing.get_context("fork").Pool(processes=workers) as pool:
+        return sum(pool.map(_index_slice_worker, jobs))
+
+
+def rebuild_products_index(
+    *,
+    workers: int = 1,
+    chunk_size: int = 1000,
+    keep: int = 1,
+    max_drift: int = 0,
+    report: Callable[[str], None] | None = None,
+) -> dict:
+    report = report or (lambda message: None)
+    alias = _es_index()
+    started_at = timezone.now()
+    new_index = f"{alias}_v{started_at:%Y%m%d%H%M%S}"
+    old_indices, legacy_concrete = alias_state(alias)
+
+    report(f"Creating index {new_index}...")
+    create_index(new_index)
+    set_shadow_index(new_index)
+    try:
+        report(f"Indexing with {workers} worker(s)...")
+        indexed = _fill_index(new_index, workers, chunk_size)
+        finalize_index(new_index)
+        es_count = index_doc_count(new_index)
+        db_count = Product.objects.count()
+        if abs(es_count - db_count) > max_drift:
+            raise ReindexError(f"{new_index} holds {es_count} documents, database has {db_count}")
+        swap_alias(alias, new_index, old_indices, legacy_concrete)
+    except Exception:
+        log.exception("es_reindex_failed", extra={"index": new_index})
+        delete_index(new_index)
+        raise
+    finally:
+        clear_shadow_index(new_index)
+
+    # Writes that raced with the swap may have landed only in the old index.
+    caught_up = enqueue_product_ids(
+        Product.objects.filter(updated_at__gte=started_at).values_list("id", flat=True)
+    )
+    removed = prune_old_indices(alias, keep, exclude=new_index)
+    log.info(
+        "es_reindex_finished",
+        extra={"index": new_index, "indexed": indexed, "caught_up": caught_up, "removed": removed},
+    )
+    return {"index": new_index, "indexed": indexed, "caught_up": caught_up, "removed": removed}
@@ -0,0 +1,94 @@
+"""Ranked product lookups on the trigger-maintained `search_vector` column.
+
+Backs the database search provider: a GIN-indexed `tsvector` match with
+prefix matching on the last word, plus a `pg_trgm` similarity pass on product
+names for typos when the extension is installed.
+
+The column is computed by a row trigger on product writes. Renaming a brand,
+series or category does not touch product rows; `refresh_search_vectors`
+recomputes the affected products afterwards from a task, in short batches.
+"""
+
+import re
+from typing import Iterable, List
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Product
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_trigram_available: bool | None = None
+
+
+def tsquery_text(variants: Iterable[str]) -> str:
+    """Build a `to_tsquery` expression: words of a variant are AND-ed, variants OR-ed.
+
+    The last word of each variant is a prefix so queries typed character by
+    character already match.
+    """
+    groups = []
+    for variant in variants:
+        words = _WORD_RE.findall((variant or "").lower())[:8]
+        if not words:
+            continue
+        terms = words[:-1] + [f"{words[-1]}:*"]
+        group = " & ".join(terms)
+        if group not in groups:
+            groups.append(group)
+    return " | ".join(f"({group})" for group in groups)
+
+
+def fulltext_product_ids(variants: Iterable[str], limit: int) -> List[int]:
+    text = tsquery_text(variants)
+    if not text:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT p.id FROM catalog_product p, to_tsquery('russian', %s) q "
+            "WHERE p.search_vector @@ q "
+            "ORDER BY ts_rank(p.search_vector, q) DESC, p.is_new DESC, p.name, p.id "
+            "LIMIT %s",
+            [text, max(1, int(limit))],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def refresh_search_vectors(kind: str, pk: int, chunk_size: int | None = None) -> int:
+    """Recompute `search_vector` of the products of brand/series/category `pk`, one transaction per chunk."""
+    chunk_size = max(1, int(chunk_size or getattr(settings, "SEARCH_VECTOR_REFRESH_CHUNK_SIZE", 1000)))
+    products = Product.objects.filter(**{f"{kind}_id": pk}).order_by("id")
+    updated = 0
+    last_id = 0
+    while True:
+        ids = list(products.filter(id__gt=last_id).values_list("id", flat=True)[:chunk_size])
+        if not ids:
+            return updated
+        with transaction.atomic():
+            # Touching name fires the row trigger, which reads the current parent names.
+            updated += Product.objects.filter(id__in=ids).update(name=F("name"))
+        last_id = ids[-1]
+
+
+def trigram_available() -> bool:
+    global _trigram_available
+    if _trigram_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_available = cursor.fetchone() is not None
+    return _trigram_available
+
+
+def trigram_product_ids(query: str, limit: int) -> List[int]:
+    """Names similar to `query`; empty when pg_trgm is not installed."""
+    normalized = " ".join((query or "").lower().split())
+    if len(normalized) < 3 or not trigram_available():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT id FROM catalog_product WHERE lower(name) %% %s "
+            "ORDER BY similarity(lower(name), %s) DESC, id LIMIT %s",
+            [normalized, normalized, max(1, int(limit))],
+        )
+        return [row[0] for row in cursor.fetchall()]
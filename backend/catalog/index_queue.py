@@ -0,0 +1,186 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from .es_index import bulk_sync_products
+from .models import (
+    Product,
+    ProductIndexQueueItem,
+    SearchIndexWatermark,
+    SellerInventory,
+    SellerOffer,
+)
+
+log = logging.getLogger("catalog")
+
+FLUSH_SCHEDULED_KEY = "catalog:es_index_queue:flush_scheduled"
+PRODUCTS_WATERMARK = "products"
+
+
+def _queue_delay() -> int:
+    return max(1, int(getattr(settings, "ES_INDEX_QUEUE_DELAY_SECONDS", 2)))
+
+
+def _batch_size() -> int:
+    return max(1, int(getattr(settings, "ES_INDEX_QUEUE_BATCH_SIZE", 500)))
+
+
+def _claim_timeout() -> timedelta:
+    return timedelta(seconds=max(1, int(getattr(settings, "ES_INDEX_QUEUE_CLAIM_TIMEOUT_SECONDS", 300))))
+
+
+def _watermark_overlap() -> timedelta:
+    return timedelta(seconds=max(0, int(getattr(settings, "ES_INCREMENTAL_OVERLAP_SECONDS", 120))))
+
+
+def index_queryset():
+    return (
+        Product.objects.select_related(
+            "brand", "series", "category", "country_of_origin", "seller", "seller__seller_store"
+        )
+        .prefetch_related(
+            "tags",
+            Prefetch(
+                "seller_offers",
+                queryset=SellerOffer.objects.filter(status=SellerOffer.Status.ACTIVE).prefetch_related("inventories"),
+            ),
+        )
+    )
+
+
+def enqueue_product_ids(product_ids: Iterable[int], *, schedule: bool = True) -> int:
+    """Mark products as needing an ES sync; repeated changes collapse into one row per product."""
+    if not getattr(settings, "ES_ENABLED", True):
+        return 0
+    ids = sorted({int(pid) for pid in product_ids if pid})
+    if not ids:
+        return 0
+    ProductIndexQueueItem.objects.bulk_create(
+        [ProductIndexQueueItem(product_id=pid) for pid in ids],
+        update_conflicts=True,
+        unique_fields=["product_id"],
+        # A change arriving during a flush drops that flush's claim, so the row outlives it.
+        update_fields=["enqueued_at", "claimed_at"],
+    )
+    if schedule:
+        transaction.on_commit(schedule_queue_flush)
+    return len(ids)
+
+
+def schedule_queue_flush() -> None:
+    delay = _queue_delay()
+    try:
+        if not cache.add(FLUSH_SCHEDULED_KEY, "1", timeout=delay):
+            return
+    except Exception:
+        log.warning("es_index_queue_lock_failed", exc_info=True)
+    from .tasks import flush_product_index_queue
+
+    try:
+        flush_product_index_queue.apply_async(countdown=delay)
+    except Exception:
+        # The periodic flush picks the rows up if the broker is unavailable.
+        log.exception("es_index_queue_schedule_failed")
+
+
+def _claim_batch(limit: int) -> tuple[datetime, list[int]]:
+    """Stamp up to `limit` unclaimed (or abandoned) rows; they stay queued until the sync succeeds."""
+    claimed_at = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            ProductIndexQueueItem.objects.select_for_update(skip_locked=True)
+            .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=claimed_at - _claim_timeout()))
+            .order_by("enqueued_at", "id")
+            .values_list("id", "product_id")[:limit]
+        )
+        if rows:
+            ProductIndexQueueItem.objects.filter(id__in=[row_id for row_id, _ in rows]).update(claimed_at=claimed_at)
+    return claimed_at, [product_id for _, product_id in rows]
+
+
+def _claimed(claimed_at: datetime, product_ids: Iterable[int]):
+    return ProductIndexQueueItem.objects.filter(product_id__in=list(product_ids), claimed_at=claimed_at)
+
+
+def flush_batch(limit: int | None = None) -> dict:
+    """Claim up to `limit` queued products and sync them to ES with one bulk request."""
+    claimed_at, product_ids = _claim_batch(limit or _batch_size())
+    if not product_ids:
+        return {"indexed": 0, "deleted": 0, "failed": 0}
+    products = list(index_queryset().filter(id__in=product_ids).order_by("id"))
+    existing = {product.id for product in products}
+    delete_ids = [pid for pid in product_ids if pid not in existing]
+    try:
+        failed = bulk_sync_products(products, delete_ids=delete_ids)
+    except Exception as exc:
+        log.warning("es_index_queue_flush_failed", extra={"count": len(product_ids), "reason": str(exc)})
+        # Leave retries to the periodic flush so an ES outage does not spin the worker.
+        _claimed(claimed_at, product_ids).update(claimed_at=None)
+        raise
+    if failed:
+        _claimed(claimed_at, failed).update(claimed_at=None)
+    # Rows re-enqueued during the bulk lost this claim and are kept for the next flush.
+    _claimed(claimed_at, set(product_ids).difference(failed)).delete()
+    return {"indexed": len(products), "deleted": len(delete_ids), "failed": len(failed)}
+
+
+def drain_queue(max_batches: int = 20) -> dict:
+    totals = {"indexed": 0, "deleted": 0, "failed": 0, "batches": 0}
+    batch_size = _batch_size()
+    for _ in range(max(1, max_batches)):
+        result = flush_batch(batch_size)
+        if not any(result.values()):
+            break
+        totals["batches"] += 1
+        for key in ("indexed", "deleted", "failed"):
+            totals[key] += result[key]
+        if result["indexed"] + result["deleted"] < batch_size:
+            break
+    return totals
+
+
+def changed_product_ids(since: datetime, until: datetime) -> set[int]:
+    """Products whose own row or an indexed related row was updated in `(since, until]`."""
+    from commerce.models import SellerStore
+
+    window = {"updated_at__gt": since, "updated_at__lte": until}
+    ids = set(Product.objects.filter(**window).values_list("id", flat=True))
+    ids.update(SellerOffer.objects.filter(**window).values_list("product_id", flat=True))
+    ids.update(SellerInventory.objects.filter(**window).values_list("offer__product_id", flat=True))
+    ids.update(
+        Product.tags.through.objects.filter(tag__updated_at__gt=since, tag__updated_at__lte=until).values_list(
+            "product_id", flat=True
+        )
+    )
+    store_owner_ids = SellerStore.objects.filter(**window).values_list("owner_id", flat=True)
+    ids.update(Product.objects.filter(seller_id__in=store_owner_ids).values_list("id", flat=True))
+    return ids
+
+
+def enqueue_changed_products(since: datetime | None = None, *, until: datetime | None = None) -> dict:
+    """Queue products changed since the stored watermark (or `since`) and advance the watermark.
+
+    The window overlaps the previous run a little so rows committed late with an
+    older `updated_at` are still picked up; re-sending a document is harmless.
+    The first run without `since` only records the watermark.
+    """
+    until = until or timezone.now()
+    with transaction.atomic():
+        mark, created = SearchIndexWatermark.objects.select_for_update().get_or_create(
+            name=PRODUCTS_WATERMARK, defaults={"synced_until": until}
+        )
+        if since is None:
+            if created:
+                return {"queued": 0, "since": None, "until": until}
+            since = mark.synced_until - _watermark_overlap()
+        queued = enqueue_product_ids(changed_product_ids(since, until), schedule=False)
+        if until > mark.synced_until:
+            mark.synced_until = until
+            mark.save(update_fields=["synced_until", "updated_at"])
+    return {"queued": queued, "since": since, "until": until}
@@ -5,6 +5,7 @@ from django.db import transaction
 
 from catalog.models import Brand, Category, Color, Country, Product, Series, Tag
 from commerce.models import DeliveryAddress, LegalEntity
+from core import tagged_cache
 from users.models import User, UserProfile
 
 
@@ -134,6 +135,7 @@ class Command(BaseCommand):
         self._beautify_users()
         self._beautify_orgs_and_addresses()
         self._beautify_catalog()
+        tagged_cache.invalidate(*tagged_cache.CATALOG_TAGS)
         self.stdout.write(self.style.SUCCESS("Beautified generated dataset names"))
 
     def _beautify_users(self) -> None:
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from catalog.autocomplete import build_index
+
+
+class Command(BaseCommand):
+    help = "Build the search-box completion snapshot and publish it to workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep", type=int, default=1, help="Previous snapshots to keep on disk")
+
+    def handle(self, *args, **options):
+        meta = build_index(keep=max(0, options["keep"]))
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed completions: {meta['count']} into {meta['path']} ({meta['elapsed_s']}s)")
+        )
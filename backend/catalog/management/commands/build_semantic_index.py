@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from catalog.vector_index import build_index
+
+
+class Command(BaseCommand):
+    help = "Build the local vector index used for hybrid search candidates and publish it to workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--keep", type=int, default=1, help="Previous index builds to keep on disk")
+
+    def handle(self, *args, **options):
+        meta = build_index(chunk_size=max(1, options["chunk_size"]), keep=max(0, options["keep"]))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed products: {meta['count']} into {meta['path']} "
+                f"({meta['nlist']} lists, {meta['elapsed_s']}s)"
+            )
+        )
@@ -9,6 +9,8 @@ from django.db import transaction
 from django.db.models import Count
 from django.utils import timezone
 
+from catalog import category_tree
+from catalog.offer_service import refresh_buy_box
 from catalog.models import (
     Brand,
     Category,
@@ -20,6 +22,7 @@ from catalog.models import (
     Tag,
 )
 from commerce.models import DeliveryAddress, LegalEntity, LegalEntityMembership, MembershipRole
+from core import tagged_cache
 from users.models import User, UserProfile
 
 
@@ -155,6 +158,7 @@ class Command(BaseCommand):
             "memberships": LegalEntityMembership.objects.count(),
             "product_images": ProductImage.objects.count(),
         }
+        tagged_cache.invalidate(*tagged_cache.CATALOG_TAGS)
         self.stdout.write(self.style.SUCCESS(f"Dataset ready: {counts}"))
 
     def _create_users(self, add_count: int) -> None:
@@ -366,6 +370,7 @@ class Command(BaseCommand):
                 )
             )
         Category.objects.bulk_create(to_create, batch_size=1000)
+        category_tree.rebuild_paths()
 
     def _create_tags(self, target_total: int) -> None:
         missing = max(0, target_total - Tag.objects.count())
@@ -447,6 +452,8 @@ class Command(BaseCommand):
             )
             created += 1
         Product.objects.bulk_create(rows, batch_size=1000)
+        # bulk_create bypasses Product.save, which fills the stored buy box.
+        refresh_buy_box([product.id for product in rows])
 
     def _assign_tags_to_products(self) -> None:
         through = Product.tags.through
@@ -578,10 +578,11 @@ class Command(BaseCommand):
         dry_run = options["dry_run"]
         with transaction.atomic():
             changed = {
-                "products": _assign_names(Product.objects, "name", product_pools),
                 "tags": _assign_names(Tag.objects, "name", tag_pools),
                 "categories": _assign_names(Category.objects, "name", category_pools),
                 "brands": _assign_names(Brand.objects, "name", brand_pools),
+                # After the parents: rewriting product names recomputes search_vector with the new parent names.
+                "products": _assign_names(Product.objects, "name", product_pools),
                 "colors": _assign_names(Color.objects, "name", color_pools),
                 "users": _assign_names(get_user_model().objects, "username", username_pools, separator="_"),
             }
@@ -1,144 +1,76 @@
-import json
+import os
 
-import requests
-from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
-from catalog.es_index import product_doc
-from catalog.models import Product
+from catalog.es_reindex import ReindexError, rebuild_products_index
+from catalog.index_queue import drain_queue, enqueue_changed_products
 
 
 class Command(BaseCommand):
-    help = "Rebuild Elasticsearch index for products used by live search"
+    help = "Rebuild Elasticsearch index for products used by live search (zero downtime, via alias swap)"
 
-    def handle(self, *args, **options):
-        es_url = settings.ES_URL.rstrip("/")
-        index = settings.ES_PRODUCTS_INDEX
-        timeout = settings.ES_TIMEOUT_SECONDS
-        index_url = f"{es_url}/{index}"
-
-        mappings = {
-            "settings": {
-                "number_of_shards": 1,
-                "number_of_replicas": 0,
-                "analysis": {
-                    "normalizer": {
-                        "folding_normalizer": {
-                            "type": "custom",
-                            "char_filter": [],
-                            "filter": ["lowercase", "asciifolding"],
-                        }
-                    },
-                    "analyzer": {
-                        "folding_text": {
-                            "type": "custom",
-                            "tokenizer": "standard",
-                            "filter": ["lowercase", "asciifolding"],
-                        }
-                    },
-                }
-            },
-            "mappings": {
-                "properties": {
-                    "id": {"type": "integer"},
-                    "name": {"type": "text", "analyzer": "folding_text"},
-                    "sku": {
-                        "type": "text",
-                        "analyzer": "folding_text",
-                        "fields": {
-                            "keyword": {
-                                "type": "keyword",
-                                "normalizer": "folding_normalizer",
-                            }
-                        },
-                    },
-                    "manufacturer_sku": {
-                        "type": "text",
-                        "analyzer": "folding_text",
-                        "fields": {"keyword": {"type": "keyword", "normalizer": "folding_normalizer"}},
-                    },
-                    "barcode": {
-                        "type": "text",
-                        "analyzer": "folding_text",
-                        "fields": {"keyword": {"type": "keyword", "normalizer": "folding_normalizer"}},
-                    },
-                    "brand": {"type": "text", "analyzer": "folding_text"},
-                    "series": {"type": "text", "analyzer": "folding_text"},
-                    "category": {"type": "text", "analyzer": "folding_text"},
-                    "country_of_origin": {
-                        "type": "text",
-                        "analyzer": "folding_text",
-                        "fields": {
-                            "keyword": {
-                                "type": "keyword",
-                            }
-                        },
-                    },
-                    "country_of_origin_keyword": {
-                        "type": "keyword",
-                        "normalizer": "folding_normalizer",
-                    },
-                    "store_name": {"type": "text", "analyzer": "folding_text"},
-                    "store_description": {"type": "text", "analyzer": "folding_text"},
-                    "seller_username": {"type": "text", "analyzer": "folding_text"},
-                    "material": {"type": "text", "analyzer": "folding_text"},
-                    "purpose": {"type": "text", "analyzer": "folding_text"},
-                    "flavor": {"type": "text", "analyzer": "folding_text"},
-                    "tags": {"type": "text", "analyzer": "folding_text"},
-                    "description": {"type": "text", "analyzer": "folding_text"},
-                    "price": {"type": "double"},
-                    "is_new": {"type": "boolean"},
-                    "is_promo": {"type": "boolean"},
-                    "in_stock": {"type": "boolean"},
-                    "search_terms": {"type": "keyword", "normalizer": "folding_normalizer"},
-                    "suggest": {"type": "completion", "analyzer": "folding_text"},
-                }
-            },
-        }
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--keep", type=int, default=1, help="Previous index versions to keep for rollback")
+        parser.add_argument(
+            "--max-drift",
+            type=int,
+            default=0,
+            help="Allowed difference between indexed and database counts before the swap",
+        )
+        parser.add_argument(
+            "--since",
+            help="Only re-send products changed after this ISO datetime instead of rebuilding the index",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only re-send products changed since the stored watermark",
+        )
 
-        self.stdout.write("Deleting old index (if exists)...")
+    def handle(self, *args, **options):
+        if options["since"] or options["incremental"]:
+            self._sync_changed(options["since"])
+            return
         try:
-            requests.delete(index_url, timeout=timeout)
-        except Exception:
-            pass
-
-        self.stdout.write("Creating index...")
-        resp = requests.put(index_url, json=mappings, timeout=timeout)
-        if resp.status_code >= 300:
-            raise RuntimeError(f"Failed to create index: {resp.status_code} {resp.text}")
-
-        qs = Product.objects.select_related(
-            "brand", "category", "country_of_origin", "seller", "seller__seller_store"
-        ).prefetch_related("tags").all().order_by("id")
-        bulk_lines = []
-        count = 0
-        for p in qs.iterator(chunk_size=500):
-            bulk_lines.append(json.dumps({"index": {"_index": index, "_id": p.id}}))
-            bulk_lines.append(json.dumps(product_doc(p), ensure_ascii=False))
-            count += 1
-
-            if len(bulk_lines) >= 1000:
-                payload = "\n".join(bulk_lines) + "\n"
-                r = requests.post(
-                    f"{es_url}/_bulk",
-                    data=payload.encode("utf-8"),
-                    headers={"Content-Type": "application/x-ndjson"},
-                    timeout=max(timeout, 5),
-                )
-                r.raise_for_status()
-                bulk_lines = []
-
-        if bulk_lines:
-            payload = "\n".join(bulk_lines) + "\n"
-            r = requests.post(
-                f"{es_url}/_bulk",
-                data=payload.encode("utf-8"),
-                headers={"Content-Type": "application/x-ndjson"},
-                timeout=max(timeout, 5),
+            result = rebuild_products_index(
+                workers=max(1, options["workers"]),
+                chunk_size=max(1, options["chunk_size"]),
+                keep=max(0, options["keep"]),
+                max_drift=max(0, options["max_drift"]),
+                report=self.stdout.write,
             )
-            r.raise_for_status()
-
-        refresh = requests.post(f"{index_url}/_refresh", timeout=timeout)
-        refresh.raise_for_status()
+        except ReindexError as exc:
+            raise CommandError(str(exc)) from exc
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed products: {result['indexed']} into {result['index']}; "
+                f"re-queued {result['caught_up']}, removed {len(result['removed'])} old index(es)"
+            )
+        )
 
-        self.stdout.write(self.style.SUCCESS(f"Indexed products: {count}"))
+    def _sync_changed(self, raw_since):
+        since = None
+        if raw_since:
+            since = parse_datetime(raw_since)
+            if since is None:
+                raise CommandError(f"Invalid --since value: {raw_since}")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        result = enqueue_changed_products(since)
+        indexed = deleted = 0
+        while True:
+            totals = drain_queue(max_batches=100)
+            indexed += totals["indexed"]
+            deleted += totals["deleted"]
+            if totals["batches"] < 100:
+                break
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Changed products queued: {result['queued']}; indexed {indexed}, deleted {deleted} "
+                f"(watermark {result['until'].isoformat()})"
+            )
+        )
@@ -14,6 +14,7 @@ from PIL import Image, ImageDraw, ImageFilter
 
 from catalog.models import Brand, Category, Product, ProductImage, Series, Tag
 from commerce.models import SellerStore
+from core import tagged_cache
 
 
 ROOT_CATEGORIES = [
@@ -323,6 +324,7 @@ class Command(BaseCommand):
         self._refresh_products()
         if not self.skip_images:
             self._generate_hero_images()
+        tagged_cache.invalidate(*tagged_cache.CATALOG_TAGS)
 
         self.stdout.write(self.style.SUCCESS("Servio catalog refresh completed"))
 
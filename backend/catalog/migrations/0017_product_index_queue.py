@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0016_wave3_marketplace_systemization'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductIndexQueueItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField(unique=True)),
+                ('enqueued_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['enqueued_at', 'id'], name='prodindexq_enqueued_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0017_product_index_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('synced_until', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at'], name='product_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sellerinventory',
+            index=models.Index(fields=['updated_at'], name='sellerinv_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='selleroffer',
+            index=models.Index(fields=['updated_at'], name='selleroffer_updated_idx'),
+        ),
+    ]
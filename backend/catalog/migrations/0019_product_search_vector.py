@@ -0,0 +1,124 @@
+from django.db import migrations, transaction
+
+# The vector is maintained by triggers so queryset updates and parent renames stay in sync
+# without the ORM loading it. Weights: A name, B codes, C brand/series, D category and text.
+PRODUCT_VECTOR_SQL = """
+ALTER TABLE catalog_product ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION catalog_product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+        || setweight(to_tsvector('simple', concat_ws(' ', NEW.sku, NEW.manufacturer_sku, NEW.barcode)), 'B')
+        || setweight(to_tsvector('russian', concat_ws(' ',
+            (SELECT name FROM catalog_brand WHERE id = NEW.brand_id),
+            (SELECT name FROM catalog_series WHERE id = NEW.series_id))), 'C')
+        || setweight(to_tsvector('russian', concat_ws(' ',
+            (SELECT name FROM catalog_category WHERE id = NEW.category_id),
+            NEW.material, NEW.purpose, NEW.flavor, left(NEW.description, 4000))), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS catalog_product_search_vector_trg ON catalog_product;
+CREATE TRIGGER catalog_product_search_vector_trg
+    BEFORE INSERT OR UPDATE OF name, sku, manufacturer_sku, barcode, brand_id, series_id, category_id,
+        material, purpose, flavor, description
+    ON catalog_product
+    FOR EACH ROW EXECUTE FUNCTION catalog_product_search_vector_update();
+
+CREATE OR REPLACE FUNCTION catalog_product_search_vector_touch() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'catalog_brand' THEN
+        UPDATE catalog_product SET brand_id = brand_id WHERE brand_id = NEW.id;
+    ELSIF TG_TABLE_NAME = 'catalog_series' THEN
+        UPDATE catalog_product SET series_id = series_id WHERE series_id = NEW.id;
+    ELSE
+        UPDATE catalog_product SET category_id = category_id WHERE category_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS catalog_brand_search_vector_trg ON catalog_brand;
+CREATE TRIGGER catalog_brand_search_vector_trg AFTER UPDATE OF name ON catalog_brand
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name) EXECUTE FUNCTION catalog_product_search_vector_touch();
+DROP TRIGGER IF EXISTS catalog_series_search_vector_trg ON catalog_series;
+CREATE TRIGGER catalog_series_search_vector_trg AFTER UPDATE OF name ON catalog_series
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name) EXECUTE FUNCTION catalog_product_search_vector_touch();
+DROP TRIGGER IF EXISTS catalog_category_search_vector_trg ON catalog_category;
+CREATE TRIGGER catalog_category_search_vector_trg AFTER UPDATE OF name ON catalog_category
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name) EXECUTE FUNCTION catalog_product_search_vector_touch();
+"""
+
+PRODUCT_VECTOR_REVERSE_SQL = """
+DROP TRIGGER IF EXISTS catalog_category_search_vector_trg ON catalog_category;
+DROP TRIGGER IF EXISTS catalog_series_search_vector_trg ON catalog_series;
+DROP TRIGGER IF EXISTS catalog_brand_search_vector_trg ON catalog_brand;
+DROP TRIGGER IF EXISTS catalog_product_search_vector_trg ON catalog_product;
+DROP FUNCTION IF EXISTS catalog_product_search_vector_touch();
+DROP FUNCTION IF EXISTS catalog_product_search_vector_update();
+DROP INDEX IF EXISTS product_search_vector_gin;
+ALTER TABLE catalog_product DROP COLUMN IF EXISTS search_vector;
+"""
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def backfill_search_vector(apps, schema_editor):
+    """Fill search_vector for existing rows in short id-range transactions.
+
+    Touching name fires the trigger; batching keeps row locks and dead tuples bounded
+    instead of rewriting the whole table in one statement.
+    """
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT min(id), max(id) FROM catalog_product")
+        low, high = cursor.fetchone()
+    if low is None:
+        return
+    for start in range(low, high + 1, BACKFILL_BATCH_SIZE):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE catalog_product SET name = name WHERE id >= %s AND id < %s AND search_vector IS NULL",
+                [start, start + BACKFILL_BATCH_SIZE],
+            )
+
+
+# pg_trgm is optional: without it the provider skips the typo-tolerant pass.
+TRIGRAM_SQL = """
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+EXCEPTION WHEN OTHERS THEN
+    RAISE NOTICE 'pg_trgm is not available, trigram search stays disabled';
+END
+$$;
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        CREATE INDEX IF NOT EXISTS product_name_trgm_idx ON catalog_product USING gin (lower(name) gin_trgm_ops);
+    END IF;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+    # The backfill commits per batch and the GIN index is built concurrently, so nothing here
+    # holds a table-wide lock for the length of the migration. Every step is safe to re-run.
+    atomic = False
+
+    dependencies = [
+        ("catalog", "0018_search_index_watermark"),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=PRODUCT_VECTOR_SQL, reverse_sql=PRODUCT_VECTOR_REVERSE_SQL),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+        migrations.RunSQL(
+            sql="CREATE INDEX CONCURRENTLY IF NOT EXISTS product_search_vector_gin ON catalog_product USING gin (search_vector);",
+            reverse_sql="DROP INDEX IF EXISTS product_search_vector_gin;",
+        ),
+        migrations.RunSQL(sql=TRIGRAM_SQL, reverse_sql="DROP INDEX IF EXISTS product_name_trgm_idx;"),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:16
+
+from django.db import migrations, models
+
+# The dictionaries that used to be hardcoded in shopfront.search_service.
+SYNONYMS = {
+    "сиропы": "сироп",
+    "стаканы": "стакан",
+    "бокалы": "бокал",
+    "кофе зерно": "кофе",
+    "салфетки": "салфетка",
+    "одноразка": "одноразовая посуда",
+}
+REWRITES = {
+    "одноразка": "одноразовая посуда",
+    "хозка": "расходные материалы",
+    "барный сироп": "сироп для бара",
+    "кофе для эспрессо": "зерновой кофе эспрессо",
+    "упаковка на вынос": "takeaway упаковка",
+}
+
+
+def seed_dictionary(apps, schema_editor):
+    SearchSynonym = apps.get_model("catalog", "SearchSynonym")
+    for kind, entries in (("synonym", SYNONYMS), ("rewrite", REWRITES)):
+        for phrase, replacement in entries.items():
+            SearchSynonym.objects.get_or_create(kind=kind, phrase=phrase, defaults={"replacement": replacement})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0019_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchSynonym',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('synonym', 'Синоним'), ('rewrite', 'Переформулировка')], default='synonym', max_length=16)),
+                ('phrase', models.CharField(max_length=120)),
+                ('replacement', models.CharField(max_length=255)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['kind', 'phrase'],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'phrase'), name='unique_search_synonym_phrase')],
+            },
+        ),
+        migrations.RunPython(seed_dictionary, migrations.RunPython.noop),
+    ]
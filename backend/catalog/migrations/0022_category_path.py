@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:42
+
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    Category = apps.get_model("catalog", "Category")
+    parents = dict(Category.objects.values_list("id", "parent_id"))
+    paths = {}
+
+    def path_of(category_id):
+        chain = []
+        current = category_id
+        while current is not None and current not in paths and current not in chain and len(chain) < 20:
+            chain.append(current)
+            current = parents.get(current)
+        prefix = paths.get(current, "/")
+        for node in reversed(chain):
+            prefix = f"{prefix}{node}/"
+            paths[node] = prefix
+        return paths[category_id]
+
+    rows = [Category(id=category_id, path=path_of(category_id)) for category_id in parents]
+    Category.objects.bulk_update(rows, ["path"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0021_product_popularity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
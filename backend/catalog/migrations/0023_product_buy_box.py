@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:54
+
+import django.db.models.deletion
+from django.conf import settings
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+
+def fill_buy_box(apps, schema_editor):
+    """Mirror of offer_service.refresh_buy_box against the historical models."""
+    Product = apps.get_model("catalog", "Product")
+    SellerOffer = apps.get_model("catalog", "SellerOffer")
+    SellerInventory = apps.get_model("catalog", "SellerInventory")
+    Product.objects.update(
+        effective_price=F("price"),
+        effective_stock_qty=Greatest(F("stock_qty"), 0),
+        effective_lead_time_days=F("lead_time_days"),
+        effective_min_order_qty=Greatest(F("min_order_qty"), 1),
+    )
+    offers = {}
+    for offer in SellerOffer.objects.filter(status="active").order_by("-is_featured", "price", "id"):
+        offers.setdefault(offer.product_id, []).append(offer)
+    inventories = {}
+    for inventory in SellerInventory.objects.filter(offer__status="active"):
+        inventories.setdefault(inventory.offer_id, []).append(inventory)
+    rows = []
+    for product_id, candidates in offers.items():
+        def stock(offer):
+            return sum(max(0, inv.stock_qty - inv.reserved_qty) for inv in inventories.get(offer.id, []))
+
+        winner = next((offer for offer in candidates if stock(offer) > 0), candidates[0])
+        etas = [max(0, inv.eta_days) for inv in inventories.get(winner.id, [])]
+        rows.append(Product(
+            id=product_id,
+            winning_offer_id=winner.id,
+            effective_price=Decimal(str(winner.price)).quantize(Decimal("0.01")),
+            effective_stock_qty=stock(winner),
+            effective_lead_time_days=min(etas + [winner.lead_time_days]),
+            effective_min_order_qty=max(1, winner.min_order_qty),
+        ))
+    Product.objects.bulk_update(
+        rows,
+        ["winning_offer", "effective_price", "effective_stock_qty", "effective_lead_time_days", "effective_min_order_qty"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0022_category_path'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_lead_time_days',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='effective_min_order_qty',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='effective_stock_qty',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='winning_offer',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog.selleroffer'),
+        ),
+        migrations.RunPython(fill_buy_box, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['effective_price', 'name', 'id'], name='product_eff_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['effective_lead_time_days', 'effective_price'], name='product_eff_lead_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('effective_stock_qty__gt', 0)), fields=['-is_new', 'name', 'id'], name='product_in_stock_new_idx'),
+        ),
+    ]
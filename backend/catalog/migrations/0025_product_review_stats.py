@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:35
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_review_stats(apps, schema_editor):
+    """Mirror of review_stats.refresh_product_ratings against the historical models."""
+    Product = apps.get_model("catalog", "Product")
+    ProductReview = apps.get_model("catalog", "ProductReview")
+    stars = {}
+    for product_id, rating, reviews in (
+        ProductReview.objects.order_by().values("product_id", "rating").annotate(n=Count("id"))
+        .values_list("product_id", "rating", "n")
+    ):
+        if 1 <= rating <= 5:
+            stars.setdefault(product_id, [0, 0, 0, 0, 0])[rating - 1] = reviews
+    helpful = dict(
+        ProductReview.objects.order_by().values("product_id").annotate(votes=Sum("helpful_count"))
+        .values_list("product_id", "votes")
+    )
+    rows = []
+    for product_id, histogram in stars.items():
+        total = sum(histogram)
+        rows.append(Product(
+            id=product_id,
+            rating_avg=round(sum((i + 1) * n for i, n in enumerate(histogram)) / total, 4),
+            rating_count=total,
+            rating_histogram=histogram,
+            review_helpful_votes=int(helpful.get(product_id) or 0),
+        ))
+    Product.objects.bulk_update(
+        rows, ["rating_avg", "rating_count", "rating_histogram", "review_helpful_votes"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0024_product_sort_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_histogram',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='review_helpful_votes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_review_stats, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-rating_avg', '-rating_count', 'name', 'id'], name='product_rating_idx'),
+        ),
+    ]
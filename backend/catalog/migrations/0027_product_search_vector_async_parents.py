@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Parent renames no longer rewrite every product row in the renaming transaction;
+# catalog.es_cascade schedules a batched recompute after commit instead.
+DROP_PARENT_TRIGGERS_SQL = """
+DROP TRIGGER IF EXISTS catalog_category_search_vector_trg ON catalog_category;
+DROP TRIGGER IF EXISTS catalog_series_search_vector_trg ON catalog_series;
+DROP TRIGGER IF EXISTS catalog_brand_search_vector_trg ON catalog_brand;
+DROP FUNCTION IF EXISTS catalog_product_search_vector_touch();
+"""
+
+RESTORE_PARENT_TRIGGERS_SQL = """
+CREATE OR REPLACE FUNCTION catalog_product_search_vector_touch() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'catalog_brand' THEN
+        UPDATE catalog_product SET brand_id = brand_id WHERE brand_id = NEW.id;
+    ELSIF TG_TABLE_NAME = 'catalog_series' THEN
+        UPDATE catalog_product SET series_id = series_id WHERE series_id = NEW.id;
+    ELSE
+        UPDATE catalog_product SET category_id = category_id WHERE category_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER catalog_brand_search_vector_trg AFTER UPDATE OF name ON catalog_brand
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name) EXECUTE FUNCTION catalog_product_search_vector_touch();
+CREATE TRIGGER catalog_series_search_vector_trg AFTER UPDATE OF name ON catalog_series
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name) EXECUTE FUNCTION catalog_product_search_vector_touch();
+CREATE TRIGGER catalog_category_search_vector_trg AFTER UPDATE OF name ON catalog_category
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name) EXECUTE FUNCTION catalog_product_search_vector_touch();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0026_productindexqueueitem_claimed_at"),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=DROP_PARENT_TRIGGERS_SQL, reverse_sql=RESTORE_PARENT_TRIGGERS_SQL),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
 from django.core.validators import RegexValidator
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
@@ -79,10 +81,27 @@ class Category(TimeStampedModel, SeoFieldsMixin):
     landing_body = models.TextField(blank=True)
     faq_title = models.CharField(max_length=255, blank=True)
     faq_body = models.TextField(blank=True)
+    # Materialized ancestor chain, e.g. "/1/5/12/"; maintained by save().
+    path = models.CharField(max_length=255, blank=True, default="", editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["path"], name="category_path_idx", opclasses=["varchar_pattern_ops"]),
+        ]
 
     def __str__(self):
         return self.name
 
+    def _parent_path(self) -> str:
+        if not self.parent_id:
+            return "/"
+        return Category.objects.filter(pk=self.parent_id).values_list("path", flat=True).first() or "/"
+
+    def clean(self):
+        super().clean()
+        if self.pk and f"/{self.pk}/" in self._parent_path():
+            raise ValidationError({"parent": "A category cannot be nested under itself or its descendants."})
+
     def save(self, *args, **kwargs):
         if not self.slug:
             base = slugify(self.name)
@@ -94,7 +113,19 @@ class Category(TimeStampedModel, SeoFieldsMixin):
                 candidate = f"{base}-{suffix}"
                 suffix += 1
             self.slug = candidate
-        return super().save(*args, **kwargs)
+        old_path = Category.objects.filter(pk=self.pk).values_list("path", flat=True).first() if self.pk else None
+        parent_path = self._parent_path()
+        if self.pk and f"/{self.pk}/" in parent_path:
+            raise ValidationError({"parent": "A category cannot be nested under itself or its descendants."})
+        result = super().save(*args, **kwargs)
+        self.path = f"{parent_path}{self.pk}/"
+        Category.objects.filter(pk=self.pk).exclude(path=self.path).update(path=self.path)
+        if old_path and old_path != self.path:
+            # Moving a subtree rewrites the prefix of every descendant in one statement.
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(self.path), Substr("path", len(old_path) + 1), output_field=models.CharField())
+            )
+        return result
 
 class Tag(TimeStampedModel):
     name = models.CharField(max_length=64, unique=True)
@@ -103,6 +134,12 @@ class Tag(TimeStampedModel):
     def __str__(self):
         return self.name
 
+BUY_BOX_FIELDS = (
+    "winning_offer", "effective_price", "effective_stock_qty", "effective_lead_time_days", "effective_min_order_qty",
+)
+RATING_FIELDS = ("rating_avg", "rating_count", "rating_histogram", "review_helpful_votes")
+
+
 class Product(TimeStampedModel, SeoFieldsMixin):
     # артикул должен состоять из 8 цифр
     sku = models.CharField(
@@ -137,6 +174,8 @@ class Product(TimeStampedModel, SeoFieldsMixin):
     lead_time_days = models.PositiveIntegerField(default=0)
     is_new = models.BooleanField(default=False)
     is_promo = models.BooleanField(default=False)
+    # Smoothed search click-through rate, recomputed from search events.
+    popularity = models.FloatField(default=0)
     attributes = models.JSONField(default=dict, blank=True)
     composition = models.TextField(blank=True)
     shelf_life = models.CharField(max_length=120, blank=True)
@@ -149,6 +188,26 @@ class Product(TimeStampedModel, SeoFieldsMixin):
         blank=True,
         related_name="marketplace_products",
     )
+    # Buy box: the winning active offer's terms, or the product's own when it has none.
+    # Maintained by save() and offer/inventory signals (see offer_service.refresh_buy_box).
+    winning_offer = models.ForeignKey(
+        "SellerOffer",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+",
+    )
+    effective_price = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    effective_stock_qty = models.IntegerField(default=0, editable=False)
+    effective_lead_time_days = models.PositiveIntegerField(default=0, editable=False)
+    effective_min_order_qty = models.PositiveIntegerField(default=1, editable=False)
+    # Review aggregates, maintained by review/vote signals (see review_stats).
+    rating_avg = models.FloatField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    # Review counts for 1..5 stars.
+    rating_histogram = models.JSONField(default=list, blank=True, editable=False)
+    review_helpful_votes = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         indexes = [
@@ -158,11 +217,31 @@ class Product(TimeStampedModel, SeoFieldsMixin):
             models.Index(fields=["category", "-is_new", "name", "id"], name="product_cat_new_idx"),
             models.Index(fields=["brand", "-is_new", "name", "id"], name="product_brand_new_idx"),
             models.Index(fields=["seller", "-is_new", "name", "id"], name="product_seller_new_idx"),
+            models.Index(fields=["updated_at"], name="product_updated_idx"),
+            models.Index(fields=["effective_price", "name", "id"], name="product_eff_price_idx"),
+            models.Index(fields=["-effective_price", "name", "id"], name="product_eff_price_desc_idx"),
+            models.Index(fields=["name", "id"], name="product_name_id_idx"),
+            models.Index(fields=["effective_lead_time_days", "effective_price"], name="product_eff_lead_idx"),
+            models.Index(fields=["-rating_avg", "-rating_count", "name", "id"], name="product_rating_idx"),
+            models.Index(
+                fields=["-is_new", "name", "id"],
+                condition=models.Q(effective_stock_qty__gt=0),
+                name="product_in_stock_new_idx",
+            ),
         ]
 
     def __str__(self):
         return f"{self.sku} — {self.name}"
 
+    def own_buy_box(self) -> dict:
+        """Buy-box values taken from the product itself, used while it has no active offer."""
+        return {
+            "effective_price": self.price,
+            "effective_stock_qty": max(0, int(self.stock_qty or 0)),
+            "effective_lead_time_days": max(0, int(self.lead_time_days or 0)),
+            "effective_min_order_qty": max(1, int(self.min_order_qty or 1)),
+        }
+
     def save(self, *args, **kwargs):
         if not self.slug:
             base = slugify(self.name)
@@ -174,27 +253,120 @@ class Product(TimeStampedModel, SeoFieldsMixin):
                 candidate = f"{base}-{suffix}"
                 suffix += 1
             self.slug = candidate
-        return super().save(*args, **kwargs)
+        own = self.own_buy_box()
+        if self._state.adding:
+            for field, value in own.items():
+                setattr(self, field, value)
+            return super().save(*args, **kwargs)
+        if not args and kwargs.get("update_fields") is None:
+            # Buy-box and rating columns have their own writers; a stale instance must not overwrite them.
+            skipped = set(BUY_BOX_FIELDS) | set(RATING_FIELDS) | self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped and field.attname not in skipped
+            ]
+        result = super().save(*args, **kwargs)
+        if Product.objects.filter(pk=self.pk, winning_offer__isnull=True).update(**own):
+            for field, value in own.items():
+                setattr(self, field, value)
+        return result
+
+    def _buy_box_value(self, name: str):
+        # Values resolved by apply_offer_snapshot win over the stored buy box.
+        if hasattr(self, f"_{name}"):
+            return getattr(self, f"_{name}")
+        if self.winning_offer_id is None:
+            return self.own_buy_box()[name]
+        return getattr(self, name)
 
     @property
     def display_price(self):
-        return getattr(self, "_effective_price", self.price)
+        return self._buy_box_value("effective_price")
 
     @property
     def display_stock_qty(self):
-        return getattr(self, "_effective_stock_qty", self.stock_qty)
+        return self._buy_box_value("effective_stock_qty")
 
     @property
     def display_lead_time_days(self):
-        return getattr(self, "_effective_lead_time_days", self.lead_time_days)
+        return self._buy_box_value("effective_lead_time_days")
 
     @property
     def display_min_order_qty(self):
-        return getattr(self, "_effective_min_order_qty", self.min_order_qty)
+        return self._buy_box_value("effective_min_order_qty")
 
     @property
     def active_offer(self):
-        return getattr(self, "_active_offer", None)
+        if hasattr(self, "_active_offer"):
+            return self._active_offer
+        return self.winning_offer if self.winning_offer_id else None
+
+class ProductIndexQueueItem(models.Model):
+    """Pending Elasticsearch sync for a product; one row per product id coalesces repeated changes.
+
+    A flush stamps `claimed_at` on the rows it is syncing and deletes them only after
+    ES accepted them; claims older than ES_INDEX_QUEUE_CLAIM_TIMEOUT_SECONDS are retaken.
+    """
+    product_id = models.BigIntegerField(unique=True)
+    enqueued_at = models.DateTimeField(auto_now=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["enqueued_at", "id"], name="prodindexq_enqueued_idx"),
+        ]
+
+    def __str__(self):
+        return f"ProductIndexQueueItem(product={self.product_id})"
+
+class SearchIndexWatermark(models.Model):
+    """Latest `updated_at` already picked up by the incremental search sync, per index."""
+    name = models.CharField(max_length=64, unique=True)
+    synced_until = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"SearchIndexWatermark({self.name}={self.synced_until.isoformat()})"
+
+class SearchSynonym(TimeStampedModel):
+    """Merchandiser-managed search dictionary entry.
+
+    Synonyms add query variants and are compiled into the ES synonym filter on
+    index build; rewrites turn shopper slang into catalog language before
+    semantic search.
+    """
+    class Kind(models.TextChoices):
+        SYNONYM = "synonym", "Синоним"
+        REWRITE = "rewrite", "Переформулировка"
+
+    kind = models.CharField(max_length=16, choices=Kind.choices, default=Kind.SYNONYM)
+    phrase = models.CharField(max_length=120)
+    replacement = models.CharField(max_length=255)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ["kind", "phrase"]
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "phrase"], name="unique_search_synonym_phrase"),
+        ]
+
+    def clean(self):
+        super().clean()
+        self.phrase = " ".join((self.phrase or "").lower().split())
+        self.replacement = " ".join((self.replacement or "").lower().split())
+        # Both sides end up in ES synonym rules, where these are syntax.
+        for value in (self.phrase, self.replacement):
+            if "," in value or "=>" in value:
+                raise ValidationError("Phrases must not contain ',' or '=>'.")
+        if self.phrase == self.replacement:
+            raise ValidationError("Replacement must differ from the phrase.")
+
+    def save(self, *args, **kwargs):
+        self.full_clean()
+        return super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.phrase} → {self.replacement}"
 
 class ProductImage(TimeStampedModel):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="images")
@@ -314,6 +486,7 @@ class SellerOffer(TimeStampedModel):
         indexes = [
             models.Index(fields=["product", "status", "price"], name="selleroffer_prod_price_idx"),
             models.Index(fields=["seller", "status", "price"], name="selleroffer_seller_price_idx"),
+            models.Index(fields=["updated_at"], name="selleroffer_updated_idx"),
         ]
 
     def __str__(self):
@@ -344,6 +517,7 @@ class SellerInventory(TimeStampedModel):
         ]
         indexes = [
             models.Index(fields=["offer", "-is_primary"], name="sellerinv_offer_primary_idx"),
+            models.Index(fields=["updated_at"], name="sellerinv_updated_idx"),
         ]
 
     def __str__(self):
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 from decimal import Decimal
+from typing import Iterable
 
 from django.db.models import Prefetch
 
-from .models import Product, SellerInventory, SellerOffer
+from .index_queue import enqueue_product_ids
+from .models import BUY_BOX_FIELDS, Product, SellerInventory, SellerOffer
 
 
 def active_offer_queryset():
@@ -21,6 +23,11 @@ def active_offer_queryset():
     )
 
 
+def with_buy_box(queryset):
+    """Join the stored winning offer so `active_offer` and the display values need no extra queries."""
+    return queryset.select_related("winning_offer__seller", "winning_offer__seller_store")
+
+
 def resolve_product_offer(product: Product) -> SellerOffer | None:
     prefetched = getattr(product, "_prefetched_objects_cache", {}).get("seller_offers")
     offers = prefetched if prefetched is not None else list(active_offer_queryset().filter(product_id=product.id))
@@ -31,25 +38,55 @@ def resolve_product_offer(product: Product) -> SellerOffer | None:
     return ordered[0] if ordered else None
 
 
+def buy_box_values(product: Product, offer: SellerOffer | None) -> dict:
+    if offer is None:
+        return {"winning_offer": None, **product.own_buy_box()}
+    inventories = list(getattr(offer, "_prefetched_objects_cache", {}).get("inventories", []) or [])
+    lead_time = offer.lead_time_days
+    if inventories:
+        lead_time = min([max(0, int(inv.eta_days or 0)) for inv in inventories] + [max(0, int(offer.lead_time_days or 0))])
+    return {
+        "winning_offer": offer,
+        "effective_price": Decimal(str(offer.price)).quantize(Decimal("0.01")),
+        "effective_stock_qty": max(0, offer.available_stock_qty),
+        "effective_lead_time_days": max(0, lead_time),
+        "effective_min_order_qty": max(1, int(offer.min_order_qty or 1)),
+    }
+
+
 def apply_offer_snapshot(products) -> list[Product]:
+    """Resolve the buy box live from the offers; listings read the stored columns instead."""
     prepared = list(products)
     for product in prepared:
-        offer = resolve_product_offer(product)
-        if offer is None:
-            product._active_offer = None
-            product._effective_price = product.price
-            product._effective_stock_qty = max(0, int(product.stock_qty or 0))
-            product._effective_lead_time_days = max(0, int(product.lead_time_days or 0))
-            product._effective_min_order_qty = max(1, int(product.min_order_qty or 1))
-            continue
-        inventories = list(getattr(offer, "_prefetched_objects_cache", {}).get("inventories", []) or [])
-        stock_qty = offer.available_stock_qty
-        lead_time = offer.lead_time_days
-        if inventories:
-            lead_time = min([max(0, int(inv.eta_days or 0)) for inv in inventories] + [max(0, int(offer.lead_time_days or 0))])
-        product._active_offer = offer
-        product._effective_price = Decimal(str(offer.price)).quantize(Decimal("0.01"))
-        product._effective_stock_qty = max(0, stock_qty)
-        product._effective_lead_time_days = max(0, lead_time)
-        product._effective_min_order_qty = max(1, int(offer.min_order_qty or 1))
+        values = buy_box_values(product, resolve_product_offer(product))
+        product._active_offer = values.pop("winning_offer")
+        for name, value in values.items():
+            setattr(product, f"_{name}", value)
     return prepared
+
+
+def refresh_buy_box(product_ids: Iterable[int] | None = None, *, chunk_size: int = 1000) -> int:
+    """Recompute the stored buy box of the given products (all when None); returns how many changed.
+
+    Changed products are queued for ES, whose documents copy the buy box.
+    """
+    queryset = Product.objects.only(
+        "id", "price", "stock_qty", "lead_time_days", "min_order_qty", *BUY_BOX_FIELDS
+    ).prefetch_related(Prefetch("seller_offers", queryset=active_offer_queryset()))
+    if product_ids is not None:
+        ids = {int(pid) for pid in product_ids if pid}
+        if not ids:
+            return 0
+        queryset = queryset.filter(id__in=ids)
+    changed = []
+    for product in queryset.order_by("id").iterator(chunk_size=chunk_size):
+        values = buy_box_values(product, resolve_product_offer(product))
+        offer = values.pop("winning_offer")
+        values["winning_offer_id"] = offer.id if offer is not None else None
+        if any(getattr(product, name) != value for name, value in values.items()):
+            for name, value in values.items():
+                setattr(product, name, value)
+            changed.append(product)
+    Product.objects.bulk_update(changed, list(BUY_BOX_FIELDS), batch_size=chunk_size)
+    enqueue_product_ids(product.id for product in changed)
+    return len(changed)
@@ -0,0 +1,148 @@
+"""Stored review aggregates for products and seller stores.
+
+Listings, product pages and store pages read the rating average, count and
+1-5 star histogram from columns instead of aggregating reviews per request.
+Review and vote signals recompute the aggregates of the affected rows under a
+row lock, inside the writing transaction; `reconcile` recomputes everything
+periodically to repair rows changed around signals (bulk writes, raw SQL).
+"""
+
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Mapping
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from commerce.models import SellerStore, StoreReview
+
+from .models import RATING_FIELDS, Product, ProductReview, ProductReviewVote
+
+STARS = (1, 2, 3, 4, 5)
+
+
+def summarize(star_counts: Mapping[int, int]) -> dict:
+    """Average, count and histogram from a {stars: reviews} mapping."""
+    histogram = [int(star_counts.get(star, 0)) for star in STARS]
+    total = sum(histogram)
+    average = sum(star * count for star, count in zip(STARS, histogram)) / total if total else 0.0
+    return {"rating_avg": round(average, 4), "rating_count": total, "rating_histogram": histogram}
+
+
+def rating_distribution(histogram) -> list:
+    """Rows for a 5-to-1 star breakdown, with each star's share of all reviews in percent."""
+    counts = list(histogram or [])[: len(STARS)]
+    counts += [0] * (len(STARS) - len(counts))
+    total = sum(counts)
+    return [
+        {"stars": star, "count": counts[star - 1], "percent": round(100 * counts[star - 1] / total) if total else 0}
+        for star in reversed(STARS)
+    ]
+
+
+def _star_counts(reviews, owner_field: str, owner_ids) -> Dict[int, Dict[int, int]]:
+    counts: Dict[int, Dict[int, int]] = defaultdict(dict)
+    rows = (
+        reviews.filter(**{f"{owner_field}__in": owner_ids})
+        .order_by()
+        .values(owner_field, "rating")
+        .annotate(reviews=Count("id"))
+        .values_list(owner_field, "rating", "reviews")
+    )
+    for owner_id, rating, reviews_count in rows:
+        counts[owner_id][rating] = reviews_count
+    return counts
+
+
+def _store(model, owner_ids, fields, compute: Callable[[list], Dict[int, dict]]) -> int:
+    ids = sorted({int(pk) for pk in owner_ids if pk})
+    if not ids:
+        return 0
+    with transaction.atomic():
+        # Locking the owners serializes concurrent refreshes, so the last writer stores the newest totals.
+        owners = list(model.objects.select_for_update().filter(id__in=ids).order_by("id").only("id", *fields))
+        values = compute(ids)
+        changed = []
+        for owner in owners:
+            fresh = values[owner.id]
+            if any(getattr(owner, name) != value for name, value in fresh.items()):
+                for name, value in fresh.items():
+                    setattr(owner, name, value)
+                changed.append(owner)
+        model.objects.bulk_update(changed, list(fields), batch_size=500)
+    return len(changed)
+
+
+def _product_values(ids) -> Dict[int, dict]:
+    counts = _star_counts(ProductReview.objects, "product_id", ids)
+    helpful = dict(
+        ProductReview.objects.filter(product_id__in=ids)
+        .order_by()
+        .values("product_id")
+        .annotate(votes=Sum("helpful_count"))
+        .values_list("product_id", "votes")
+    )
+    return {pid: {**summarize(counts.get(pid, {})), "review_helpful_votes": int(helpful.get(pid) or 0)} for pid in ids}
+
+
+def refresh_product_ratings(product_ids: Iterable[int]) -> int:
+    """Recompute the stored aggregates of these products and their sellers' stores; returns products changed."""
+    product_ids = list(product_ids)
+    changed = _store(Product, product_ids, RATING_FIELDS, _product_values)
+    if changed:
+        seller_ids = Product.objects.filter(id__in=product_ids, seller_id__isnull=False).values_list("seller_id", flat=True)
+        refresh_store_ratings(SellerStore.objects.filter(owner_id__in=seller_ids).values_list("id", flat=True))
+    return changed
+
+
+def _store_values(ids) -> Dict[int, dict]:
+    counts = _star_counts(StoreReview.objects, "store_id", ids)
+    owners = dict(SellerStore.objects.filter(id__in=ids).values_list("id", "owner_id"))
+    products = {
+        row["seller_id"]: row
+        for row in Product.objects.filter(seller_id__in=owners.values(), rating_count__gt=0)
+        .order_by()
+        .values("seller_id")
+        .annotate(reviews=Sum("rating_count"), stars=Sum(F("rating_avg") * F("rating_count")))
+    }
+    values = {}
+    for store_id in ids:
+        row = products.get(owners.get(store_id)) or {"reviews": 0, "stars": 0}
+        reviews = int(row["reviews"] or 0)
+        values[store_id] = {
+            **summarize(counts.get(store_id, {})),
+            "product_rating_avg": round(float(row["stars"] or 0) / reviews, 4) if reviews else 0.0,
+            "product_rating_count": reviews,
+        }
+    return values
+
+
+def refresh_store_ratings(store_ids: Iterable[int]) -> int:
+    """Recompute the stored store-review and seller product-review aggregates of these stores."""
+    return _store(SellerStore, store_ids, SellerStore.RATING_FIELDS, _store_values)
+
+
+def refresh_review_votes(review_id: int) -> None:
+    """Recount a review's helpful/unhelpful votes from the vote rows."""
+    votes = dict(
+        ProductReviewVote.objects.filter(review_id=review_id)
+        .order_by()
+        .values("value")
+        .annotate(total=Count("id"))
+        .values_list("value", "total")
+    )
+    ProductReview.objects.filter(pk=review_id).update(
+        helpful_count=votes.get(ProductReviewVote.Value.HELPFUL, 0),
+        unhelpful_count=votes.get(ProductReviewVote.Value.UNHELPFUL, 0),
+    )
+
+
+def reconcile(chunk_size: int = 500) -> dict:
+    """Recompute every product and store aggregate; returns how many rows were out of date."""
+    totals = {"products": 0, "stores": 0}
+    product_ids = list(Product.objects.order_by("id").values_list("id", flat=True))
+    for start in range(0, len(product_ids), chunk_size):
+        totals["products"] += _store(Product, product_ids[start:start + chunk_size], RATING_FIELDS, _product_values)
+    store_ids = list(SellerStore.objects.order_by("id").values_list("id", flat=True))
+    for start in range(0, len(store_ids), chunk_size):
+        totals["stores"] += refresh_store_ratings(store_ids[start:start + chunk_size])
+    return totals
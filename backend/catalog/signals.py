@@ -1,15 +1,151 @@
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
-from catalog.es_index import delete_product, upsert_product
-from catalog.models import Product
+from catalog import versions
+from catalog.es_cascade import affected_products, remember_tracked_values, schedule_cascade_if_changed
+from catalog.index_queue import enqueue_product_ids
+from catalog.offer_service import refresh_buy_box
+from catalog.models import (
+    Brand, Category, Country, Product, ProductReview, ProductReviewVote, SearchSynonym, SellerInventory, SellerOffer,
+    Series, Tag,
+)
+from catalog.review_stats import refresh_product_ratings, refresh_review_votes
+from core import tagged_cache
+
+_PARENT_KINDS = {Brand: "brand", Series: "series", Category: "category", Country: "country"}
+# Fields read by the spelling and autocomplete indexes; saves touching only other fields keep them current.
+_VOCABULARY_FIELDS = {
+    Product: ("name", "brand", "sku", "barcode", "is_new", "is_promo"),
+    Brand: ("name",),
+    Category: ("name",),
+    Tag: ("name",),
+}
+_VOCABULARY_BEFORE_ATTR = "_vocabulary_before"
 
 
 @receiver(post_save, sender=Product)
 def product_post_save(sender, instance, **kwargs):
-    upsert_product(instance)
+    enqueue_product_ids([instance.id])
 
 
 @receiver(post_delete, sender=Product)
 def product_post_delete(sender, instance, **kwargs):
-    delete_product(instance.id)
+    enqueue_product_ids([instance.id])
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def product_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        enqueue_product_ids(instance.products.values_list("id", flat=True))
+        return
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+    if not reverse:
+        enqueue_product_ids([instance.pk])
+    elif pk_set:
+        enqueue_product_ids(pk_set)
+
+
+@receiver(pre_save, sender=Brand)
+@receiver(pre_save, sender=Series)
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Country)
+def product_parent_pre_save(sender, instance, **kwargs):
+    remember_tracked_values(_PARENT_KINDS[sender], instance)
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Series)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Country)
+def product_parent_post_save(sender, instance, created, **kwargs):
+    schedule_cascade_if_changed(_PARENT_KINDS[sender], instance, created)
+
+
+@receiver(pre_delete, sender=Brand)
+@receiver(pre_delete, sender=Series)
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Country)
+def product_parent_pre_delete(sender, instance, **kwargs):
+    # SET_NULL/CASCADE run as plain UPDATE/DELETE without product signals.
+    enqueue_product_ids(affected_products(_PARENT_KINDS[sender], instance.pk).values_list("id", flat=True))
+
+
+def _offers_changed(product_ids):
+    # The buy box is written with a bulk UPDATE that sends no product signals.
+    if refresh_buy_box(product_ids):
+        tagged_cache.invalidate(*(tagged_cache.tag("product", pk) for pk in product_ids), tagged_cache.tag("product"))
+
+
+@receiver(post_save, sender=SellerOffer)
+@receiver(post_delete, sender=SellerOffer)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def product_child_changed(sender, instance, **kwargs):
+    # Offer prices, lead times, sellers and ratings feed the catalog filter fields.
+    if sender is SellerOffer:
+        _offers_changed([instance.product_id])
+    else:
+        refresh_product_ratings([instance.product_id])
+    enqueue_product_ids([instance.product_id])
+
+
+@receiver([post_save, post_delete], sender=ProductReviewVote)
+def review_vote_changed(sender, instance, **kwargs):
+    refresh_review_votes(instance.review_id)
+    refresh_product_ratings(ProductReview.objects.filter(pk=instance.review_id).values_list("product_id", flat=True))
+
+
+@receiver(post_save, sender=SellerInventory)
+@receiver(post_delete, sender=SellerInventory)
+def seller_inventory_changed(sender, instance, **kwargs):
+    product_ids = list(SellerOffer.objects.filter(pk=instance.offer_id).values_list("product_id", flat=True))
+    _offers_changed(product_ids)
+    enqueue_product_ids(product_ids)
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Brand)
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Tag)
+def catalog_vocabulary_pre_save(sender, instance, update_fields=None, **kwargs):
+    fields = _VOCABULARY_FIELDS[sender]
+    before = None
+    if instance.pk and (update_fields is None or not set(fields).isdisjoint(update_fields)):
+        before = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    setattr(instance, _VOCABULARY_BEFORE_ATTR, before)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+def catalog_vocabulary_saved(sender, instance, created, **kwargs):
+    before = getattr(instance, _VOCABULARY_BEFORE_ATTR, None)
+    setattr(instance, _VOCABULARY_BEFORE_ATTR, None)
+    if created or (
+        before is not None
+        and any(
+            before[field] != getattr(instance, sender._meta.get_field(field).attname)
+            for field in _VOCABULARY_FIELDS[sender]
+        )
+    ):
+        versions.bump_version(versions.VOCABULARY)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Brand)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+def catalog_vocabulary_deleted(sender, **kwargs):
+    versions.bump_version(versions.VOCABULARY)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def category_tree_changed(sender, **kwargs):
+    versions.bump_version(versions.CATEGORY_TREE)
+
+
+@receiver([post_save, post_delete], sender=SearchSynonym)
+def search_synonyms_changed(sender, **kwargs):
+    versions.bump_version(versions.SYNONYMS)
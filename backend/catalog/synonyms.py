@@ -0,0 +1,161 @@
+"""Search synonym and rewrite dictionary compiled into Aho-Corasick automata.
+
+Entries live in `SearchSynonym` and are edited in the admin. Each worker
+compiles the active ones into two automata (synonyms, rewrites) so a query is
+scanned once, whatever the dictionary size. The dictionary is recompiled when
+the `synonyms` version moves; the same synonyms become the ES synonym filter
+when a products index is built.
+"""
+
+import logging
+import threading
+from collections import deque
+from typing import Iterable, Iterator, List, Mapping, Tuple
+
+from . import versions
+from .models import SearchSynonym
+
+log = logging.getLogger("catalog")
+
+MAX_VARIANTS = 4
+
+
+class Automaton:
+    """Aho-Corasick matcher over a fixed set of patterns."""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[str, ...]] = [()]
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._link()
+
+    def _add(self, pattern: str) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = (pattern,)
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Every `(start, pattern)` occurrence in `text`, overlaps included."""
+        state = 0
+        for end, ch in enumerate(text, start=1):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for pattern in self._out[state]:
+                yield end - len(pattern), pattern
+
+    def leftmost_longest(self, text: str) -> List[Tuple[int, str]]:
+        """Non-overlapping matches, preferring the earliest and then the longest pattern."""
+        chosen = []
+        position = 0
+        for start, pattern in sorted(self.matches(text), key=lambda item: (item[0], -len(item[1]))):
+            if start >= position:
+                chosen.append((start, pattern))
+                position = start + len(pattern)
+        return chosen
+
+
+class SynonymDictionary:
+    def __init__(self, synonyms: Mapping[str, str], rewrites: Mapping[str, str], version: int = 0):
+        self.synonyms = dict(synonyms)
+        self.rewrites = dict(rewrites)
+        self.version = version
+        self._synonym_automaton = Automaton(self.synonyms)
+        self._rewrite_automaton = Automaton(self.rewrites)
+
+    def variants(self, normalized: str) -> List[str]:
+        """The query, its whole-query alias and one variant per synonym found in it."""
+        variants = [normalized]
+        alias = self.synonyms.get(normalized)
+        if alias and alias not in variants:
+            variants.append(alias)
+        seen = set()
+        for _start, source in sorted(self._synonym_automaton.matches(normalized)):
+            if source in seen:
+                continue
+            seen.add(source)
+            replaced = normalized.replace(source, self.synonyms[source]).strip()
+            if replaced and replaced not in variants:
+                variants.append(replaced)
+        return variants[:MAX_VARIANTS]
+
+    def rewrite(self, normalized: str) -> str:
+        """Replace rewrite phrases in one left-to-right pass (longest phrase wins at a position)."""
+        parts = []
+        position = 0
+        for start, source in self._rewrite_automaton.leftmost_longest(normalized):
+            parts.append(normalized[position:start])
+            parts.append(self.rewrites[source])
+            position = start + len(source)
+        parts.append(normalized[position:])
+        return " ".join("".join(parts).split())
+
+    def es_rules(self) -> List[str]:
+        """Solr-format rules that keep the typed phrase and add its replacement."""
+        return [f"{source} => {source}, {target}" for source, target in sorted(self.synonyms.items())]
+
+
+def load_dictionary(version: int = 0) -> SynonymDictionary:
+    entries = {SearchSynonym.Kind.SYNONYM: {}, SearchSynonym.Kind.REWRITE: {}}
+    for kind, phrase, replacement in SearchSynonym.objects.filter(is_active=True).values_list(
+        "kind", "phrase", "replacement"
+    ):
+        entries[kind][phrase] = replacement
+    return SynonymDictionary(entries[SearchSynonym.Kind.SYNONYM], entries[SearchSynonym.Kind.REWRITE], version)
+
+
+_dictionary: SynonymDictionary | None = None
+_lock = threading.Lock()
+
+
+def get_dictionary() -> SynonymDictionary:
+    """The worker's compiled dictionary, reloaded after admin edits bump the version."""
+    global _dictionary
+    version = versions.get_version(versions.SYNONYMS)
+    current = _dictionary
+    if current is not None and current.version == version:
+        return current
+    with _lock:
+        if _dictionary is current:
+            try:
+                _dictionary = load_dictionary(version)
+                log.info(
+                    "synonym_dictionary_loaded",
+                    extra={"version": version, "synonyms": len(_dictionary.synonyms), "rewrites": len(_dictionary.rewrites)},
+                )
+            except Exception:
+                log.exception("synonym_dictionary_load_failed")
+                if _dictionary is None:
+                    return SynonymDictionary({}, {}, version)
+        return _dictionary
+
+
+def reset_dictionary() -> None:
+    global _dictionary
+    _dictionary = None
@@ -0,0 +1,100 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+
+from . import autocomplete, es_breaker, fulltext, review_stats, vector_index
+from .es_cascade import affected_products, partial_update_products
+from .index_queue import drain_queue, enqueue_changed_products, enqueue_product_ids, schedule_queue_flush
+
+log = logging.getLogger("catalog")
+
+
+@shared_task(bind=True, max_retries=0, ignore_result=True)
+def flush_product_index_queue(self, max_batches: int = 20):
+    try:
+        totals = drain_queue(max_batches=max_batches)
+    except Exception:
+        log.exception("es_index_queue_task_failed")
+        return None
+    log.info("es_index_queue_flushed", extra=totals)
+    if totals["batches"] >= max_batches:
+        schedule_queue_flush()
+    return totals
+
+
+@shared_task(ignore_result=True)
+def sync_changed_products_to_es(max_batches: int = 20):
+    """Catch ES up with rows changed outside model signals (raw SQL, bulk updates, lost tasks)."""
+    if not getattr(settings, "ES_ENABLED", True):
+        return None
+    try:
+        result = enqueue_changed_products()
+        totals = drain_queue(max_batches=max_batches) if result["queued"] else None
+    except Exception:
+        log.exception("es_incremental_sync_failed")
+        return None
+    log.info("es_incremental_sync", extra={"queued": result["queued"], "totals": totals})
+    if totals and totals["batches"] >= max_batches:
+        schedule_queue_flush()
+    return {"queued": result["queued"], "totals": totals}
+
+
+@shared_task(ignore_result=True)
+def cascade_parent_update(kind: str, pk: int):
+    """Refresh the denormalized parent fields of products after a brand/category/... rename."""
+    try:
+        result = partial_update_products(kind, pk)
+    except Exception:
+        log.exception("es_cascade_failed", extra={"kind": kind, "pk": pk})
+        enqueue_product_ids(affected_products(kind, pk).values_list("id", flat=True))
+        return None
+    log.info("es_cascade_done", extra={"kind": kind, "pk": pk, **result})
+    return result
+
+
+@shared_task(ignore_result=True)
+def refresh_parent_search_vectors(kind: str, pk: int):
+    """Recompute the database search vectors of products after a brand/series/category rename."""
+    try:
+        updated = fulltext.refresh_search_vectors(kind, pk)
+    except Exception:
+        log.exception("search_vector_refresh_failed", extra={"kind": kind, "pk": pk})
+        return None
+    log.info("search_vector_refreshed", extra={"kind": kind, "pk": pk, "updated": updated})
+    return updated
+
+
+@shared_task(ignore_result=True)
+def probe_elasticsearch():
+    return es_breaker.probe()
+
+
+@shared_task(ignore_result=True)
+def rebuild_semantic_index():
+    try:
+        return vector_index.build_index()
+    except Exception:
+        log.exception("semantic_index_build_failed")
+        return None
+
+
+@shared_task(ignore_result=True)
+def rebuild_autocomplete_index():
+    try:
+        return autocomplete.build_index()
+    except Exception:
+        log.exception("autocomplete_index_build_failed")
+        return None
+
+
+@shared_task(ignore_result=True)
+def reconcile_review_stats():
+    """Repair stored rating aggregates after writes that bypassed the review signals."""
+    try:
+        totals = review_stats.reconcile()
+    except Exception:
+        log.exception("review_stats_reconcile_failed")
+        return None
+    log.info("review_stats_reconciled", extra=totals)
+    return totals
@@ -0,0 +1,284 @@
+"""Local semantic candidate index over product `semantic_text`.
+
+Texts are embedded with hashed word and character-trigram TF-IDF features
+projected into a small dense space (no model download, CPU only). Vectors are
+grouped into inverted lists around k-means centroids and stored as `.npy`
+files; workers memory-map them and score only the lists closest to the query,
+so top-k lookups stay in the low milliseconds at full catalog size.
+
+Layout under `SEMANTIC_INDEX_DIR`: one directory per build plus a `CURRENT`
+file naming the live one, swapped atomically after a build.
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
+from django.conf import settings
+
+log = logging.getLogger("catalog")
+
+FEATURE_SPACE = 1 << 20
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+# Long descriptions add little beyond the first words and dominate build time.
+MAX_WORDS = 64
+IDF_SAMPLE_SIZE = 50000
+CURRENT_FILE = "CURRENT"
+# A worker without a published index warns at most this often while search falls back.
+MISSING_WARNING_INTERVAL = 300
+
+
+def _root() -> Path:
+    return Path(getattr(settings, "SEMANTIC_INDEX_DIR", Path(settings.BASE_DIR) / "var" / "semantic_index"))
+
+
+def _dim() -> int:
+    return int(getattr(settings, "SEMANTIC_INDEX_DIM", 256))
+
+
+def _nprobe() -> int:
+    return max(1, int(getattr(settings, "SEMANTIC_INDEX_NPROBE", 12)))
+
+
+def text_features(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashed word and boundary-marked char-trigram features with their counts."""
+    counts: Counter = Counter()
+    for word in _WORD_RE.findall((text or "").casefold())[:MAX_WORDS]:
+        counts[f"w:{word}"] += 1
+        padded = f"<{word}>"
+        for i in range(len(padded) - 2):
+            counts[padded[i : i + 3]] += 1
+    if not counts:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.float32)
+    hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in counts), dtype=np.uint32, count=len(counts))
+    return hashes, np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+
+
+def fit_idf(feature_sets: Iterable[Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+    df = np.zeros(FEATURE_SPACE, dtype=np.float32)
+    docs = 0
+    for hashes, _ in feature_sets:
+        docs += 1
+        if len(hashes):
+            df[np.unique(hashes % FEATURE_SPACE)] += 1
+    return np.log((1 + docs) / (1 + df)).astype(np.float32) + 1
+
+
+def embed(feature_sets: List[Tuple[np.ndarray, np.ndarray]], idf: np.ndarray, dim: int) -> np.ndarray:
+    """Sign-hash TF-IDF features into `dim` dense dimensions and L2-normalize the rows."""
+    matrix = np.zeros((len(feature_sets), dim), dtype=np.float32)
+    for row, (hashes, counts) in enumerate(feature_sets):
+        if not len(hashes):
+            continue
+        signs = np.where((hashes >> 31) & 1, -1.0, 1.0).astype(np.float32)
+        weights = (1 + np.log(counts)) * idf[hashes % FEATURE_SPACE] * signs
+        matrix[row] = np.bincount((hashes % dim).astype(np.intp), weights=weights, minlength=dim)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def _train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 8, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(len(vectors), nlist * 64), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        filled = np.bincount(assign, minlength=nlist) > 0
+        norms = np.linalg.norm(sums[filled], axis=1, keepdims=True)
+        centroids[filled] = sums[filled] / np.maximum(norms, 1e-12)
+    return centroids
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    return np.concatenate(
+        [np.argmax(vectors[start : start + chunk] @ centroids.T, axis=1) for start in range(0, len(vectors), chunk)]
+    ) if len(vectors) else np.zeros(0, dtype=np.intp)
+
+
+class VectorIndex:
+    def __init__(self, path: Path, mmap: bool = True):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / "meta.json").read_text())
+        mode = "r" if mmap else None
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode=mode)
+        self.ids = np.load(self.path / "ids.npy", mmap_mode=mode)
+        self.centroids = np.load(self.path / "centroids.npy")
+        self.offsets = np.load(self.path / "offsets.npy")
+        self.idf = np.load(self.path / "idf.npy")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return embed([text_features(query)], self.idf, self.vectors.shape[1])[0]
+
+    def search(self, query: str, k: int = 50, nprobe: int | None = None) -> List[int]:
+        vector = self.embed_query(query)
+        if not len(self.ids) or not vector.any():
+            return []
+        nprobe = min(len(self.centroids), nprobe or _nprobe())
+        lists = np.argsort(-(self.centroids @ vector))[:nprobe]
+        rows = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists])
+        if not len(rows):
+            return []
+        scores = self.vectors[rows] @ vector
+        top = min(k, len(rows))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [int(self.ids[rows[i]]) for i in best if scores[i] > 0]
+
+
+def _write_rows(path: Path, vectors: np.ndarray, order: np.ndarray, chunk: int = 65536) -> None:
+    """Write `vectors[order]` to an `.npy` file a chunk at a time, never holding the permuted copy."""
+    if not len(order):
+        np.save(path, np.zeros((0, vectors.shape[1]), dtype=np.float32))
+        return
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(len(order), vectors.shape[1]))
+    for start in range(0, len(order), chunk):
+        out[start : start + chunk] = vectors[order[start : start + chunk]]
+    out.flush()
+    del out
+
+
+def write_index(path: Path, ids: np.ndarray, vectors: np.ndarray, idf: np.ndarray) -> dict:
+    n = len(ids)
+    # ~sqrt(n) lists; tiny catalogs are scanned exhaustively.
+    nlist = 1 if n < 2000 else int(min(1024, max(1, np.sqrt(n))))
+    centroids = (
+        _train_centroids(vectors, nlist) if nlist > 1 else np.ones((1, vectors.shape[1]), dtype=np.float32)
+    )
+    assign = _assign(vectors, centroids) if nlist > 1 else np.zeros(n, dtype=np.intp)
+    order = np.argsort(assign, kind="stable")
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(assign, minlength=nlist))
+    path.mkdir(parents=True, exist_ok=True)
+    _write_rows(path / "vectors.npy", vectors, order)
+    np.save(path / "ids.npy", ids[order].astype(np.int64))
+    np.save(path / "centroids.npy", centroids.astype(np.float32))
+    np.save(path / "offsets.npy", offsets)
+    np.save(path / "idf.npy", idf)
+    meta = {"count": n, "dim": int(vectors.shape[1]), "nlist": nlist, "built_at": time.time()}
+    (path / "meta.json").write_text(json.dumps(meta))
+    return meta
+
+
+def _product_texts(chunk_size: int) -> Iterator[Tuple[int, str]]:
+    from .es_index import product_doc
+    from .index_queue import index_queryset
+
+    for product in index_queryset().order_by("id").iterator(chunk_size=chunk_size):
+        yield product.id, product_doc(product)["semantic_text"]
+
+
+def build_index(texts: Iterable[Tuple[int, str]] | None = None, *, chunk_size: int = 2000, keep: int = 1) -> dict:
+    """Embed every product, write a new index directory and point `CURRENT` at it."""
+    started = time.monotonic()
+    dim = _dim()
+    rows = iter(texts if texts is not None else _product_texts(chunk_size))
+    # IDF is fitted on a leading sample so the catalog is read only once.
+    sample = []
+    for pid, text in rows:
+        sample.append((pid, text_features(text)))
+        if len(sample) >= IDF_SAMPLE_SIZE:
+            break
+    idf = fit_idf(features for _, features in sample)
+
+    root = _root()
+    name = f"v{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    path = root / name
+    path.mkdir(parents=True)
+    # Embedded chunks are appended to a scratch file and memory-mapped back, so the
+    # full matrix is never held in memory; write_index reorders it the same way.
+    raw = path / "vectors.raw"
+    ids = [pid for pid, _ in sample]
+    try:
+        with open(raw, "wb") as out:
+            if sample:
+                out.write(embed([features for _, features in sample], idf, dim).tobytes())
+            batch: list = []
+            for pid, text in rows:
+                ids.append(pid)
+                batch.append(text_features(text))
+                if len(batch) >= chunk_size:
+                    out.write(embed(batch, idf, dim).tobytes())
+                    batch = []
+            if batch:
+                out.write(embed(batch, idf, dim).tobytes())
+        vectors = (
+            np.memmap(raw, dtype=np.float32, mode="r", shape=(len(ids), dim))
+            if ids
+            else np.zeros((0, dim), dtype=np.float32)
+        )
+        meta = write_index(path, np.asarray(ids, dtype=np.int64), vectors, idf)
+        del vectors
+        raw.unlink()
+    except Exception:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    tmp = root / f"{CURRENT_FILE}.{os.getpid()}"
+    tmp.write_text(name)
+    os.replace(tmp, root / CURRENT_FILE)
+    _prune(root, keep=keep, live=name)
+    meta.update(path=str(root / name), elapsed_s=round(time.monotonic() - started, 2))
+    log.info("semantic_index_built", extra=meta)
+    return meta
+
+
+def _prune(root: Path, keep: int, live: str) -> None:
+    old = sorted((p for p in root.iterdir() if p.is_dir() and p.name != live), reverse=True)
+    for path in old[max(0, keep) :]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+_loaded: Tuple[str, VectorIndex] | None = None
+_lock = threading.Lock()
+_missing_warned_at: float | None = None
+
+
+def get_index() -> VectorIndex | None:
+    """The live index for this worker, reloaded after a new build is published; None if never built."""
+    global _loaded
+    try:
+        name = (_root() / CURRENT_FILE).read_text().strip()
+    except OSError:
+        return None
+    if _loaded is not None and _loaded[0] == name:
+        return _loaded[1]
+    with _lock:
+        if _loaded is None or _loaded[0] != name:
+            try:
+                _loaded = (name, VectorIndex(_root() / name))
+            except Exception:
+                log.exception("semantic_index_load_failed", extra={"index": name})
+                return None
+        return _loaded[1]
+
+
+def _warn_missing() -> None:
+    global _missing_warned_at
+    now = time.monotonic()
+    if _missing_warned_at is None or now - _missing_warned_at >= MISSING_WARNING_INTERVAL:
+        _missing_warned_at = now
+        log.warning("semantic_index_missing", extra={"path": str(_root())})
+
+
+def semantic_candidate_ids(query: str, limit: int = 50) -> List[int]:
+    index = get_index()
+    if index is None:
+        # Callers fall back to database search; without this the vector backend fails silently.
+        _warn_missing()
+        return []
+    return index.search(query, k=limit)
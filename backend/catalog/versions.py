@@ -0,0 +1,37 @@
+"""Catalog version counters shared through the cache.
+
+Per-worker in-memory structures built from catalog data (spelling index,
+category tree, ...) remember the version they were built at and rebuild once
+the shared counter moves. Signals bump the counters on writes.
+"""
+
+import logging
+
+from django.core.cache import cache
+
+log = logging.getLogger("catalog")
+
+VOCABULARY = "vocabulary"
+SYNONYMS = "synonyms"
+CATEGORY_TREE = "category_tree"
+
+
+def _key(name: str) -> str:
+    return f"catalog:version:{name}"
+
+
+def get_version(name: str) -> int:
+    try:
+        return int(cache.get(_key(name)) or 0)
+    except Exception:
+        log.warning("catalog_version_read_failed", extra={"version": name}, exc_info=True)
+        return 0
+
+
+def bump_version(name: str) -> None:
+    key = _key(name)
+    try:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+    except Exception:
+        log.warning("catalog_version_bump_failed", extra={"version": name}, exc_info=True)
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:35
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def fill_store_review_stats(apps, schema_editor):
+    """Mirror of review_stats.refresh_store_ratings against the historical models."""
+    SellerStore = apps.get_model("commerce", "SellerStore")
+    StoreReview = apps.get_model("commerce", "StoreReview")
+    Product = apps.get_model("catalog", "Product")
+    stars = {}
+    for store_id, rating, reviews in (
+        StoreReview.objects.order_by().values("store_id", "rating").annotate(n=Count("id"))
+        .values_list("store_id", "rating", "n")
+    ):
+        if 1 <= rating <= 5:
+            stars.setdefault(store_id, [0, 0, 0, 0, 0])[rating - 1] = reviews
+    sellers = {
+        row["seller_id"]: row
+        for row in Product.objects.filter(rating_count__gt=0, seller_id__isnull=False).order_by().values("seller_id")
+        .annotate(reviews=Sum("rating_count"), stars=Sum(F("rating_avg") * F("rating_count")))
+    }
+    rows = []
+    for store in SellerStore.objects.only("id", "owner_id"):
+        histogram = stars.get(store.id, [0, 0, 0, 0, 0])
+        total = sum(histogram)
+        seller = sellers.get(store.owner_id) or {"reviews": 0, "stars": 0}
+        store.rating_avg = round(sum((i + 1) * n for i, n in enumerate(histogram)) / total, 4) if total else 0
+        store.rating_count = total
+        store.rating_histogram = histogram
+        store.product_rating_count = int(seller["reviews"] or 0)
+        store.product_rating_avg = (
+            round(float(seller["stars"]) / store.product_rating_count, 4) if store.product_rating_count else 0
+        )
+        rows.append(store)
+    SellerStore.objects.bulk_update(
+        rows,
+        ["rating_avg", "rating_count", "rating_histogram", "product_rating_avg", "product_rating_count"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0013_store_reviews'),
+        ('catalog', '0025_product_review_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sellerstore',
+            name='product_rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sellerstore',
+            name='product_rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sellerstore',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sellerstore',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sellerstore',
+            name='rating_histogram',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(fill_store_review_stats, migrations.RunPython.noop),
+    ]
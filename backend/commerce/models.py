@@ -160,6 +160,14 @@ class SellerStore(TimeStampedModel):
     moderation_status = models.CharField(max_length=16, choices=ModerationStatus.choices, default=ModerationStatus.PENDING)
     sla_target_hours = models.PositiveIntegerField(default=24)
     is_featured = models.BooleanField(default=False)
+    # Store-review aggregates and the seller's product-review totals, maintained by catalog.review_stats.
+    rating_avg = models.FloatField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_histogram = models.JSONField(default=list, blank=True, editable=False)
+    product_rating_avg = models.FloatField(default=0, editable=False)
+    product_rating_count = models.PositiveIntegerField(default=0, editable=False)
+
+    RATING_FIELDS = ("rating_avg", "rating_count", "rating_histogram", "product_rating_avg", "product_rating_count")
 
     class Meta:
         verbose_name = "Магазин продавца"
@@ -177,6 +185,13 @@ class SellerStore(TimeStampedModel):
                 candidate = f"{base}-{suffix}"
                 suffix += 1
             self.slug = candidate
+        if not self._state.adding and not args and kwargs.get("update_fields") is None:
+            # Rating columns are written by catalog.review_stats; a stale instance must not overwrite them.
+            skipped = set(self.RATING_FIELDS) | self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped and field.attname not in skipped
+            ]
         super().save(*args, **kwargs)
 
 
@@ -1,9 +1,11 @@
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 import logging
 
-from catalog.es_index import upsert_product
+from catalog.es_cascade import remember_tracked_values, schedule_cascade_if_changed
+from catalog.index_queue import enqueue_product_ids
 from catalog.models import Product
+from catalog.review_stats import refresh_store_ratings
 
 from .models import (
     ApprovalPolicy,
@@ -12,6 +14,7 @@ from .models import (
     LegalEntityMembership,
     MembershipRole,
     SellerStore,
+    StoreReview,
 )
 from .company_service import ensure_company_workspace, sync_company_membership_from_legal_entity
 
@@ -61,13 +64,24 @@ def ensure_entity_and_membership_on_approval(sender, instance: LegalEntityCreati
     )
 
 
-@receiver([post_save, post_delete], sender=SellerStore)
-def reindex_products_on_seller_store_change(sender, instance: SellerStore, **kwargs):
-    products = Product.objects.select_related("brand", "category", "country_of_origin", "seller", "seller__seller_store").filter(
-        seller=instance.owner
-    )
-    for product in products.iterator(chunk_size=200):
-        upsert_product(product)
+@receiver(pre_save, sender=SellerStore)
+def remember_seller_store_indexed_fields(sender, instance: SellerStore, **kwargs):
+    remember_tracked_values("seller_store", instance)
+
+
+@receiver(post_save, sender=SellerStore)
+def reindex_products_on_seller_store_change(sender, instance: SellerStore, created: bool, **kwargs):
+    if created:
+        enqueue_product_ids(Product.objects.filter(seller_id=instance.owner_id).values_list("id", flat=True))
+        # Start the store from the seller's existing product ratings.
+        refresh_store_ratings([instance.id])
+        return
+    schedule_cascade_if_changed("seller_store", instance, created)
+
+
+@receiver(post_delete, sender=SellerStore)
+def reindex_products_on_seller_store_delete(sender, instance: SellerStore, **kwargs):
+    enqueue_product_ids(Product.objects.filter(seller_id=instance.owner_id).values_list("id", flat=True))
 
 
 @receiver(post_save, sender=LegalEntityMembership)
@@ -75,3 +89,8 @@ def sync_company_workspace_on_membership_change(sender, instance: LegalEntityMem
     company = ensure_company_workspace(instance.legal_entity)
     sync_company_membership_from_legal_entity(instance)
     ApprovalPolicy.objects.get_or_create(company=company)
+
+
+@receiver([post_save, post_delete], sender=StoreReview)
+def store_review_changed(sender, instance, **kwargs):
+    refresh_store_ratings([instance.store_id])
@@ -7,3 +7,15 @@ worker_class = "uvicorn.workers.UvicornWorker"
 timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
 graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
 keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+
+def post_worker_init(worker):
+    # Map the completion snapshot and build the spelling index before the first live-search request.
+    from catalog import autocomplete
+    from shopfront import spelling
+
+    autocomplete.load_index()
+    try:
+        spelling.get_index()
+    except Exception:
+        worker.log.exception("spelling index warm-up failed")
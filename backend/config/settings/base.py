@@ -242,11 +242,43 @@ ANALYTICS_REQUIRE_CONSENT = _env_bool("ANALYTICS_REQUIRE_CONSENT", not DEBUG)
 
 # Search readiness
 SEARCH_PROVIDER = os.getenv("SEARCH_PROVIDER", "elasticsearch").strip().lower()
+# Ranked tsvector/trigram search for the database provider instead of substring scans.
+SEARCH_DB_FULLTEXT_ENABLED = _env_bool("SEARCH_DB_FULLTEXT_ENABLED", True)
+# Products whose search_vector is recomputed per transaction after a brand, series or category rename.
+SEARCH_VECTOR_REFRESH_CHUNK_SIZE = int(os.getenv("SEARCH_VECTOR_REFRESH_CHUNK_SIZE", "1000"))
+# Minimum age of the per-worker spelling index before a vocabulary change triggers a rebuild.
+SEARCH_SPELLING_REBUILD_SECONDS = int(os.getenv("SEARCH_SPELLING_REBUILD_SECONDS", "60"))
+# Rebuild it on a background thread and keep serving the previous index meanwhile.
+SEARCH_SPELLING_REBUILD_ASYNC = _env_bool("SEARCH_SPELLING_REBUILD_ASYNC", True)
 ES_ENABLED = _env_bool("ES_ENABLED", True)
 SEMANTIC_SEARCH_ENABLED = _env_bool("SEMANTIC_SEARCH_ENABLED", False)
 SEARCH_QUERY_REWRITE_ENABLED = _env_bool("SEARCH_QUERY_REWRITE_ENABLED", True)
 SEARCH_RERANK_ENABLED = _env_bool("SEARCH_RERANK_ENABLED", True)
+# "vector" reads hybrid-search candidates from the local vector index, "hybrid-db" from Postgres.
+# Switch to "vector" once build_semantic_index has published an index for every worker.
 SEMANTIC_SEARCH_BACKEND = os.getenv("SEMANTIC_SEARCH_BACKEND", "hybrid-db").strip().lower()
+SEMANTIC_INDEX_DIR = os.getenv("SEMANTIC_INDEX_DIR", str(BASE_DIR / "var" / "semantic_index"))
+SEMANTIC_INDEX_DIM = int(os.getenv("SEMANTIC_INDEX_DIM", "256"))
+SEMANTIC_INDEX_NPROBE = int(os.getenv("SEMANTIC_INDEX_NPROBE", "12"))
+# Search-box completions come from a memory-mapped snapshot plus an overlay of later catalog changes.
+AUTOCOMPLETE_INDEX_DIR = os.getenv("AUTOCOMPLETE_INDEX_DIR", str(BASE_DIR / "var" / "autocomplete"))
+AUTOCOMPLETE_REFRESH_SECONDS = float(os.getenv("AUTOCOMPLETE_REFRESH_SECONDS", "5"))
+# Overlay refreshes run on a worker thread, off the request path; off refreshes inline.
+AUTOCOMPLETE_REFRESH_ASYNC = _env_bool("AUTOCOMPLETE_REFRESH_ASYNC", True)
+# Products changed since the snapshot that a worker keeps in memory; more queue a snapshot rebuild.
+AUTOCOMPLETE_OVERLAY_MAX_PRODUCTS = int(os.getenv("AUTOCOMPLETE_OVERLAY_MAX_PRODUCTS", "5000"))
+# Impression/click/add-to-cart events are buffered in Redis and folded into CTR scores by a periodic job.
+SEARCH_EVENTS_ENABLED = _env_bool("SEARCH_EVENTS_ENABLED", _cache_backend == "redis")
+SEARCH_EVENTS_REDIS_URL = os.getenv("SEARCH_EVENTS_REDIS_URL", os.getenv("REDIS_URL", "redis://redis:6379/0"))
+SEARCH_EVENTS_MAX_BUFFER = int(os.getenv("SEARCH_EVENTS_MAX_BUFFER", "200000"))
+SEARCH_EVENTS_BATCH_SIZE = int(os.getenv("SEARCH_EVENTS_BATCH_SIZE", "5000"))
+# Pseudo-impressions added to every CTR so a few lucky clicks do not dominate ranking.
+SEARCH_CTR_SMOOTHING = float(os.getenv("SEARCH_CTR_SMOOTHING", "20"))
+SEARCH_CTR_CART_WEIGHT = float(os.getenv("SEARCH_CTR_CART_WEIGHT", "3"))
+# Per-query CTR maps are republished by every aggregation; 0 keeps them cached until then.
+SEARCH_CTR_CACHE_SECONDS = int(os.getenv("SEARCH_CTR_CACHE_SECONDS", "0"))
+# Weight of the product CTR in the ES function_score (0 disables the boost).
+SEARCH_POPULARITY_ES_FACTOR = float(os.getenv("SEARCH_POPULARITY_ES_FACTOR", "10"))
 
 # Telegram
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -261,7 +293,6 @@ TURNSTILE_SECRET_KEY = os.getenv("TURNSTILE_SECRET_KEY", "1x00000000000000000000
 # Public observability/docs toggles
 ENABLE_API_DOCS = _env_bool("ENABLE_API_DOCS", DEBUG)
 METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
-ENABLE_CATALOG_RATING = _env_bool("ENABLE_CATALOG_RATING", True)
 
 # Google Maps
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
@@ -271,14 +302,58 @@ ES_URL = os.getenv("ES_URL", "http://es:9200")
 ES_PRODUCTS_INDEX = os.getenv("ES_PRODUCTS_INDEX", "products")
 ES_TIMEOUT_SECONDS = float(os.getenv("ES_TIMEOUT_SECONDS", "0.8"))
 ES_ENABLED = _env_bool("ES_ENABLED", True)
+# Keep-alive connections per worker process in the shared ES session.
+ES_POOL_MAXSIZE = int(os.getenv("ES_POOL_MAXSIZE", "20"))
+# Product changes are coalesced in an outbox table and flushed to ES in bulk.
+ES_INDEX_QUEUE_DELAY_SECONDS = int(os.getenv("ES_INDEX_QUEUE_DELAY_SECONDS", "2"))
+ES_INDEX_QUEUE_BATCH_SIZE = int(os.getenv("ES_INDEX_QUEUE_BATCH_SIZE", "500"))
+# A flush that has not confirmed its claimed queue rows within this time is presumed dead; its rows are retaken.
+ES_INDEX_QUEUE_CLAIM_TIMEOUT_SECONDS = int(os.getenv("ES_INDEX_QUEUE_CLAIM_TIMEOUT_SECONDS", "300"))
+ES_INCREMENTAL_OVERLAP_SECONDS = int(os.getenv("ES_INCREMENTAL_OVERLAP_SECONDS", "120"))
+ES_CASCADE_CHUNK_SIZE = int(os.getenv("ES_CASCADE_CHUNK_SIZE", "1000"))
+# Search circuit breaker: trips after N consecutive failures or slow responses.
+ES_BREAKER_FAILURE_THRESHOLD = int(os.getenv("ES_BREAKER_FAILURE_THRESHOLD", "5"))
+ES_BREAKER_SLOW_SECONDS = float(os.getenv("ES_BREAKER_SLOW_SECONDS", "0.6"))
+ES_BREAKER_COOLDOWN_SECONDS = int(os.getenv("ES_BREAKER_COOLDOWN_SECONDS", "30"))
+# Filtered catalog pages, sorting and facets are answered by ES; Postgres only hydrates the page.
+ES_CATALOG_ENGINE_ENABLED = _env_bool("ES_CATALOG_ENGINE_ENABLED", True)
 
 # Cache TTLs (seconds)
-CACHE_TTL_HEADER_CATEGORIES = int(os.getenv("CACHE_TTL_HEADER_CATEGORIES", "900"))
-CACHE_TTL_HOME = int(os.getenv("CACHE_TTL_HOME", "180"))
-CACHE_TTL_CATALOG_FILTERS = int(os.getenv("CACHE_TTL_CATALOG_FILTERS", "900"))
+CACHE_TTL_HEADER_CATEGORIES = int(os.getenv("CACHE_TTL_HEADER_CATEGORIES", "21600"))
+CACHE_TTL_HOME = int(os.getenv("CACHE_TTL_HOME", "3600"))
+CACHE_TTL_CATALOG_FILTERS = int(os.getenv("CACHE_TTL_CATALOG_FILTERS", "21600"))
 CACHE_TTL_LIVE_SEARCH = int(os.getenv("CACHE_TTL_LIVE_SEARCH", "60"))
 CACHE_TTL_ES_SEARCH = int(os.getenv("CACHE_TTL_ES_SEARCH", "120"))
+# Live-search bundles past their TTL are served for this long while one worker refreshes them.
+ES_SEARCH_STALE_SECONDS = int(os.getenv("ES_SEARCH_STALE_SECONDS", "600"))
+# Concurrent misses for one query wait on the first request's lock instead of all hitting ES.
+ES_SEARCH_LOCK_SECONDS = int(os.getenv("ES_SEARCH_LOCK_SECONDS", "5"))
+ES_SEARCH_WAIT_SECONDS = float(os.getenv("ES_SEARCH_WAIT_SECONDS", "0.5"))
 CACHE_TTL_CATALOG_API = int(os.getenv("CACHE_TTL_CATALOG_API", "120"))
+# Tag-invalidated (core.tagged_cache) ids and counts of the default catalog listing.
+CACHE_TTL_CATALOG_LISTING = int(os.getenv("CACHE_TTL_CATALOG_LISTING", "3600"))
+CACHE_TTL_CATALOG_HTML = int(os.getenv("CACHE_TTL_CATALOG_HTML", "20"))
+# core.tagged_cache stampede protection: entries outlive freshness by CACHE_STALE_SECONDS for stale
+# fallback; one worker rebuilds under a CACHE_LOCK_SECONDS lock while others wait up to CACHE_WAIT_SECONDS.
+CACHE_STALE_SECONDS = int(os.getenv("CACHE_STALE_SECONDS", "300"))
+CACHE_LOCK_SECONDS = int(os.getenv("CACHE_LOCK_SECONDS", "10"))
+CACHE_WAIT_SECONDS = float(os.getenv("CACHE_WAIT_SECONDS", "0.5"))
+# XFetch early-refresh aggressiveness; 0 disables early refresh.
+CACHE_XFETCH_BETA = float(os.getenv("CACHE_XFETCH_BETA", "1.0"))
+# Per-worker LRU (core.local_cache) for small hot entries; kept coherent by tags published on
+# CACHE_INVALIDATION_CHANNEL, with CACHE_LOCAL_TTL bounding any missed message. Without a Redis URL
+# (locmem/dummy cache) there are no other workers to notify and no listener is started.
+CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "512"))
+CACHE_LOCAL_TTL = int(os.getenv("CACHE_LOCAL_TTL", "300"))
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+CACHE_INVALIDATION_REDIS_URL = os.getenv(
+    "CACHE_INVALIDATION_REDIS_URL", CACHES["default"]["LOCATION"] if CACHES["default"]["BACKEND"].endswith("RedisCache") else ""
+)
+CACHE_TTL_CATALOG_COUNTS = int(os.getenv("CACHE_TTL_CATALOG_COUNTS", "60"))
+# Filtered catalog counts are exact up to this many matches; beyond it the planner estimate (or "N+") is shown.
+CATALOG_COUNT_EXACT_LIMIT = int(os.getenv("CATALOG_COUNT_EXACT_LIMIT", "1000"))
+CACHE_TTL_CATALOG_FACETS = int(os.getenv("CACHE_TTL_CATALOG_FACETS", "60"))
+CATALOG_FACET_PRICE_BUCKETS = int(os.getenv("CATALOG_FACET_PRICE_BUCKETS", "8"))
 CACHE_TTL_COMMERCE_LOOKUPS = int(os.getenv("CACHE_TTL_COMMERCE_LOOKUPS", "600"))
 
 # Admin email notifications (orders lifecycle)
@@ -327,6 +402,34 @@ CELERY_BEAT_SCHEDULE = {
         "task": "orders.tasks.notify_stale_fake_payments",
         "schedule": timedelta(minutes=10),
     },
+    "es-index-queue-flush": {
+        "task": "catalog.tasks.flush_product_index_queue",
+        "schedule": timedelta(minutes=1),
+    },
+    "es-incremental-sync": {
+        "task": "catalog.tasks.sync_changed_products_to_es",
+        "schedule": timedelta(minutes=1),
+    },
+    "es-breaker-probe": {
+        "task": "catalog.tasks.probe_elasticsearch",
+        "schedule": timedelta(seconds=15),
+    },
+    "semantic-index-rebuild": {
+        "task": "catalog.tasks.rebuild_semantic_index",
+        "schedule": timedelta(hours=6),
+    },
+    "autocomplete-index-rebuild": {
+        "task": "catalog.tasks.rebuild_autocomplete_index",
+        "schedule": timedelta(minutes=30),
+    },
+    "search-events-aggregate": {
+        "task": "shopfront.tasks.aggregate_search_events",
+        "schedule": timedelta(minutes=5),
+    },
+    "review-stats-reconcile": {
+        "task": "catalog.tasks.reconcile_review_stats",
+        "schedule": timedelta(hours=6),
+    },
 }
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
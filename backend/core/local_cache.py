@@ -0,0 +1,171 @@
+"""Per-worker LRU in front of the shared cache.
+
+Small, hot, rarely-changing entries (header categories, catalog filter
+lists) are read on nearly every page. Keeping them in process memory saves
+the Redis round trips and the unpickling of every request. Entries carry the
+same tags as their shared copies. `core.tagged_cache.invalidate` evicts them
+in this worker and publishes the tags on a Redis channel; every other worker
+runs a listener thread that evicts its own copies on receipt.
+
+The listener clears the whole local cache whenever it (re)subscribes, since
+messages sent while it was disconnected are lost, and entries also expire
+after `CACHE_LOCAL_TTL` seconds as a bound on any missed message.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable
+
+import redis
+from django.conf import settings
+
+log = logging.getLogger("core.cache")
+
+MISSING = object()
+
+
+class LocalCache:
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        # Bumped by every eviction: a value read before one may be outdated and is not kept.
+        self.epoch = 0
+        self._entries: OrderedDict[str, tuple[frozenset, Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return MISSING
+            if item[2] <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return item[1]
+
+    def set(self, key: str, value, tags: Iterable[str], epoch: int | None = None) -> bool:
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return False
+            self._entries[key] = (frozenset(tags), value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def evict_tags(self, tags: Iterable[str]) -> int:
+        tags = frozenset(tags)
+        with self._lock:
+            self.epoch += 1
+            stale = [key for key, (entry_tags, _, _) in self._entries.items() if entry_tags & tags]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.epoch += 1
+            self._entries.clear()
+
+
+_local: LocalCache | None = None
+_listener_pid: int | None = None
+_publisher = None
+_lock = threading.Lock()
+
+
+def _channel() -> str:
+    return getattr(settings, "CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+
+
+def _redis_url() -> str:
+    return getattr(settings, "CACHE_INVALIDATION_REDIS_URL", "") or ""
+
+
+def get_local() -> LocalCache:
+    """This worker's local cache; starts the invalidation listener on first use in each process."""
+    global _local, _listener_pid
+    local = _local
+    if local is not None and _listener_pid == os.getpid():
+        return local
+    with _lock:
+        if _local is None:
+            _local = LocalCache(
+                getattr(settings, "CACHE_LOCAL_MAX_ENTRIES", 512), getattr(settings, "CACHE_LOCAL_TTL", 300)
+            )
+        if _listener_pid != os.getpid():
+            # Threads do not survive a fork: each worker process subscribes on its own.
+            _listener_pid = os.getpid()
+            if _redis_url():
+                threading.Thread(target=_listen, name="cache-invalidation", daemon=True).start()
+        return _local
+
+
+def reset_local() -> None:
+    global _local, _publisher
+    _local = None
+    _publisher = None
+
+
+def handle_message(message) -> None:
+    if not isinstance(message, dict) or message.get("type") != "message":
+        return
+    try:
+        tags = json.loads(message["data"])
+    except (TypeError, ValueError):
+        log.warning("cache_invalidation_message_invalid")
+        return
+    if _local is not None:
+        _local.evict_tags(tags)
+
+
+def listen_once(client) -> None:
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(_channel())
+    try:
+        if _local is not None:
+            _local.clear()
+        for message in pubsub.listen():
+            handle_message(message)
+    finally:
+        pubsub.close()
+
+
+def _listen() -> None:
+    while True:
+        try:
+            listen_once(redis.Redis.from_url(_redis_url(), socket_connect_timeout=1, health_check_interval=30))
+        except Exception:
+            log.warning("cache_invalidation_listener_failed", exc_info=True)
+        time.sleep(1)
+
+
+def evict(tags: Iterable[str]) -> None:
+    """Evict these tags in this worker only."""
+    if _local is not None:
+        _local.evict_tags(tags)
+
+
+def publish(tags: Iterable[str]) -> None:
+    """Evict these tags here and in every other worker."""
+    global _publisher
+    tags = sorted(set(tags))
+    evict(tags)
+    url = _redis_url()
+    if not url:
+        return
+    try:
+        if _publisher is None:
+            _publisher = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        _publisher.publish(_channel(), json.dumps(tags))
+    except Exception:
+        # Remote copies then age out after CACHE_LOCAL_TTL.
+        log.warning("cache_invalidation_publish_failed", extra={"tags": ",".join(tags)}, exc_info=True)
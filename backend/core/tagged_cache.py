@@ -0,0 +1,267 @@
+"""Cache entries tagged with the data they were built from.
+
+An entry is stored together with the generation of each of its tags
+("product:123", "category:*", "catalog-listing", ...). Writers do not know
+which keys exist: model signals bump the generations of the tags a change
+touches, and a reader accepts an entry only while every stored generation
+still matches the current one (one `get_many` per read). Entries can
+therefore live for hours and still disappear the moment their data changes.
+
+A generation that is missing from the cache (never written, or evicted) is
+started from the current time in nanoseconds rather than from zero, so an
+entry stamped before the eviction can never match it again.
+
+`get_or_compute` keeps hot keys from stampeding when they expire:
+
+* entries are refreshed early with a probability that grows as expiry nears,
+  scaled by how long the value took to build (XFetch), so one request
+  usually rebuilds a key before the rest of the fleet sees it expire;
+* the rebuild runs under a short cache lock; other workers serve the expired
+  value meanwhile or, when there is none, wait briefly for the lock holder;
+* entries are kept `CACHE_STALE_SECONDS` past freshness, and that stale value
+  is served when the rebuild itself fails (database or backend errors).
+
+With `local=True` a per-worker LRU (`core.local_cache`) answers repeat reads
+without touching the shared cache; invalidations reach it through Redis
+pub/sub.
+"""
+
+import logging
+import math
+import random
+import time
+from typing import Any, Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core import local_cache
+
+log = logging.getLogger("core.cache")
+
+ANY = "*"
+# Membership and order of the default product listing (home page, unfiltered catalog).
+CATALOG_LISTING = "catalog-listing"
+# Everything catalog pages are built from; bumped after bulk loads that bypass model signals.
+CATALOG_TAGS = (CATALOG_LISTING, "product:*", "category:*", "brand:*", "tag:*")
+
+
+def tag(kind: str, pk: Any = ANY) -> str:
+    """`kind:pk` for one object, `kind:*` for "any object of this kind"."""
+    return f"{kind}:{pk}"
+
+
+def object_tags(kind: str, pk: Any) -> tuple[str, str]:
+    return tag(kind, pk), tag(kind)
+
+
+def _generation_key(name: str) -> str:
+    return f"cache:tag:{name}"
+
+
+def generations(tags: Iterable[str]) -> dict | None:
+    """Current generation of each tag; None when they cannot be read."""
+    names = sorted(set(tags))
+    keys = {name: _generation_key(name) for name in names}
+    if not keys:
+        return {}
+    try:
+        found = cache.get_many(list(keys.values()))
+    except Exception:
+        log.warning("cache_tag_read_failed", extra={"tags": ",".join(names)}, exc_info=True)
+        return None
+    current = {}
+    for name, key in keys.items():
+        if key not in found:
+            try:
+                cache.add(key, time.time_ns(), timeout=None)
+                found[key] = cache.get(key)
+            except Exception:
+                log.warning("cache_tag_read_failed", extra={"tags": name}, exc_info=True)
+        if found.get(key) is None:
+            # Without a generation the entry cannot be validated: treat it as uncacheable.
+            return None
+        current[name] = found[key]
+    return current
+
+
+_PENDING_ATTR = "_tagged_cache_pending"
+
+
+def _bump_generations(tags) -> None:
+    for name in tags:
+        key = _generation_key(name)
+        try:
+            if not cache.add(key, time.time_ns(), timeout=None):
+                cache.incr(key)
+        except Exception:
+            log.warning("cache_tag_bump_failed", extra={"tag": name}, exc_info=True)
+
+
+def _bump(tags) -> None:
+    _bump_generations(tags)
+    local_cache.publish(tags)
+
+
+def _flush_pending(connection) -> None:
+    tags = getattr(connection, _PENDING_ATTR, None)
+    setattr(connection, _PENDING_ATTR, None)
+    if tags:
+        _bump(sorted(tags))
+
+
+def invalidate(*tags: str) -> None:
+    """Retire every entry carrying any of these tags.
+
+    Inside a transaction the generations are bumped right away, so later reads
+    in the same transaction do not get entries built before the write. Other
+    workers are told on commit only: the tags of the whole transaction are
+    bumped once more and published in one message. That second bump also
+    retires entries cached from the old rows between the write and the commit.
+
+    Every call registers a flush; the first one to run publishes the pending
+    tags of the connection and the rest find nothing left. Tags left behind
+    by a rollback go out with the next commit, which only over-invalidates.
+    """
+    names = sorted(set(tags))
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _bump(names)
+        return
+    _bump_generations(names)
+    local_cache.evict(names)
+    pending = getattr(connection, _PENDING_ATTR, None)
+    if pending is None:
+        pending = set()
+        setattr(connection, _PENDING_ATTR, pending)
+    pending.update(names)
+    transaction.on_commit(lambda: _flush_pending(connection), using=connection.alias)
+
+
+def _stale_seconds() -> int:
+    return int(getattr(settings, "CACHE_STALE_SECONDS", 300))
+
+
+def _read(key: str):
+    try:
+        entry = cache.get(key)
+    except Exception:
+        log.warning("cache_get_failed", extra={"cache_key": key}, exc_info=True)
+        return None
+    return entry if isinstance(entry, dict) and {"stamps", "value", "fresh_until"} <= entry.keys() else None
+
+
+def _current(entry) -> bool:
+    return generations(entry["stamps"]) == entry["stamps"]
+
+
+def _fresh(entry, beta: float = 0.0) -> bool:
+    if entry["fresh_until"] is None:
+        return True
+    # XFetch: -log(U) is an exponential draw, so early refreshes get likelier as expiry approaches.
+    early = entry.get("delta", 0.0) * beta * -math.log(1.0 - random.random())
+    return time.time() + early < entry["fresh_until"]
+
+
+def lookup(key: str, default=None):
+    entry = _read(key)
+    if entry is None or not _fresh(entry) or not _current(entry):
+        return default
+    return entry["value"]
+
+
+def store(
+    key: str, value, tags: Iterable[str], timeout: int | None, stamps: dict | None = None, delta: float = 0.0
+) -> None:
+    stamps = generations(tags) if stamps is None else stamps
+    if stamps is None:
+        return
+    entry = {
+        "stamps": stamps,
+        "value": value,
+        "fresh_until": None if timeout is None else time.time() + timeout,
+        "delta": delta,
+    }
+    try:
+        cache.set(key, entry, timeout=None if timeout is None else timeout + _stale_seconds())
+    except Exception:
+        log.warning("cache_set_failed", extra={"cache_key": key}, exc_info=True)
+
+
+def _acquire(key: str) -> bool:
+    try:
+        return bool(cache.add(f"{key}:lock", 1, timeout=int(getattr(settings, "CACHE_LOCK_SECONDS", 10))))
+    except Exception:
+        log.warning("cache_lock_failed", extra={"cache_key": key}, exc_info=True)
+        return True
+
+
+def _release(key: str) -> None:
+    try:
+        cache.delete(f"{key}:lock")
+    except Exception:
+        log.warning("cache_unlock_failed", extra={"cache_key": key}, exc_info=True)
+
+
+def _wait(key: str):
+    deadline = time.monotonic() + float(getattr(settings, "CACHE_WAIT_SECONDS", 0.5))
+    while time.monotonic() < deadline:
+        time.sleep(0.02)
+        entry = _read(key)
+        if entry is not None and _fresh(entry) and _current(entry):
+            return entry
+        try:
+            if cache.get(f"{key}:lock") is None:
+                return None
+        except Exception:
+            return None
+    return None
+
+
+def get_or_compute(
+    key: str, tags: Iterable[str], compute: Callable[[], Any], timeout: int | None, *, local: bool = False
+):
+    """Cached value of `compute()`, rebuilt by one worker at a time when it expires or its tags move.
+
+    `local=True` keeps a copy in this worker's memory; use it only for small values read on most requests.
+    """
+    tags = tuple(tags)
+    if local:
+        worker_cache = local_cache.get_local()
+        value = worker_cache.get(key)
+        if value is not local_cache.MISSING:
+            return value
+        epoch = worker_cache.epoch
+        value = get_or_compute(key, tags, compute, timeout)
+        worker_cache.set(key, value, tags, epoch=epoch)
+        return value
+    entry = _read(key)
+    current = entry is not None and _current(entry)
+    if current and _fresh(entry, float(getattr(settings, "CACHE_XFETCH_BETA", 1.0))):
+        return entry["value"]
+
+    owns_lock = _acquire(key)
+    if not owns_lock:
+        if current:
+            # Expired by time only: its data has not changed, and the lock holder is rebuilding it.
+            return entry["value"]
+        waited = _wait(key)
+        if waited is not None:
+            return waited["value"]
+    try:
+        # Stamp with the generations seen before computing: a change during the computation retires the result.
+        stamps = generations(tags)
+        started = time.monotonic()
+        try:
+            value = compute()
+        except Exception:
+            if entry is None:
+                raise
+            log.warning("cache_compute_failed_serving_stale", extra={"cache_key": key}, exc_info=True)
+            return entry["value"]
+        store(key, value, tags, timeout, stamps=stamps, delta=time.monotonic() - started)
+        return value
+    finally:
+        if owns_lock:
+            _release(key)
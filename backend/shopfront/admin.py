@@ -9,6 +9,7 @@ from .models import (
     RecentlyViewedProduct,
     SavedList,
     SavedListItem,
+    SearchClickStat,
 )
 
 
@@ -60,3 +61,11 @@ class SavedListAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "name", "description", "share_token")
     list_filter = ("source", "is_public")
     inlines = [SavedListItemInline]
+
+
+@admin.register(SearchClickStat)
+class SearchClickStatAdmin(admin.ModelAdmin):
+    list_display = ("id", "query", "product", "impressions", "clicks", "add_to_carts", "updated_at")
+    search_fields = ("query", "product__name", "product__sku")
+    raw_id_fields = ("product",)
+    readonly_fields = ("impressions", "clicks", "add_to_carts", "created_at", "updated_at")
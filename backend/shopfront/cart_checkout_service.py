@@ -6,7 +6,7 @@ from decimal import Decimal
 from django.db.models import Prefetch
 
 from catalog.models import Product, ProductImage
-from catalog.offer_service import active_offer_queryset, apply_offer_snapshot
+from catalog.offer_service import with_buy_box
 from commerce.company_service import ensure_approval_policy, ensure_company_workspace
 from commerce.models import CompanyMembership, DeliveryAddress
 from orders.models import Order
@@ -45,18 +45,16 @@ def cart_summary(request):
             continue
     products = {
         product.id: product
-        for product in Product.objects.select_related("brand", "category", "series", "seller", "seller__seller_store")
+        for product in with_buy_box(Product.objects.select_related("brand", "category", "series", "seller", "seller__seller_store"))
         .prefetch_related(
             Prefetch(
                 "images",
                 queryset=ProductImage.objects.only("id", "product_id", "url", "alt", "ordering").order_by("ordering", "id"),
                 to_attr="prefetched_images",
             ),
-            Prefetch("seller_offers", queryset=active_offer_queryset()),
         )
         .filter(id__in=product_ids)
     }
-    apply_offer_snapshot(products.values())
     items = []
     seller_groups: OrderedDict[str, dict] = OrderedDict()
     subtotal = Decimal("0.00")
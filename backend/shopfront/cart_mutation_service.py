@@ -1,17 +1,13 @@
 from decimal import Decimal
 
-from django.db.models import Prefetch
-
 from catalog.models import Product
-from catalog.offer_service import active_offer_queryset, apply_offer_snapshot
+from catalog.offer_service import with_buy_box
 
 from .cart_store import persist_cart_for_user
 
 
 def _load_cart_product(product_id: int):
-    product = Product.objects.prefetch_related(Prefetch("seller_offers", queryset=active_offer_queryset())).get(pk=product_id)
-    apply_offer_snapshot([product])
-    return product
+    return with_buy_box(Product.objects).get(pk=product_id)
 
 
 def _max_qty_for_product(product) -> int:
@@ -0,0 +1,94 @@
+"""Cached, bounded result counts for filtered catalog pages.
+
+An exact `COUNT` of a filtered, joined catalog query costs as much as reading
+every match. Counts here are cached per normalized filter signature for a
+short TTL and tagged with `CATALOG_TAGS`, so any catalog write retires them.
+Only the first `CATALOG_COUNT_EXACT_LIMIT + 1` matches are ever counted: up
+to the limit the number is exact; beyond it the planner's row estimate is
+shown as "≈N", or "N+" when no usable estimate exists.
+"""
+
+import hashlib
+import json
+import logging
+from dataclasses import astuple, dataclass
+from typing import Mapping
+
+from django.conf import settings
+from django.db import connections
+
+from core import tagged_cache
+
+log = logging.getLogger("shopfront")
+
+EXACT = "exact"
+ESTIMATE = "estimate"
+AT_LEAST = "at_least"
+
+
+@dataclass(frozen=True)
+class CatalogCount:
+    value: int
+    kind: str = EXACT
+
+    @property
+    def exact(self) -> bool:
+        return self.kind == EXACT
+
+    @property
+    def label(self) -> str:
+        if self.kind == ESTIMATE:
+            return f"≈{self.value}"
+        if self.kind == AT_LEAST:
+            return f"{self.value}+"
+        return str(self.value)
+
+
+def filter_signature(filters: Mapping) -> str:
+    """Order-independent text of the non-empty filters."""
+    normalized = {key: str(value) for key, value in filters.items() if value not in (None, "", [], ())}
+    return json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+
+
+def _key(signature: str) -> str:
+    digest = hashlib.sha1(signature.encode("utf-8")).hexdigest()
+    return f"shopfront:catalog_count:v1:{digest}"
+
+
+def _round(value: int) -> int:
+    """Two significant digits: an estimate should not look precise."""
+    return int(float(f"{value:.2g}"))
+
+
+def planner_rows(queryset) -> int | None:
+    """PostgreSQL's row estimate for the query, without running it."""
+    if connections[queryset.db].vendor != "postgresql":
+        return None
+    try:
+        plan = json.loads(queryset.order_by().values("id").explain(format="json"))
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception:
+        log.warning("catalog_count_explain_failed", exc_info=True)
+        return None
+
+
+def measure(queryset) -> CatalogCount:
+    limit = int(getattr(settings, "CATALOG_COUNT_EXACT_LIMIT", 1000))
+    # Counting a LIMITed subquery stops after limit + 1 rows however many match.
+    counted = queryset.order_by().values("id")[: limit + 1].count()
+    if counted <= limit:
+        return CatalogCount(counted)
+    estimate = planner_rows(queryset)
+    if estimate is not None and estimate > limit:
+        return CatalogCount(_round(estimate), ESTIMATE)
+    return CatalogCount(limit, AT_LEAST)
+
+
+def count_products(queryset, filters: Mapping) -> CatalogCount:
+    value, kind = tagged_cache.get_or_compute(
+        _key(filter_signature(filters)),
+        tagged_cache.CATALOG_TAGS,
+        lambda: astuple(measure(queryset)),
+        timeout=getattr(settings, "CACHE_TTL_CATALOG_COUNTS", 60),
+    )
+    return CatalogCount(value, kind)
@@ -0,0 +1,67 @@
+"""Opaque keyset cursors for the catalog grid.
+
+A cursor carries the sort key of the last product shown, ending with its id as
+the final tie-breaker. The next page is then `WHERE key > last ORDER BY key
+LIMIT n`: an index range scan that costs the same at any scroll depth, with no
+COUNT and no OFFSET. Every order handled here must end with "id".
+"""
+
+import base64
+import binascii
+import json
+from decimal import Decimal
+from typing import List, Optional, Sequence, Tuple
+
+from django.db.models import Q
+
+
+def key_fields(order: Sequence[str]) -> List[str]:
+    return [term.lstrip("-") for term in order]
+
+
+def _dump(value):
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def encode(sort: str, values: Sequence) -> str:
+    payload = json.dumps([sort, [_dump(value) for value in values]], separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode(token: str, sort: str, order: Sequence[str]) -> Optional[list]:
+    """The key values in `token`, or None when it is malformed or was issued for another sort."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        cursor_sort, values = json.loads(raw.decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+    if cursor_sort != sort or not isinstance(values, list) or len(values) != len(order):
+        return None
+    if any(value is None or isinstance(value, (list, dict)) for value in values):
+        return None
+    return values
+
+
+def after_q(order: Sequence[str], values: Sequence) -> Q:
+    """Rows strictly after `values` in `order`, honouring each term's direction."""
+    fields = key_fields(order)
+    clauses = []
+    for position, term in enumerate(order):
+        equal = {fields[i]: values[i] for i in range(position)}
+        lookup = "lt" if term.startswith("-") else "gt"
+        clauses.append(Q(**equal, **{f"{fields[position]}__{lookup}": values[position]}))
+    condition = clauses[0]
+    for clause in clauses[1:]:
+        condition |= clause
+    # The redundant bound on the leading column lets the planner range-scan the sort index.
+    leading = "lte" if order[0].startswith("-") else "gte"
+    return Q(**{f"{fields[0]}__{leading}": values[0]}) & condition
+
+
+def page_after(queryset, order: Sequence[str], values: Optional[Sequence], page_size: int) -> Tuple[List[tuple], bool]:
+    """Up to `page_size` key rows after the cursor (from the start when None) and whether more follow."""
+    queryset = queryset.order_by(*order)
+    if values is not None:
+        queryset = queryset.filter(after_q(order, values))
+    rows = list(queryset.values_list(*key_fields(order))[: page_size + 1])
+    return rows[:page_size], len(rows) > page_size
@@ -0,0 +1,144 @@
+"""Facets of a filtered database catalog page in one grouped query.
+
+Brand counts, seller counts, the price range, a price histogram and the match
+total all come from a single statement: the filtered queryset becomes a CTE
+that is read once and aggregated with `GROUPING SETS`, instead of one
+aggregate per facet plus a `COUNT` over the same distinct, multi-join query.
+Results are cached per normalized filter signature and tagged like the
+counts in `catalog_counts`.
+"""
+
+import hashlib
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Mapping
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+
+from catalog.models import Brand
+from commerce.models import SellerStore
+from core import tagged_cache
+
+from .catalog_counts import filter_signature
+
+
+@dataclass(frozen=True)
+class CatalogFacets:
+    total: int = 0
+    brands: list = field(default_factory=list)
+    sellers: list = field(default_factory=list)
+    min_price: Decimal | None = None
+    max_price: Decimal | None = None
+    price_histogram: list = field(default_factory=list)
+
+    @property
+    def price_stats(self) -> dict:
+        return {"min_price": self.min_price, "max_price": self.max_price}
+
+
+def _key(signature: str) -> str:
+    digest = hashlib.sha1(signature.encode("utf-8")).hexdigest()
+    return f"shopfront:catalog_facets:v1:{digest}"
+
+
+def _sql(connection, base_sql: str, buckets: int) -> str:
+    brand_table = connection.ops.quote_name(Brand._meta.db_table)
+    store_table = connection.ops.quote_name(SellerStore._meta.db_table)
+    return f"""
+        WITH base (id, brand_id, seller_id, price) AS ({base_sql}),
+        bounds AS (SELECT MIN(price) AS lo, MAX(price) AS hi FROM base),
+        bucketed AS (
+            SELECT base.brand_id, base.seller_id, base.price,
+                   CASE WHEN bounds.hi > bounds.lo
+                        THEN LEAST(WIDTH_BUCKET(base.price, bounds.lo, bounds.hi, {buckets}), {buckets})
+                        ELSE 1 END AS bucket
+            FROM base CROSS JOIN bounds
+        ),
+        grouped AS (
+            SELECT GROUPING(brand_id) AS by_brand, GROUPING(seller_id) AS by_seller, GROUPING(bucket) AS by_bucket,
+                   brand_id, seller_id, bucket, COUNT(*) AS matches, MIN(price) AS lo, MAX(price) AS hi
+            FROM bucketed
+            GROUP BY GROUPING SETS ((brand_id), (seller_id), (bucket), ())
+        )
+        SELECT grouped.by_brand, grouped.by_seller, grouped.by_bucket, grouped.brand_id, grouped.seller_id,
+               grouped.bucket, grouped.matches, grouped.lo, grouped.hi, b.name, s.name, s.slug
+        FROM grouped
+        LEFT JOIN {brand_table} b ON grouped.by_brand = 0 AND b.id = grouped.brand_id
+        LEFT JOIN {store_table} s ON grouped.by_seller = 0 AND s.owner_id = grouped.seller_id
+    """
+
+
+def _top(options: list, limit: int) -> list:
+    return sorted(options, key=lambda option: (-option["count"], option["label"]))[:limit]
+
+
+def _histogram(bucket_counts: dict, lo, hi, buckets: int, total: int) -> list:
+    """Equal-width price buckets between the cheapest and dearest match, empty ones included."""
+    if not total or lo is None:
+        return []
+    if hi == lo:
+        buckets = 1
+    width = (hi - lo) / buckets
+    return [
+        {
+            "bucket": bucket,
+            "count": bucket_counts.get(bucket, 0),
+            "min_price": round(lo + width * (bucket - 1), 2),
+            "max_price": round(lo + width * bucket, 2) if bucket < buckets else hi,
+            "percent": round(100 * bucket_counts.get(bucket, 0) / total),
+        }
+        for bucket in range(1, buckets + 1)
+    ]
+
+
+def compute(queryset, *, exclude_brand_id=None, exclude_seller_id=None, limit: int = 10) -> CatalogFacets:
+    """Run the grouped query; facet options of the excluded brand/seller are left out."""
+    buckets = max(1, int(getattr(settings, "CATALOG_FACET_PRICE_BUCKETS", 8)))
+    try:
+        base_sql, params = queryset.order_by().values("id", "brand_id", "seller_id", "effective_price").query.sql_with_params()
+    except EmptyResultSet:
+        return CatalogFacets()
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        cursor.execute(_sql(connection, base_sql, buckets), params)
+        rows = cursor.fetchall()
+
+    total, lo, hi = 0, None, None
+    brands, sellers, bucket_counts = [], [], {}
+    for by_brand, by_seller, by_bucket, brand_id, seller_id, bucket, matches, row_lo, row_hi, brand_name, store_name, store_slug in rows:
+        if by_brand == 0:
+            if brand_id and brand_name and brand_id != exclude_brand_id:
+                brands.append({"id": brand_id, "label": brand_name, "count": matches})
+        elif by_seller == 0:
+            if seller_id and store_name is not None and seller_id != exclude_seller_id:
+                sellers.append({"id": seller_id, "slug": store_slug or "", "label": store_name or "", "count": matches})
+        elif by_bucket == 0:
+            bucket_counts[bucket] = matches
+        else:
+            total, lo, hi = matches, row_lo, row_hi
+    return CatalogFacets(
+        total=total,
+        brands=_top(brands, limit),
+        sellers=_top(sellers, limit),
+        min_price=lo,
+        max_price=hi,
+        price_histogram=_histogram(bucket_counts, lo, hi, buckets, total),
+    )
+
+
+def catalog_facets(
+    queryset,
+    filters: Mapping,
+    *,
+    exclude_brand_id=None,
+    exclude_seller_id=None,
+    limit: int = 10,
+) -> CatalogFacets:
+    return tagged_cache.get_or_compute(
+        _key(filter_signature(filters)),
+        tagged_cache.CATALOG_TAGS,
+        lambda: compute(queryset, exclude_brand_id=exclude_brand_id, exclude_seller_id=exclude_seller_id, limit=limit),
+        timeout=getattr(settings, "CACHE_TTL_CATALOG_FACETS", 60),
+    )
@@ -0,0 +1,236 @@
+"""Catalog listings served by Elasticsearch.
+
+Filters, sorting, the total, brand/seller facets and price bounds come from a
+single `_search` request against the denormalized product documents, so the
+database only hydrates the ids of the requested page.
+"""
+
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.conf import settings
+
+from catalog import es_breaker, es_client
+from . import search as es_search
+
+# Past ES `index.max_result_window` deep pages are left to the database path.
+MAX_RESULT_WINDOW = 10000
+
+CATALOG_FILTER_PATH = ",".join(
+    [
+        "hits.total.value",
+        "hits.hits._id",
+        "aggregations.brands.buckets.key",
+        "aggregations.brands.buckets.doc_count",
+        "aggregations.sellers.buckets.key",
+        "aggregations.sellers.buckets.doc_count",
+        "aggregations.min_price.value",
+        "aggregations.max_price.value",
+        "suggest.query_suggest.options.text",
+    ]
+)
+
+DELIVERY_RANGES = {
+    "fast": {"lte": 2},
+    "week": {"gt": 2, "lte": 7},
+    "planned": {"gt": 7},
+}
+
+_NAME_ORDER = [{"name_sort": {"order": "asc", "unmapped_type": "keyword"}}, {"id": {"order": "asc"}}]
+
+SORTS = {
+    "new": [{"is_new": {"order": "desc"}}, *_NAME_ORDER],
+    "price_asc": [{"effective_price": {"order": "asc"}}, *_NAME_ORDER],
+    "price_desc": [{"effective_price": {"order": "desc"}}, *_NAME_ORDER],
+    "name": _NAME_ORDER,
+    "promo": [{"is_promo": {"order": "desc"}}, *_NAME_ORDER],
+    "rating_desc": [
+        {"rating_avg": {"order": "desc", "unmapped_type": "float"}},
+        {"rating_count": {"order": "desc", "unmapped_type": "integer"}},
+        *_NAME_ORDER,
+    ],
+}
+
+
+@dataclass
+class CatalogFilters:
+    q: str = ""
+    category_ids: list[int] = field(default_factory=list)
+    brand_id: int | None = None
+    series_id: int | None = None
+    tag_id: int | None = None
+    tag_slug: str = ""
+    seller_id: int | None = None
+    in_stock: bool = False
+    delivery_eta: str = ""
+    min_price: Decimal | None = None
+    max_price: Decimal | None = None
+
+
+@dataclass
+class CatalogPage:
+    product_ids: list[int]
+    total_count: int
+    page: int
+    num_pages: int
+    brand_options: list[dict]
+    seller_options: list[dict]
+    min_price: Decimal | None
+    max_price: Decimal | None
+    suggestions: list[str]
+
+    @property
+    def has_next(self) -> bool:
+        return self.page < self.num_pages
+
+
+def enabled() -> bool:
+    return bool(getattr(settings, "ES_ENABLED", True)) and bool(getattr(settings, "ES_CATALOG_ENGINE_ENABLED", True))
+
+
+def _filter_clauses(filters: CatalogFilters) -> list[dict]:
+    clauses: list[dict] = []
+    if filters.category_ids:
+        clauses.append({"terms": {"category_id": list(filters.category_ids)}})
+    if filters.brand_id is not None:
+        clauses.append({"term": {"brand_id": filters.brand_id}})
+    if filters.series_id is not None:
+        clauses.append({"term": {"series_id": filters.series_id}})
+    if filters.tag_id is not None:
+        clauses.append({"term": {"tag_ids": filters.tag_id}})
+    elif filters.tag_slug:
+        clauses.append({"term": {"tag_slugs": filters.tag_slug}})
+    if filters.seller_id is not None:
+        clauses.append({"term": {"seller_ids": filters.seller_id}})
+    if filters.in_stock:
+        clauses.append({"term": {"in_stock": True}})
+    if filters.delivery_eta in DELIVERY_RANGES:
+        clauses.append({"range": {"effective_lead_time_days": DELIVERY_RANGES[filters.delivery_eta]}})
+    price_range = {}
+    if filters.min_price is not None:
+        price_range["gte"] = float(filters.min_price)
+    if filters.max_price is not None:
+        price_range["lte"] = float(filters.max_price)
+    if price_range:
+        clauses.append({"range": {"effective_price": price_range}})
+    return clauses
+
+
+def catalog_payload(filters: CatalogFilters, *, sort: str, offset: int, page_size: int, facet_limit: int = 10) -> dict:
+    query: dict = {"bool": {"filter": _filter_clauses(filters)}}
+    text_payload = es_search._search_payload(filters.q, limit=page_size, country_limit=0) if filters.q else None
+    if text_payload:
+        query["bool"]["must"] = [text_payload["query"]]
+    if sort in SORTS:
+        sort_clause = SORTS[sort]
+    elif filters.q:
+        sort_clause = ["_score", {"id": {"order": "asc"}}]
+    else:
+        sort_clause = SORTS["new"]
+    # One extra bucket so dropping the selected brand/seller still leaves `facet_limit` options.
+    bucket_order = [{"_count": "desc"}, {"_key": "asc"}]
+    payload = {
+        "from": offset,
+        "size": page_size,
+        "_source": False,
+        "track_total_hits": True,
+        "query": query,
+        "sort": sort_clause,
+        "aggs": {
+            "brands": {"terms": {"field": "brand_facet", "size": facet_limit + 1, "order": bucket_order}},
+            "sellers": {"terms": {"field": "seller_facet", "size": facet_limit + 1, "order": bucket_order}},
+            "min_price": {"min": {"field": "effective_price"}},
+            "max_price": {"max": {"field": "effective_price"}},
+        },
+    }
+    if text_payload:
+        payload["suggest"] = text_payload["suggest"]
+    return payload
+
+
+def _buckets(data: dict, name: str) -> list[dict]:
+    return data.get("aggregations", {}).get(name, {}).get("buckets", [])
+
+
+def _brand_options(data: dict, exclude_id: int | None, limit: int) -> list[dict]:
+    options = []
+    for bucket in _buckets(data, "brands"):
+        label, _, raw_id = str(bucket.get("key", "")).rpartition("|")
+        if not label or not raw_id.isdigit() or int(raw_id) == exclude_id:
+            continue
+        options.append({"id": int(raw_id), "label": label, "count": int(bucket.get("doc_count", 0))})
+    return options[:limit]
+
+
+def _seller_options(data: dict, exclude_id: int | None, limit: int) -> list[dict]:
+    options = []
+    for bucket in _buckets(data, "sellers"):
+        parts = str(bucket.get("key", "")).rsplit("|", 2)
+        if len(parts) != 3 or not parts[2].isdigit() or int(parts[2]) == exclude_id:
+            continue
+        label, slug, raw_id = parts
+        options.append({"id": int(raw_id), "slug": slug, "label": label, "count": int(bucket.get("doc_count", 0))})
+    return options[:limit]
+
+
+def _price(data: dict, name: str) -> Decimal | None:
+    value = data.get("aggregations", {}).get(name, {}).get("value")
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(Decimal("0.01"))
+
+
+def _run(payload: dict) -> dict:
+    started = time.monotonic()
+    try:
+        data = es_client.search(
+            es_search._es_index(), payload, filter_path=CATALOG_FILTER_PATH, timeout=es_search._es_timeout()
+        )
+    except Exception as exc:
+        es_breaker.record_failure(str(exc))
+        raise es_search.ESSearchUnavailable(str(exc)) from exc
+    es_breaker.record_success(time.monotonic() - started)
+    return data
+
+
+def search_catalog(
+    filters: CatalogFilters,
+    *,
+    sort: str = "",
+    page: int = 1,
+    page_size: int = 16,
+    facet_limit: int = 10,
+) -> CatalogPage:
+    """Return one catalog page with facets; raise `ESSearchUnavailable` to fall back to the database."""
+    if not enabled():
+        raise es_search.ESSearchUnavailable("disabled")
+    if es_breaker.is_open():
+        raise es_search.ESSearchUnavailable("breaker open")
+    page = max(1, int(page))
+    offset = (page - 1) * page_size
+    if offset + page_size > MAX_RESULT_WINDOW:
+        raise es_search.ESSearchUnavailable("page beyond result window")
+    data = _run(catalog_payload(filters, sort=sort, offset=offset, page_size=page_size, facet_limit=facet_limit))
+    total = int(data.get("hits", {}).get("total", {}).get("value", 0))
+    num_pages = max(1, (total + page_size - 1) // page_size)
+    if page > num_pages:
+        # Same as the paginator: out-of-range pages show the last one.
+        page = num_pages
+        data = _run(
+            catalog_payload(
+                filters, sort=sort, offset=(page - 1) * page_size, page_size=page_size, facet_limit=facet_limit
+            )
+        )
+    product_ids, _, suggestions = es_search._parse_search_response(data)
+    return CatalogPage(
+        product_ids=product_ids,
+        total_count=total,
+        page=page,
+        num_pages=num_pages,
+        brand_options=_brand_options(data, filters.brand_id, facet_limit),
+        seller_options=_seller_options(data, filters.seller_id, facet_limit),
+        min_price=_price(data, "min_price"),
+        max_price=_price(data, "max_price"),
+        suggestions=suggestions[:8],
+    )
@@ -1,60 +1,53 @@
-import logging
+from typing import NamedTuple
 
 from django.conf import settings
-from django.core.cache import cache
-from django.db.models import Avg, Case, Count, FloatField, IntegerField, Min, Max, Prefetch, Value, When
-from django.db.models.functions import Coalesce
+from django.db.models import Case, IntegerField, Prefetch, Q, When
 
-from catalog.models import Category, Collection, Product, ProductImage
-from catalog.offer_service import active_offer_queryset, apply_offer_snapshot
+from catalog import category_tree
+from catalog.models import BUY_BOX_FIELDS, Brand, Category, Collection, Product, ProductImage, Tag
+from catalog.offer_service import with_buy_box
+from core import tagged_cache
 
-log = logging.getLogger("shopfront")
 
+# Filter-list rows are plain tuples: they sit in every worker's local cache and unpickle cheaply.
+class BrandOption(NamedTuple):
+    id: int
+    name: str
 
-def _cache_get(key, default=None):
-    try:
-        return cache.get(key, default)
-    except Exception:
-        log.warning("cache_get_failed", extra={"cache_key": key}, exc_info=True)
-        return default
 
+class CategoryOption(NamedTuple):
+    id: int
+    name: str
+    slug: str
+    parent_id: int | None
 
-def _cache_set(key, value, timeout):
-    try:
-        cache.set(key, value, timeout=timeout)
-    except Exception:
-        log.warning("cache_set_failed", extra={"cache_key": key}, exc_info=True)
+
+class TagOption(NamedTuple):
+    id: int
+    name: str
+    slug: str
 
 
 def category_breadcrumbs(category: Category | None) -> list[Category]:
-    trail: list[Category] = []
-    current = category
-    safety = 0
-    while current is not None and safety < 12:
-        trail.append(current)
-        current = getattr(current, "parent", None)
-        safety += 1
-    return list(reversed(trail))
+    if category is None:
+        return []
+    return category_tree.get_tree(require=category.id).ancestors(category.id)
 
 
 def category_descendant_ids(category: Category | None) -> list[int]:
     if category is None:
         return []
-    ids: list[int] = [category.id]
-    frontier = [category.id]
-    safety = 0
-    while frontier and safety < 20:
-        children = list(Category.objects.filter(parent_id__in=frontier).values_list("id", flat=True))
-        if not children:
-            break
-        ids.extend(children)
-        frontier = children
-        safety += 1
-    return ids
-
-
-def category_option_rows(categories: list[Category]) -> list[dict]:
-    by_parent: dict[int | None, list[Category]] = {}
+    return category_tree.get_tree(require=category.id).descendant_ids(category.id)
+
+
+def category_subtree_q(category: Category, prefix: str = "category") -> Q:
+    """One indexed prefix match on the materialized path instead of an `IN` list of descendant ids."""
+    path = category_tree.get_tree(require=category.id).path(category.id)
+    return Q(**{f"{prefix}__path__startswith": path})
+
+
+def category_option_rows(categories: list[CategoryOption]) -> list[dict]:
+    by_parent: dict[int | None, list[CategoryOption]] = {}
     for category in categories:
         by_parent.setdefault(category.parent_id, []).append(category)
     for children in by_parent.values():
@@ -79,53 +72,7 @@ def category_option_rows(categories: list[Category]) -> list[dict]:
     return rows
 
 
-def facet_option_counts(qs, field_name: str, *, label_field: str = "name", limit: int = 12) -> list[dict]:
-    values = (
-        qs.exclude(**{f"{field_name}__isnull": True})
-        .values(f"{field_name}_id", f"{field_name}__{label_field}")
-        .annotate(count=Count("id"))
-        .order_by("-count", f"{field_name}__{label_field}")[:limit]
-    )
-    options = []
-    for row in values:
-        entity_id = row.get(f"{field_name}_id")
-        label = row.get(f"{field_name}__{label_field}") or ""
-        if not entity_id or not label:
-            continue
-        options.append({"id": entity_id, "label": label, "count": row.get("count", 0)})
-    return options
-
-
-def seller_facet_counts(qs, limit: int = 10) -> list[dict]:
-    values = (
-        qs.exclude(seller__seller_store__isnull=True)
-        .values("seller_id", "seller__seller_store__name", "seller__seller_store__slug")
-        .annotate(count=Count("id"))
-        .order_by("-count", "seller__seller_store__name")[:limit]
-    )
-    options = []
-    for row in values:
-        if not row.get("seller_id"):
-            continue
-        options.append(
-            {
-                "id": row["seller_id"],
-                "slug": row.get("seller__seller_store__slug", "") or "",
-                "label": row.get("seller__seller_store__name", "") or "",
-                "count": row.get("count", 0),
-            }
-        )
-    return options
-
-
-def with_rating(qs):
-    return qs.annotate(
-        rating_avg=Coalesce(Avg("reviews__rating"), Value(0.0), output_field=FloatField()),
-        rating_count=Count("reviews", distinct=True),
-    )
-
-
-def ordered_products_with_related(product_ids, include_rating: bool = True):
+def ordered_products_with_related(product_ids):
     if not product_ids:
         return []
     order_case = Case(
@@ -149,6 +96,8 @@ def ordered_products_with_related(product_ids, include_rating: bool = True):
             "volume_ml",
             "is_new",
             "is_promo",
+            "rating_avg",
+            "rating_count",
             "brand__name",
             "brand__slug",
             "series__name",
@@ -156,6 +105,7 @@ def ordered_products_with_related(product_ids, include_rating: bool = True):
             "category__slug",
             "seller__seller_store__slug",
             "seller__seller_store__name",
+            *BUY_BOX_FIELDS,
         )
         .select_related("brand", "series", "category", "seller", "seller__seller_store")
         .prefetch_related(
@@ -168,57 +118,87 @@ def ordered_products_with_related(product_ids, include_rating: bool = True):
                 "collections",
                 queryset=Collection.objects.only("id", "name", "slug").order_by("-is_featured", "name"),
             ),
-            Prefetch("seller_offers", queryset=active_offer_queryset()),
         )
     )
-    if include_rating:
-        base_qs = with_rating(base_qs)
-    return apply_offer_snapshot(list(base_qs.order_by(order_case)))
+    return list(with_buy_box(base_qs).order_by(order_case))
 
 
 def cached_home_product_ids(limit: int = 12):
-    key = f"shopfront:home:product_ids:v2:{limit}"
-    ids = _cache_get(key)
-    if ids is None:
-        ids = list(Product.objects.order_by("-is_new", "name", "id").values_list("id", flat=True)[:limit])
-        _cache_set(key, ids, timeout=getattr(settings, "CACHE_TTL_HOME", 180))
-    return ids
+    return tagged_cache.get_or_compute(
+        f"shopfront:home:product_ids:v3:{limit}",
+        (tagged_cache.CATALOG_LISTING,),
+        lambda: list(Product.objects.order_by("-is_new", "name", "id").values_list("id", flat=True)[:limit]),
+        timeout=getattr(settings, "CACHE_TTL_HOME", 3600),
+        local=True,
+    )
 
 
 def cached_home_category_ids(limit: int = 8):
-    key = f"shopfront:home:category_ids:v1:{limit}"
-    ids = _cache_get(key)
-    if ids is None:
-        ids = list(
+    return tagged_cache.get_or_compute(
+        f"shopfront:home:category_ids:v2:{limit}",
+        (tagged_cache.tag("category"),),
+        lambda: list(
             Category.objects.filter(parent__isnull=True)
             .exclude(name__startswith="HoReCa направление")
             .order_by("id")
             .values_list("id", flat=True)[:limit]
-        )
-        _cache_set(key, ids, timeout=getattr(settings, "CACHE_TTL_HOME", 180))
-    return ids
+        ),
+        timeout=getattr(settings, "CACHE_TTL_HOME", 3600),
+        local=True,
+    )
 
 
 def cached_catalog_default_page_ids(page: int, page_size: int):
-    key = f"shopfront:catalog:default_page_ids:v3:{page}:{page_size}"
-    ids = _cache_get(key)
-    if ids is None:
-        offset = max(0, page - 1) * page_size
-        ids = list(
+    offset = max(0, page - 1) * page_size
+    return tagged_cache.get_or_compute(
+        f"shopfront:catalog:default_page_ids:v4:{page}:{page_size}",
+        (tagged_cache.CATALOG_LISTING,),
+        lambda: list(
             Product.objects.order_by("-is_new", "name", "id").values_list("id", flat=True)[offset : offset + page_size]
-        )
-        _cache_set(key, ids, timeout=getattr(settings, "CACHE_TTL_CATALOG_API", 120))
-    return ids
+        ),
+        timeout=getattr(settings, "CACHE_TTL_CATALOG_LISTING", 3600),
+    )
 
 
 def cached_catalog_default_total_count():
-    key = "shopfront:catalog:default_total_count:v3"
-    count = _cache_get(key)
-    if count is None:
-        count = Product.objects.count()
-        _cache_set(key, count, timeout=getattr(settings, "CACHE_TTL_CATALOG_API", 120))
-    return count
+    return tagged_cache.get_or_compute(
+        "shopfront:catalog:default_total_count:v4",
+        (tagged_cache.CATALOG_LISTING,),
+        Product.objects.count,
+        timeout=getattr(settings, "CACHE_TTL_CATALOG_LISTING", 3600),
+    )
 
 
-def catalog_price_stats(qs):
-    return qs.aggregate(min_price=Min("price"), max_price=Max("price"))
+def cached_catalog_brand_options() -> list[BrandOption]:
+    return tagged_cache.get_or_compute(
+        "shopfront:catalog:brands:v3",
+        (tagged_cache.tag("brand"),),
+        lambda: [BrandOption(*row) for row in Brand.objects.order_by("name").values_list("id", "name")],
+        timeout=getattr(settings, "CACHE_TTL_CATALOG_FILTERS", 21600),
+        local=True,
+    )
+
+
+def cached_catalog_category_options() -> list[CategoryOption]:
+    return tagged_cache.get_or_compute(
+        "shopfront:catalog:categories:v3",
+        (tagged_cache.tag("category"),),
+        lambda: [
+            CategoryOption(*row)
+            for row in Category.objects.exclude(name__startswith="HoReCa направление")
+            .order_by("parent_id", "name", "id")
+            .values_list("id", "name", "slug", "parent_id")
+        ],
+        timeout=getattr(settings, "CACHE_TTL_CATALOG_FILTERS", 21600),
+        local=True,
+    )
+
+
+def cached_catalog_tag_options(limit: int = 50) -> list[TagOption]:
+    return tagged_cache.get_or_compute(
+        f"shopfront:catalog:tags:v3:{limit}",
+        (tagged_cache.tag("tag"),),
+        lambda: [TagOption(*row) for row in Tag.objects.order_by("name").values_list("id", "name", "slug")[:limit]],
+        timeout=getattr(settings, "CACHE_TTL_CATALOG_FILTERS", 21600),
+        local=True,
+    )
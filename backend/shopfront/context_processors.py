@@ -1,12 +1,10 @@
 from decimal import Decimal
 import logging
 from django.conf import settings
-from django.core.cache import cache
-from django.db.models import Prefetch
 from django.urls import resolve, Resolver404
 
 from catalog.models import Product, Category
-from catalog.offer_service import active_offer_queryset, apply_offer_snapshot
+from core import tagged_cache
 from .models import FavoriteProduct
 
 log = logging.getLogger("shopfront")
@@ -33,12 +31,7 @@ def cart_badge(request):
             ids.append(pid)
 
     if ids:
-        products = list(
-            Product.objects.filter(id__in=ids).prefetch_related(
-                Prefetch("seller_offers", queryset=active_offer_queryset())
-            )
-        )
-        apply_offer_snapshot(products)
+        products = list(Product.objects.filter(id__in=ids))
         prices = {product.id: product.display_price for product in products}
         for raw_pid, payload in cart.items():
             try:
@@ -64,16 +57,18 @@ def cart_badge(request):
 
 
 def header_categories(request):
-    cache_key = "shopfront:header_categories:v1"
-    cats = cache.get(cache_key)
-    if cats is None:
-        cats = list(
+    cats = tagged_cache.get_or_compute(
+        "shopfront:header_categories:v3",
+        (tagged_cache.tag("category"),),
+        lambda: list(
             Category.objects.filter(parent__isnull=True)
             .exclude(name__startswith="HoReCa направление")
             .order_by("id")
             .values("slug", "name")[:14]
-        )
-        cache.set(cache_key, cats, timeout=getattr(settings, "CACHE_TTL_HEADER_CATEGORIES", 900))
+        ),
+        timeout=getattr(settings, "CACHE_TTL_HEADER_CATEGORIES", 21600),
+        local=True,
+    )
     return {"header_categories": cats}
 
 
@@ -1,9 +1,10 @@
 from django.db.models import Prefetch, Q
 
+from catalog import autocomplete
 from catalog.models import Product, ProductImage
 from shopfront import search as sf_search
 
-from .search_service import DatabaseSearchProvider, suggest_query_corrections
+from .search_service import PostgresSearchProvider, suggest_query_corrections
 
 
 def live_search_context(*, query: str, search_provider_getter, logger) -> dict:
@@ -68,11 +69,18 @@ def live_search_context(*, query: str, search_provider_getter, logger) -> dict:
         if not suggestions:
             suggestions = suggest_query_corrections(q, limit=6)
     else:
-        fallback_bundle = DatabaseSearchProvider().live_bundle(query=q, limit=8, country_limit=0)
+        fallback_bundle = PostgresSearchProvider().live_bundle(query=q, limit=8, country_limit=0)
         ids = fallback_bundle.product_ids
         suggestions = suggestions or fallback_bundle.suggestions
         products = list(base_qs.filter(id__in=ids).distinct().order_by("-is_new", "name")[:8])
         if not suggestions:
             suggestions = suggest_query_corrections(q, limit=6)
 
-    return {"q": q, "products": products, "countries": countries, "suggestions": suggestions[:8], "show": True}
+    # Local prefix completions come first and keep working while ES is down.
+    merged = []
+    seen = set()
+    for item in [*autocomplete.suggest(q, limit=8), *suggestions]:
+        if item.casefold() not in seen:
+            seen.add(item.casefold())
+            merged.append(item)
+    return {"q": q, "products": products, "countries": countries, "suggestions": merged[:8], "show": True}
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0021_product_popularity'),
+        ('shopfront', '0003_growth_lists_and_recent_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchClickStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('query', models.CharField(max_length=200)),
+                ('impressions', models.PositiveIntegerField(default=0)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('add_to_carts', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_click_stats', to='catalog.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('query', 'product'), name='unique_search_click_stat')],
+            },
+        ),
+    ]
@@ -215,3 +215,28 @@ class SavedListItem(TimeStampedModel):
 
     def __str__(self) -> str:
         return f"SavedListItem(list={self.saved_list_id}, product={self.product_id})"
+
+
+class SearchClickStat(TimeStampedModel):
+    """Running search-event totals for one normalized query and one product."""
+
+    query = models.CharField(max_length=200)
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="search_click_stats",
+    )
+    impressions = models.PositiveIntegerField(default=0)
+    clicks = models.PositiveIntegerField(default=0)
+    add_to_carts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["query", "product"],
+                name="unique_search_click_stat",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"SearchClickStat(query={self.query}, product={self.product_id})"
@@ -0,0 +1,118 @@
+"""Batch reranking of search candidates on a compact feature matrix.
+
+One query fetches the few columns the scorer needs for all candidates. Text
+hits are counted with vectorized string search, learned click-through rates
+come precomputed from `search_events`, and the final score is a single
+matrix-vector product with configurable weights. Used by the hybrid live
+search and by the catalog's database search path.
+"""
+
+from typing import Mapping, Sequence
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Concat, Substr
+
+from catalog.models import Product
+
+from . import search_events
+
+FEATURES = ("position", "phrase", "rewritten", "tokens", "promo", "new", "popularity", "ctr")
+
+DEFAULT_WEIGHTS = {
+    "position": 1.0,
+    "phrase": 30.0,
+    "rewritten": 20.0,
+    "tokens": 6.0,
+    "promo": 1.5,
+    "new": 1.0,
+    "popularity": 8.0,
+    "ctr": 25.0,
+}
+
+# Only the head of long descriptions takes part in matching.
+DESCRIPTION_CHARS = 500
+POSITION_WINDOW = 40
+
+
+def weights() -> np.ndarray:
+    configured = {**DEFAULT_WEIGHTS, **(getattr(settings, "SEARCH_RERANK_WEIGHTS", None) or {})}
+    return np.array([float(configured[name]) for name in FEATURES], dtype=np.float32)
+
+
+def _candidate_rows(product_ids: Sequence[int]) -> dict[int, tuple[str, bool, bool, float]]:
+    def _text(expression):
+        return Coalesce(expression, Value(""))
+
+    haystack = Concat(
+        _text(F("name")), Value(" "),
+        _text(F("brand__name")), Value(" "),
+        _text(F("category__name")), Value(" "),
+        _text(Substr("description", 1, DESCRIPTION_CHARS)), Value(" "),
+        _text(F("material")), Value(" "),
+        _text(F("purpose")),
+    )
+    rows = Product.objects.filter(id__in=product_ids).annotate(haystack=haystack).values_list(
+        "id", "haystack", "is_promo", "is_new", "popularity"
+    )
+    return {pid: (text, promo, new, popularity) for pid, text, promo, new, popularity in rows}
+
+
+def feature_matrix(
+    product_ids: Sequence[int],
+    query: str,
+    rewritten: str = "",
+    popularity: Mapping[int, float] | None = None,
+    ctr: Mapping[int, float] | None = None,
+) -> np.ndarray:
+    """One row per candidate, columns in `FEATURES` order.
+
+    `popularity` overrides the stored per-product CTR; `ctr` holds the
+    per-query scores.
+    """
+    rows = _candidate_rows(product_ids)
+    n = len(product_ids)
+    texts, promo, new, stored = zip(*(rows.get(pid, ("", False, False, 0.0)) for pid in product_ids))
+    # Lower-cased here: the database collation may not fold Cyrillic.
+    haystacks = np.strings.lower(np.array(texts, dtype=np.str_))
+    matrix = np.zeros((n, len(FEATURES)), dtype=np.float32)
+    matrix[:, 0] = np.maximum(0, POSITION_WINDOW - np.arange(n))
+    normalized = " ".join((query or "").strip().lower().split())
+    if normalized:
+        matrix[:, 1] = np.strings.find(haystacks, normalized) >= 0
+    if rewritten and rewritten != normalized:
+        matrix[:, 2] = np.strings.find(haystacks, rewritten) >= 0
+    for token in (rewritten or normalized).split():
+        matrix[:, 3] += np.strings.find(haystacks, token) >= 0
+    matrix[:, 4] = promo
+    matrix[:, 5] = new
+    if popularity:
+        matrix[:, 6] = [float(popularity.get(pid, 0.0)) for pid in product_ids]
+    else:
+        matrix[:, 6] = stored
+    if ctr:
+        matrix[:, 7] = [float(ctr.get(pid, 0.0)) for pid in product_ids]
+    return matrix
+
+
+def rerank(
+    product_ids: Sequence[int],
+    query: str,
+    *,
+    rewritten: str = "",
+    limit: int | None = None,
+    popularity: Mapping[int, float] | None = None,
+    ctr: Mapping[int, float] | None = None,
+) -> list[int]:
+    """Candidates ordered by weighted score; ties keep their incoming order."""
+    unique = list(dict.fromkeys(product_ids))
+    if not unique:
+        return []
+    if ctr is None:
+        ctr = search_events.query_scores(query)
+    scores = feature_matrix(unique, query, rewritten, popularity, ctr) @ weights()
+    order = np.argsort(-scores, kind="stable")
+    if limit is not None:
+        order = order[:limit]
+    return [unique[i] for i in order]
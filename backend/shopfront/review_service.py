@@ -1,7 +1,8 @@
-from django.db.models import Avg, Count, Prefetch
+from django.db.models import Prefetch
 from django.shortcuts import render
 
 from catalog.models import (
+    RATING_FIELDS,
     Product,
     ProductQuestion,
     ProductReview,
@@ -9,6 +10,7 @@ from catalog.models import (
     ProductReviewPhoto,
     ProductReviewVote,
 )
+from catalog.review_stats import rating_distribution
 from orders.models import Order, OrderItem
 
 
@@ -35,7 +37,6 @@ def build_reviews_context(product: Product, user, *, seller_rating_summary) -> d
             ),
         )
     )
-    agg = reviews_qs.aggregate(avg=Avg("rating"), count=Count("id"))
     user_review = None
     if getattr(user, "is_authenticated", False):
         user_review = reviews_qs.filter(user=user).first()
@@ -44,8 +45,10 @@ def build_reviews_context(product: Product, user, *, seller_rating_summary) -> d
     return {
         "p": product,
         "reviews": reviews_qs[:30],
-        "rating_avg": agg["avg"] or 0,
-        "rating_count": agg["count"] or 0,
+        "rating_avg": product.rating_avg,
+        "rating_count": product.rating_count,
+        "rating_distribution": rating_distribution(product.rating_histogram),
+        "review_helpful_votes": product.review_helpful_votes,
         "user_review": user_review,
         "questions": questions_qs,
         "seller_rating_avg": seller_summary["rating_avg"],
@@ -72,15 +75,20 @@ def has_verified_product_purchase(*, user, product: Product) -> bool:
 
 def upsert_product_review(*, product: Product, user, rating: int, text: str):
     verified = has_verified_product_purchase(user=user, product=product)
-    return ProductReview.objects.update_or_create(
+    result = ProductReview.objects.update_or_create(
         product=product,
         user=user,
         defaults={"rating": rating, "text": text, "is_verified_purchase": verified},
     )
+    # The review signal stored fresh aggregates; the caller re-renders from this instance.
+    product.refresh_from_db(fields=list(RATING_FIELDS))
+    return result
 
 
 def delete_product_review(*, product: Product, user) -> int:
     deleted, _ = ProductReview.objects.filter(product=product, user=user).delete()
+    if deleted:
+        product.refresh_from_db(fields=list(RATING_FIELDS))
     return deleted
 
 
@@ -99,18 +107,13 @@ def delete_review_comment(*, comment: ProductReviewComment):
 
 
 def apply_review_vote(*, review: ProductReview, user, value: str):
+    # The vote signal recounts the review and the product totals in the same transaction.
     ProductReviewVote.objects.update_or_create(
         review=review,
         user=user,
         defaults={"value": value},
     )
-    review.helpful_count = ProductReviewVote.objects.filter(
-        review=review, value=ProductReviewVote.Value.HELPFUL
-    ).count()
-    review.unhelpful_count = ProductReviewVote.objects.filter(
-        review=review, value=ProductReviewVote.Value.UNHELPFUL
-    ).count()
-    review.save(update_fields=["helpful_count", "unhelpful_count", "updated_at"])
+    review.refresh_from_db(fields=["helpful_count", "unhelpful_count"])
     return review
 
 
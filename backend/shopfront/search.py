@@ -1,11 +1,13 @@
 import logging
+import time
 from hashlib import sha1
 from typing import List, Tuple
 
-import requests
 from django.conf import settings
 from django.core.cache import cache
 
+from catalog import es_breaker, es_client
+
 log = logging.getLogger("shopfront")
 
 
@@ -39,12 +41,24 @@ def _norm_query(query: str) -> str:
     return " ".join((query or "").strip().lower().split())
 
 
+# Only ids, suggestion texts and country keys are read back; everything else stays on the ES side.
+SEARCH_FILTER_PATH = ",".join(
+    [
+        "hits.hits._id",
+        "suggest.query_suggest.options.text",
+        "aggregations.country_suggestions_scope.country_suggestions.buckets.key",
+    ]
+)
+
+
 def _search_payload(query: str, limit: int, country_limit: int):
     norm_q = _norm_query(query)
     safe_country_limit = max(1, int(country_limit or 1))
     safe_limit = max(1, int(limit or 1))
-    return {
+    payload = {
         "size": safe_limit,
+        "_source": False,
+        "track_total_hits": False,
         "query": {
             "bool": {
                 "should": [
@@ -94,7 +108,24 @@ def _search_payload(query: str, limit: int, country_limit: int):
                 },
             }
         },
-        "aggs": {
+    }
+    popularity_factor = float(getattr(settings, "SEARCH_POPULARITY_ES_FACTOR", 0) or 0)
+    if popularity_factor > 0:
+        # Learned click-through rate adds to the text score; documents without it are unaffected.
+        payload["query"] = {
+            "function_score": {
+                "query": payload["query"],
+                "field_value_factor": {
+                    "field": "popularity",
+                    "factor": popularity_factor,
+                    "modifier": "log1p",
+                    "missing": 0,
+                },
+                "boost_mode": "sum",
+            }
+        }
+    if country_limit and country_limit > 0:
+        payload["aggs"] = {
             "country_suggestions_scope": {
                 "filter": {"prefix": {"country_of_origin_keyword": norm_q}},
                 "aggs": {
@@ -107,22 +138,11 @@ def _search_payload(query: str, limit: int, country_limit: int):
                     }
                 },
             }
-        },
-    }
+        }
+    return payload
 
 
-def _es_search_bundle(query: str, limit: int, country_limit: int) -> Tuple[List[int], List[str], List[str]]:
-    if not getattr(settings, "ES_ENABLED", True):
-        raise ESSearchUnavailable("disabled")
-    payload = _search_payload(query=query, limit=limit, country_limit=country_limit)
-    url = f"{_es_url()}/{_es_index()}/_search"
-    try:
-        r = requests.post(url, json=payload, timeout=_es_timeout())
-        r.raise_for_status()
-        data = r.json()
-    except Exception as exc:
-        raise ESSearchUnavailable(str(exc)) from exc
-
+def _parse_search_response(data: dict) -> Tuple[List[int], List[str], List[str]]:
     hits = data.get("hits", {}).get("hits", [])
     ids: List[int] = []
     for hit in hits:
@@ -160,18 +180,84 @@ def _es_search_bundle(query: str, limit: int, country_limit: int) -> Tuple[List[
     return ids, countries, suggestions
 
 
-def live_search_bundle(query: str, limit: int = 8, country_limit: int = 6) -> Tuple[List[int], List[str], List[str]]:
+def _es_search_bundle(query: str, limit: int, country_limit: int) -> Tuple[List[int], List[str], List[str]]:
+    if not getattr(settings, "ES_ENABLED", True):
+        raise ESSearchUnavailable("disabled")
+    payload = _search_payload(query=query, limit=limit, country_limit=country_limit)
+    started = time.monotonic()
+    try:
+        data = es_client.search(_es_index(), payload, filter_path=SEARCH_FILTER_PATH, timeout=_es_timeout())
+    except Exception as exc:
+        es_breaker.record_failure(str(exc))
+        raise ESSearchUnavailable(str(exc)) from exc
+    es_breaker.record_success(time.monotonic() - started)
+    return _parse_search_response(data)
+
+
+def _bundle_cache_key(query: str, limit: int, country_limit: int) -> str:
     norm_q = _norm_query(query)
-    cache_key = f"shopfront:es_live_bundle:v2:{sha1(f'{norm_q}:{limit}:{country_limit}'.encode('utf-8')).hexdigest()}"
-    cached = cache.get(cache_key)
-    if cached is not None:
-        ids, countries, suggestions = cached
-        return list(ids), list(countries), list(suggestions)
+    return f"shopfront:es_live_bundle:v2:{sha1(f'{norm_q}:{limit}:{country_limit}'.encode('utf-8')).hexdigest()}"
+
+
+def _fresh_seconds() -> int:
+    return int(getattr(settings, "CACHE_TTL_ES_SEARCH", 120))
+
+
+def _stale_seconds() -> int:
+    return int(getattr(settings, "ES_SEARCH_STALE_SECONDS", 600))
+
 
-    ids, countries, suggestions = _es_search_bundle(query=query, limit=limit, country_limit=country_limit)
-    if country_limit <= 0:
-        countries = []
-    cache.set(cache_key, [ids, countries, suggestions], timeout=getattr(settings, "CACHE_TTL_ES_SEARCH", 120))
+def _lock_seconds() -> int:
+    return int(getattr(settings, "ES_SEARCH_LOCK_SECONDS", 5))
+
+
+def _cache_entry(ids, countries, suggestions) -> dict:
+    # Kept past freshness so expired bundles can still be served while one worker refreshes them.
+    return {"bundle": [ids, countries, suggestions], "fresh_until": time.time() + _fresh_seconds()}
+
+
+def _read_entry(entry) -> Tuple[Tuple[List[int], List[str], List[str]], bool]:
+    """Cached bundle and whether it is still fresh; plain bundles from older releases count as fresh."""
+    if isinstance(entry, dict):
+        ids, countries, suggestions = entry["bundle"]
+        fresh = entry.get("fresh_until", 0) > time.time()
+    else:
+        ids, countries, suggestions = entry
+        fresh = True
+    return (list(ids), list(countries), list(suggestions)), fresh
+
+
+def _store_bundles(entries: dict) -> None:
+    cache.set_many(entries, timeout=_fresh_seconds() + _stale_seconds())
+
+
+def _acquire_refresh(cache_key: str) -> bool:
+    try:
+        return bool(cache.add(f"{cache_key}:lock", 1, timeout=_lock_seconds()))
+    except Exception:
+        log.warning("live_search_lock_failed", exc_info=True)
+        return True
+
+
+def _release_refresh(cache_key: str) -> None:
+    try:
+        cache.delete(f"{cache_key}:lock")
+    except Exception:
+        log.warning("live_search_unlock_failed", exc_info=True)
+
+
+def _fetch_bundle(
+    query: str, limit: int, country_limit: int, *, owns_lock: bool = True
+) -> Tuple[List[int], List[str], List[str]]:
+    cache_key = _bundle_cache_key(query, limit, country_limit)
+    try:
+        ids, countries, suggestions = _es_search_bundle(query=query, limit=limit, country_limit=country_limit)
+        if country_limit <= 0:
+            countries = []
+        _store_bundles({cache_key: _cache_entry(ids, countries, suggestions)})
+    finally:
+        if owns_lock:
+            _release_refresh(cache_key)
     log.info(
         "live_search_es_ok",
         extra={"query": query, "count": len(ids), "country_count": len(countries), "suggestions_count": len(suggestions)},
@@ -179,6 +265,64 @@ def live_search_bundle(query: str, limit: int = 8, country_limit: int = 6) -> Tu
     return ids, countries, suggestions
 
 
+def refresh_bundle(query: str, limit: int, country_limit: int) -> None:
+    """Background refresh of a stale bundle; the caller already holds the refresh lock."""
+    try:
+        _fetch_bundle(query, limit, country_limit)
+    except ESSearchUnavailable as exc:
+        log.warning("live_search_refresh_failed", extra={"query": query, "reason": str(exc)})
+
+
+def _schedule_refresh(query: str, limit: int, country_limit: int) -> None:
+    cache_key = _bundle_cache_key(query, limit, country_limit)
+    if not _acquire_refresh(cache_key):
+        return
+    from .tasks import refresh_live_search_bundle
+
+    try:
+        refresh_live_search_bundle.apply_async(args=(query, limit, country_limit))
+    except Exception:
+        # The lock expires on its own and a later request schedules the refresh again.
+        log.exception("live_search_refresh_schedule_failed", extra={"query": query})
+
+
+def _wait_for_bundle(cache_key: str):
+    deadline = time.monotonic() + float(getattr(settings, "ES_SEARCH_WAIT_SECONDS", 0.5))
+    while time.monotonic() < deadline:
+        time.sleep(0.02)
+        entry = cache.get(cache_key)
+        if entry is not None:
+            return entry
+        if cache.get(f"{cache_key}:lock") is None:
+            return None
+    return None
+
+
+def live_search_bundle(query: str, limit: int = 8, country_limit: int = 6) -> Tuple[List[int], List[str], List[str]]:
+    """Cached ES live-search bundle.
+
+    Concurrent misses for one query are coalesced across workers: the first
+    request takes a short cache lock and asks ES while the others wait for its
+    result. Expired bundles are served as-is while one worker refreshes them.
+    """
+    cache_key = _bundle_cache_key(query, limit, country_limit)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        bundle, fresh = _read_entry(cached)
+        if not fresh:
+            _schedule_refresh(query, limit, country_limit)
+        return bundle
+
+    if _acquire_refresh(cache_key):
+        return _fetch_bundle(query, limit, country_limit)
+    cached = _wait_for_bundle(cache_key)
+    if cached is not None:
+        log.info("live_search_coalesced", extra={"query": query})
+        return _read_entry(cached)[0]
+    # The leader failed or is too slow; ask ES directly without touching its lock.
+    return _fetch_bundle(query, limit, country_limit, owns_lock=False)
+
+
 def search_product_ids(query: str, limit: int = 8) -> List[int]:
     try:
         ids, _countries, _suggestions = _normalize_bundle(
@@ -0,0 +1,250 @@
+"""Server-side search events and the click-through scores learned from them.
+
+Requests only append compact impression/click/add-to-cart events to a Redis
+list. A periodic job drains the list into `SearchClickStat` totals and turns
+them into smoothed click-through rates: one per (query, product), cached for
+the reranker, and one per product, stored on `Product.popularity` and indexed
+for the ES `function_score`. Nothing is computed at query time.
+"""
+
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from catalog.autocomplete import fold
+from catalog.index_queue import enqueue_product_ids
+from catalog.models import Product
+
+from .models import SearchClickStat
+
+log = logging.getLogger("shopfront")
+
+IMPRESSION = "impression"
+CLICK = "click"
+CART = "cart"
+# Event kind -> position in the (impressions, clicks, add_to_carts) totals.
+KINDS = {IMPRESSION: 0, CLICK: 1, CART: 2}
+EVENTS_KEY = "shopfront:search_events:v1"
+SCORES_WARM_KEY = "shopfront:search_ctr:v1:warm"
+MAX_QUERY_CHARS = 200
+# Per-query maps keep only the best-engaging products.
+MAX_QUERY_SCORES = 200
+
+_client = None
+
+
+def _redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.SEARCH_EVENTS_REDIS_URL,
+            socket_timeout=0.2,
+            socket_connect_timeout=0.2,
+        )
+    return _client
+
+
+def normalize_query(query: str) -> str:
+    return fold(query)[:MAX_QUERY_CHARS].strip()
+
+
+def ctr_score(impressions: int, clicks: int, add_to_carts: int) -> float:
+    """Engagement per impression, shrunk toward zero until enough impressions accumulate."""
+    smoothing = float(getattr(settings, "SEARCH_CTR_SMOOTHING", 20))
+    cart_weight = float(getattr(settings, "SEARCH_CTR_CART_WEIGHT", 3))
+    engaged = clicks + cart_weight * add_to_carts
+    if engaged <= 0:
+        return 0.0
+    return round(min(1.0, engaged / (max(impressions, clicks) + smoothing)), 4)
+
+
+def record(kind: str, query: str, product_ids: Iterable[int]) -> None:
+    """Buffer one event; never raises and never touches the database."""
+    if not getattr(settings, "SEARCH_EVENTS_ENABLED", False) or kind not in KINDS:
+        return
+    normalized = normalize_query(query)
+    ids = [int(pid) for pid in product_ids if pid]
+    if not normalized or not ids:
+        return
+    max_buffer = int(getattr(settings, "SEARCH_EVENTS_MAX_BUFFER", 200000))
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        pipe.rpush(EVENTS_KEY, json.dumps([kind, normalized, ids], ensure_ascii=False))
+        # A stalled aggregator drops the oldest events instead of growing Redis.
+        pipe.ltrim(EVENTS_KEY, -max_buffer, -1)
+        pipe.execute()
+    except Exception as exc:
+        log.warning("search_event_record_failed", extra={"kind": kind, "reason": str(exc)})
+
+
+def _drain(batch_size: int) -> List[bytes]:
+    pipe = _redis().pipeline(transaction=True)
+    pipe.lrange(EVENTS_KEY, 0, batch_size - 1)
+    pipe.ltrim(EVENTS_KEY, batch_size, -1)
+    raw, _ = pipe.execute()
+    return raw
+
+
+def _scores_key(normalized: str) -> str:
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+    return f"shopfront:search_ctr:v1:{digest}"
+
+
+def _scores_ttl() -> int | None:
+    return int(getattr(settings, "SEARCH_CTR_CACHE_SECONDS", 0)) or None
+
+
+def _load_query_scores(queries: Iterable[str]) -> Dict[str, Dict[int, float]]:
+    scores: Dict[str, Dict[int, float]] = {query: {} for query in queries}
+    rows = SearchClickStat.objects.filter(query__in=list(scores)).values_list(
+        "query", "product_id", "impressions", "clicks", "add_to_carts"
+    )
+    for query, product_id, impressions, clicks, add_to_carts in rows:
+        score = ctr_score(impressions, clicks, add_to_carts)
+        if score > 0:
+            scores[query][product_id] = score
+    for query, per_product in scores.items():
+        if len(per_product) > MAX_QUERY_SCORES:
+            best = sorted(per_product.items(), key=lambda item: -item[1])[:MAX_QUERY_SCORES]
+            scores[query] = dict(best)
+    return scores
+
+
+def query_scores(query: str) -> Dict[int, float]:
+    """Click-through scores of products for this query, as last published by `aggregate`.
+
+    Reads only the cache: a miss means no learned scores, never a database query.
+    """
+    normalized = normalize_query(query)
+    if not normalized:
+        return {}
+    try:
+        return cache.get(_scores_key(normalized)) or {}
+    except Exception:
+        return {}
+
+
+def _publish_scores(queries: Iterable[str]) -> int:
+    fresh = _load_query_scores(queries)
+    try:
+        cache.set_many({_scores_key(query): scores for query, scores in fresh.items()}, timeout=_scores_ttl())
+    except Exception:
+        log.warning("search_ctr_cache_set_failed", extra={"queries": len(fresh)})
+    return len(fresh)
+
+
+def warm_query_scores(batch_size: int = 1000) -> int:
+    """Publish the scores of every stored query; `aggregate` runs it when the cache lost them."""
+    queries = SearchClickStat.objects.values_list("query", flat=True).distinct().order_by("query").iterator()
+    published = 0
+    batch: List[str] = []
+    for query in queries:
+        batch.append(query)
+        if len(batch) >= batch_size:
+            published += _publish_scores(batch)
+            batch = []
+    if batch:
+        published += _publish_scores(batch)
+    log.info("search_ctr_scores_warmed", extra={"queries": published})
+    return published
+
+
+def _collect(batch_size: int, max_batches: int) -> Tuple[Dict[Tuple[str, int], List[int]], int]:
+    totals: Dict[Tuple[str, int], List[int]] = defaultdict(lambda: [0, 0, 0])
+    events = 0
+    for _ in range(max_batches):
+        raw = _drain(batch_size)
+        for item in raw:
+            try:
+                kind, query, ids = json.loads(item)
+                column = KINDS[kind]
+                ids = [int(pid) for pid in ids]
+            except Exception:
+                continue
+            events += 1
+            for pid in ids:
+                totals[(query, pid)][column] += 1
+        if len(raw) < batch_size:
+            break
+    return totals, events
+
+
+def _apply_totals(totals: Dict[Tuple[str, int], List[int]]) -> None:
+    product_ids = {pid for _, pid in totals}
+    valid = set(Product.objects.filter(id__in=product_ids).values_list("id", flat=True))
+    queries = {query for query, _ in totals}
+    now = timezone.now()
+    with transaction.atomic():
+        existing = {
+            (stat.query, stat.product_id): stat
+            for stat in SearchClickStat.objects.select_for_update().filter(query__in=queries, product_id__in=valid)
+        }
+        created, updated = [], []
+        for (query, pid), (impressions, clicks, add_to_carts) in totals.items():
+            if pid not in valid:
+                continue
+            stat = existing.get((query, pid))
+            if stat is None:
+                created.append(SearchClickStat(
+                    query=query, product_id=pid, impressions=impressions, clicks=clicks, add_to_carts=add_to_carts,
+                ))
+                continue
+            stat.impressions += impressions
+            stat.clicks += clicks
+            stat.add_to_carts += add_to_carts
+            stat.updated_at = now
+            updated.append(stat)
+        SearchClickStat.objects.bulk_create(created, batch_size=1000)
+        SearchClickStat.objects.bulk_update(
+            updated, ["impressions", "clicks", "add_to_carts", "updated_at"], batch_size=1000
+        )
+
+
+def _refresh_product_popularity(product_ids: Iterable[int]) -> List[int]:
+    rows = (
+        SearchClickStat.objects.filter(product_id__in=list(product_ids))
+        .values("product_id")
+        .annotate(impressions=Sum("impressions"), clicks=Sum("clicks"), add_to_carts=Sum("add_to_carts"))
+    )
+    scores = {row["product_id"]: ctr_score(row["impressions"], row["clicks"], row["add_to_carts"]) for row in rows}
+    changed = [
+        product
+        for product in Product.objects.filter(id__in=list(scores)).only("id", "popularity")
+        if product.popularity != scores[product.id]
+    ]
+    for product in changed:
+        product.popularity = scores[product.id]
+    # bulk_update skips model signals; the index queue carries the new values to ES.
+    Product.objects.bulk_update(changed, ["popularity"], batch_size=1000)
+    changed_ids = [product.id for product in changed]
+    enqueue_product_ids(changed_ids)
+    return changed_ids
+
+
+def aggregate(batch_size: int | None = None, max_batches: int = 20) -> dict:
+    """Fold buffered events into the stored totals and republish the affected scores."""
+    batch_size = batch_size or int(getattr(settings, "SEARCH_EVENTS_BATCH_SIZE", 5000))
+    try:
+        cold = cache.add(SCORES_WARM_KEY, 1, timeout=_scores_ttl())
+    except Exception:
+        cold = False
+    if cold:
+        # The marker lives beside the scores: if it is gone, so are they.
+        warm_query_scores()
+    totals, events = _collect(batch_size, max_batches)
+    if not totals:
+        return {"events": 0, "queries": 0, "products": 0}
+    _apply_totals(totals)
+    queries = {query for query, _ in totals}
+    changed = _refresh_product_popularity({pid for _, pid in totals})
+    _publish_scores(queries)
+    return {"events": events, "queries": len(queries), "products": len(changed)}
@@ -1,13 +1,13 @@
 from dataclasses import dataclass
-from difflib import get_close_matches
-from collections import defaultdict
 
 from django.conf import settings
 
 from django.db.models import Q
 
-from catalog.models import Brand, Category, Product, Tag
+from catalog import es_breaker, fulltext, synonyms, vector_index
+from catalog.models import Product
 from . import search as es_search
+from . import rerank, spelling
 
 
 @dataclass
@@ -19,51 +19,18 @@ class SearchBundle:
     rewritten_query: str = ""
 
 
-SEARCH_SYNONYMS = {
-    "сиропы": "сироп",
-    "стаканы": "стакан",
-    "бокалы": "бокал",
-    "кофе зерно": "кофе",
-    "салфетки": "салфетка",
-    "одноразка": "одноразовая посуда",
-}
-
-SEMANTIC_QUERY_REWRITES = {
-    "одноразка": "одноразовая посуда",
-    "хозка": "расходные материалы",
-    "барный сироп": "сироп для бара",
-    "кофе для эспрессо": "зерновой кофе эспрессо",
-    "упаковка на вынос": "takeaway упаковка",
-}
-
-
 def build_query_variants(query: str) -> list[str]:
     normalized = " ".join((query or "").strip().lower().split())
     if not normalized:
         return []
-    variants = [normalized]
-    alias = SEARCH_SYNONYMS.get(normalized)
-    if alias and alias not in variants:
-        variants.append(alias)
-    for source, target in SEARCH_SYNONYMS.items():
-        if source in normalized:
-            replaced = normalized.replace(source, target).strip()
-            if replaced and replaced not in variants:
-                variants.append(replaced)
-    return variants[:4]
+    return synonyms.get_dictionary().variants(normalized)
 
 
 def rewrite_query(query: str) -> str:
-    if not getattr(settings, "SEARCH_QUERY_REWRITE_ENABLED", True):
-        return " ".join((query or "").strip().lower().split())
     normalized = " ".join((query or "").strip().lower().split())
-    if not normalized:
-        return ""
-    rewritten = normalized
-    for source, target in SEMANTIC_QUERY_REWRITES.items():
-        if source in rewritten:
-            rewritten = rewritten.replace(source, target).strip()
-    return rewritten
+    if not normalized or not getattr(settings, "SEARCH_QUERY_REWRITE_ENABLED", True):
+        return normalized
+    return synonyms.get_dictionary().rewrite(normalized)
 
 
 def semantic_query_variants(query: str) -> list[str]:
@@ -89,20 +56,7 @@ def suggest_query_corrections(query: str, limit: int = 5) -> list[str]:
         variant for variant in build_query_variants(normalized)
         if variant.casefold() != normalized.casefold()
     ]
-    candidates = []
-    candidates.extend(list(Brand.objects.order_by("name").values_list("name", flat=True)[:100]))
-    candidates.extend(list(Category.objects.order_by("name").values_list("name", flat=True)[:120]))
-    candidates.extend(list(Tag.objects.order_by("name").values_list("name", flat=True)[:80]))
-    candidates.extend(list(Product.objects.order_by("-is_new", "name").values_list("name", flat=True)[:150]))
-    seen = set()
-    deduped = []
-    for item in candidates:
-        key = str(item or "").strip().casefold()
-        if not key or key in seen:
-            continue
-        seen.add(key)
-        deduped.append(str(item).strip())
-    close = get_close_matches(normalized, deduped, n=limit, cutoff=0.62)
+    close = spelling.get_index().suggest(normalized, limit=limit)
     merged = []
     merged_seen = set()
     for item in direct_variants + [item for item in close if item.casefold() != normalized.casefold()]:
@@ -186,10 +140,53 @@ class DatabaseSearchProvider(SearchProvider):
         )
 
 
+class PostgresSearchProvider(DatabaseSearchProvider):
+    """Ranked full-text search on the GIN-indexed `search_vector`, with trigram matches for typos.
+
+    Falls back to the substring scan only when neither pass finds anything.
+    """
+
+    code = "postgres"
+
+    def live_bundle(self, query: str, limit: int = 8, country_limit: int = 6) -> SearchBundle:
+        if not getattr(settings, "SEARCH_DB_FULLTEXT_ENABLED", True):
+            return super().live_bundle(query=query, limit=limit, country_limit=country_limit)
+        variants = semantic_query_variants(query) or [query]
+        ids = fulltext.fulltext_product_ids(variants, limit)
+        if len(ids) < limit:
+            ids.extend(pid for pid in fulltext.trigram_product_ids(query, limit) if pid not in ids)
+        if not ids:
+            return super().live_bundle(query=query, limit=limit, country_limit=country_limit)
+        ids = ids[:limit]
+        names = dict(Product.objects.filter(id__in=ids).values_list("id", "name"))
+        suggestions = []
+        seen = set()
+        for pid in ids:
+            normalized = " ".join(str(names.get(pid) or "").split())
+            if normalized and normalized.casefold() not in seen:
+                seen.add(normalized.casefold())
+                suggestions.append(normalized)
+        return SearchBundle(
+            product_ids=ids,
+            countries=[],
+            suggestions=suggestions[:limit],
+            provider=self.code,
+            rewritten_query=rewrite_query(query),
+        )
+
+
 def _semantic_candidate_ids(query: str, limit: int = 24) -> list[int]:
     variants = semantic_query_variants(query)
     if not variants:
         return []
+    if getattr(settings, "SEMANTIC_SEARCH_BACKEND", "hybrid-db") == "vector":
+        ids = vector_index.semantic_candidate_ids(query, limit)
+        if ids:
+            return ids
+    if getattr(settings, "SEARCH_DB_FULLTEXT_ENABLED", True):
+        ids = fulltext.fulltext_product_ids(variants, limit)
+        if ids:
+            return ids
     query_filter = Q()
     for variant in variants:
         query_filter |= (
@@ -215,45 +212,7 @@ def _rerank_product_ids(product_ids: list[int], query: str, limit: int = 8) -> l
         return []
     if not getattr(settings, "SEARCH_RERANK_ENABLED", True):
         return product_ids[:limit]
-    normalized = " ".join((query or "").strip().lower().split())
-    rewritten = rewrite_query(query)
-    tokens = [token for token in rewritten.split() if token]
-    rows = Product.objects.filter(id__in=product_ids).select_related("brand", "category")
-    scores: dict[int, float] = defaultdict(float)
-    for position, pid in enumerate(product_ids):
-        scores[pid] += max(0, 40 - position)
-    for product in rows:
-        haystacks = [
-            (product.name or "").lower(),
-            (getattr(product.brand, "name", "") or "").lower(),
-            (getattr(product.category, "name", "") or "").lower(),
-            (product.description or "").lower(),
-            (product.material or "").lower(),
-            (product.purpose or "").lower(),
-        ]
-        full = " ".join(haystacks)
-        if normalized and normalized in full:
-            scores[product.id] += 30
-        if rewritten and rewritten != normalized and rewritten in full:
-            scores[product.id] += 20
-        for token in tokens:
-            if token in full:
-                scores[product.id] += 6
-        if product.is_promo:
-            scores[product.id] += 1.5
-        if product.is_new:
-            scores[product.id] += 1
-    ordered = sorted(product_ids, key=lambda pid: (-scores[pid], product_ids.index(pid)))
-    seen = set()
-    result = []
-    for pid in ordered:
-        if pid in seen:
-            continue
-        seen.add(pid)
-        result.append(pid)
-        if len(result) >= limit:
-            break
-    return result
+    return rerank.rerank(product_ids, query, rewritten=rewrite_query(query), limit=limit)
 
 
 class HybridSearchProvider(SearchProvider):
@@ -261,10 +220,13 @@ class HybridSearchProvider(SearchProvider):
 
     def live_bundle(self, query: str, limit: int = 8, country_limit: int = 6) -> SearchBundle:
         rewritten = rewrite_query(query)
+        lexical_limit = max(limit * 2, 12)
         try:
-            lexical_bundle = ElasticsearchSearchProvider().live_bundle(query=query, limit=max(limit * 2, 12), country_limit=country_limit)
+            if es_breaker.is_open():
+                raise es_search.ESSearchUnavailable("circuit open")
+            lexical_bundle = ElasticsearchSearchProvider().live_bundle(query=query, limit=lexical_limit, country_limit=country_limit)
         except Exception:
-            lexical_bundle = DatabaseSearchProvider().live_bundle(query=query, limit=max(limit * 2, 12), country_limit=country_limit)
+            lexical_bundle = PostgresSearchProvider().live_bundle(query=query, limit=lexical_limit, country_limit=country_limit)
         semantic_ids = _semantic_candidate_ids(rewritten or query, limit=max(limit * 3, 24))
         merged = []
         seen = set()
@@ -297,7 +259,9 @@ def get_search_provider(prefer_semantic: bool = False) -> SearchProvider:
         return HybridSearchProvider()
     if provider_code == "database":
         return DatabaseSearchProvider()
+    if provider_code == "postgres" or es_breaker.is_open():
+        return PostgresSearchProvider()
     try:
         return ElasticsearchSearchProvider()
     except Exception:
-        return DatabaseSearchProvider()
+        return PostgresSearchProvider()
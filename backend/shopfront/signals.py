@@ -1,35 +1,42 @@
-from django.core.cache import cache
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
-from catalog.models import Brand, Category, Product, ProductImage, ProductReview, Tag
+from catalog.models import (
+    Brand, Category, Product, ProductImage, ProductReview, ProductReviewVote, SellerInventory, SellerOffer, Tag,
+)
+from core import tagged_cache
 
-
-def _invalidate(*keys: str):
-    cache.delete_many(list(keys))
+_KINDS = {Category: "category", Brand: "brand", Tag: "tag"}
 
 
 @receiver([post_save, post_delete], sender=Category)
-def _invalidate_categories_cache(**kwargs):
-    _invalidate(
-        "shopfront:header_categories:v1",
-        "shopfront:home:category_ids:v1:8",
-        "shopfront:catalog:categories:v1",
-    )
-
-
 @receiver([post_save, post_delete], sender=Brand)
-def _invalidate_brands_cache(**kwargs):
-    _invalidate("shopfront:catalog:brands:v1")
-
-
 @receiver([post_save, post_delete], sender=Tag)
-def _invalidate_tags_cache(**kwargs):
-    _invalidate("shopfront:catalog:tags:v1")
+def _invalidate_catalog_dimension(sender, instance, **kwargs):
+    tagged_cache.invalidate(*tagged_cache.object_tags(_KINDS[sender], instance.pk))
 
 
 @receiver([post_save, post_delete], sender=Product)
+def _invalidate_product(sender, instance, **kwargs):
+    # Any product row change can move it in (or out of) the default listing.
+    tagged_cache.invalidate(*tagged_cache.object_tags("product", instance.pk), tagged_cache.CATALOG_LISTING)
+
+
 @receiver([post_save, post_delete], sender=ProductImage)
 @receiver([post_save, post_delete], sender=ProductReview)
-def _invalidate_products_cache(**kwargs):
-    _invalidate("shopfront:home:product_ids:v1:12")
+@receiver([post_save, post_delete], sender=SellerOffer)
+def _invalidate_product_child(sender, instance, **kwargs):
+    # Images, ratings and the buy box are shown with the product but do not reorder listings.
+    tagged_cache.invalidate(*tagged_cache.object_tags("product", instance.product_id))
+
+
+@receiver([post_save, post_delete], sender=ProductReviewVote)
+@receiver([post_save, post_delete], sender=SellerInventory)
+def _invalidate_products(sender, **kwargs):
+    tagged_cache.invalidate(tagged_cache.tag("product"))
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def _invalidate_product_tags(sender, action, **kwargs):
+    if action.startswith("post_"):
+        tagged_cache.invalidate(tagged_cache.tag("product"), tagged_cache.tag("tag"))
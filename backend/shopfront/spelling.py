@@ -0,0 +1,206 @@
+"""Per-worker spelling-correction index over the whole catalog vocabulary.
+
+Words from brand, category, tag and product names go into a SymSpell-style
+symmetric-delete dictionary, so a misspelled word is corrected with a few dict
+lookups instead of comparing it against every candidate. When the catalog
+vocabulary version moves the index is rebuilt on a background thread and
+swapped in; requests keep using the previous index meanwhile.
+"""
+
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain
+from typing import Iterable
+
+from django.conf import settings
+from django.db import connection
+
+from catalog import versions
+from catalog.models import Brand, Category, Product, Tag
+
+log = logging.getLogger("shopfront")
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+# Deletes are generated from a word prefix only; full words are verified afterwards.
+PREFIX_LENGTH = 6
+MAX_DISTANCE = 2
+# Brand, category and tag names are canonical terms; prefer them over product-name words.
+REFERENCE_WEIGHT = 5
+
+
+def _words(text: str) -> list[str]:
+    return _WORD_RE.findall((text or "").casefold())
+
+
+def _deletes(word: str, distance: int) -> set[str]:
+    result = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {item[:i] + item[i + 1 :] for item in frontier for i in range(len(item))} - result
+        result |= frontier
+    return result
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance; returns `limit + 1` once it is exceeded."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev_prev: list[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(prev[j] + 1, current[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], prev_prev[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        prev_prev, prev = prev, current
+    return prev[-1]
+
+
+class SpellingIndex:
+    def __init__(self, reference_phrases: Iterable[str], product_names: Iterable[str], version: int = 0):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.frequencies: Counter = Counter()
+        displays: dict[str, str] = {}
+        for weight, phrases in ((REFERENCE_WEIGHT, reference_phrases), (1, product_names)):
+            for phrase in phrases:
+                display = " ".join(str(phrase or "").split())
+                if not display:
+                    continue
+                displays.setdefault(display.casefold(), display)
+                for word in _words(display):
+                    if len(word) > 1:
+                        self.frequencies[word] += weight
+        self._phrase_keys = sorted(displays)
+        self._phrase_displays = [displays[key] for key in self._phrase_keys]
+        self._deletes: dict[str, list[str]] = {}
+        for word in self.frequencies:
+            for variant in _deletes(word[:PREFIX_LENGTH], MAX_DISTANCE):
+                self._deletes.setdefault(variant, []).append(word)
+
+    def __len__(self) -> int:
+        return len(self.frequencies)
+
+    def correct_word(self, word: str) -> str | None:
+        """Closest known word (ties go to the more frequent one), or None if nothing is close."""
+        word = word.casefold()
+        if word in self.frequencies:
+            return word
+        max_distance = 1 if len(word) <= 4 else MAX_DISTANCE
+        candidates = set(
+            chain.from_iterable(self._deletes.get(variant, ()) for variant in _deletes(word[:PREFIX_LENGTH], max_distance))
+        )
+        best = None
+        best_key = None
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance)
+            if distance > max_distance:
+                continue
+            key = (distance, -self.frequencies[candidate], candidate)
+            if best_key is None or key < best_key:
+                best, best_key = candidate, key
+        return best
+
+    def complete_phrase(self, prefix: str, limit: int) -> list[str]:
+        key = prefix.casefold()
+        pos = bisect_left(self._phrase_keys, key)
+        result = []
+        while pos < len(self._phrase_keys) and len(result) < limit and self._phrase_keys[pos].startswith(key):
+            result.append(self._phrase_displays[pos])
+            pos += 1
+        return result
+
+    def suggest(self, query: str, limit: int = 5) -> list[str]:
+        words = _words(query)
+        if not words:
+            return []
+        corrected = []
+        for word in words:
+            replacement = self.correct_word(word) if len(word) > 2 else None
+            corrected.append(replacement or word)
+        phrase = " ".join(corrected)
+        suggestions = self.complete_phrase(phrase, limit)
+        if phrase != " ".join(words) and all(item.casefold() != phrase for item in suggestions):
+            suggestions.insert(0, phrase)
+        return [item for item in suggestions if item.casefold() != query.casefold()][:limit]
+
+
+def build_index(version: int = 0) -> SpellingIndex:
+    started = time.monotonic()
+    reference = chain(
+        Brand.objects.values_list("name", flat=True).iterator(),
+        Category.objects.values_list("name", flat=True).iterator(),
+        Tag.objects.values_list("name", flat=True).iterator(),
+    )
+    index = SpellingIndex(reference, Product.objects.values_list("name", flat=True).iterator(chunk_size=5000), version)
+    log.info(
+        "spelling_index_built",
+        extra={"version": version, "words": len(index), "elapsed_ms": round((time.monotonic() - started) * 1000, 1)},
+    )
+    return index
+
+
+_index: SpellingIndex | None = None
+_building = False
+_lock = threading.Lock()
+
+
+def _rebuild_interval() -> float:
+    return float(getattr(settings, "SEARCH_SPELLING_REBUILD_SECONDS", 60))
+
+
+def _rebuild_async() -> bool:
+    return bool(getattr(settings, "SEARCH_SPELLING_REBUILD_ASYNC", True))
+
+
+def _rebuild_in_background(version: int) -> None:
+    global _index, _building
+    try:
+        index = build_index(version)
+        with _lock:
+            _index = index
+    except Exception:
+        log.exception("spelling_index_build_failed", extra={"version": version})
+    finally:
+        with _lock:
+            _building = False
+        connection.close()
+
+
+def get_index() -> SpellingIndex:
+    """The worker's index; a vocabulary change starts a rebuild at most once per interval.
+
+    Only the first call in a worker builds inline. Later rebuilds run on a background
+    thread and the current index keeps answering until the new one is swapped in.
+    """
+    global _index, _building
+    version = versions.get_version(versions.VOCABULARY)
+    current = _index
+    if current is not None and (
+        current.version == version or time.monotonic() - current.built_at < _rebuild_interval()
+    ):
+        return current
+    with _lock:
+        if _index is None or (_index is current and not _rebuild_async()):
+            _index = build_index(version)
+            return _index
+        if _building or _index is not current:
+            return _index
+        _building = True
+        # A failed build is retried after another interval, not on every request.
+        current.built_at = time.monotonic()
+    threading.Thread(target=_rebuild_in_background, args=(version,), name="spelling-index", daemon=True).start()
+    return current
+
+
+def reset_index() -> None:
+    global _index
+    _index = None
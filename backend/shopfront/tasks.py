@@ -5,6 +5,9 @@ from django.conf import settings
 from users.models import UserProfile
 from core.notifications import apost_notify_json, is_telegram_recipient_quarantined, send_mail_message
 
+from . import search as sf_search
+from . import search_events
+
 log = logging.getLogger("shopfront")
 
 
@@ -105,3 +108,19 @@ def notify_contact_feedback(self, *, name: str, phone: str, message: str, source
         log.exception("contact_feedback_tg_send_failed", extra={"recipients": telegram_ids})
         raise
     log.info("contact_feedback_tg_sent", extra={"recipients": telegram_ids})
+
+
+@shared_task(ignore_result=True)
+def refresh_live_search_bundle(query: str, limit: int, country_limit: int):
+    sf_search.refresh_bundle(query, limit, country_limit)
+
+
+@shared_task(ignore_result=True)
+def aggregate_search_events():
+    try:
+        totals = search_events.aggregate()
+    except Exception:
+        log.exception("search_events_aggregate_failed")
+        return None
+    log.info("search_events_aggregated", extra=totals)
+    return totals
@@ -6,7 +6,6 @@ from catalog.models import (
     Product,
     Category,
     Brand,
-    Tag,
     ProductImage,
     ProductReview,
     ProductReviewComment,
@@ -14,8 +13,8 @@ from catalog.models import (
     Collection,
     SellerOffer,
 )
-from catalog.offer_service import active_offer_queryset, apply_offer_snapshot, resolve_product_offer
-from django.core.paginator import Paginator, EmptyPage
+from catalog.review_stats import rating_distribution
+from catalog.offer_service import with_buy_box
 from django.views import View
 from django.views.generic import TemplateView
 from django.utils.decorators import method_decorator
@@ -24,12 +23,10 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.decorators.csrf import ensure_csrf_cookie
 from django.middleware.csrf import get_token
-from django.core.cache import cache
 from django.contrib import messages
-from django.db.models import Avg, Count, Case, When, IntegerField, Value, FloatField, Prefetch
+from django.db.models import Count, Case, F, When, IntegerField, Prefetch, Sum
 from django.db.models import Q
 from django.db import transaction
-from django.db.models.functions import Coalesce
 from orders.models import Order, OrderItem, FakeAcquiringPayment, OrderApprovalLog
 from orders.payment_providers import get_payment_provider
 from commerce.models import LegalEntityMembership, DeliveryAddress, SellerStore, StoreReview
@@ -61,20 +58,25 @@ from .checkout_flow_service import (
     fake_payment_template_context,
 )
 from .catalog_selectors import (
+    cached_catalog_brand_options as _cached_catalog_brand_options,
+    cached_catalog_category_options as _cached_catalog_category_options,
     cached_catalog_default_page_ids as _cached_catalog_default_page_ids,
     cached_catalog_default_total_count as _cached_catalog_default_total_count,
+    cached_catalog_tag_options as _cached_catalog_tag_options,
     cached_home_category_ids as _cached_home_category_ids,
     cached_home_product_ids as _cached_home_product_ids,
-    catalog_price_stats as _catalog_price_stats,
     category_breadcrumbs as _category_breadcrumbs,
     category_descendant_ids as _category_descendant_ids,
+    category_subtree_q as _category_subtree_q,
     category_option_rows as _category_option_rows,
-    facet_option_counts as _facet_option_counts,
     ordered_products_with_related as _ordered_products_with_related,
-    seller_facet_counts as _seller_facet_counts,
-    with_rating as _with_rating,
 )
-from .search_service import get_search_provider, DatabaseSearchProvider, suggest_query_corrections
+from .search_service import get_search_provider, HybridSearchProvider, PostgresSearchProvider, suggest_query_corrections
+from . import rerank as search_rerank
+from . import catalog_search
+from . import catalog_counts
+from . import catalog_facets
+from . import catalog_cursor
 from .recommendations import (
     record_recent_view,
     recently_viewed_ids_for_user,
@@ -107,10 +109,12 @@ import logging
 import json
 from uuid import uuid4
 from django.utils import timezone
+from core import tagged_cache
 from core.logging_utils import log_calls
 from decimal import Decimal
 from . import search as sf_search
-from urllib.parse import urlencode
+from . import search_events
+from urllib.parse import parse_qs, urlencode, urlparse
 from django.urls import reverse
 from xml.sax.saxutils import escape
 from users.models import UserProfile
@@ -299,21 +303,6 @@ def _product_json_ld(request, product: Product, seller_store: SellerStore | None
     return data
 
 
-def _cache_get(key, default=None):
-    try:
-        return cache.get(key, default)
-    except Exception:
-        log.warning("cache_get_failed", extra={"cache_key": key}, exc_info=True)
-        return default
-
-
-def _cache_set(key, value, timeout):
-    try:
-        cache.set(key, value, timeout=timeout)
-    except Exception:
-        log.warning("cache_set_failed", extra={"cache_key": key}, exc_info=True)
-
-
 def _parse_decimal_filter(raw_value: str | None) -> Decimal | None:
     value = (raw_value or "").strip().replace(",", ".")
     if not value:
@@ -383,7 +372,7 @@ def _fake_payment_event_url(order: Order) -> str:
 def _tracking_item_from_product(product: Product, quantity: int = 1) -> dict:
     category_name = getattr(product.category, "name", "") or ""
     seller_store = getattr(getattr(product, "seller", None), "seller_store", None)
-    offer = getattr(product, "active_offer", None) or resolve_product_offer(product)
+    offer = getattr(product, "active_offer", None)
     seller_store = getattr(offer, "seller_store", None) or seller_store
     price = getattr(product, "display_price", None) or getattr(offer, "price", None) or product.price
     return {
@@ -399,7 +388,7 @@ def _tracking_item_from_product(product: Product, quantity: int = 1) -> dict:
 
 
 def _order_tracking_payload(order: Order) -> dict:
-    items = [_tracking_item_from_product(item.product, quantity=item.qty) for item in order.items.select_related("product", "product__brand", "product__category", "product__series", "product__seller", "product__seller__seller_store").all()]
+    items = [_tracking_item_from_product(item.product, quantity=item.qty) for item in order.items.select_related("product", "product__brand", "product__category", "product__series", "product__seller", "product__seller__seller_store", "product__winning_offer__seller_store").all()]
     return {
         "event": "purchase",
         "seller_count": order.seller_splits.count(),
@@ -478,7 +467,7 @@ def _payment_tracking_payload(event_name: str, order: Order, payment: FakeAcquir
             "value": float(order.total),
             "items": [
                 _tracking_item_from_product(item.product, quantity=item.qty)
-                for item in order.items.select_related("product", "product__brand", "product__category", "product__series", "product__seller", "product__seller__seller_store").all()
+                for item in order.items.select_related("product", "product__brand", "product__category", "product__series", "product__seller", "product__seller__seller_store", "product__winning_offer__seller_store").all()
             ],
         },
     }
@@ -499,6 +488,17 @@ def _record_recently_viewed(request, product: Product, limit: int = 12) -> None:
     record_recent_view(request.user, product, limit=max(limit, 24))
 
 
+def _search_query_from_referer(request) -> str:
+    """The search a cart add came from: a searched catalog page or a product opened from results."""
+    referer = urlparse(request.META.get("HTTP_REFERER", ""))
+    params = parse_qs(referer.query)
+    if referer.path.startswith("/product/"):
+        return (params.get("sq") or [""])[0]
+    if referer.path.rstrip("/") == "/catalog":
+        return (params.get("q") or [""])[0]
+    return ""
+
+
 def _recently_viewed_products(request, exclude_product_id: int | None = None, limit: int = 8):
     ids = [int(pid) for pid in request.session.get("recently_viewed_products", []) if str(pid).isdigit()]
     if request.user.is_authenticated:
@@ -506,44 +506,42 @@ def _recently_viewed_products(request, exclude_product_id: int | None = None, li
         ids = ids + [pid for pid in persistent_ids if pid not in ids]
     if exclude_product_id is not None:
         ids = [pid for pid in ids if pid != exclude_product_id]
-    return _ordered_products_with_related(ids[:limit], include_rating=True)
+    return _ordered_products_with_related(ids[:limit])
 
 
 def _seller_rating_summary(seller_id: int | None) -> dict:
     if not seller_id:
         return {"rating_avg": 0, "rating_count": 0}
-    agg = ProductReview.objects.filter(product__seller_id=seller_id).aggregate(
-        rating_avg=Coalesce(Avg("rating"), Value(0.0), output_field=FloatField()),
-        rating_count=Count("id"),
-    )
+    row = SellerStore.objects.filter(owner_id=seller_id).values("product_rating_avg", "product_rating_count").first()
+    if row is None:
+        # Sellers without a store: combine the stored per-product totals.
+        row = Product.objects.filter(seller_id=seller_id, rating_count__gt=0).aggregate(
+            product_rating_count=Sum("rating_count"),
+            stars=Sum(F("rating_avg") * F("rating_count")),
+        )
+        count = row["product_rating_count"] or 0
+        row["product_rating_avg"] = (row["stars"] or 0) / count if count else 0
     return {
-        "rating_avg": agg["rating_avg"] or 0,
-        "rating_count": agg["rating_count"] or 0,
+        "rating_avg": row["product_rating_avg"] or 0,
+        "rating_count": row["product_rating_count"] or 0,
     }
 
 
 def _store_rating_summary(store: SellerStore | None) -> dict:
     if store is None:
         return {"rating_avg": 0, "rating_count": 0}
-    agg = StoreReview.objects.filter(store=store).aggregate(
-        rating_avg=Coalesce(Avg("rating"), Value(0.0), output_field=FloatField()),
-        rating_count=Count("id"),
-    )
-    return {
-        "rating_avg": agg["rating_avg"] or 0,
-        "rating_count": agg["rating_count"] or 0,
-    }
+    return {"rating_avg": store.rating_avg, "rating_count": store.rating_count}
 
 
 def _store_reviews_context(store: SellerStore, user):
     reviews_qs = store.reviews.select_related("user", "user__profile")
-    agg = reviews_qs.aggregate(avg=Avg("rating"), count=Count("id"))
     user_review = reviews_qs.filter(user=user).first() if getattr(user, "is_authenticated", False) else None
     return {
         "store": store,
         "store_reviews": reviews_qs[:20],
-        "store_rating_avg": agg["avg"] or 0,
-        "store_rating_count": agg["count"] or 0,
+        "store_rating_avg": store.rating_avg,
+        "store_rating_count": store.rating_count,
+        "store_rating_distribution": rating_distribution(store.rating_histogram),
         "store_user_review": user_review,
     }
 
@@ -808,9 +806,9 @@ class HomeView(TemplateView):
             )
             .order_by("-products_count", "name")
         )
-        ctx["recommended_for_you"] = _ordered_products_with_related(personalized["for_you"], include_rating=True)
-        ctx["home_recently_viewed"] = _ordered_products_with_related(personalized["based_on_lists"], include_rating=True)
-        ctx["watchlist_products"] = _ordered_products_with_related(personalized["brand_watch"], include_rating=True)
+        ctx["recommended_for_you"] = _ordered_products_with_related(personalized["for_you"])
+        ctx["home_recently_viewed"] = _ordered_products_with_related(personalized["based_on_lists"])
+        ctx["watchlist_products"] = _ordered_products_with_related(personalized["brand_watch"])
         ctx["recommended_for_you_tracking_payload"] = _recommendation_impression_payload("home_for_you", ctx["recommended_for_you"])
         ctx["home_recently_viewed_tracking_payload"] = _recommendation_impression_payload("home_recently_viewed", ctx["home_recently_viewed"])
         ctx["watchlist_products_tracking_payload"] = _recommendation_impression_payload("home_watchlist", ctx["watchlist_products"])
@@ -1071,7 +1069,7 @@ class BrandDetailPageView(TemplateView):
             Product.objects.filter(brand=brand).order_by("-is_new", "name").values_list("id", flat=True)[:60]
         )
         ctx["brand"] = brand
-        ctx["products"] = _ordered_products_with_related(product_ids, include_rating=True)
+        ctx["products"] = _ordered_products_with_related(product_ids)
         ctx["child_categories"] = list(
             Category.objects.filter(products__brand=brand).distinct().order_by("name")[:8]
         )
@@ -1112,7 +1110,7 @@ class CategoryDetailPageView(TemplateView):
             Product.objects.filter(category_id__in=category_ids).order_by("-is_new", "name").values_list("id", flat=True)[:80]
         )
         ctx["category"] = category
-        ctx["products"] = _ordered_products_with_related(product_ids, include_rating=True)
+        ctx["products"] = _ordered_products_with_related(product_ids)
         ctx["breadcrumbs"] = _category_breadcrumbs(category)
         ctx["child_categories"] = list(category.children.order_by("name")[:12])
         ctx["featured_brands"] = list(
@@ -1165,7 +1163,7 @@ class CollectionDetailPageView(TemplateView):
         collection = get_object_or_404(Collection.objects.filter(is_active=True), slug=kwargs["collection_slug"])
         product_ids = list(collection.items.order_by("ordering", "id").values_list("product_id", flat=True)[:80])
         ctx["collection"] = collection
-        ctx["products"] = _ordered_products_with_related(product_ids, include_rating=True)
+        ctx["products"] = _ordered_products_with_related(product_ids)
         ctx["related_collections"] = list(
             Collection.objects.filter(is_active=True, is_featured=True).exclude(id=collection.id).order_by("-updated_at", "name")[:3]
         )
@@ -1194,7 +1192,7 @@ class PromotionsPageView(TemplateView):
         product_ids = list(
             Product.objects.filter(is_promo=True).order_by("-is_new", "name").values_list("id", flat=True)[:40]
         )
-        ctx["products"] = _ordered_products_with_related(product_ids, include_rating=True)
+        ctx["products"] = _ordered_products_with_related(product_ids)
         ctx.update(
             _seo_context(
                 self.request,
@@ -1341,7 +1339,7 @@ class ComparePageView(TemplateView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        products = _ordered_products_with_related(_compare_ids(self.request), include_rating=True)
+        products = _ordered_products_with_related(_compare_ids(self.request))
         ctx["products"] = products
         ctx["compare_rows"] = _compare_fields(products)
         ctx.update(
@@ -1371,7 +1369,7 @@ class FavoritesPageView(LoginRequiredMixin, TemplateView):
             .order_by("-created_at")
             .values_list("product_id", flat=True)[:300]
         )
-        ctx["products"] = _ordered_products_with_related(product_ids, include_rating=True)
+        ctx["products"] = _ordered_products_with_related(product_ids)
         ctx["category_subscriptions"] = (
             CategorySubscription.objects.select_related("category")
             .filter(user=self.request.user)
@@ -1493,7 +1491,7 @@ class SavedListDetailView(LoginRequiredMixin, TemplateView):
         saved_list = self._get_list()
         product_ids = list(saved_list.items.values_list("product_id", flat=True))
         ctx["saved_list"] = saved_list
-        ctx["products"] = _ordered_products_with_related(product_ids, include_rating=True)
+        ctx["products"] = _ordered_products_with_related(product_ids)
         ctx["share_url"] = _absolute_url(self.request, reverse("saved_list_shared", kwargs={"share_token": saved_list.share_token}))
         ctx.update(
             _seo_context(
@@ -1524,7 +1522,6 @@ class SharedSavedListView(TemplateView):
         ctx["saved_list"] = saved_list
         ctx["products"] = _ordered_products_with_related(
             list(saved_list.items.values_list("product_id", flat=True)),
-            include_rating=True,
         )
         ctx.update(
             _seo_context(
@@ -1595,9 +1592,47 @@ class SavedSearchesPageView(LoginRequiredMixin, TemplateView):
 
 @method_decorator(ensure_csrf_cookie, name="dispatch")
 class CatalogView(View):
+    DEFAULT_HTML_KEY = "shopfront:catalog:html:v3:default"
+    DEFAULT_HTML_TAGS = (
+        tagged_cache.CATALOG_LISTING,
+        tagged_cache.tag("product"),
+        tagged_cache.tag("brand"),
+        tagged_cache.tag("category"),
+        tagged_cache.tag("tag"),
+    )
+    FILTER_PARAMS = (
+        "brand", "category", "seller", "series", "q", "tag", "tag_slug", "availability", "delivery_eta",
+        "min_price", "max_price",
+    )
+
     @log_calls(log)
     def get(self, request):
         get_token(request)
+        if self._is_cacheable_default(request):
+            # Anonymous visitors share one rendering of the first default page; one worker rebuilds it at a time.
+            html = tagged_cache.get_or_compute(
+                self.DEFAULT_HTML_KEY,
+                self.DEFAULT_HTML_TAGS,
+                lambda: self._render(request).content.decode(),
+                timeout=getattr(settings, "CACHE_TTL_CATALOG_HTML", 20),
+            )
+            return HttpResponse(html)
+        return self._render(request)
+
+    def _is_cacheable_default(self, request) -> bool:
+        params = request.GET
+        if any((params.get(name) or "").strip() for name in self.FILTER_PARAMS):
+            return False
+        if (params.get("sort") or "").strip() not in ("", "new") or (params.get("page") or "1") != "1":
+            return False
+        return (
+            not request.user.is_authenticated
+            and not request.headers.get("HX-Request")
+            and not (request.session.get("cart") or {})
+            and not (request.session.get(COMPARE_SESSION_KEY) or [])
+        )
+
+    def _render(self, request):
         qs = Product.objects.all()
         brand = request.GET.get("brand")
         category = request.GET.get("category")
@@ -1617,6 +1652,9 @@ class CatalogView(View):
         if page < 1:
             page = 1
         page_size = 16
+        grid_append = bool(request.headers.get("HX-Request")) and request.GET.get("fragment") == "grid_append"
+        # Cursors only drive the infinite-scroll fragment; full pages keep numbered pagination.
+        cursor_token = (request.GET.get("cursor") or "").strip() if grid_append else ""
         selected_category_obj = None
         selected_seller_store = None
         selected_series_obj = None
@@ -1639,119 +1677,189 @@ class CatalogView(View):
             else:
                 selected_category_obj = Category.objects.select_related("parent").filter(slug=category).first()
             if selected_category_obj:
-                qs = qs.filter(category_id__in=_category_descendant_ids(selected_category_obj))
+                qs = qs.filter(_category_subtree_q(selected_category_obj))
             else:
                 qs = qs.none()
+        if tag:
+            if tag.isdigit():
+                qs = qs.filter(tags__id=int(tag))
+            else:
+                qs = qs.filter(tags__slug=tag)
+        seller_owner_id = None
+        if seller:
+            if str(seller).isdigit():
+                seller_owner_id = int(seller)
+                selected_seller_store = SellerStore.objects.filter(owner_id=int(seller)).only("name", "slug", "owner_id").first()
+            else:
+                selected_seller_store = SellerStore.objects.filter(slug=seller).only("name", "slug", "owner_id").first()
+                if selected_seller_store:
+                    seller_owner_id = selected_seller_store.owner_id
+                else:
+                    qs = qs.none()
+            if seller_owner_id is not None:
+                qs = qs.filter(
+                    Q(seller_id=seller_owner_id)
+                    | Q(seller_offers__seller_id=seller_owner_id, seller_offers__status=SellerOffer.Status.ACTIVE)
+                )
+        default_catalog = not any([brand, category, seller, series, q, tag, availability, delivery_eta, min_price, max_price]) and (not sort or sort == "new")
+        es_page = None
+        # A cursor was issued by the database path, so its follow-up pages stay there.
+        if not default_catalog and not cursor_token and not qs.query.is_empty():
+            try:
+                es_page = catalog_search.search_catalog(
+                    catalog_search.CatalogFilters(
+                        q=q,
+                        category_ids=_category_descendant_ids(selected_category_obj),
+                        brand_id=int(brand) if brand else None,
+                        series_id=selected_series_obj.id if selected_series_obj else None,
+                        tag_id=int(tag) if tag and tag.isdigit() else None,
+                        tag_slug=tag if tag and not tag.isdigit() else "",
+                        seller_id=seller_owner_id,
+                        in_stock=availability == "in_stock",
+                        delivery_eta=delivery_eta,
+                        min_price=min_price,
+                        max_price=max_price,
+                    ),
+                    sort=sort,
+                    page=page,
+                    page_size=page_size,
+                )
+            except sf_search.ESSearchUnavailable:
+                es_page = None
         es_ranked_ids = []
         search_suggestions: list[str] = []
-        if q:
+        if es_page is not None:
+            search_suggestions = es_page.suggestions
+            if q and not search_suggestions:
+                search_suggestions = suggest_query_corrections(q, limit=6)
+        elif q:
             max_hits = int(getattr(settings, "ES_CATALOG_MAX_HITS", 2000))
             try:
                 bundle = get_search_provider().live_bundle(query=q, limit=max_hits, country_limit=0)
                 es_ranked_ids = bundle.product_ids
                 search_suggestions = bundle.suggestions[:8]
             except sf_search.ESSearchUnavailable:
-                fallback_bundle = DatabaseSearchProvider().live_bundle(query=q, limit=max_hits, country_limit=0)
-                es_ranked_ids = fallback_bundle.product_ids
-                search_suggestions = fallback_bundle.suggestions[:8]
+                bundle = PostgresSearchProvider().live_bundle(query=q, limit=max_hits, country_limit=0)
+                es_ranked_ids = bundle.product_ids
+                search_suggestions = bundle.suggestions[:8]
+            if bundle.provider != HybridSearchProvider.code and getattr(settings, "SEARCH_RERANK_ENABLED", True):
+                es_ranked_ids = search_rerank.rerank(es_ranked_ids, q, rewritten=bundle.rewritten_query)
             if not search_suggestions:
                 search_suggestions = suggest_query_corrections(q, limit=6)
             if not es_ranked_ids:
                 qs = qs.none()
             else:
                 qs = qs.filter(id__in=es_ranked_ids)
-        if tag:
-            if tag.isdigit():
-                qs = qs.filter(tags__id=int(tag))
-            else:
-                qs = qs.filter(tags__slug=tag)
-        if seller:
-            if str(seller).isdigit():
-                qs = qs.filter(Q(seller_id=int(seller)) | Q(seller_offers__seller_id=int(seller), seller_offers__status=SellerOffer.Status.ACTIVE))
-                selected_seller_store = SellerStore.objects.filter(owner_id=int(seller)).only("name", "slug", "owner_id").first()
-            else:
-                selected_seller_store = SellerStore.objects.filter(slug=seller).only("name", "slug", "owner_id").first()
-                if selected_seller_store:
-                    qs = qs.filter(
-                        Q(seller_id=selected_seller_store.owner_id)
-                        | Q(seller_offers__seller_id=selected_seller_store.owner_id, seller_offers__status=SellerOffer.Status.ACTIVE)
-                    )
-                else:
-                    qs = qs.none()
+        # Stock, delivery and price filters read the stored buy box: plain columns on the product row.
         if availability == "in_stock":
-            qs = qs.filter(
-                Q(stock_qty__gt=0)
-                | Q(seller_offers__status=SellerOffer.Status.ACTIVE, seller_offers__inventories__stock_qty__gt=0)
-            )
+            qs = qs.filter(effective_stock_qty__gt=0)
         if delivery_eta == "fast":
-            qs = qs.filter(Q(lead_time_days__lte=2) | Q(seller_offers__status=SellerOffer.Status.ACTIVE, seller_offers__lead_time_days__lte=2))
+            qs = qs.filter(effective_lead_time_days__lte=2)
         elif delivery_eta == "week":
-            qs = qs.filter(
-                Q(lead_time_days__gt=2, lead_time_days__lte=7)
-                | Q(seller_offers__status=SellerOffer.Status.ACTIVE, seller_offers__lead_time_days__gt=2, seller_offers__lead_time_days__lte=7)
-            )
+            qs = qs.filter(effective_lead_time_days__gt=2, effective_lead_time_days__lte=7)
         elif delivery_eta == "planned":
-            qs = qs.filter(Q(lead_time_days__gt=7) | Q(seller_offers__status=SellerOffer.Status.ACTIVE, seller_offers__lead_time_days__gt=7))
+            qs = qs.filter(effective_lead_time_days__gt=7)
         if min_price is not None:
-            qs = qs.filter(Q(price__gte=min_price) | Q(seller_offers__status=SellerOffer.Status.ACTIVE, seller_offers__price__gte=min_price))
+            qs = qs.filter(effective_price__gte=min_price)
         if max_price is not None:
-            qs = qs.filter(Q(price__lte=max_price) | Q(seller_offers__status=SellerOffer.Status.ACTIVE, seller_offers__price__lte=max_price))
-        qs = qs.distinct()
+            qs = qs.filter(effective_price__lte=max_price)
+        if seller_owner_id is not None:
+            # Only the seller filter joins offers and can repeat a product.
+            qs = qs.distinct()
         facet_seed_qs = qs
+        facet_filters = {
+            "q": q, "brand": brand, "category": getattr(selected_category_obj, "id", category),
+            "series": series, "tag": tag, "seller": seller_owner_id, "availability": availability,
+            "delivery_eta": delivery_eta, "min_price": min_price, "max_price": max_price,
+        }
+        facets = None
+
+        def load_facets():
+            return catalog_facets.catalog_facets(
+                facet_seed_qs,
+                facet_filters,
+                exclude_brand_id=int(brand) if brand and str(brand).isdigit() else None,
+                exclude_seller_id=int(seller) if seller and str(seller).isdigit() else None,
+                limit=10,
+            )
         sort_map = {
             "new": ["-is_new", "name", "id"],
-            "price_asc": ["price", "name", "id"],
-            "price_desc": ["-price", "name", "id"],
+            "price_asc": ["effective_price", "name", "id"],
+            "price_desc": ["-effective_price", "name", "id"],
             "name": ["name", "id"],
             "promo": ["-is_promo", "name", "id"],
             "rating_desc": ["-rating_avg", "-rating_count", "name", "id"],
         }
-        include_rating = bool(getattr(settings, "ENABLE_CATALOG_RATING", settings.DEBUG))
-        default_catalog = not any([brand, category, seller, series, q, tag, availability, delivery_eta, min_price, max_price]) and (not sort or sort == "new")
-        cacheable_default_catalog = (
-            default_catalog
-            and page == 1
-            and not request.user.is_authenticated
-            and not request.headers.get("HX-Request")
-            and not (request.session.get("cart") or {})
-            and not (request.session.get(COMPARE_SESSION_KEY) or [])
-        )
-        if cacheable_default_catalog:
-            cached_html = _cache_get("shopfront:catalog:html:v1:default")
-            if cached_html:
-                return HttpResponse(cached_html)
-        if sort == "rating_desc":
-            qs = _with_rating(qs).order_by(*sort_map["rating_desc"])
-        elif q and es_ranked_ids and not sort:
-            rank_order = Case(
+        if q and es_ranked_ids and not sort:
+            sort_code = "relevance"
+            qs = qs.annotate(search_rank=Case(
                 *[When(id=pid, then=pos) for pos, pid in enumerate(es_ranked_ids)],
                 default=len(es_ranked_ids),
                 output_field=IntegerField(),
-            )
-            qs = qs.order_by(rank_order)
+            ))
         else:
-            qs = qs.order_by(*sort_map.get(sort, ["-is_new", "name", "id"]))
-        if default_catalog:
+            sort_code = sort if sort in sort_map else "new"
+        order_terms = ["search_rank", "id"] if sort_code == "relevance" else sort_map[sort_code]
+        qs = qs.order_by(*order_terms)
+        next_cursor = ""
+        total_count_label = ""
+        if cursor_token:
+            # Keyset page: no COUNT, no OFFSET; the cost does not grow with scroll depth.
+            after = catalog_cursor.decode(cursor_token, sort_code, order_terms)
+            key_rows, has_next = catalog_cursor.page_after(qs, order_terms, after, page_size)
+            page_ids = [row[-1] for row in key_rows]
+            products_page = _ordered_products_with_related(page_ids)
+            total_count = None
+            current_page = page
+            next_page = page + 1 if has_next else None
+            if has_next:
+                next_cursor = catalog_cursor.encode(sort_code, key_rows[-1])
+        elif default_catalog:
             total_count = _cached_catalog_default_total_count()
             num_pages = max(1, (total_count + page_size - 1) // page_size)
             safe_page = min(page, num_pages)
             page_ids = _cached_catalog_default_page_ids(page=safe_page, page_size=page_size)
-            products_page = _ordered_products_with_related(page_ids, include_rating=include_rating)
+            products_page = _ordered_products_with_related(page_ids)
             has_next = safe_page < num_pages
             next_page = safe_page + 1 if has_next else None
             current_page = safe_page
+            if has_next and page_ids:
+                last_key = qs.filter(id=page_ids[-1]).values_list(*catalog_cursor.key_fields(order_terms)).first()
+                if last_key:
+                    next_cursor = catalog_cursor.encode(sort_code, last_key)
+        elif es_page is not None:
+            page_ids = es_page.product_ids
+            products_page = _ordered_products_with_related(page_ids)
+            total_count = es_page.total_count
+            has_next = es_page.has_next
+            next_page = es_page.page + 1 if has_next else None
+            current_page = es_page.page
         else:
-            paginator = Paginator(qs.values_list("id", flat=True), page_size)
-            try:
-                page_obj = paginator.page(page)
-            except EmptyPage:
-                page_obj = paginator.page(paginator.num_pages or 1)
-            page_ids = list(page_obj.object_list)
-            products_page = _ordered_products_with_related(page_ids, include_rating=include_rating)
-            total_count = paginator.count
-            has_next = page_obj.has_next()
-            next_page = page_obj.next_page_number() if page_obj.has_next() else None
-            current_page = page_obj.number
+            if grid_append:
+                counted = catalog_counts.count_products(qs, filters=facet_filters)
+            else:
+                # The facet query reads every match anyway, so the full page takes its exact total.
+                facets = load_facets()
+                counted = catalog_counts.CatalogCount(facets.total)
+            total_count = counted.value
+            total_count_label = counted.label
+            key_qs = qs.values_list(*catalog_cursor.key_fields(order_terms))
+            key_rows = list(key_qs[(page - 1) * page_size : page * page_size + 1])
+            if not key_rows and page > 1:
+                # Past the end (a stale link): show the last page, as numbered pagination did.
+                matches = total_count if counted.exact else qs.count()
+                page = max(1, (matches + page_size - 1) // page_size)
+                key_rows = list(key_qs[(page - 1) * page_size : page * page_size + 1])
+            has_next = len(key_rows) > page_size
+            key_rows = key_rows[:page_size]
+            page_ids = [row[-1] for row in key_rows]
+            products_page = _ordered_products_with_related(page_ids)
+            next_page = page + 1 if has_next else None
+            current_page = page
+            if has_next:
+                next_cursor = catalog_cursor.encode(sort_code, key_rows[-1])
+        if q and page_ids:
+            search_events.record(search_events.IMPRESSION, q, page_ids)
         base_params = {}
         if q:
             base_params["q"] = q
@@ -1765,57 +1873,46 @@ class CatalogView(View):
             base_params["series"] = series
         if tag:
             base_params["tag"] = tag
+        if availability:
+            base_params["availability"] = availability
         if delivery_eta:
             base_params["delivery_eta"] = delivery_eta
+        if min_price is not None:
+            base_params["min_price"] = str(min_price)
+        if max_price is not None:
+            base_params["max_price"] = str(max_price)
         if sort:
             base_params["sort"] = sort
         querystring_base = urlencode(base_params)
         category_reset_params = {k: v for k, v in base_params.items() if k != "category"}
         category_reset_querystring = urlencode(category_reset_params)
         category_reset_url = f"/catalog/?{category_reset_querystring}" if category_reset_querystring else "/catalog/"
-        if request.headers.get("HX-Request") and request.GET.get("fragment") == "grid_append":
+        if grid_append:
             return render(request, "shopfront/partials/catalog_grid_append.html", {
                 "products": products_page,
                 "has_next": has_next,
                 "next_page": next_page,
+                "next_cursor": next_cursor,
                 "querystring_base": querystring_base,
+                "q": q,
             })
-        brands = _cache_get("shopfront:catalog:brands:v1")
-        if brands is None:
-            brands = list(Brand.objects.only("id", "name").order_by("name"))
-            _cache_set("shopfront:catalog:brands:v1", brands, timeout=getattr(settings, "CACHE_TTL_CATALOG_FILTERS", 900))
-        cats = _cache_get("shopfront:catalog:categories:v1")
-        if cats is None:
-            cats = list(
-                Category.objects.select_related("parent")
-                .exclude(name__startswith="HoReCa направление")
-                .only("id", "name", "slug", "parent_id")
-                .order_by("parent_id", "name", "id")
-            )
-            _cache_set("shopfront:catalog:categories:v1", cats, timeout=getattr(settings, "CACHE_TTL_CATALOG_FILTERS", 900))
+        brands = _cached_catalog_brand_options()
+        cats = _cached_catalog_category_options()
         category_rows = _category_option_rows(cats)
-        tags = _cache_get("shopfront:catalog:tags:v1")
-        if tags is None:
-            tags = list(Tag.objects.only("id", "name", "slug").order_by("name")[:50])
-            _cache_set("shopfront:catalog:tags:v1", tags, timeout=getattr(settings, "CACHE_TTL_CATALOG_FILTERS", 900))
+        tags = _cached_catalog_tag_options()
         brand_id = int(brand) if brand and str(brand).isdigit() else None
         sel_brand = next((b for b in brands if brand_id is not None and b.id == brand_id), None)
-        if category:
-            sel_category = selected_category_obj or (next((c for c in cats if str(category).isdigit() and c.id == int(category)), None) if str(category).isdigit() else next((c for c in cats if c.slug == category), None))
-        else:
-            sel_category = None
+        sel_category = selected_category_obj
         selected_category_children = [item for item in cats if sel_category and item.parent_id == sel_category.id][:8]
-        facet_brand_options = _facet_option_counts(
-            facet_seed_qs.exclude(brand_id=int(brand)) if brand and str(brand).isdigit() else facet_seed_qs,
-            "brand",
-            label_field="name",
-            limit=10,
-        )
-        facet_seller_options = _seller_facet_counts(
-            facet_seed_qs.exclude(seller_id=int(seller)) if seller and str(seller).isdigit() else facet_seed_qs,
-            limit=10,
-        )
-        facet_price_stats = _catalog_price_stats(facet_seed_qs)
+        if es_page is not None:
+            facet_brand_options = es_page.brand_options
+            facet_seller_options = es_page.seller_options
+            facet_price_stats = {"min_price": es_page.min_price, "max_price": es_page.max_price}
+        else:
+            facets = facets or load_facets()
+            facet_brand_options = facets.brands
+            facet_seller_options = facets.sellers
+            facet_price_stats = facets.price_stats
         fallback_product_ids = []
         if total_count == 0:
             fallback_product_ids = list(
@@ -1856,8 +1953,10 @@ class CatalogView(View):
             "series": series,
             "has_next": has_next,
             "next_page": next_page,
+            "next_cursor": next_cursor,
             "querystring_base": querystring_base,
             "total_count": total_count,
+            "total_count_label": total_count_label or str(total_count),
             "page": current_page,
             "page_size": page_size,
             "sel_brand": sel_brand,
@@ -1870,7 +1969,8 @@ class CatalogView(View):
             "facet_seller_options": facet_seller_options,
             "facet_price_min": facet_price_stats.get("min_price"),
             "facet_price_max": facet_price_stats.get("max_price"),
-            "zero_results_products": _ordered_products_with_related(fallback_product_ids, include_rating=True),
+            "facet_price_histogram": facets.price_histogram if facets else [],
+            "zero_results_products": _ordered_products_with_related(fallback_product_ids),
             "category_breadcrumbs": _category_breadcrumbs(sel_category),
             "category_reset_url": category_reset_url,
             "catalog_tracking_payload": json.dumps(
@@ -1908,10 +2008,6 @@ class CatalogView(View):
                 robots=seo_robots,
             ),
         }
-        if cacheable_default_catalog:
-            html = render_to_string("shopfront/catalog.html", context, request=request)
-            _cache_set("shopfront:catalog:html:v1:default", html, timeout=20)
-            return HttpResponse(html)
         return render(request, "shopfront/catalog.html", context)
 
 
@@ -1936,14 +2032,14 @@ class ProductDetailView(TemplateView):
         ctx = super().get_context_data(**kwargs)
         slug = kwargs.get("slug")
         p = get_object_or_404(
-            Product.objects.select_related(
+            with_buy_box(Product.objects.select_related(
                 "brand",
                 "series",
                 "category",
                 "category__parent",
                 "seller",
                 "seller__seller_store",
-            ).prefetch_related(
+            )).prefetch_related(
                 Prefetch(
                     "images",
                     queryset=ProductImage.objects.only("id", "product_id", "url", "alt", "ordering").order_by("ordering", "id"),
@@ -1952,12 +2048,12 @@ class ProductDetailView(TemplateView):
                 "tags",
                 "documents",
                 "collections",
-                Prefetch("seller_offers", queryset=active_offer_queryset()),
             ),
             slug=slug,
         )
-        apply_offer_snapshot([p])
         _record_recently_viewed(self.request, p)
+        if self.request.GET.get("sq"):
+            search_events.record(search_events.CLICK, self.request.GET["sq"], [p.id])
         ctx.update(build_reviews_context(p, self.request.user, seller_rating_summary=_seller_rating_summary))
         seller_store = getattr(getattr(p, "active_offer", None), "seller_store", None) or (getattr(p.seller, "seller_store", None) if p.seller_id else None)
         seller_summary = _seller_rating_summary(getattr(p, "seller_id", None))
@@ -2001,7 +2097,7 @@ class ProductDetailView(TemplateView):
                 .values_list("id", flat=True)[: 12 - len(similar_ids)]
             )
             similar_ids.extend(more_ids)
-        ctx["similar_products"] = _ordered_products_with_related(similar_ids[:12], include_rating=True)
+        ctx["similar_products"] = _ordered_products_with_related(similar_ids[:12])
         accessory_ids: list[int] = []
         if p.seller_id:
             accessory_ids.extend(
@@ -2022,15 +2118,13 @@ class ProductDetailView(TemplateView):
                     .values_list("id", flat=True)[: 8 - len(accessory_ids)]
                 )
             )
-        ctx["accessory_products"] = _ordered_products_with_related(accessory_ids[:8], include_rating=True)
+        ctx["accessory_products"] = _ordered_products_with_related(accessory_ids[:8])
         ctx["recently_viewed_products"] = _recently_viewed_products(self.request, exclude_product_id=p.id, limit=8)
         ctx["frequently_bought_together_products"] = _ordered_products_with_related(
             frequently_bought_together_ids(p, limit=8),
-            include_rating=True,
         )
         ctx["seller_cross_sell_products"] = _ordered_products_with_related(
             seller_cross_sell_ids(p, limit=8),
-            include_rating=True,
         )
         ctx["frequently_bought_together_tracking_payload"] = _recommendation_impression_payload(
             "product_frequently_bought_together",
@@ -2098,7 +2192,7 @@ class SellerStoreDetailView(TemplateView):
         product_ids = list(
             Product.objects.filter(seller=store.owner).order_by("-is_new", "name").values_list("id", flat=True)[:60]
         )
-        products = _ordered_products_with_related(product_ids, include_rating=True)
+        products = _ordered_products_with_related(product_ids)
         ctx.update({"store": store, "products": products, "store_rating": _store_rating_summary(store)})
         ctx.update(_store_reviews_context(store, self.request.user))
         ctx.update(
@@ -2397,6 +2491,9 @@ class CartAddView(View):
             log.warning("cart_add_product_not_found", extra={"product_id": pid})
             return JsonResponse({"ok": False, "error": "product_not_found"}, status=404)
         log.info("cart_add", extra={"product_id": pid, "qty": qty})
+        search_query = _search_query_from_referer(request)
+        if search_query:
+            search_events.record(search_events.CART, search_query, [pid])
         triggers = json.dumps({
             "showToast": {"message": "Товар добавлен в корзину", "variant": "success"},
             "cartChanged": {},
@@ -2450,7 +2547,7 @@ class CartPageView(TemplateView):
             .order_by("-is_promo", "-is_new", "name")
             .values_list("id", flat=True)[:8]
         )
-        ctx["cart_recommendations"] = _ordered_products_with_related(cross_sell_ids, include_rating=True)
+        ctx["cart_recommendations"] = _ordered_products_with_related(cross_sell_ids)
         ctx["cart_recommendations_tracking_payload"] = _recommendation_impression_payload("cart_cross_sell", ctx["cart_recommendations"])
         ctx.update(
             _seo_context(
@@ -2538,7 +2635,7 @@ class CheckoutPageView(TemplateView):
             .order_by("-is_promo", "-is_new", "name")
             .values_list("id", flat=True)[:6]
         )
-        ctx["checkout_recommendations"] = _ordered_products_with_related(checkout_reco_ids, include_rating=True)
+        ctx["checkout_recommendations"] = _ordered_products_with_related(checkout_reco_ids)
         ctx["checkout_recommendations_tracking_payload"] = _recommendation_impression_payload(
             "checkout_cross_sell",
             ctx["checkout_recommendations"],
@@ -2602,11 +2699,9 @@ class CheckoutSubmitView(View):
                 continue
         products = {
             p.id: p
-            for p in Product.objects.select_related("brand", "category", "series", "seller", "seller__seller_store")
-            .prefetch_related(Prefetch("seller_offers", queryset=active_offer_queryset()))
+            for p in with_buy_box(Product.objects.select_related("brand", "category", "series", "seller", "seller__seller_store"))
             .filter(id__in=ids)
         }
-        apply_offer_snapshot(products.values())
         if not products:
             return fail("Товары не найдены")
         checkout_lines = []
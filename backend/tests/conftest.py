@@ -27,6 +27,63 @@ def _env_settings(settings):
     yield
 
 
+@pytest.fixture(autouse=True)
+def _reset_es_breaker():
+    # Tests without a reachable ES must not trip the shared breaker for later tests.
+    from django.core.cache import cache
+
+    from catalog import es_breaker
+
+    yield
+    cache.delete_many([es_breaker.FAILURES_KEY, es_breaker.OPEN_KEY, es_breaker.HALF_OPEN_KEY, es_breaker.PROBE_SCHEDULED_KEY])
+
+
+@pytest.fixture(autouse=True)
+def _reset_spelling_index(settings):
+    # The per-worker index would otherwise keep vocabulary from earlier tests.
+    # Background rebuilds would read through another connection, outside the test transaction.
+    from shopfront import spelling
+
+    settings.SEARCH_SPELLING_REBUILD_ASYNC = False
+    spelling.reset_index()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def _reset_synonym_dictionary():
+    from catalog import synonyms
+
+    synonyms.reset_dictionary()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def _reset_category_tree():
+    from catalog import category_tree
+
+    category_tree.reset_tree()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def _reset_local_cache():
+    from core import local_cache
+
+    local_cache.reset_local()
+    yield
+
+
+@pytest.fixture
+def es_down(monkeypatch):
+    # Every ES search raises, so views take their database fallback.
+    from catalog import es_client
+
+    def _down(*args, **kwargs):
+        raise RuntimeError("es down")
+
+    monkeypatch.setattr(es_client, "search", _down)
+
+
 @pytest.fixture
 def api_client(client, user):
     from rest_framework_simplejwt.tokens import AccessToken
@@ -0,0 +1,195 @@
+import threading
+import time
+
+import pytest
+from django.core.management import call_command
+
+from catalog import autocomplete
+from catalog import tasks as catalog_tasks
+from catalog import versions
+from catalog.models import Brand, Category, Product
+from shopfront import search as sf_search
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def index_dir(settings, tmp_path):
+    settings.AUTOCOMPLETE_INDEX_DIR = str(tmp_path)
+    settings.AUTOCOMPLETE_REFRESH_SECONDS = 0
+    settings.ES_INCREMENTAL_OVERLAP_SECONDS = 0
+    # Background refreshes would read through another connection, outside the test transaction.
+    settings.AUTOCOMPLETE_REFRESH_ASYNC = False
+    autocomplete.reset_index()
+    yield tmp_path
+    autocomplete.reset_index()
+
+
+def _catalog():
+    monin = Brand.objects.create(name="Monin")
+    Category.objects.create(name="Сиропы")
+    Product.objects.create(sku="SYR-001", name="Сироп Ваниль", brand=monin, price=5, barcode="4600000000011")
+    Product.objects.create(sku="SYR-002", name="Сироп Карамель", brand=monin, price=5, is_new=True)
+    Product.objects.create(sku="CAF-001", name="Café crème", price=5, is_promo=True)
+
+
+def test_snapshot_ranks_reference_names_and_boosted_products_first(index_dir):
+    _catalog()
+    assert autocomplete.suggest("сир") == []
+
+    meta = autocomplete.build_index()
+
+    assert meta["count"] == 11
+    assert autocomplete.suggest("СИР") == ["Сиропы", "Сироп Карамель", "Сироп Ваниль"]
+    assert autocomplete.suggest("сир", limit=2) == ["Сиропы", "Сироп Карамель"]
+    assert autocomplete.suggest("monin с") == ["Monin Сироп Карамель", "Monin Сироп Ваниль"]
+    assert autocomplete.suggest("cafe") == ["Café crème"]
+    assert autocomplete.suggest("syr-00") == ["SYR-002", "SYR-001"]
+    assert autocomplete.suggest("460000") == ["4600000000011"]
+    assert autocomplete.suggest("zzz") == []
+    assert autocomplete.suggest("  ") == []
+
+
+def test_overlay_applies_catalog_changes_until_the_next_snapshot(index_dir):
+    _catalog()
+    autocomplete.build_index()
+    index = autocomplete.get_index()
+    assert index.overlay is None
+
+    vanilla = Product.objects.get(sku="SYR-001")
+    vanilla.name = "Сироп Ванильный"
+    vanilla.save()
+    Product.objects.create(sku="SYR-003", name="Сироп Кокос", price=5)
+    monin = Brand.objects.get(name="Monin")
+    monin.name = "Monin Le Sirop"
+    monin.save()
+    Category.objects.create(name="Сиропы Premium")
+
+    assert autocomplete.suggest("сироп в") == ["Сироп Ванильный"]
+    assert autocomplete.get_index() is index and index.overlay is not None
+    assert autocomplete.suggest("сироп к") == ["Сироп Карамель", "Сироп Кокос"]
+    assert autocomplete.suggest("сиропы") == ["Сиропы", "Сиропы Premium"]
+    assert autocomplete.suggest("monin") == ["Monin Le Sirop", "Monin Сироп Карамель", "Monin Le Sirop Сироп Ванильный"]
+
+    # A new snapshot folds the overlay in; workers switch to it on their next lookup.
+    autocomplete.build_index()
+    fresh = autocomplete.get_index()
+    assert fresh is not index and fresh.overlay is None
+    assert autocomplete.suggest("сироп в") == ["Сироп Ванильный"]
+
+
+def test_overlay_hides_products_deleted_since_the_snapshot(index_dir, monkeypatch):
+    _catalog()
+    monkeypatch.setattr(autocomplete, "DELETED_SCAN_BUCKET", 2)
+    autocomplete.build_index()
+    assert autocomplete.suggest("сироп") == ["Сиропы", "Сироп Карамель", "Сироп Ваниль"]
+
+    Product.objects.get(sku="SYR-001").delete()
+
+    assert autocomplete.suggest("сироп") == ["Сиропы", "Сироп Карамель"]
+    assert autocomplete.suggest("460000") == []
+    assert autocomplete.suggest("cafe") == ["Café crème"]
+
+
+def test_refresh_runs_in_background_and_keeps_serving_the_overlay(index_dir, settings, monkeypatch):
+    settings.AUTOCOMPLETE_REFRESH_ASYNC = True
+    _catalog()
+    autocomplete.build_index()
+    index = autocomplete.get_index()
+    release = threading.Event()
+    refreshed = []
+
+    def slow_refresh(version):
+        release.wait(5)
+        refreshed.append(version)
+        index.version = version
+
+    monkeypatch.setattr(index, "refresh", slow_refresh)
+    versions.bump_version(versions.VOCABULARY)
+
+    assert autocomplete.suggest("сироп в") == ["Сироп Ваниль"]
+    assert autocomplete.suggest("сироп в") == ["Сироп Ваниль"]
+    threads = [thread for thread in threading.enumerate() if thread.name == "autocomplete-overlay"]
+    assert len(threads) == 1 and refreshed == []
+
+    release.set()
+    threads[0].join(5)
+    assert refreshed == [versions.get_version(versions.VOCABULARY)]
+
+
+def test_refresh_failures_keep_serving_the_snapshot(index_dir, monkeypatch):
+    _catalog()
+    autocomplete.build_index()
+    index = autocomplete.get_index()
+    Product.objects.create(sku="SYR-004", name="Сироп Мята", price=5)
+    monkeypatch.setattr(index, "refresh", lambda version: (_ for _ in ()).throw(RuntimeError("db down")))
+
+    assert autocomplete.suggest("сироп м") == []
+    assert autocomplete.suggest("сироп в") == ["Сироп Ваниль"]
+
+
+def test_overlay_is_capped_and_queues_one_snapshot_rebuild(index_dir, settings, monkeypatch):
+    settings.AUTOCOMPLETE_OVERLAY_MAX_PRODUCTS = 1
+    queued = []
+    monkeypatch.setattr(catalog_tasks.rebuild_autocomplete_index, "delay", lambda: queued.append(1))
+    _catalog()
+    autocomplete.build_index()
+    autocomplete.get_index()
+
+    Product.objects.create(sku="SYR-005", name="Сироп Лаванда", price=5)
+    time.sleep(0.01)
+    Product.objects.create(sku="SYR-006", name="Сироп Лимон", price=5)
+    assert autocomplete.suggest("сироп л") == ["Сироп Лимон"]
+    assert len(autocomplete.get_index().overlay.hidden) == 1
+
+    Product.objects.create(sku="SYR-007", name="Сироп Личи", price=5)
+    autocomplete.suggest("сироп л")
+    assert queued == [1]
+
+
+def test_broken_snapshot_is_skipped(index_dir):
+    (index_dir / "CURRENT").write_text("missing")
+    assert autocomplete.load_index() is None
+    assert autocomplete.suggest("сир") == []
+
+
+def test_prefix_lookups_stay_under_a_millisecond(index_dir):
+    entries = autocomplete.collect(
+        (f"{word} {i}", 10 + i % 3, i + 1)
+        for i in range(60000)
+        for word in ("Сироп", "Стакан")[i % 2 : i % 2 + 1]
+    )
+    autocomplete.write_snapshot(index_dir / "bench", entries, {"started_at": "2026-01-01T00:00:00+00:00"})
+    (index_dir / "CURRENT").write_text("bench")
+    autocomplete.suggest("сир")
+
+    started = time.perf_counter()
+    for _ in range(200):
+        result = autocomplete.suggest("сир")
+    elapsed = (time.perf_counter() - started) / 200
+
+    assert len(result) == 8 and all(item.startswith("Сироп") for item in result)
+    assert elapsed < 0.002
+
+
+def test_live_search_shows_completions_while_es_is_down(index_dir, client, settings, monkeypatch):
+    settings.SEARCH_PROVIDER = "elasticsearch"
+    _catalog()
+    autocomplete.build_index()
+    monkeypatch.setattr(
+        sf_search, "live_search_bundle", lambda *args, **kwargs: (_ for _ in ()).throw(sf_search.ESSearchUnavailable("down"))
+    )
+
+    r = client.get("/search/live/?q=сир")
+
+    assert r.context["suggestions"][:3] == ["Сиропы", "Сироп Карамель", "Сироп Ваниль"]
+
+
+def test_task_and_command_publish_a_snapshot(index_dir, monkeypatch):
+    _catalog()
+    assert catalog_tasks.rebuild_autocomplete_index()["count"] == 11
+    call_command("build_autocomplete_index", keep=0)
+    assert len([path for path in index_dir.iterdir() if path.is_dir()]) == 1
+
+    monkeypatch.setattr(autocomplete, "build_index", lambda **kwargs: (_ for _ in ()).throw(RuntimeError("disk full")))
+    assert catalog_tasks.rebuild_autocomplete_index() is None
@@ -0,0 +1,94 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from catalog.models import Product, SellerInventory, SellerOffer
+from catalog.offer_service import refresh_buy_box, with_buy_box
+from shopfront.catalog_selectors import ordered_products_with_related
+
+pytestmark = pytest.mark.django_db
+
+
+def _seller(username):
+    return get_user_model().objects.create_user(username=username, password="pass")
+
+
+def test_buy_box_follows_offer_and_inventory_changes():
+    product = Product.objects.create(sku="81800001", name="Buy box cup", price=150, stock_qty=0, lead_time_days=9, min_order_qty=2)
+    assert (product.winning_offer_id, product.effective_price, product.effective_stock_qty) == (None, Decimal("150"), 0)
+
+    cheap = SellerOffer.objects.create(product=product, seller=_seller("bb_cheap"), price=90, lead_time_days=5)
+    dear = SellerOffer.objects.create(product=product, seller=_seller("bb_dear"), price=120, min_order_qty=4, lead_time_days=7)
+    product.refresh_from_db()
+    # No stock anywhere: the cheapest active offer still wins.
+    assert product.winning_offer_id == cheap.id and product.effective_price == Decimal("90.00")
+
+    inventory = SellerInventory.objects.create(offer=dear, warehouse_name="A", stock_qty=10, reserved_qty=3, eta_days=2)
+    product.refresh_from_db()
+    assert product.winning_offer_id == dear.id
+    assert (product.effective_price, product.effective_stock_qty) == (Decimal("120.00"), 7)
+    assert (product.effective_lead_time_days, product.effective_min_order_qty) == (2, 4)
+
+    stale = Product.objects.get(pk=product.pk)
+    inventory.stock_qty = 0
+    inventory.save()
+    # A product loaded before the inventory change must not write its old buy box back.
+    stale.name = "Buy box mug"
+    stale.save()
+    product.refresh_from_db()
+    assert product.name == "Buy box mug"
+    assert product.winning_offer_id == cheap.id and product.effective_stock_qty == 0
+
+    cheap.status = SellerOffer.Status.PAUSED
+    cheap.save()
+    dear.delete()
+    product.refresh_from_db()
+    assert product.winning_offer_id is None
+    assert (product.effective_price, product.effective_lead_time_days, product.effective_min_order_qty) == (Decimal("150.00"), 9, 2)
+
+    product.price = 140
+    product.stock_qty = 3
+    product.save()
+    product.refresh_from_db()
+    assert (product.effective_price, product.effective_stock_qty) == (Decimal("140.00"), 3)
+    assert refresh_buy_box() == 0
+    assert refresh_buy_box([]) == 0
+
+
+def test_refresh_buy_box_repairs_rows_written_around_signals():
+    product = Product.objects.create(sku="81800011", name="Bulk cup", price=50, stock_qty=1)
+    offer = SellerOffer.objects.create(product=product, seller=_seller("bb_bulk"), price=40)
+    SellerInventory.objects.bulk_create([SellerInventory(offer=offer, warehouse_name="A", stock_qty=6)])
+    Product.objects.filter(pk=product.pk).update(effective_stock_qty=0)
+
+    assert refresh_buy_box([product.id]) == 1
+    product.refresh_from_db()
+    assert product.effective_stock_qty == 6
+    assert refresh_buy_box([product.id]) == 0
+
+
+def test_catalog_filters_and_sorts_on_stored_buy_box(client, es_down):
+    own = Product.objects.create(sku="81800021", name="Own stock cup", price=30, stock_qty=5)
+    offered = Product.objects.create(sku="81800022", name="Offer stock cup", price=500, stock_qty=0)
+    offer = SellerOffer.objects.create(product=offered, seller=_seller("bb_catalog"), price=20, lead_time_days=1)
+    SellerInventory.objects.create(offer=offer, warehouse_name="A", stock_qty=4)
+    Product.objects.create(sku="81800023", name="Empty cup", price=10, stock_qty=0)
+
+    r = client.get("/catalog/?availability=in_stock&sort=price_asc")
+    assert [p.name for p in r.context["products"]] == ["Offer stock cup", "Own stock cup"]
+
+    r = client.get("/catalog/?max_price=25")
+    assert {p.name for p in r.context["products"]} == {"Offer stock cup", "Empty cup"}
+
+    with CaptureQueriesContext(connection) as ctx:
+        products = ordered_products_with_related([own.id, offered.id])
+        shown = [(p.display_price, p.display_stock_qty, getattr(p.active_offer, "id", None)) for p in products]
+    assert shown == [(Decimal("30.00"), 5, None), (Decimal("20.00"), 4, offer.id)]
+    # The winning offer arrives with the products; no per-listing offer/inventory queries.
+    assert not [q for q in ctx.captured_queries if 'FROM "catalog_seller' in q["sql"]]
+
+    loaded = with_buy_box(Product.objects).get(pk=offered.pk)
+    assert loaded.active_offer.seller.username == "bb_catalog"
@@ -0,0 +1,70 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from catalog.models import Product, SellerOffer
+from shopfront import catalog_counts, catalog_facets
+
+pytestmark = pytest.mark.django_db
+
+
+def _products(count, prefix="8200"):
+    for i in range(count):
+        Product.objects.create(sku=f"{prefix}{i:04d}", name=f"Count cup {i}", price=10, stock_qty=1)
+
+
+def test_measure_is_exact_up_to_the_limit_then_estimated(settings, monkeypatch):
+    settings.CATALOG_COUNT_EXACT_LIMIT = 3
+    _products(5)
+
+    assert catalog_counts.measure(Product.objects.filter(name__endswith="1")) == catalog_counts.CatalogCount(1)
+    assert isinstance(catalog_counts.planner_rows(Product.objects.all()), int)
+
+    monkeypatch.setattr(catalog_counts, "planner_rows", lambda qs: 12345)
+    estimated = catalog_counts.measure(Product.objects.all())
+    assert (estimated.value, estimated.exact, estimated.label) == (12000, False, "≈12000")
+
+    # An estimate at or below the limit contradicts the capped count; show a lower bound instead.
+    monkeypatch.setattr(catalog_counts, "planner_rows", lambda qs: 2)
+    assert catalog_counts.measure(Product.objects.all()).label == "3+"
+
+
+def test_counts_are_cached_per_signature_and_retired_by_writes():
+    _products(2)
+    queryset = Product.objects.filter(stock_qty__gt=0)
+
+    assert catalog_counts.count_products(queryset, {"availability": "in_stock", "q": ""}).value == 2
+    with CaptureQueriesContext(connection) as ctx:
+        again = catalog_counts.count_products(queryset, {"q": None, "availability": "in_stock"})
+    assert again.value == 2 and len(ctx.captured_queries) == 0
+
+    Product.objects.create(sku="82009999", name="Count cup new", price=10, stock_qty=1)
+    assert catalog_counts.count_products(queryset, {"availability": "in_stock"}).value == 3
+
+    seller = get_user_model().objects.create_user(username="count_seller", password="pass")
+    offered = Product.objects.filter(seller_offers__seller=seller)
+    assert catalog_counts.count_products(offered, {"seller": seller.id}).value == 0
+    SellerOffer.objects.create(product=Product.objects.first(), seller=seller, price=9)
+    assert catalog_counts.count_products(offered, {"seller": seller.id}).value == 1
+
+
+def test_catalog_view_shows_bounded_count(client, monkeypatch, settings, es_down):
+    settings.CATALOG_COUNT_EXACT_LIMIT = 4
+    monkeypatch.setattr(catalog_counts, "planner_rows", lambda qs: None)
+    _products(20)
+
+    # Scroll fragments render no facets: they take the bounded count instead of the grouped facet query.
+    with monkeypatch.context() as patched:
+        patched.setattr(catalog_facets, "compute", lambda *args, **kwargs: pytest.fail("no facets for fragments"))
+        r = client.get("/catalog/?availability=in_stock&page=2&fragment=grid_append", HTTP_HX_REQUEST="true")
+    assert r.context["has_next"] is False and len(r.context["products"]) == 4
+
+    # Full pages compute facets over every match anyway and show their exact total.
+    r = client.get("/catalog/?availability=in_stock")
+    assert r.context["total_count"] == 20 and r.context["has_next"] is True
+    assert "Найдено: 20" in r.content.decode()
+
+    r = client.get("/catalog/?availability=in_stock&page=9")
+    assert r.context["page"] == 2 and r.context["has_next"] is False
+    assert len(r.context["products"]) == 4
@@ -0,0 +1,95 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Case, IntegerField, When
+from django.test.utils import CaptureQueriesContext
+
+from catalog.models import Product, ProductReview
+from shopfront import catalog_cursor
+
+pytestmark = pytest.mark.django_db
+
+ORDERS = {
+    "new": ["-is_new", "name", "id"],
+    "price_asc": ["effective_price", "name", "id"],
+    "price_desc": ["-effective_price", "name", "id"],
+    "name": ["name", "id"],
+    "promo": ["-is_promo", "name", "id"],
+    "rating_desc": ["-rating_avg", "-rating_count", "name", "id"],
+    "relevance": ["search_rank", "id"],
+}
+
+
+def _walk(queryset, order, page_size):
+    seen, values = [], None
+    while True:
+        rows, has_next = catalog_cursor.page_after(queryset, order, values, page_size)
+        seen.extend(row[-1] for row in rows)
+        if not has_next:
+            return seen
+        values = catalog_cursor.decode(catalog_cursor.encode("s", rows[-1]), "s", order)
+
+
+def test_cursor_round_trip_and_rejects_foreign_tokens():
+    token = catalog_cursor.encode("price_asc", [Product._meta.get_field("price").to_python("12.50"), "Чашка", 7])
+
+    assert "=" not in token
+    assert catalog_cursor.decode(token, "price_asc", ORDERS["price_asc"]) == ["12.50", "Чашка", 7]
+    assert catalog_cursor.decode(token, "name", ORDERS["name"]) is None
+    assert catalog_cursor.decode(token, "price_asc", ORDERS["name"]) is None
+    assert catalog_cursor.decode("not a cursor!", "name", ORDERS["name"]) is None
+    assert catalog_cursor.decode(catalog_cursor.encode("name", [["x"], 1]), "name", ORDERS["name"]) is None
+
+
+def test_keyset_walk_matches_full_ordering_for_every_sort():
+    user = get_user_model().objects.create_user(username="cursor_reviewer", password="pass")
+    products = []
+    for i in range(9):
+        products.append(Product.objects.create(
+            sku=f"8190000{i}", name=f"Cursor {'ab'[i % 2]}", price=10 + i % 3,
+            is_new=i % 3 == 0, is_promo=i % 4 == 0,
+        ))
+    for product in products[::3]:
+        ProductReview.objects.create(product=product, user=user, rating=5 - product.id % 3)
+    ids = [product.id for product in products]
+    base = Product.objects.filter(id__in=ids)
+    ranked = base.annotate(search_rank=Case(
+        *[When(id=pid, then=pos) for pos, pid in enumerate(reversed(ids))], output_field=IntegerField(),
+    ))
+
+    for sort, order in ORDERS.items():
+        queryset = ranked if sort == "relevance" else base
+        expected = list(queryset.order_by(*order).values_list("id", flat=True))
+        assert _walk(queryset, order, 2) == expected, sort
+
+
+def test_grid_append_scrolls_by_cursor_without_count_or_offset(client, es_down):
+    for i in range(20):
+        Product.objects.create(sku=f"8191{i:04d}", name=f"Scroll cup {i:02d}", price=5 + i % 4, stock_qty=1)
+    Product.objects.create(sku="81919999", name="Scroll cup empty", price=1, stock_qty=0)
+
+    first = client.get("/catalog/?availability=in_stock&sort=price_desc")
+    assert first.context["total_count"] == 20
+    cursor = first.context["next_cursor"]
+    assert f"availability=in_stock&amp;sort=price_desc&cursor={cursor}&fragment=grid_append" in first.content.decode()
+
+    with CaptureQueriesContext(connection) as ctx:
+        r = client.get(
+            f"/catalog/?availability=in_stock&sort=price_desc&cursor={cursor}&fragment=grid_append",
+            HTTP_HX_REQUEST="true",
+        )
+    sql = " ".join(query["sql"] for query in ctx.captured_queries)
+    assert "__count" not in sql and "OFFSET" not in sql
+    assert r.context["has_next"] is False and r.context["next_cursor"] == ""
+    shown = [p.id for p in first.context["products"]] + [p.id for p in r.context["products"]]
+    expected = list(
+        Product.objects.filter(stock_qty__gt=0).order_by(*ORDERS["price_desc"]).values_list("id", flat=True)
+    )
+    assert shown == expected
+
+    # The default catalog also hands out cursors, and a cursor from another sort restarts the list.
+    default = client.get("/catalog/")
+    r = client.get(f"/catalog/?cursor={default.context['next_cursor']}&fragment=grid_append", HTTP_HX_REQUEST="true")
+    assert len(r.context["products"]) == 5
+    r = client.get(f"/catalog/?sort=name&cursor={cursor}&fragment=grid_append", HTTP_HX_REQUEST="true")
+    assert [p.name for p in r.context["products"]][:2] == ["Scroll cup 00", "Scroll cup 01"]
@@ -0,0 +1,93 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+
+from catalog.models import Brand, Product, SellerOffer
+from commerce.models import LegalEntity, SellerStore
+from shopfront import catalog_facets
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def shelf():
+    seller = get_user_model().objects.create_user(username="facet_seller", password="pass")
+    other = get_user_model().objects.create_user(username="facet_other", password="pass")
+    legal_entity = LegalEntity.objects.create(name="Facet LE", inn="7707083893", bik="044525225", checking_account="40702810900000001011")
+    SellerStore.objects.create(owner=seller, legal_entity=legal_entity, name="Facet Store")
+    alpha = Brand.objects.create(name="Alpha")
+    beta = Brand.objects.create(name="Beta")
+    for i, (brand, price) in enumerate([(alpha, 10), (alpha, 20), (alpha, 90), (beta, 50), (None, 100)]):
+        Product.objects.create(
+            sku=f"8220000{i}", name=f"Facet cup {i}", price=price, stock_qty=1, brand=brand,
+            seller=seller if i < 2 else other,
+        )
+    return {"seller": seller, "other": other, "alpha": alpha, "beta": beta}
+
+
+def test_one_grouped_query_returns_every_facet(shelf, settings):
+    settings.CATALOG_FACET_PRICE_BUCKETS = 3
+
+    with CaptureQueriesContext(connection) as ctx:
+        facets = catalog_facets.compute(Product.objects.all())
+
+    assert len(ctx.captured_queries) == 1 and "GROUPING SETS" in ctx.captured_queries[0]["sql"]
+    assert facets.total == 5
+    assert (facets.min_price, facets.max_price) == (Decimal("10.00"), Decimal("100.00"))
+    assert facets.brands == [
+        {"id": shelf["alpha"].id, "label": "Alpha", "count": 3},
+        {"id": shelf["beta"].id, "label": "Beta", "count": 1},
+    ]
+    # Only sellers with a store are offered as a facet.
+    assert facets.sellers == [{"id": shelf["seller"].id, "slug": SellerStore.objects.get().slug, "label": "Facet Store", "count": 2}]
+    assert [(row["bucket"], row["count"]) for row in facets.price_histogram] == [(1, 2), (2, 1), (3, 2)]
+    assert [(row["min_price"], row["max_price"]) for row in facets.price_histogram] == [
+        (Decimal("10.00"), Decimal("40.00")), (Decimal("40.00"), Decimal("70.00")), (Decimal("70.00"), Decimal("100.00")),
+    ]
+
+    excluded = catalog_facets.compute(Product.objects.all(), exclude_brand_id=shelf["alpha"].id, exclude_seller_id=shelf["seller"].id)
+    assert [row["label"] for row in excluded.brands] == ["Beta"] and excluded.sellers == []
+
+    single = catalog_facets.compute(Product.objects.filter(price=50))
+    assert single.price_histogram == [{"bucket": 1, "count": 1, "min_price": Decimal("50.00"), "max_price": Decimal("50.00"), "percent": 100}]
+
+    with CaptureQueriesContext(connection) as ctx:
+        assert catalog_facets.compute(Product.objects.none()) == catalog_facets.CatalogFacets()
+    assert len(ctx.captured_queries) == 0
+
+
+def test_joined_filters_count_each_product_once(shelf):
+    product = Product.objects.get(sku="82200000")
+    SellerOffer.objects.create(product=product, seller=shelf["other"], price=9)
+    SellerOffer.objects.create(product=Product.objects.get(sku="82200003"), seller=shelf["other"], price=9)
+    owner = shelf["other"].id
+    queryset = Product.objects.filter(Q(seller_id=owner) | Q(seller_offers__seller_id=owner)).distinct()
+
+    facets = catalog_facets.compute(queryset)
+    assert facets.total == 4
+    assert {row["label"]: row["count"] for row in facets.brands} == {"Alpha": 2, "Beta": 1}
+
+
+def test_catalog_page_runs_one_cached_facet_query(client, shelf, es_down):
+    with CaptureQueriesContext(connection) as ctx:
+        r = client.get("/catalog/?availability=in_stock")
+    sql = [query["sql"] for query in ctx.captured_queries]
+    assert sum("GROUPING SETS" in item for item in sql) == 1
+    assert not any("COUNT(" in item and "GROUPING SETS" not in item for item in sql)
+    assert r.context["total_count"] == 5
+    assert [row["label"] for row in r.context["facet_brand_options"]] == ["Alpha", "Beta"]
+    assert r.context["facet_price_min"] == Decimal("10.00") and len(r.context["facet_price_histogram"]) == 8
+    assert "Распределение цен" in r.content.decode()
+
+    with CaptureQueriesContext(connection) as ctx:
+        client.get("/catalog/?availability=in_stock")
+    assert not any("GROUPING SETS" in query["sql"] for query in ctx.captured_queries)
+
+    Product.objects.create(sku="82200099", name="Facet cup new", price=30, stock_qty=1, brand=shelf["beta"])
+    r = client.get("/catalog/?availability=in_stock")
+    assert r.context["total_count"] == 6
+    assert {row["label"]: row["count"] for row in r.context["facet_brand_options"]} == {"Alpha": 3, "Beta": 2}
@@ -0,0 +1,223 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from catalog import es_breaker, es_client, es_index, offer_service
+from catalog.index_queue import index_queryset
+from catalog.models import Brand, Category, Product, ProductIndexQueueItem, ProductReview, SellerInventory, SellerOffer, Tag
+from commerce.models import LegalEntity, SellerStore
+from shopfront import catalog_search
+from shopfront import search as sf_search
+from shopfront import views as sf_views
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def _es_enabled(settings):
+    settings.ES_ENABLED = True
+    settings.ES_CATALOG_ENGINE_ENABLED = True
+
+
+@pytest.fixture
+def seller_store():
+    user = get_user_model().objects.create_user(username="catalog-es-seller", password="x")
+    legal_entity = LegalEntity.objects.create(
+        name="Catalog ES LE", inn="500100017001", bik="044525225", checking_account="40702810900000017001"
+    )
+    return SellerStore.objects.create(owner=user, legal_entity=legal_entity, name="Shelf Store")
+
+
+def test_product_doc_carries_filter_sort_and_facet_fields(seller_store, django_assert_num_queries):
+    brand = Brand.objects.create(name="Doc Brand")
+    category = Category.objects.create(name="Doc Category")
+    product = Product.objects.create(
+        sku="75000001", name="Jug", brand=brand, category=category, price=30, lead_time_days=9, seller=seller_store.owner
+    )
+    product.tags.add(Tag.objects.create(name="Glass", slug="glass"))
+    reseller = get_user_model().objects.create_user(username="catalog-es-reseller", password="x")
+    offer = SellerOffer.objects.create(product=product, seller=reseller, price=Decimal("24.50"), lead_time_days=1)
+    SellerInventory.objects.create(offer=offer, warehouse_name="Main", stock_qty=3)
+    paused_seller = get_user_model().objects.create_user(username="catalog-es-paused", password="x")
+    SellerOffer.objects.create(
+        product=product, seller=paused_seller, price=1, lead_time_days=40, status=SellerOffer.Status.PAUSED
+    )
+    ProductReview.objects.create(product=product, user=reseller, rating=4)
+    ProductReview.objects.create(product=product, user=paused_seller, rating=5)
+
+    loaded = index_queryset().get(id=product.id)
+    with django_assert_num_queries(0):
+        doc = es_index.product_doc(loaded)
+
+    assert doc["brand_id"] == brand.id and doc["category_id"] == category.id
+    assert doc["tag_slugs"] == ["glass"]
+    assert doc["seller_ids"] == sorted([seller_store.owner_id, reseller.id])
+    # Price, stock and lead time come from the stored buy box, like the database filters.
+    assert loaded.winning_offer_id == offer.id
+    assert doc["effective_price"] == 24.5
+    assert doc["effective_lead_time_days"] == 1
+    assert doc["in_stock"] is True
+    assert (doc["rating_avg"], doc["rating_count"]) == (4.5, 2)
+    assert doc["brand_facet"] == f"Doc Brand|{brand.id}"
+    assert doc["seller_facet"] == f"Shelf Store|{seller_store.slug}|{seller_store.owner_id}"
+    # Without the index queryset the same values are loaded on demand.
+    assert es_index.product_doc(Product.objects.get(id=product.id))["rating_count"] == 2
+
+
+def test_offer_inventory_and_review_changes_enqueue_product():
+    product = Product.objects.create(sku="75000011", name="Tray", price=5)
+    user = get_user_model().objects.create_user(username="catalog-es-buyer", password="x")
+    ProductIndexQueueItem.objects.all().delete()
+
+    offer = SellerOffer.objects.create(product=product, seller=user, price=4)
+    assert list(ProductIndexQueueItem.objects.values_list("product_id", flat=True)) == [product.id]
+    ProductIndexQueueItem.objects.all().delete()
+    SellerInventory.objects.create(offer=offer, warehouse_name="A", stock_qty=1)
+    assert ProductIndexQueueItem.objects.filter(product_id=product.id).exists()
+    ProductIndexQueueItem.objects.all().delete()
+    ProductReview.objects.create(product=product, user=user, rating=3).delete()
+    assert ProductIndexQueueItem.objects.filter(product_id=product.id).exists()
+
+
+def test_buy_box_refresh_enqueues_changed_products():
+    product = Product.objects.create(sku="75000012", name="Bowl", price=5)
+    user = get_user_model().objects.create_user(username="catalog-es-bulk", password="x")
+    offer = SellerOffer.objects.create(product=product, seller=user, price=4)
+    SellerInventory.objects.create(offer=offer, warehouse_name="A", stock_qty=2)
+    ProductIndexQueueItem.objects.all().delete()
+
+    assert offer_service.refresh_buy_box([product.id]) == 0
+    assert not ProductIndexQueueItem.objects.exists()
+    # Bulk writes send no signals; the buy box refresh queues the documents it changed.
+    SellerInventory.objects.filter(offer=offer).update(stock_qty=0)
+    assert offer_service.refresh_buy_box([product.id]) == 1
+    assert list(ProductIndexQueueItem.objects.values_list("product_id", flat=True)) == [product.id]
+
+
+def test_payload_translates_filters_and_sorts():
+    filters = catalog_search.CatalogFilters(
+        category_ids=[1, 2],
+        brand_id=3,
+        series_id=4,
+        tag_slug="glass",
+        seller_id=5,
+        in_stock=True,
+        delivery_eta="week",
+        min_price=Decimal("10"),
+        max_price=Decimal("20"),
+    )
+    payload = catalog_search.catalog_payload(filters, sort="price_desc", offset=32, page_size=16)
+
+    assert payload["from"] == 32 and payload["track_total_hits"] is True
+    assert payload["query"]["bool"]["filter"] == [
+        {"terms": {"category_id": [1, 2]}},
+        {"term": {"brand_id": 3}},
+        {"term": {"series_id": 4}},
+        {"term": {"tag_slugs": "glass"}},
+        {"term": {"seller_ids": 5}},
+        {"term": {"in_stock": True}},
+        {"range": {"effective_lead_time_days": {"gt": 2, "lte": 7}}},
+        {"range": {"effective_price": {"gte": 10.0, "lte": 20.0}}},
+    ]
+    assert payload["sort"][0] == {"effective_price": {"order": "desc"}}
+    assert payload["aggs"]["min_price"] == {"min": {"field": "effective_price"}}
+    assert "must" not in payload["query"]["bool"] and "suggest" not in payload
+
+    searched = catalog_search.catalog_payload(catalog_search.CatalogFilters(q="jug", tag_id=7), sort="", offset=0, page_size=16)
+    assert searched["sort"][0] == "_score"
+    text_query = searched["query"]["bool"]["must"][0]["function_score"]
+    assert text_query["query"]["bool"]["should"]
+    assert text_query["field_value_factor"]["field"] == "popularity"
+    assert searched["query"]["bool"]["filter"] == [{"term": {"tag_ids": 7}}]
+    assert searched["suggest"]["query_suggest"]["prefix"] == "jug"
+    assert catalog_search.catalog_payload(catalog_search.CatalogFilters(), sort="", offset=0, page_size=16)["sort"] == catalog_search.SORTS["new"]
+
+
+def test_search_catalog_parses_page_and_facets(monkeypatch):
+    calls = []
+    response = {
+        "hits": {"total": {"value": 40}, "hits": [{"_id": "9"}, {"_id": "4"}]},
+        "aggregations": {
+            "brands": {"buckets": [{"key": "Acme|1", "doc_count": 30}, {"key": "Zed|2", "doc_count": 10}, {"key": "broken"}]},
+            "sellers": {"buckets": [{"key": "Shop | One|shop-one|7", "doc_count": 5}, {"key": "Other|other|8", "doc_count": 2}]},
+            "min_price": {"value": 3.5},
+            "max_price": {"value": 120.0},
+        },
+        "suggest": {"query_suggest": [{"options": [{"text": "Jug"}]}]},
+    }
+
+    def _search(index, body, filter_path, timeout):
+        calls.append(body)
+        return response
+
+    monkeypatch.setattr(es_client, "search", _search)
+    page = catalog_search.search_catalog(catalog_search.CatalogFilters(brand_id=2, seller_id=8), page=2)
+
+    assert page.product_ids == [9, 4]
+    assert (page.total_count, page.page, page.num_pages, page.has_next) == (40, 2, 3, True)
+    assert page.brand_options == [{"id": 1, "label": "Acme", "count": 30}]
+    assert page.seller_options == [{"id": 7, "slug": "shop-one", "label": "Shop | One", "count": 5}]
+    assert (page.min_price, page.max_price) == (Decimal("3.50"), Decimal("120.00"))
+    assert page.suggestions == ["Jug"]
+    assert [body["from"] for body in calls] == [16]
+
+    # Pages past the end show the last page, like the paginator.
+    calls.clear()
+    assert catalog_search.search_catalog(catalog_search.CatalogFilters(), page=9).page == 3
+    assert [body["from"] for body in calls] == [128, 32]
+
+
+def test_search_catalog_refuses_when_unavailable(monkeypatch, settings, es_down):
+    with pytest.raises(sf_search.ESSearchUnavailable):
+        catalog_search.search_catalog(catalog_search.CatalogFilters())
+    with pytest.raises(sf_search.ESSearchUnavailable):
+        catalog_search.search_catalog(catalog_search.CatalogFilters(), page=1000)
+
+    es_breaker.trip("test")
+    monkeypatch.setattr(es_client, "search", lambda *args, **kwargs: pytest.fail("breaker is open"))
+    with pytest.raises(sf_search.ESSearchUnavailable):
+        catalog_search.search_catalog(catalog_search.CatalogFilters())
+    settings.ES_CATALOG_ENGINE_ENABLED = False
+    with pytest.raises(sf_search.ESSearchUnavailable):
+        catalog_search.search_catalog(catalog_search.CatalogFilters())
+
+
+def test_catalog_view_hydrates_only_the_es_page(client, monkeypatch):
+    brand = Brand.objects.create(name="View Brand")
+    first = Product.objects.create(sku="75000021", name="Alpha cup", brand=brand, price=10, stock_qty=1)
+    second = Product.objects.create(sku="75000022", name="Beta cup", brand=brand, price=12, stock_qty=1)
+    Product.objects.create(sku="75000023", name="Gamma cup", brand=brand, price=14, stock_qty=1)
+    bodies = []
+
+    def _search(index, body, filter_path, timeout):
+        bodies.append(body)
+        return {
+            "hits": {"total": {"value": 20}, "hits": [{"_id": str(second.id)}, {"_id": str(first.id)}]},
+            "aggregations": {"brands": {"buckets": [{"key": "Facet From ES|999", "doc_count": 20}]}},
+        }
+
+    monkeypatch.setattr(es_client, "search", _search)
+    monkeypatch.setattr(sf_views.catalog_facets, "compute", lambda *args, **kwargs: pytest.fail("facets come from ES"))
+
+    r = client.get("/catalog/?availability=in_stock&sort=price_desc")
+
+    assert r.status_code == 200
+    assert bodies[0]["query"]["bool"]["filter"] == [{"term": {"in_stock": True}}]
+    assert r.context["total_count"] == 20 and r.context["has_next"] is True
+    assert [p.id for p in r.context["products"]] == [second.id, first.id]
+    assert r.context["facet_brand_options"] == [{"id": 999, "label": "Facet From ES", "count": 20}]
+    assert "Gamma cup" not in r.text
+
+
+def test_catalog_view_falls_back_to_database(client, monkeypatch, es_down):
+    Product.objects.create(sku="75000031", name="Fallback cup", price=10, stock_qty=1)
+    Product.objects.create(sku="75000032", name="Empty cup", price=10, stock_qty=0)
+
+    r = client.get("/catalog/?availability=in_stock")
+
+    assert r.status_code == 200
+    assert [p.name for p in r.context["products"]] == ["Fallback cup"]
+    # Filters that cannot match never reach ES.
+    monkeypatch.setattr(es_client, "search", lambda *args, **kwargs: pytest.fail("no ES call expected"))
+    assert client.get("/catalog/?brand=oops").context["total_count"] == 0
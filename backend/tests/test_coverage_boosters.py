@@ -9,6 +9,7 @@ from django.core.cache import cache
 from django.test import RequestFactory, override_settings
 from django.contrib.sessions.middleware import SessionMiddleware
 
+from catalog import es_client
 from catalog.models import Brand, Category, Collection, Product, SellerInventory, SellerOffer
 from commerce.company_service import (
     approver_memberships_for_company,
@@ -299,7 +300,7 @@ def test_search_helpers_and_cache(monkeypatch, settings):
         sf_search._es_search_bundle("cup", 2, 2)
     settings.ES_ENABLED = True
 
-    def _post(url, json, timeout):
+    def _post(url, json, params, timeout):
         return _Resp(
             payload={
                 "hits": {"hits": [{"_source": {"id": 1}}, {"_id": "2"}, {"_source": {"id": "bad"}}]},
@@ -314,7 +315,7 @@ def test_search_helpers_and_cache(monkeypatch, settings):
             }
         )
 
-    monkeypatch.setattr(sf_search.requests, "post", _post)
+    monkeypatch.setattr(es_client, "post", _post)
     ids, countries, suggestions = sf_search._es_search_bundle("cup", 5, 2)
     assert ids == [1, 2]
     assert countries == ["IT"]
@@ -322,10 +323,10 @@ def test_search_helpers_and_cache(monkeypatch, settings):
 
     cached = sf_search.live_search_bundle("cup", limit=5, country_limit=0)
     assert cached == ([1, 2], [], ["Cup", "Mug"])
-    monkeypatch.setattr(sf_search.requests, "post", lambda *args, **kwargs: (_ for _ in ()).throw(RuntimeError("should not call")))
+    monkeypatch.setattr(es_client, "post", lambda *args, **kwargs: (_ for _ in ()).throw(RuntimeError("should not call")))
     assert sf_search.live_search_bundle("cup", limit=5, country_limit=0) == cached
 
-    monkeypatch.setattr(sf_search.requests, "post", lambda *args, **kwargs: (_ for _ in ()).throw(RuntimeError("down")))
+    monkeypatch.setattr(es_client, "post", lambda *args, **kwargs: (_ for _ in ()).throw(RuntimeError("down")))
     with pytest.raises(sf_search.ESSearchUnavailable):
         sf_search._es_search_bundle("cup", 5, 1)
 
@@ -657,7 +658,7 @@ def test_shopfront_tasks_and_live_search(monkeypatch):
             raise sf_search.ESSearchUnavailable("down")
 
     monkeypatch.setattr(
-        "shopfront.live_search_service.DatabaseSearchProvider.live_bundle",
+        "shopfront.live_search_service.PostgresSearchProvider.live_bundle",
         lambda self, query, limit, country_limit: type("Bundle", (), {"product_ids": [], "countries": [], "suggestions": ["fallback"]})(),
     )
     monkeypatch.setattr("shopfront.live_search_service.suggest_query_corrections", lambda q, limit=6: ["corrected"])
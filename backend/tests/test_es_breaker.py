@@ -0,0 +1,121 @@
+import pytest
+from django.core.cache import cache
+
+from catalog import es_breaker, es_client
+from catalog import tasks as catalog_tasks
+from shopfront import search as sf_search
+from shopfront.search_service import (
+    DatabaseSearchProvider,
+    ElasticsearchSearchProvider,
+    HybridSearchProvider,
+    get_search_provider,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+class _Resp:
+    def __init__(self, payload=None, status_code=200):
+        self._payload = payload or {}
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError("http fail")
+
+    def json(self):
+        return self._payload
+
+
+@pytest.fixture(autouse=True)
+def probes(settings, monkeypatch):
+    settings.ES_ENABLED = True
+    settings.SEARCH_PROVIDER = "elasticsearch"
+    settings.SEMANTIC_SEARCH_ENABLED = False
+    settings.ES_BREAKER_FAILURE_THRESHOLD = 3
+    settings.ES_BREAKER_SLOW_SECONDS = 0.5
+    settings.ES_BREAKER_COOLDOWN_SECONDS = 30
+    probes = []
+    monkeypatch.setattr(catalog_tasks.probe_elasticsearch, "apply_async", lambda **kwargs: probes.append(kwargs))
+    cache.clear()
+    return probes
+
+
+def _down(*args, **kwargs):
+    raise RuntimeError("connection refused")
+
+
+def test_consecutive_failures_trip_breaker_and_route_to_database(monkeypatch, probes):
+    monkeypatch.setattr(es_client, "search", _down)
+    for _ in range(2):
+        with pytest.raises(sf_search.ESSearchUnavailable):
+            sf_search._es_search_bundle("cup", 3, 0)
+    assert not es_breaker.is_open()
+    assert isinstance(get_search_provider(), ElasticsearchSearchProvider)
+
+    with pytest.raises(sf_search.ESSearchUnavailable):
+        sf_search._es_search_bundle("cup", 3, 0)
+
+    assert es_breaker.is_open()
+    assert isinstance(get_search_provider(), DatabaseSearchProvider)
+    # One background probe per trip, however many workers see the failures.
+    es_breaker.schedule_probe()
+    assert probes == [{"countdown": 5}]
+
+
+def test_success_resets_failure_count(monkeypatch):
+    monkeypatch.setattr(es_client, "search", _down)
+    for _ in range(2):
+        with pytest.raises(sf_search.ESSearchUnavailable):
+            sf_search._es_search_bundle("cup", 3, 0)
+    monkeypatch.setattr(es_client, "search", lambda *args, **kwargs: {"hits": {"hits": [{"_id": "4"}]}})
+    assert sf_search._es_search_bundle("cup", 3, 0)[0] == [4]
+
+    monkeypatch.setattr(es_client, "search", _down)
+    with pytest.raises(sf_search.ESSearchUnavailable):
+        sf_search._es_search_bundle("cup", 3, 0)
+    assert not es_breaker.is_open()
+
+
+def test_slow_responses_count_as_failures():
+    for _ in range(3):
+        es_breaker.record_success(elapsed=0.9)
+    assert es_breaker.is_open()
+
+
+def test_half_open_failure_retrips_immediately():
+    es_breaker.trip("test")
+    cache.delete(es_breaker.OPEN_KEY)  # cooldown expired
+    assert not es_breaker.is_open()
+
+    es_breaker.record_failure("still down")
+    assert es_breaker.is_open()
+
+
+def test_probe_closes_breaker_when_cluster_is_healthy(monkeypatch):
+    assert catalog_tasks.probe_elasticsearch.run() is None
+
+    es_breaker.trip("test")
+    monkeypatch.setattr(es_client, "get", _down)
+    assert catalog_tasks.probe_elasticsearch.run() is False
+    assert es_breaker.is_open()
+
+    monkeypatch.setattr(es_client, "get", lambda url, params, timeout: _Resp({"status": "yellow"}))
+    assert catalog_tasks.probe_elasticsearch.run() is True
+    assert not es_breaker.is_open()
+    assert cache.get(es_breaker.HALF_OPEN_KEY) is None
+
+
+def test_probe_schedule_failure_is_logged(monkeypatch):
+    monkeypatch.setattr(catalog_tasks.probe_elasticsearch, "apply_async", _down)
+    es_breaker.trip("test")
+    assert es_breaker.is_open()
+
+
+def test_hybrid_skips_es_while_open(monkeypatch):
+    es_breaker.trip("test")
+    monkeypatch.setattr(sf_search, "live_search_bundle", lambda *args, **kwargs: pytest.fail("ES must be skipped"))
+
+    bundle = HybridSearchProvider().live_bundle("сироп", limit=4, country_limit=0)
+
+    assert bundle.provider == "hybrid"
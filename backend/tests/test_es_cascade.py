@@ -0,0 +1,144 @@
+import json
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from catalog import es_cascade, es_client
+from catalog import tasks as catalog_tasks
+from catalog.models import Brand, Category, Country, Product, ProductIndexQueueItem, Series
+from commerce.models import LegalEntity, SellerStore
+
+pytestmark = pytest.mark.django_db
+
+
+class _Resp:
+    status_code = 200
+
+    def __init__(self, payload=None):
+        self._payload = payload or {"errors": False}
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self._payload
+
+
+@pytest.fixture(autouse=True)
+def _es_enabled(settings):
+    settings.ES_ENABLED = True
+
+
+@pytest.fixture
+def scheduled(monkeypatch):
+    calls = []
+    monkeypatch.setattr(catalog_tasks.cascade_parent_update, "delay", lambda kind, pk: calls.append((kind, pk)))
+    monkeypatch.setattr(catalog_tasks.refresh_parent_search_vectors, "delay", lambda kind, pk: None)
+    return calls
+
+
+def _bulk_lines(data: bytes) -> list[dict]:
+    return [json.loads(line) for line in data.decode("utf-8").splitlines() if line]
+
+
+def test_brand_rename_schedules_one_cascade_after_commit(scheduled, django_capture_on_commit_callbacks):
+    brand = Brand.objects.create(name="Old Brand")
+    Product.objects.create(sku="74000001", name="Cup", brand=brand, price=5)
+    ProductIndexQueueItem.objects.all().delete()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        brand.description = "Only description"
+        brand.save()
+    assert scheduled == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        brand.name = "New Brand"
+        brand.save()
+    assert scheduled == [("brand", brand.id)]
+    # The cascade replaces per-product full reindexing.
+    assert not ProductIndexQueueItem.objects.exists()
+
+
+def test_partial_update_sends_chunked_update_actions(monkeypatch):
+    brand = Brand.objects.create(name="Renamed")
+    other = Brand.objects.create(name="Other")
+    ids = [Product.objects.create(sku=f"7400001{i}", name=f"Plate {i}", brand=brand, price=5).id for i in range(3)]
+    Product.objects.create(sku="74000019", name="Not affected", brand=other, price=5)
+    posted = []
+    monkeypatch.setattr(
+        es_client, "post", lambda url, data, headers, timeout: posted.append(_bulk_lines(data)) or _Resp()
+    )
+
+    result = es_cascade.partial_update_products("brand", brand.id, chunk_size=2)
+
+    assert result == {"updated": 3, "requeued": 0}
+    assert len(posted) == 2
+    actions = [line for batch in posted for line in batch[::2]]
+    docs = [line for batch in posted for line in batch[1::2]]
+    assert [action["update"]["_id"] for action in actions] == ids
+    assert set(docs[0]["doc"]) == {"brand", "brand_facet", "search_terms", "semantic_terms", "semantic_text", "suggest"}
+    assert docs[0]["doc"]["brand_facet"] == f"Renamed|{brand.id}"
+    assert docs[0]["doc"]["brand"] == "Renamed"
+
+
+def test_missing_documents_fall_back_to_full_sync(monkeypatch):
+    country = Country.objects.create(name="Narnia", iso_code="NRN")
+    product = Product.objects.create(sku="74000021", name="Wardrobe", country_of_origin=country, price=5)
+    ProductIndexQueueItem.objects.all().delete()
+    payload = {"errors": True, "items": [{"update": {"_id": str(product.id), "status": 404}}]}
+    monkeypatch.setattr(es_client, "post", lambda url, data, headers, timeout: _Resp(payload))
+
+    assert es_cascade.partial_update_products("country", country.id) == {"updated": 0, "requeued": 1}
+    assert list(ProductIndexQueueItem.objects.values_list("product_id", flat=True)) == [product.id]
+
+
+def test_store_rename_targets_seller_products(scheduled, monkeypatch, django_capture_on_commit_callbacks):
+    user = get_user_model().objects.create_user(username="cascade-seller", password="x")
+    legal_entity = LegalEntity.objects.create(
+        name="Cascade LE", inn="500100014001", bik="044525225", checking_account="40702810900000014001"
+    )
+    store = SellerStore.objects.create(owner=user, legal_entity=legal_entity, name="Store A")
+    product = Product.objects.create(sku="74000031", name="Knife", seller=user, price=5)
+    Product.objects.create(sku="74000032", name="Fork", price=5)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        store.name = "Store B"
+        store.save()
+    assert scheduled == [("seller_store", store.id)]
+
+    posted = []
+    monkeypatch.setattr(
+        es_client, "post", lambda url, data, headers, timeout: posted.append(_bulk_lines(data)) or _Resp()
+    )
+    assert catalog_tasks.cascade_parent_update.run("seller_store", store.id) == {"updated": 1, "requeued": 0}
+    assert posted[0][0]["update"]["_id"] == product.id
+    assert posted[0][1]["doc"]["store_name"] == "Store B"
+
+
+def test_task_failure_and_broker_outage_use_outbox(monkeypatch):
+    category = Category.objects.create(name="Pans")
+    product = Product.objects.create(sku="74000041", name="Pan", category=category, price=5)
+    ProductIndexQueueItem.objects.all().delete()
+
+    def _down(*args, **kwargs):
+        raise RuntimeError("es down")
+
+    monkeypatch.setattr(es_client, "post", _down)
+    assert catalog_tasks.cascade_parent_update.run("category", category.id) is None
+    assert list(ProductIndexQueueItem.objects.values_list("product_id", flat=True)) == [product.id]
+
+    ProductIndexQueueItem.objects.all().delete()
+    monkeypatch.setattr(catalog_tasks.cascade_parent_update, "delay", _down)
+    es_cascade.schedule_cascade("category", category.id)
+    assert list(ProductIndexQueueItem.objects.values_list("product_id", flat=True)) == [product.id]
+
+
+def test_parent_delete_enqueues_products_before_fk_is_cleared():
+    brand = Brand.objects.create(name="Gone")
+    series = Series.objects.create(brand=brand, name="Gone series")
+    product = Product.objects.create(sku="74000051", name="Orphan", brand=brand, series=series, price=5)
+    ProductIndexQueueItem.objects.all().delete()
+
+    brand.delete()
+
+    assert list(ProductIndexQueueItem.objects.values_list("product_id", flat=True)) == [product.id]
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from catalog import es_client
+
+pytestmark = pytest.mark.django_db
+
+
+class _Resp:
+    def __init__(self, payload=None, status_code=200):
+        self._payload = payload or {}
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError("http fail")
+
+    def json(self):
+        return self._payload
+
+
+def test_session_is_pooled_per_process(monkeypatch):
+    es_client.reset_session()
+    first = es_client.get_session()
+    assert es_client.get_session() is first
+    adapter = first.get_adapter("http://es:9200")
+    assert adapter._pool_maxsize == 20
+
+    # A forked worker gets its own session instead of sharing sockets.
+    monkeypatch.setattr(es_client.os, "getpid", lambda: -1)
+    assert es_client.get_session() is not first
+    es_client.reset_session()
+
+
+def test_request_goes_through_shared_session(monkeypatch):
+    calls = []
+
+    class _Session:
+        def request(self, method, url, **kwargs):
+            calls.append((method, url, kwargs))
+            return _Resp({"ok": True})
+
+    monkeypatch.setattr(es_client, "get_session", lambda: _Session())
+    es_client.head("http://es/x", timeout=1)
+    es_client.put("http://es/x", json={}, timeout=1)
+    es_client.delete("http://es/x", timeout=1)
+    assert es_client.search("products", {"size": 1}, filter_path="hits.hits._id", timeout=1) == {"ok": True}
+    assert [call[0] for call in calls] == ["HEAD", "PUT", "DELETE", "POST"]
+    assert calls[-1][2]["params"] == {"filter_path": "hits.hits._id"}
+
+
+def test_msearch_sends_ndjson_and_prefixes_filter_path(monkeypatch):
+    sent = {}
+
+    def _post(url, data, headers, params, timeout):
+        sent.update(url=url, lines=[json.loads(line) for line in data.decode("utf-8").splitlines()], params=params)
+        return _Resp({"responses": [{"status": 200}, {"status": 200, "hits": {"hits": [{"_id": "3"}]}}]})
+
+    monkeypatch.setattr(es_client, "post", _post)
+    responses = es_client.msearch("products", [{"size": 1}, {"size": 2}], filter_path="hits.hits._id")
+
+    assert sent["url"].endswith("/_msearch")
+    assert sent["lines"] == [{"index": "products"}, {"size": 1}, {"index": "products"}, {"size": 2}]
+    assert sent["params"] == {"filter_path": "responses.hits.hits._id,responses.error,responses.status"}
+    assert responses[1]["hits"]["hits"][0]["_id"] == "3"
+    assert es_client.msearch("products", []) == []
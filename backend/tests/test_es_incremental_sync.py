@@ -0,0 +1,157 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from catalog import es_client, index_queue
+from catalog import tasks as catalog_tasks
+from catalog.models import (
+    Product,
+    ProductIndexQueueItem,
+    SearchIndexWatermark,
+    SellerInventory,
+    SellerOffer,
+    Tag,
+)
+from commerce.models import LegalEntity, SellerStore
+
+pytestmark = pytest.mark.django_db
+
+
+class _Resp:
+    status_code = 200
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return {"errors": False}
+
+
+@pytest.fixture(autouse=True)
+def _es_enabled(settings):
+    settings.ES_ENABLED = True
+    settings.ES_INCREMENTAL_OVERLAP_SECONDS = 0
+
+
+def _queued():
+    return set(ProductIndexQueueItem.objects.values_list("product_id", flat=True))
+
+
+def _set_watermark(value):
+    SearchIndexWatermark.objects.update_or_create(
+        name=index_queue.PRODUCTS_WATERMARK, defaults={"synced_until": value}
+    )
+
+
+def test_first_run_only_records_watermark():
+    Product.objects.create(sku="73000001", name="Existing", price=5)
+    ProductIndexQueueItem.objects.all().delete()
+
+    result = index_queue.enqueue_changed_products()
+
+    assert result["queued"] == 0
+    assert not ProductIndexQueueItem.objects.exists()
+    assert SearchIndexWatermark.objects.get(name="products").synced_until == result["until"]
+
+
+def test_out_of_band_updates_on_related_rows_are_picked_up():
+    user = get_user_model().objects.create_user(username="wm-seller", password="x")
+    legal_entity = LegalEntity.objects.create(
+        name="WM LE", inn="500100013001", bik="044525225", checking_account="40702810900000013001"
+    )
+    store = SellerStore.objects.create(owner=user, legal_entity=legal_entity, name="WM Store")
+    untouched = Product.objects.create(sku="73000010", name="Untouched", price=5)
+    by_product = Product.objects.create(sku="73000011", name="Raw SQL", price=5)
+    by_offer = Product.objects.create(sku="73000012", name="Offer", price=5)
+    by_inventory = Product.objects.create(sku="73000013", name="Inventory", price=5)
+    by_tag = Product.objects.create(sku="73000014", name="Tag", price=5)
+    by_store = Product.objects.create(sku="73000015", name="Store", price=5, seller=user)
+    offer = SellerOffer.objects.create(product=by_offer, seller=user, price=7)
+    inventory_offer = SellerOffer.objects.create(product=by_inventory, seller=user, price=8)
+    inventory = SellerInventory.objects.create(offer=inventory_offer, warehouse_name="main", stock_qty=1)
+    tag = Tag.objects.create(name="Drift", slug="drift")
+    by_tag.tags.add(tag)
+
+    past = timezone.now() - timedelta(hours=1)
+    for model in (Product, SellerOffer, SellerInventory, Tag, SellerStore):
+        model.objects.update(updated_at=past)
+    ProductIndexQueueItem.objects.all().delete()
+    _set_watermark(past + timedelta(minutes=1))
+
+    # Bulk updates bypass signals and auto_now, so set updated_at like a migration script would.
+    now = timezone.now()
+    Product.objects.filter(id=by_product.id).update(price=6, updated_at=now)
+    SellerOffer.objects.filter(id=offer.id).update(price=9, updated_at=now)
+    SellerInventory.objects.filter(id=inventory.id).update(stock_qty=0, updated_at=now)
+    Tag.objects.filter(id=tag.id).update(name="Drift v2", updated_at=now)
+    SellerStore.objects.filter(id=store.id).update(name="WM Store v2", updated_at=now)
+
+    result = index_queue.enqueue_changed_products()
+
+    expected = {by_product.id, by_offer.id, by_inventory.id, by_tag.id, by_store.id}
+    assert result["queued"] == len(expected)
+    assert _queued() == expected
+    assert untouched.id not in _queued()
+    assert SearchIndexWatermark.objects.get(name="products").synced_until == result["until"]
+
+    ProductIndexQueueItem.objects.all().delete()
+    assert index_queue.enqueue_changed_products()["queued"] == 0
+
+
+def test_explicit_since_does_not_move_watermark_back():
+    product = Product.objects.create(sku="73000021", name="Since", price=5)
+    ProductIndexQueueItem.objects.all().delete()
+    future = timezone.now() + timedelta(hours=1)
+    _set_watermark(future)
+
+    result = index_queue.enqueue_changed_products(timezone.now() - timedelta(hours=1))
+
+    assert _queued() == {product.id}
+    assert result["queued"] == 1
+    assert SearchIndexWatermark.objects.get(name="products").synced_until == future
+
+
+def test_beat_task_resends_changed_docs(monkeypatch):
+    product = Product.objects.create(sku="73000031", name="Beat", price=5)
+    ProductIndexQueueItem.objects.all().delete()
+    _set_watermark(timezone.now() - timedelta(minutes=5))
+    posted = []
+    monkeypatch.setattr(es_client, "post", lambda url, data, headers, timeout: posted.append(data) or _Resp())
+
+    result = catalog_tasks.sync_changed_products_to_es.run()
+
+    assert result["queued"] == 1
+    assert result["totals"]["indexed"] == 1
+    assert str(product.id).encode() in posted[0]
+    assert not ProductIndexQueueItem.objects.exists()
+
+
+def test_beat_task_is_noop_when_disabled_and_survives_errors(settings, monkeypatch):
+    settings.ES_ENABLED = False
+    assert catalog_tasks.sync_changed_products_to_es.run() is None
+
+    settings.ES_ENABLED = True
+
+    def _boom(*args, **kwargs):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(catalog_tasks, "enqueue_changed_products", _boom)
+    assert catalog_tasks.sync_changed_products_to_es.run() is None
+
+
+def test_command_since_mode(monkeypatch):
+    Product.objects.create(sku="73000041", name="Command", price=5)
+    ProductIndexQueueItem.objects.all().delete()
+    monkeypatch.setattr(es_client, "post", lambda url, data, headers, timeout: _Resp())
+
+    since = (timezone.now() - timedelta(hours=1)).replace(tzinfo=None).isoformat()
+    call_command("reindex_products_es", since=since)
+
+    assert not ProductIndexQueueItem.objects.exists()
+    assert SearchIndexWatermark.objects.filter(name="products").exists()
+    with pytest.raises(CommandError):
+        call_command("reindex_products_es", since="yesterday")
@@ -0,0 +1,211 @@
+import json
+
+import pytest
+from django.core.cache import cache
+
+from catalog import es_client, es_index, index_queue
+from catalog import tasks as catalog_tasks
+from catalog.models import Brand, Product, ProductIndexQueueItem, Tag
+
+pytestmark = pytest.mark.django_db
+
+
+class _Resp:
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self._payload = payload or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError("http fail")
+
+    def json(self):
+        return self._payload
+
+
+@pytest.fixture(autouse=True)
+def _es_enabled(settings):
+    settings.ES_ENABLED = True
+    cache.delete(index_queue.FLUSH_SCHEDULED_KEY)
+
+
+def _no_http(*args, **kwargs):
+    raise AssertionError("product save must not call Elasticsearch synchronously")
+
+
+def _bulk_lines(data: bytes) -> list[dict]:
+    return [json.loads(line) for line in data.decode("utf-8").splitlines() if line]
+
+
+def test_product_changes_are_coalesced_without_http(monkeypatch):
+    monkeypatch.setattr(es_client, "put", _no_http)
+    monkeypatch.setattr(es_client, "post", _no_http)
+    product = Product.objects.create(sku="71000001", name="Queued cup", price=5)
+    product.name = "Queued cup v2"
+    product.save()
+    product.tags.add(Tag.objects.create(name="Queued", slug="queued"))
+
+    assert list(ProductIndexQueueItem.objects.values_list("product_id", flat=True)) == [product.id]
+
+
+def test_reverse_tag_changes_enqueue_products():
+    tag = Tag.objects.create(name="Reverse", slug="reverse")
+    first = Product.objects.create(sku="71000011", name="First", price=5)
+    second = Product.objects.create(sku="71000012", name="Second", price=5)
+    ProductIndexQueueItem.objects.all().delete()
+
+    tag.products.add(first, second)
+    assert set(ProductIndexQueueItem.objects.values_list("product_id", flat=True)) == {first.id, second.id}
+
+    ProductIndexQueueItem.objects.all().delete()
+    tag.products.clear()
+    assert set(ProductIndexQueueItem.objects.values_list("product_id", flat=True)) == {first.id, second.id}
+
+
+def test_enqueue_is_noop_when_es_disabled(settings):
+    settings.ES_ENABLED = False
+    Product.objects.create(sku="71000002", name="Silent", price=5)
+    assert index_queue.enqueue_product_ids([1, 2]) == 0
+    assert not ProductIndexQueueItem.objects.exists()
+
+
+def test_commit_schedules_single_delayed_flush(monkeypatch, django_capture_on_commit_callbacks):
+    scheduled = []
+    monkeypatch.setattr(
+        catalog_tasks.flush_product_index_queue,
+        "apply_async",
+        lambda **kwargs: scheduled.append(kwargs),
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        Product.objects.create(sku="71000003", name="One", price=5)
+        Product.objects.create(sku="71000004", name="Two", price=5)
+
+    assert scheduled == [{"countdown": 2}]
+
+
+def test_schedule_failure_is_logged_not_raised(monkeypatch):
+    def _boom(**kwargs):
+        raise RuntimeError("broker down")
+
+    monkeypatch.setattr(catalog_tasks.flush_product_index_queue, "apply_async", _boom)
+    index_queue.schedule_queue_flush()
+
+
+def test_flush_sends_one_bulk_with_upserts_and_deletes(monkeypatch):
+    brand = Brand.objects.create(name="Bulk Brand")
+    kept = Product.objects.create(sku="71000005", name="Kept", brand=brand, price=5)
+    kept.tags.add(Tag.objects.create(name="Bulk tag", slug="bulk-tag"))
+    removed = Product.objects.create(sku="71000006", name="Removed", price=5)
+    removed_id = removed.id
+    removed.delete()
+
+    calls = []
+
+    def _post(url, data, headers, timeout):
+        calls.append((url, data))
+        return _Resp(payload={"errors": False, "items": []})
+
+    monkeypatch.setattr(es_client, "post", _post)
+    totals = index_queue.drain_queue()
+
+    assert totals == {"indexed": 1, "deleted": 1, "failed": 0, "batches": 1}
+    assert len(calls) == 1
+    assert calls[0][0].endswith("/_bulk")
+    lines = _bulk_lines(calls[0][1])
+    assert lines[0] == {"index": {"_index": "products", "_id": kept.id}}
+    assert lines[1]["brand"] == "Bulk Brand"
+    assert lines[1]["tags"] == ["Bulk tag"]
+    assert lines[2] == {"delete": {"_index": "products", "_id": removed_id}}
+    assert not ProductIndexQueueItem.objects.exists()
+
+
+def test_flush_requeues_rejected_items(monkeypatch):
+    ok = Product.objects.create(sku="71000007", name="Ok", price=5)
+    bad = Product.objects.create(sku="71000008", name="Bad", price=5)
+
+    def _post(url, data, headers, timeout):
+        return _Resp(
+            payload={
+                "errors": True,
+                "items": [
+                    {"index": {"_id": str(ok.id), "status": 200}},
+                    {"index": {"_id": str(bad.id), "status": 429}},
+                    {"delete": {"_id": "999", "status": 404}},
+                    {"index": {"_id": None, "status": 500}},
+                ],
+            }
+        )
+
+    monkeypatch.setattr(es_client, "post", _post)
+    result = index_queue.flush_batch()
+
+    assert result == {"indexed": 2, "deleted": 0, "failed": 1}
+    assert list(ProductIndexQueueItem.objects.values_list("product_id", flat=True)) == [bad.id]
+
+
+def test_task_keeps_queue_when_es_is_down(monkeypatch):
+    product = Product.objects.create(sku="71000009", name="Retry", price=5)
+
+    def _post(url, data, headers, timeout):
+        return _Resp(status_code=503)
+
+    monkeypatch.setattr(es_client, "post", _post)
+    assert catalog_tasks.flush_product_index_queue.run() is None
+    assert list(ProductIndexQueueItem.objects.values_list("product_id", flat=True)) == [product.id]
+
+
+def test_task_reschedules_when_batches_exhausted(monkeypatch, settings):
+    settings.ES_INDEX_QUEUE_BATCH_SIZE = 1
+    Product.objects.create(sku="71000010", name="A", price=5)
+    Product.objects.create(sku="71000013", name="B", price=5)
+    monkeypatch.setattr(
+        es_client,
+        "post",
+        lambda url, data, headers, timeout: _Resp(payload={"errors": False}),
+    )
+    scheduled = []
+    monkeypatch.setattr(catalog_tasks, "schedule_queue_flush", lambda: scheduled.append(True))
+
+    totals = catalog_tasks.flush_product_index_queue.run(max_batches=1)
+
+    assert totals["indexed"] == 1
+    assert scheduled == [True]
+    assert ProductIndexQueueItem.objects.count() == 1
+    assert index_queue.flush_batch() == {"indexed": 1, "deleted": 0, "failed": 0}
+    assert index_queue.flush_batch() == {"indexed": 0, "deleted": 0, "failed": 0}
+    assert es_index.bulk_sync_products([], delete_ids=[]) == []
+
+
+def test_rows_survive_a_crashed_flush_and_are_retaken_after_the_claim_timeout(monkeypatch):
+    product = Product.objects.create(sku="71000014", name="Crash", price=5)
+
+    def _crash(products, delete_ids):
+        raise SystemExit("worker killed")
+
+    monkeypatch.setattr(index_queue, "bulk_sync_products", _crash)
+    with pytest.raises(SystemExit):
+        index_queue.flush_batch()
+    row = ProductIndexQueueItem.objects.get()
+    assert row.product_id == product.id and row.claimed_at is not None
+
+    # A live claim is left to its owner.
+    monkeypatch.setattr(index_queue, "bulk_sync_products", lambda products, delete_ids: [])
+    assert index_queue.flush_batch() == {"indexed": 0, "deleted": 0, "failed": 0}
+
+    ProductIndexQueueItem.objects.update(claimed_at=row.claimed_at - index_queue._claim_timeout())
+    assert index_queue.flush_batch() == {"indexed": 1, "deleted": 0, "failed": 0}
+    assert not ProductIndexQueueItem.objects.exists()
+
+
+def test_changes_during_a_flush_stay_queued(monkeypatch):
+    product = Product.objects.create(sku="71000015", name="Busy", price=5)
+
+    def _bulk(products, delete_ids):
+        index_queue.enqueue_product_ids([product.id], schedule=False)
+        return []
+
+    monkeypatch.setattr(index_queue, "bulk_sync_products", _bulk)
+    assert index_queue.flush_batch()["indexed"] == 1
+
+    row = ProductIndexQueueItem.objects.get()
+    assert row.product_id == product.id and row.claimed_at is None
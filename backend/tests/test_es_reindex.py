@@ -0,0 +1,220 @@
+import json
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from catalog import es_client, es_index, es_reindex
+from catalog.index_queue import index_queryset
+from catalog.models import Product, ProductIndexQueueItem, Tag
+
+pytestmark = pytest.mark.django_db
+
+_loads = json.loads
+
+
+class _Resp:
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self._payload = payload or {}
+        self.text = json.dumps(self._payload)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError("http fail")
+
+    def json(self):
+        return self._payload
+
+
+class FakeES:
+    """Just enough of the index/alias API for the rebuild flow."""
+
+    def __init__(self, aliases=None, concrete=()):
+        self.indices = {name: {} for name in concrete}
+        self.aliases = dict(aliases or {})
+        for index in self.aliases.values():
+            self.indices.setdefault(index, {})
+        self.settings = {}
+        self.alias_actions = []
+        self.deleted = []
+        self.bulk_calls = 0
+
+    def _path(self, url):
+        return url.split("://", 1)[-1].split("/", 1)[1]
+
+    def get(self, url, timeout, params=None):
+        path = self._path(url)
+        if path.startswith("_alias/"):
+            alias = path.split("/", 1)[1]
+            if alias not in self.aliases:
+                return _Resp(404)
+            return _Resp(payload={self.aliases[alias]: {"aliases": {alias: {}}}})
+        if path.endswith("/_count"):
+            return _Resp(payload={"count": len(self.indices[path.split("/")[0]])})
+        prefix = path.rstrip("*")
+        return _Resp(payload={name: {} for name in self.indices if name.startswith(prefix)})
+
+    def head(self, url, timeout):
+        return _Resp(200 if self._path(url) in self.indices else 404)
+
+    def put(self, url, json, timeout):
+        path = self._path(url)
+        if path.endswith("/_settings"):
+            self.settings[path.split("/")[0]] = json
+            return _Resp()
+        self.indices[path] = {}
+        self.settings[path] = json["settings"]
+        return _Resp()
+
+    def post(self, url, json=None, data=None, headers=None, timeout=None):
+        path = self._path(url)
+        if path == "_bulk":
+            self.bulk_calls += 1
+            lines = [_loads(line) for line in data.decode("utf-8").splitlines()]
+            items = []
+            while lines:
+                action = lines.pop(0)
+                if "index" in action:
+                    meta = action["index"]
+                    self.indices.setdefault(meta["_index"], {})[meta["_id"]] = lines.pop(0)
+                    items.append({"index": {"_id": str(meta["_id"]), "status": 201}})
+                else:
+                    meta = action["delete"]
+                    self.indices.get(meta["_index"], {}).pop(meta["_id"], None)
+            return _Resp(payload={"errors": False, "items": items})
+        if path == "_aliases":
+            self.alias_actions.append(json["actions"])
+            for action in json["actions"]:
+                if "remove_index" in action:
+                    self.indices.pop(action["remove_index"]["index"], None)
+                elif "add" in action:
+                    self.aliases[action["add"]["alias"]] = action["add"]["index"]
+            return _Resp()
+        return _Resp()
+
+    def delete(self, url, timeout):
+        name = self._path(url)
+        self.deleted.append(name)
+        self.indices.pop(name, None)
+        return _Resp()
+
+
+@pytest.fixture
+def fake_es(monkeypatch, settings):
+    settings.ES_ENABLED = True
+    es = FakeES()
+    for method in ("get", "head", "put", "post", "delete"):
+        monkeypatch.setattr(es_client, method, getattr(es, method))
+    cache.delete(es_index.SHADOW_INDEX_KEY)
+    return es
+
+
+def test_product_doc_uses_prefetched_tags(django_assert_num_queries):
+    product = Product.objects.create(sku="72000001", name="Tagged", price=5)
+    product.tags.add(Tag.objects.create(name="Prefetched", slug="prefetched"))
+    loaded = index_queryset().get(id=product.id)
+    with django_assert_num_queries(0):
+        assert es_index.product_doc(loaded)["tags"] == ["Prefetched"]
+
+
+def test_id_slices_cover_range():
+    assert es_reindex.id_slices(4) == []
+    ids = [Product.objects.create(sku=f"7200001{i}", name=f"P{i}", price=5).id for i in range(5)]
+    slices = es_reindex.id_slices(2)
+    assert slices[0][0] == ids[0]
+    assert slices[-1][1] == ids[-1] + 1
+    assert all(a[1] == b[0] for a, b in zip(slices, slices[1:]))
+
+
+def test_rebuild_swaps_alias_from_legacy_concrete_index(fake_es, settings):
+    settings.ES_PRODUCTS_INDEX = "products"
+    fake_es.indices["products"] = {}
+    for i in range(3):
+        Product.objects.create(sku=f"7200002{i}", name=f"Item {i}", price=5)
+    ProductIndexQueueItem.objects.all().delete()
+
+    result = es_reindex.rebuild_products_index(chunk_size=2)
+
+    new_index = result["index"]
+    assert new_index.startswith("products_v")
+    assert result["indexed"] == 3
+    assert len(fake_es.indices[new_index]) == 3
+    assert fake_es.settings[new_index] == {"index": {"refresh_interval": "1s"}}
+    assert fake_es.alias_actions == [
+        [{"remove_index": {"index": "products"}}, {"add": {"index": new_index, "alias": "products"}}]
+    ]
+    assert fake_es.aliases == {"products": new_index}
+    assert result["caught_up"] == 0
+    assert cache.get(es_index.SHADOW_INDEX_KEY) is None
+
+
+def test_rebuild_moves_alias_and_prunes_old_versions(fake_es, settings, monkeypatch):
+    settings.ES_PRODUCTS_INDEX = "products"
+    fill = es_reindex._fill_index
+
+    def _fill_with_concurrent_write(*args):
+        count = fill(*args)
+        Product.objects.filter(sku="72000031").first().save()
+        return count
+
+    monkeypatch.setattr(es_reindex, "_fill_index", _fill_with_concurrent_write)
+    fake_es.aliases["products"] = "products_v20200103000000"
+    for name in ("products_v20200101000000", "products_v20200102000000", "products_v20200103000000"):
+        fake_es.indices[name] = {}
+    Product.objects.create(sku="72000031", name="Only", price=5)
+
+    result = es_reindex.rebuild_products_index(keep=1)
+
+    new_index = result["index"]
+    assert fake_es.alias_actions[0][0] == {"remove": {"index": "products_v20200103000000", "alias": "products"}}
+    assert result["removed"] == ["products_v20200102000000", "products_v20200101000000"]
+    assert "products_v20200103000000" in fake_es.indices
+    assert new_index in fake_es.indices
+    # A product saved while the index was being filled is re-queued for the live alias.
+    assert result["caught_up"] == 1
+
+
+def test_rebuild_aborts_on_count_mismatch(fake_es, settings, monkeypatch):
+    settings.ES_PRODUCTS_INDEX = "products"
+    Product.objects.create(sku="72000041", name="Lost", price=5)
+    monkeypatch.setattr(es_reindex, "index_doc_count", lambda name: 0)
+
+    with pytest.raises(es_reindex.ReindexError):
+        es_reindex.rebuild_products_index()
+
+    assert fake_es.alias_actions == []
+    assert fake_es.deleted and fake_es.deleted[0].startswith("products_v")
+    assert cache.get(es_index.SHADOW_INDEX_KEY) is None
+
+
+def test_queue_flush_dual_writes_to_shadow_index(settings, monkeypatch):
+    settings.ES_PRODUCTS_INDEX = "products"
+    calls = []
+
+    def _post(url, data, headers, timeout):
+        calls.append([json.loads(line) for line in data.decode("utf-8").splitlines()])
+        return _Resp(payload={"errors": False})
+
+    monkeypatch.setattr(es_client, "post", _post)
+    product = Product.objects.create(sku="72000051", name="Shadow", price=5)
+    es_index.set_shadow_index("products_vnext")
+    try:
+        assert es_index.write_targets() == ["products", "products_vnext"]
+        es_index.bulk_sync_products([product], delete_ids=[999])
+    finally:
+        es_index.clear_shadow_index("products_vnext")
+
+    targets = [line[action]["_index"] for line in calls[0] for action in ("index", "delete") if action in line]
+    assert targets == ["products", "products", "products_vnext", "products_vnext"]
+    assert es_index.write_targets() == ["products"]
+
+
+def test_command_reports_failure(fake_es, monkeypatch):
+    def _fail(**kwargs):
+        raise es_reindex.ReindexError("boom")
+
+    monkeypatch.setattr("catalog.management.commands.reindex_products_es.rebuild_products_index", _fail)
+    with pytest.raises(CommandError):
+        call_command("reindex_products_es")
@@ -0,0 +1,148 @@
+import json
+
+import pytest
+from django.core.cache import cache
+from django.db import transaction
+
+from catalog.models import Brand, Category, Product
+from core import local_cache, tagged_cache
+from shopfront.catalog_selectors import BrandOption, CategoryOption
+
+pytestmark = pytest.mark.django_db
+
+
+class _FakeRedis:
+    def __init__(self, messages=()):
+        self.messages = list(messages)
+        self.published = []
+        self.subscribed = []
+        self.closed = False
+
+    def publish(self, channel, data):
+        self.published.append((channel, json.loads(data)))
+
+    def pubsub(self, **kwargs):
+        return self
+
+    def subscribe(self, channel):
+        self.subscribed.append(channel)
+
+    def listen(self):
+        yield from self.messages
+
+    def close(self):
+        self.closed = True
+
+
+def test_lru_is_bounded_expires_and_drops_values_read_before_an_eviction(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(local_cache.time, "monotonic", lambda: now[0])
+    lru = local_cache.LocalCache(max_entries=2, ttl=10)
+    lru.set("a", 1, ("brand:*",))
+    lru.set("b", 2, ("tag:*",))
+    assert lru.get("a") == 1
+    lru.set("c", 3, ("tag:*",))
+    # "b" was least recently used.
+    assert lru.get("b") is local_cache.MISSING and len(lru) == 2
+
+    assert lru.evict_tags(["tag:*"]) == 1
+    assert lru.get("c") is local_cache.MISSING and lru.get("a") == 1
+
+    epoch = lru.epoch
+    lru.evict_tags(["brand:*"])
+    assert lru.set("a", "outdated", ("brand:*",), epoch=epoch) is False
+    assert lru.get("a") is local_cache.MISSING
+
+    lru.set("d", 4, ())
+    now[0] += 10
+    assert lru.get("d") is local_cache.MISSING
+
+
+def test_local_hits_skip_the_shared_cache_until_invalidated(monkeypatch):
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+    assert tagged_cache.get_or_compute("t:local", ("brand:*",), compute, timeout=60, local=True) == 1
+
+    def _no_shared_reads(*args, **kwargs):
+        raise AssertionError("local hit went to the shared cache")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(cache, "get", _no_shared_reads)
+        patched.setattr(cache, "get_many", _no_shared_reads)
+        assert tagged_cache.get_or_compute("t:local", ("brand:*",), compute, timeout=60, local=True) == 1
+
+    tagged_cache.invalidate("brand:*")
+    assert tagged_cache.get_or_compute("t:local", ("brand:*",), compute, timeout=60, local=True) == 2
+
+
+def test_invalidations_are_published_and_applied_by_the_listener(settings, django_capture_on_commit_callbacks):
+    settings.CACHE_INVALIDATION_REDIS_URL = "redis://cache.invalid:6379/1"
+    fake = _FakeRedis()
+    local_cache._publisher = fake
+    with django_capture_on_commit_callbacks(execute=True):
+        tagged_cache.invalidate("tag:*", "brand:*")
+    assert fake.published == [("cache:invalidate", ["brand:*", "tag:*"])]
+
+    lru = local_cache.LocalCache(max_entries=8, ttl=60)
+    local_cache._local = lru
+    listener = _FakeRedis(
+        [
+            {"type": "message", "data": json.dumps(["brand:*"])},
+            {"type": "message", "data": "not json"},
+            {"type": "pong", "data": None},
+        ]
+    )
+    lru.set("before", 1, ("tag:*",))
+    # Messages missed while (re)connecting are unknown: subscribing starts from an empty cache.
+    local_cache.listen_once(listener)
+    assert lru.get("before") is local_cache.MISSING
+    assert listener.subscribed == ["cache:invalidate"] and listener.closed
+
+    lru.set("brands", 1, ("brand:*",))
+    lru.set("tags", 2, ("tag:*",))
+    local_cache.handle_message({"type": "message", "data": json.dumps(["brand:*"])})
+    assert lru.get("brands") is local_cache.MISSING and lru.get("tags") == 2
+
+
+def test_a_transaction_publishes_its_invalidations_once_on_commit(settings, django_capture_on_commit_callbacks):
+    settings.CACHE_INVALIDATION_REDIS_URL = "redis://cache.invalid:6379/1"
+    fake = _FakeRedis()
+    local_cache._publisher = fake
+    tagged_cache.store("t:card", "C", ("product:1",), timeout=3600)
+    with django_capture_on_commit_callbacks(execute=True):
+        for pk in (1, 2, 1):
+            tagged_cache.invalidate(*tagged_cache.object_tags("product", pk))
+        # Reads inside the transaction already miss; other workers have not been told yet.
+        assert tagged_cache.lookup("t:card") is None
+        assert fake.published == []
+    assert fake.published == [("cache:invalidate", ["product:*", "product:1", "product:2"])]
+
+
+def test_invalidations_survive_a_rolled_back_savepoint(settings, django_capture_on_commit_callbacks):
+    settings.CACHE_INVALIDATION_REDIS_URL = "redis://cache.invalid:6379/1"
+    fake = _FakeRedis()
+    local_cache._publisher = fake
+    with django_capture_on_commit_callbacks(execute=True):
+        tagged_cache.invalidate(tagged_cache.tag("product", 1))
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                tagged_cache.invalidate(tagged_cache.tag("product", 2))
+                raise RuntimeError("rolled back")
+        tagged_cache.invalidate(tagged_cache.tag("product", 3))
+    assert fake.published == [("cache:invalidate", ["product:1", "product:2", "product:3"])]
+
+
+def test_catalog_filter_lists_are_compact_and_follow_writes(client):
+    brand = Brand.objects.create(name="Local Brand")
+    root = Category.objects.create(name="Local root", slug="local-root")
+    Product.objects.create(sku="82500001", name="Local cup", price=1, brand=brand, category=root)
+
+    r = client.get("/catalog/?sort=name")
+    assert r.context["brands"] == [BrandOption(brand.id, "Local Brand")]
+    assert r.context["cats"] == [CategoryOption(root.id, "Local root", "local-root", None)]
+
+    brand.name = "Renamed Local Brand"
+    brand.save()
+    r = client.get("/catalog/?sort=name")
+    assert [b.name for b in r.context["brands"]] == ["Renamed Local Brand"]
+    assert "Renamed Local Brand" in r.content.decode()
@@ -0,0 +1,107 @@
+import pytest
+from django.contrib.auth import get_user_model
+
+from catalog import es_client, review_stats, tasks
+from catalog.models import Product, ProductReview, ProductReviewVote
+from commerce.models import LegalEntity, SellerStore, StoreReview
+
+pytestmark = pytest.mark.django_db
+
+
+def _users(*names):
+    User = get_user_model()
+    return [User.objects.create_user(username=name, password="pass") for name in names]
+
+
+def _store(owner, inn="7707083893"):
+    legal_entity = LegalEntity.objects.create(name=f"LE {owner.username}", inn=inn, bik="044525225", checking_account="40702810900000001011")
+    return SellerStore.objects.create(owner=owner, legal_entity=legal_entity, name=f"Store {owner.username}")
+
+
+def test_summarize_and_distribution():
+    summary = review_stats.summarize({5: 3, 4: 1, 1: 1})
+    assert summary == {"rating_avg": 4.0, "rating_count": 5, "rating_histogram": [1, 0, 0, 1, 3]}
+    assert review_stats.summarize({}) == {"rating_avg": 0.0, "rating_count": 0, "rating_histogram": [0, 0, 0, 0, 0]}
+    assert review_stats.rating_distribution([1, 0, 0, 1, 3])[0] == {"stars": 5, "count": 3, "percent": 60}
+    assert [row["count"] for row in review_stats.rating_distribution([])] == [0, 0, 0, 0, 0]
+
+
+def test_product_and_seller_aggregates_follow_reviews_and_votes():
+    seller, first, second, voter = _users("rs_seller", "rs_first", "rs_second", "rs_voter")
+    store = _store(seller)
+    product = Product.objects.create(sku="82100001", name="Rated cup", price=10, seller=seller)
+    stale = Product.objects.get(pk=product.pk)
+
+    review = ProductReview.objects.create(product=product, user=first, rating=5)
+    ProductReview.objects.create(product=product, user=second, rating=2)
+    ProductReviewVote.objects.create(review=review, user=voter, value=ProductReviewVote.Value.HELPFUL)
+
+    product.refresh_from_db()
+    assert (product.rating_avg, product.rating_count, product.rating_histogram) == (3.5, 2, [0, 1, 0, 0, 1])
+    assert product.review_helpful_votes == 1
+    review.refresh_from_db()
+    assert (review.helpful_count, review.unhelpful_count) == (1, 0)
+    store.refresh_from_db()
+    assert (store.product_rating_avg, store.product_rating_count) == (3.5, 2)
+
+    # Saving a product loaded before the reviews must not reset its aggregates.
+    stale.name = "Rated mug"
+    stale.save()
+    product.refresh_from_db()
+    assert product.name == "Rated mug" and product.rating_count == 2
+
+    ProductReviewVote.objects.filter(review=review).update(value=ProductReviewVote.Value.UNHELPFUL)
+    ProductReviewVote.objects.get(review=review).save()
+    review.delete()
+    product.refresh_from_db()
+    assert (product.rating_avg, product.rating_count, product.review_helpful_votes) == (2.0, 1, 0)
+
+
+def test_store_aggregates_follow_store_reviews():
+    owner, reviewer = _users("rs_store_owner", "rs_store_reviewer")
+    store = _store(owner, inn="7707083894")
+    stale = SellerStore.objects.get(pk=store.pk)
+
+    review = StoreReview.objects.create(store=store, user=reviewer, rating=4)
+    stale.description = "Updated"
+    stale.save()
+    store.refresh_from_db()
+    assert (store.rating_avg, store.rating_count, store.rating_histogram) == (4.0, 1, [0, 0, 0, 1, 0])
+    assert store.description == "Updated"
+
+    review.delete()
+    store.refresh_from_db()
+    assert (store.rating_avg, store.rating_count) == (0.0, 0)
+
+
+def test_reconcile_repairs_rows_written_around_signals():
+    owner, reviewer = _users("rs_drift_owner", "rs_drift_reviewer")
+    store = _store(owner, inn="7707083895")
+    product = Product.objects.create(sku="82100011", name="Drift cup", price=10, seller=owner)
+    ProductReview.objects.bulk_create([ProductReview(product=product, user=reviewer, rating=4)])
+    StoreReview.objects.bulk_create([StoreReview(store=store, user=reviewer, rating=3)])
+
+    assert tasks.reconcile_review_stats() == {"products": 1, "stores": 1}
+    product.refresh_from_db()
+    store.refresh_from_db()
+    assert (product.rating_avg, product.rating_count) == (4.0, 1)
+    assert (store.rating_count, store.product_rating_count) == (1, 1)
+    assert review_stats.reconcile() == {"products": 0, "stores": 0}
+
+
+def test_rating_sort_and_display_read_stored_columns(client, monkeypatch):
+    monkeypatch.setattr(es_client, "search", lambda *args, **kwargs: (_ for _ in ()).throw(RuntimeError("es down")))
+    first, second = _users("rs_sort_a", "rs_sort_b")
+    low = Product.objects.create(sku="82100021", name="Low rated", price=10)
+    high = Product.objects.create(sku="82100022", name="High rated", price=10)
+    ProductReview.objects.create(product=low, user=first, rating=2)
+    ProductReview.objects.create(product=high, user=first, rating=5)
+    ProductReview.objects.create(product=high, user=second, rating=4)
+
+    r = client.get("/catalog/?sort=rating_desc")
+    assert [p.name for p in r.context["products"]][:2] == ["High rated", "Low rated"]
+
+    r = client.get(f"/product/{high.slug}/")
+    assert r.context["rating_count"] == 2
+    assert [row["count"] for row in r.context["rating_distribution"]] == [1, 1, 0, 0, 0]
+    assert "Распределение оценок" in r.content.decode()
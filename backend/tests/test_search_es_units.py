@@ -1,7 +1,7 @@
 import pytest
 from django.test import override_settings
 
-from catalog import es_index
+from catalog import es_client, es_index
 from shopfront import search as sf_search
 
 pytestmark = pytest.mark.django_db
@@ -24,9 +24,11 @@ class _Resp:
 
 @override_settings(ES_ENABLED=True)
 def test_es_search_bundle_success(monkeypatch):
-    def _post(url, json, timeout):
+    def _post(url, json, params, timeout):
         assert url.endswith('/products/_search')
         assert json['size'] == 3
+        assert json['_source'] is False
+        assert params['filter_path'] == sf_search.SEARCH_FILTER_PATH
         return _Resp(payload={
             'hits': {
                 'hits': [
@@ -44,7 +46,7 @@ def test_es_search_bundle_success(monkeypatch):
             },
         })
 
-    monkeypatch.setattr(sf_search.requests, 'post', _post)
+    monkeypatch.setattr(es_client, 'post', _post)
     ids, countries, suggestions = sf_search._es_search_bundle('abc', 3, 2)
     assert ids == [10, 11]
     assert countries == ["Италия", "Россия"]
@@ -87,8 +89,8 @@ def test_es_index_upsert_and_delete_success(monkeypatch):
         calls.append(('delete', url, timeout))
         return _Resp(status_code=200)
 
-    monkeypatch.setattr(es_index.requests, 'put', _put)
-    monkeypatch.setattr(es_index.requests, 'delete', _delete)
+    monkeypatch.setattr(es_client, 'put', _put)
+    monkeypatch.setattr(es_client, 'delete', _delete)
 
     class _P:
         id = 77
@@ -114,7 +116,7 @@ def test_es_index_delete_non_ok_raises_handled(monkeypatch):
     def _delete(url, timeout):
         return _Resp(status_code=500)
 
-    monkeypatch.setattr(es_index.requests, 'delete', _delete)
+    monkeypatch.setattr(es_client, 'delete', _delete)
     es_index.delete_product(99)
 
 
@@ -122,7 +124,7 @@ def test_es_index_upsert_exception_handled(monkeypatch):
     def _put(url, json, timeout):
         raise RuntimeError('boom')
 
-    monkeypatch.setattr(es_index.requests, 'put', _put)
+    monkeypatch.setattr(es_client, 'put', _put)
 
     class _P:
         id = 1
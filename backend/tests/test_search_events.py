@@ -0,0 +1,160 @@
+import pytest
+from django.core.cache import cache
+
+from catalog.models import Product, ProductIndexQueueItem
+from shopfront import rerank, search_events, tasks
+from shopfront.models import SearchClickStat
+from shopfront.search import _search_payload
+
+pytestmark = pytest.mark.django_db
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.items = []
+        self.down = False
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.ops = []
+
+    def rpush(self, key, value):
+        self.ops.append(lambda: self.client.items.append(value.encode()) or len(self.client.items))
+
+    def lrange(self, key, start, end):
+        self.ops.append(lambda: self.client.items[start : None if end == -1 else end + 1])
+
+    def ltrim(self, key, start, end):
+        def _trim():
+            self.client.items = self.client.items[start : None if end == -1 else end + 1]
+            return True
+
+        self.ops.append(_trim)
+
+    def execute(self):
+        if self.client.down:
+            raise ConnectionError("redis down")
+        return [op() for op in self.ops]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch, settings):
+    settings.SEARCH_EVENTS_ENABLED = True
+    client = _FakeRedis()
+    monkeypatch.setattr(search_events, "_redis", lambda: client)
+    return client
+
+
+def test_record_buffers_bounded_events_and_never_raises(fake_redis, settings):
+    settings.SEARCH_EVENTS_MAX_BUFFER = 2
+    search_events.record(search_events.IMPRESSION, "  Сироп  Кофе ", [1, 2])
+    search_events.record(search_events.CLICK, "сироп", ["3"])
+    search_events.record(search_events.CART, "сироп", [4])
+    search_events.record("purchase", "сироп", [5])
+    search_events.record(search_events.CLICK, "   ", [5])
+    search_events.record(search_events.CLICK, "сироп", [])
+
+    assert [item.decode() for item in fake_redis.items] == ['["click", "сироп", [3]]', '["cart", "сироп", [4]]']
+
+    fake_redis.down = True
+    search_events.record(search_events.CLICK, "сироп", [6])
+    settings.SEARCH_EVENTS_ENABLED = False
+    fake_redis.down = False
+    search_events.record(search_events.CLICK, "сироп", [6])
+    assert len(fake_redis.items) == 2
+
+
+def test_aggregate_folds_events_into_stats_popularity_and_query_scores(fake_redis, settings):
+    settings.SEARCH_CTR_SMOOTHING = 2
+    liked = Product.objects.create(sku="80100001", name="Сироп ваниль", price=5)
+    ignored = Product.objects.create(sku="80100002", name="Сироп кокос", price=5)
+    ProductIndexQueueItem.objects.all().delete()
+    for _ in range(4):
+        search_events.record(search_events.IMPRESSION, "Сироп", [liked.id, ignored.id, 999999])
+    search_events.record(search_events.CLICK, "сироп", [liked.id])
+    search_events.record(search_events.CART, "сироп", [liked.id])
+    fake_redis.items.append(b"not json")
+
+    totals = search_events.aggregate(batch_size=2)
+
+    assert totals == {"events": 6, "queries": 1, "products": 1}
+    assert fake_redis.items == []
+    stat = SearchClickStat.objects.get(query="сироп", product=liked)
+    assert (stat.impressions, stat.clicks, stat.add_to_carts) == (4, 1, 1)
+    assert not SearchClickStat.objects.filter(product_id=999999).exists()
+    liked.refresh_from_db()
+    ignored.refresh_from_db()
+    assert liked.popularity == search_events.ctr_score(4, 1, 1) == round(4 / 6, 4)
+    assert ignored.popularity == 0
+    assert list(ProductIndexQueueItem.objects.values_list("product_id", flat=True)) == [liked.id]
+    assert search_events.query_scores(" СИРОП ") == {liked.id: liked.popularity}
+
+    # After a cache flush the next aggregation republishes every stored query.
+    cache.clear()
+    assert search_events.aggregate() == {"events": 0, "queries": 0, "products": 0}
+    assert search_events.query_scores("сироп") == {liked.id: liked.popularity}
+
+    search_events.record(search_events.IMPRESSION, "сироп", [liked.id])
+    assert tasks.aggregate_search_events() == {"events": 1, "queries": 1, "products": 1}
+    assert SearchClickStat.objects.get(query="сироп", product=liked).impressions == 5
+    assert search_events.aggregate() == {"events": 0, "queries": 0, "products": 0}
+
+    fake_redis.down = True
+    assert tasks.aggregate_search_events() is None
+
+
+def test_learned_scores_reach_reranker_and_es_query(settings, django_assert_num_queries):
+    settings.SEARCH_CTR_SMOOTHING = 0
+    plain = Product.objects.create(sku="80100011", name="Стакан", price=5)
+    clicked = Product.objects.create(sku="80100012", name="Стакан высокий", price=5)
+    SearchClickStat.objects.create(query="стакан", product=clicked, impressions=10, clicks=5)
+
+    # Ranking reads only published scores; a cache miss is empty, not a database query.
+    with django_assert_num_queries(0):
+        assert search_events.query_scores("Стакан") == {}
+    assert search_events.warm_query_scores() == 1
+    assert search_events.query_scores("Стакан") == {clicked.id: 0.5}
+    assert search_events.query_scores("") == {}
+    assert rerank.rerank([plain.id, clicked.id], "стакан", ctr={}) == [plain.id, clicked.id]
+    assert rerank.rerank([plain.id, clicked.id], "стакан") == [clicked.id, plain.id]
+
+    Product.objects.filter(id=plain.id).update(popularity=1.0)
+    assert rerank.feature_matrix([plain.id], "стакан")[0][rerank.FEATURES.index("popularity")] == 1.0
+
+    boosted = _search_payload("стакан", 8, 0)["query"]["function_score"]
+    assert boosted["field_value_factor"]["field"] == "popularity"
+    assert boosted["query"]["bool"]["should"]
+    settings.SEARCH_POPULARITY_ES_FACTOR = 0
+    assert "bool" in _search_payload("стакан", 8, 0)["query"]
+
+
+def test_views_record_clicks_carts_and_impressions(client, monkeypatch):
+    product = Product.objects.create(sku="80100021", name="Шейкер", price=5, stock_qty=10)
+    events = []
+    monkeypatch.setattr(search_events, "record", lambda kind, query, ids: events.append((kind, query, list(ids))))
+
+    client.get(f"/product/{product.slug}/?sq=шейкер")
+    client.get(f"/product/{product.slug}/")
+    client.post("/cart/add/", {"product_id": product.id, "qty": 1}, HTTP_REFERER=f"http://testserver/product/{product.slug}/?sq=шейкер")
+    client.post("/cart/add/", {"product_id": product.id, "qty": 1}, HTTP_REFERER="http://testserver/catalog/?q=бар")
+    client.post("/cart/add/", {"product_id": product.id, "qty": 1}, HTTP_REFERER="http://testserver/")
+
+    assert events == [
+        ("click", "шейкер", [product.id]),
+        ("cart", "шейкер", [product.id]),
+        ("cart", "бар", [product.id]),
+    ]
+
+    monkeypatch.setattr(
+        "shopfront.views.live_search_context",
+        lambda **kwargs: {"q": "шейк", "products": [product], "countries": [], "suggestions": [], "show": True},
+    )
+    # Typeahead keystrokes are not searches: only submitted catalog queries count impressions and clicks.
+    r = client.get("/search/live/?q=шейк")
+    assert events[-1] == ("cart", "бар", [product.id])
+    assert f"/product/{product.slug}/?sq=" not in r.content.decode()
@@ -0,0 +1,93 @@
+import pytest
+
+from catalog import fulltext
+from catalog import tasks as catalog_tasks
+from catalog.models import Brand, Category, Product
+from shopfront import search_service
+from shopfront.search_service import DatabaseSearchProvider, PostgresSearchProvider, get_search_provider
+
+pytestmark = pytest.mark.django_db
+
+
+def test_tsquery_text_ands_words_and_prefixes_last_word():
+    assert fulltext.tsquery_text(["Сироп  ванильный", "сироп ваниль", "", "!!"]) == (
+        "(сироп & ванильный:*) | (сироп & ваниль:*)"
+    )
+    assert fulltext.tsquery_text(["a'b|c"]) == "(a & b & c:*)"
+    assert fulltext.fulltext_product_ids([""], 5) == []
+
+
+def test_vector_ranks_name_over_brand_and_description():
+    brand = Brand.objects.create(name="Монин")
+    by_description = Product.objects.create(sku="76000001", name="Стакан", price=5, description="Для сиропа")
+    by_brand = Product.objects.create(sku="76000002", name="Бутылка", brand=brand, price=5)
+    by_name = Product.objects.create(sku="76000003", name="Сироп карамельный", price=5)
+
+    assert fulltext.fulltext_product_ids(["сиропы"], 10) == [by_name.id, by_description.id]
+    assert fulltext.fulltext_product_ids(["мон"], 10) == [by_brand.id]
+    assert fulltext.fulltext_product_ids(["76000001"], 10) == [by_description.id]
+
+
+def test_parent_rename_refreshes_vector_after_commit(settings, monkeypatch, django_capture_on_commit_callbacks):
+    settings.SEARCH_VECTOR_REFRESH_CHUNK_SIZE = 1
+    refreshes = []
+
+    def run_now(kind, pk):
+        refreshes.append((kind, pk))
+        return catalog_tasks.refresh_parent_search_vectors(kind, pk)
+
+    monkeypatch.setattr(catalog_tasks.refresh_parent_search_vectors, "delay", run_now)
+    category = Category.objects.create(name="Посуда")
+    plate = Product.objects.create(sku="76000011", name="Тарелка", category=category, price=5)
+    bowl = Product.objects.create(sku="76000012", name="Миска", category=category, price=5)
+    assert sorted(fulltext.fulltext_product_ids(["посуда"], 5)) == sorted([plate.id, bowl.id])
+
+    with django_capture_on_commit_callbacks(execute=True):
+        category.name = "Текстиль"
+        category.save()
+        # The rename itself leaves product rows alone; the refresh runs after commit.
+        assert len(fulltext.fulltext_product_ids(["посуда"], 5)) == 2
+    assert refreshes == [("category", category.id)]
+
+    assert fulltext.fulltext_product_ids(["посуда"], 5) == []
+    assert sorted(fulltext.fulltext_product_ids(["текстиль"], 5)) == sorted([plate.id, bowl.id])
+    assert fulltext.refresh_search_vectors("category", category.id, chunk_size=5) == 2
+
+
+def test_postgres_provider_ranks_and_falls_back(settings, monkeypatch):
+    product = Product.objects.create(sku="76000021", name="Шейкер бостон", price=5)
+    jigger = Product.objects.create(sku="76000022", name="Джиггер", price=5)
+
+    bundle = PostgresSearchProvider().live_bundle("шейкеры", limit=4)
+    assert bundle.provider == "postgres"
+    assert bundle.product_ids == [product.id]
+    assert bundle.suggestions == ["Шейкер бостон"]
+
+    # Typo-tolerant names come from pg_trgm when the full-text pass is short.
+    monkeypatch.setattr(fulltext, "trigram_product_ids", lambda query, limit: [product.id])
+    assert PostgresSearchProvider().live_bundle("шейкре", limit=4).product_ids == [product.id]
+
+    # Substrings inside words are still found by the legacy scan.
+    monkeypatch.setattr(fulltext, "trigram_product_ids", lambda query, limit: [])
+    assert PostgresSearchProvider().live_bundle("игге", limit=4).product_ids == [jigger.id]
+    settings.SEARCH_DB_FULLTEXT_ENABLED = False
+    assert PostgresSearchProvider().live_bundle("ейке", limit=4).product_ids == [product.id]
+
+
+def test_trigram_pass_is_skipped_without_extension(monkeypatch):
+    monkeypatch.setattr(fulltext, "_trigram_available", None)
+    available = fulltext.trigram_available()
+    if not available:
+        assert fulltext.trigram_product_ids("шейкре", 5) == []
+    assert fulltext.trigram_product_ids("ab", 5) == []
+
+
+def test_provider_selection_and_semantic_candidates(settings):
+    product = Product.objects.create(sku="76000031", name="Кофе зерновой", price=5)
+    settings.SEARCH_PROVIDER = "postgres"
+    settings.SEMANTIC_SEARCH_ENABLED = False
+    assert isinstance(get_search_provider(), PostgresSearchProvider)
+    settings.SEARCH_PROVIDER = "database"
+    assert type(get_search_provider()) is DatabaseSearchProvider
+
+    assert search_service._semantic_candidate_ids("кофе", limit=5) == [product.id]
@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from catalog.models import Brand, Product
+from shopfront import rerank
+from shopfront.search import ESSearchUnavailable
+from shopfront.search_service import SearchBundle
+
+pytestmark = pytest.mark.django_db
+
+
+def test_text_hits_and_flags_outrank_position():
+    brand = Brand.objects.create(name="Monin")
+    first = Product.objects.create(sku="79000001", name="Стакан", price=5)
+    promo = Product.objects.create(sku="79000002", name="Кружка", price=5, is_promo=True)
+    phrase = Product.objects.create(sku="79000003", name="Сироп ванильный", brand=brand, price=5)
+    described = Product.objects.create(sku="79000004", name="Топпинг", price=5, description="Ванильный вкус")
+
+    ranked = rerank.rerank([first.id, promo.id, phrase.id, described.id, first.id], "Сироп ванильный")
+
+    assert ranked == [phrase.id, described.id, promo.id, first.id]
+    assert rerank.rerank([first.id, phrase.id], "сироп ванильный", limit=1) == [phrase.id]
+    assert rerank.rerank([], "x") == []
+
+
+def test_weights_and_popularity_are_configurable(settings):
+    a = Product.objects.create(sku="79000011", name="Alpha", price=5)
+    b = Product.objects.create(sku="79000012", name="Beta", price=5, is_new=True)
+
+    assert rerank.rerank([a.id, b.id], "zzz") == [a.id, b.id]
+    settings.SEARCH_RERANK_WEIGHTS = {"new": 5.0}
+    assert rerank.rerank([a.id, b.id], "zzz") == [b.id, a.id]
+    settings.SEARCH_RERANK_WEIGHTS = {"popularity": 10.0}
+    assert rerank.rerank([b.id, a.id], "zzz", popularity={a.id: 1.0}) == [a.id, b.id]
+
+    matrix = rerank.feature_matrix([a.id, 999999], "alfa", rewritten="alpha")
+    assert matrix.shape == (2, len(rerank.FEATURES))
+    assert matrix[0].tolist() == [40.0, 0.0, 1.0, 1.0, 0.0, 0.0, 0.0, 0.0]
+    assert matrix[1].tolist() == [39.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+
+
+def test_scoring_two_thousand_candidates_is_vectorized(monkeypatch):
+    rows = {pid: (f"Товар {pid} сироп {'ваниль' if pid % 3 else ''}", pid % 7 == 0, pid % 5 == 0, 0.0) for pid in range(2000)}
+    monkeypatch.setattr(rerank, "_candidate_rows", lambda product_ids: rows)
+    ids = list(range(2000))
+    rerank.rerank(ids, "сироп ваниль")
+
+    started = time.perf_counter()
+    ranked = rerank.rerank(ids, "сироп ваниль")
+    elapsed = time.perf_counter() - started
+
+    assert len(ranked) == 2000 and ranked[0] == 1
+    assert elapsed < 0.05
+
+
+def test_catalog_database_path_reranks_non_hybrid_results(client, monkeypatch):
+    plain = Product.objects.create(sku="79000021", name="Поднос", price=5)
+    exact = Product.objects.create(sku="79000022", name="Сахарница", price=5)
+
+    class _Provider:
+        def live_bundle(self, query, limit, country_limit):
+            raise ESSearchUnavailable("down")
+
+    class _Fallback:
+        def live_bundle(self, query, limit, country_limit):
+            return SearchBundle(product_ids=[plain.id, exact.id], countries=[], suggestions=[], provider="postgres")
+
+    monkeypatch.setattr("shopfront.views.get_search_provider", lambda: _Provider())
+    monkeypatch.setattr("shopfront.views.PostgresSearchProvider", _Fallback)
+    monkeypatch.setattr("shopfront.views.catalog_search.search_catalog", lambda *a, **k: (_ for _ in ()).throw(ESSearchUnavailable()))
+
+    r = client.get("/catalog/?q=сахарница")
+
+    assert [p.id for p in r.context["products"]] == [exact.id, plain.id]
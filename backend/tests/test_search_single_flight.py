@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+
+from shopfront import search as sf_search
+from shopfront import tasks as sf_tasks
+
+
+@pytest.fixture(autouse=True)
+def _es(settings):
+    settings.ES_ENABLED = True
+    settings.CACHE_TTL_ES_SEARCH = 60
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def _expire(query, limit, country_limit):
+    key = sf_search._bundle_cache_key(query, limit, country_limit)
+    entry = cache.get(key)
+    entry["fresh_until"] = time.time() - 1
+    cache.set(key, entry, 600)
+
+
+def test_concurrent_misses_share_one_es_request(monkeypatch):
+    calls = []
+
+    def _search(query, limit, country_limit):
+        calls.append(query)
+        time.sleep(0.1)
+        return [1, 2], ["IT"], ["cup"]
+
+    monkeypatch.setattr(sf_search, "_es_search_bundle", _search)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(sf_search.live_search_bundle("Cup ", 8, 6))) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["Cup "]
+    assert results == [([1, 2], ["IT"], ["cup"])] * 8
+    assert cache.get(sf_search._bundle_cache_key("cup", 8, 6) + ":lock") is None
+
+
+def test_waiter_asks_es_itself_when_the_leader_gives_up(monkeypatch, settings):
+    settings.ES_SEARCH_WAIT_SECONDS = 0.05
+    key = sf_search._bundle_cache_key("tea", 8, 0)
+    cache.add(f"{key}:lock", 1, 5)
+    monkeypatch.setattr(sf_search, "_es_search_bundle", lambda query, limit, country_limit: ([3], ["IT"], []))
+
+    assert sf_search.live_search_bundle("tea", 8, 0) == ([3], [], [])
+    # The leader still owns its lock.
+    assert cache.get(f"{key}:lock") == 1
+
+    cache.delete(key)
+    cache.delete(f"{key}:lock")
+    monkeypatch.setattr(sf_search, "_es_search_bundle", lambda *args, **kwargs: (_ for _ in ()).throw(sf_search.ESSearchUnavailable("down")))
+    with pytest.raises(sf_search.ESSearchUnavailable):
+        sf_search.live_search_bundle("tea", 8, 0)
+    assert cache.get(f"{key}:lock") is None
+
+
+def test_stale_bundle_is_served_while_one_refresh_runs(monkeypatch):
+    responses = iter([([1], [], []), ([2], [], [])])
+    monkeypatch.setattr(sf_search, "_es_search_bundle", lambda *args, **kwargs: next(responses))
+    scheduled = []
+    monkeypatch.setattr(sf_tasks.refresh_live_search_bundle, "apply_async", lambda args: scheduled.append(args))
+
+    assert sf_search.live_search_bundle("mug", 4, 0) == ([1], [], [])
+    _expire("mug", 4, 0)
+
+    assert sf_search.live_search_bundle("mug", 4, 0) == ([1], [], [])
+    assert sf_search.live_search_bundle("mug", 4, 0) == ([1], [], [])
+    assert scheduled == [("mug", 4, 0)]
+
+    sf_tasks.refresh_live_search_bundle(*scheduled[0])
+    assert sf_search.live_search_bundle("mug", 4, 0) == ([2], [], [])
+    assert cache.get(sf_search._bundle_cache_key("mug", 4, 0) + ":lock") is None
+
+
+def test_refresh_failures_keep_the_stale_bundle(monkeypatch):
+    monkeypatch.setattr(sf_search, "_es_search_bundle", lambda *args, **kwargs: ([1], [], []))
+    sf_search.live_search_bundle("mug", 4, 0)
+    _expire("mug", 4, 0)
+    monkeypatch.setattr(sf_search, "_es_search_bundle", lambda *args, **kwargs: (_ for _ in ()).throw(sf_search.ESSearchUnavailable("down")))
+    monkeypatch.setattr(
+        sf_tasks.refresh_live_search_bundle, "apply_async", lambda args: (_ for _ in ()).throw(RuntimeError("no broker"))
+    )
+
+    assert sf_search.live_search_bundle("mug", 4, 0) == ([1], [], [])
+    sf_search.refresh_bundle("mug", 4, 0)
+    assert sf_search.live_search_bundle("mug", 4, 0) == ([1], [], [])
+
+
+def test_cache_errors_do_not_block_search(monkeypatch):
+    monkeypatch.setattr(sf_search, "_es_search_bundle", lambda *args, **kwargs: ([7], [], []))
+
+    def _down(*args, **kwargs):
+        raise RuntimeError("cache down")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(cache, "add", _down)
+        patched.setattr(cache, "delete", _down)
+        assert sf_search.live_search_bundle("pan", 4, 0) == ([7], [], [])
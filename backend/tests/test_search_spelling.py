@@ -0,0 +1,117 @@
+import threading
+
+import pytest
+from django.core.cache import cache
+
+from catalog import versions
+from catalog.models import Brand, Category, Product, Tag
+from shopfront import spelling
+from shopfront.search_service import suggest_query_corrections
+
+pytestmark = pytest.mark.django_db
+
+
+def test_edit_distance_counts_transpositions_and_stops_early():
+    assert spelling.edit_distance("сироп", "сироп", 2) == 0
+    assert spelling.edit_distance("сиорп", "сироп", 2) == 1
+    assert spelling.edit_distance("срп", "сироп", 2) == 2
+    assert spelling.edit_distance("кофе", "стаканчик", 2) == 3
+    assert spelling.edit_distance("abcdef", "uvwxyz", 2) == 3
+
+
+def test_index_corrects_words_and_completes_phrases():
+    index = spelling.SpellingIndex(["Monin", "Сиропы"], ["Сироп Monin ваниль", "Сироп кокос", "Стакан"])
+
+    assert index.correct_word("monim") == "monin"
+    assert index.correct_word("сирпо") == "сироп"
+    assert index.correct_word("zzzzzz") is None
+    assert index.suggest("сирпо монин") == ["сироп монин"]
+    assert index.suggest("Сирпо") == ["сироп", "Сироп Monin ваниль", "Сироп кокос", "Сиропы"]
+    assert index.suggest("стакан") == []
+    assert index.suggest("!!") == []
+
+
+def test_corrections_cover_the_whole_catalog_without_per_call_queries(django_assert_num_queries, settings):
+    settings.SEARCH_SPELLING_REBUILD_SECONDS = 0
+    Brand.objects.create(name="Barista Pro")
+    Category.objects.create(name="Кофемашины")
+    Tag.objects.create(name="Эспрессо")
+    for i in range(300):
+        Product.objects.create(sku=f"7700{i:04d}", name=f"Товар {i}", price=5)
+    Product.objects.create(sku="77009999", name="Портафильтр", price=5)
+
+    assert suggest_query_corrections("портафильтер") == ["Портафильтр"]
+    with django_assert_num_queries(0):
+        assert suggest_query_corrections("кофемошины") == ["Кофемашины"]
+        assert "Barista Pro" in suggest_query_corrections("baristta")
+
+
+def test_index_rebuilds_when_vocabulary_version_moves(settings):
+    settings.SEARCH_SPELLING_REBUILD_SECONDS = 0
+    first = spelling.get_index()
+    assert spelling.get_index() is first
+
+    Brand.objects.create(name="Новинка")
+    rebuilt = spelling.get_index()
+    assert rebuilt is not first
+    assert rebuilt.version == versions.get_version(versions.VOCABULARY)
+    assert rebuilt.correct_word("новинко") == "новинка"
+
+    # Rebuilds are rate limited per worker.
+    settings.SEARCH_SPELLING_REBUILD_SECONDS = 3600
+    versions.bump_version(versions.VOCABULARY)
+    assert spelling.get_index() is rebuilt
+
+
+def test_only_vocabulary_fields_bump_the_version():
+    product = Product.objects.create(sku="77000001", name="Сироп", price=5)
+    version = versions.get_version(versions.VOCABULARY)
+
+    product.price = 7
+    product.save()
+    product.stock_qty = 3
+    product.save(update_fields=["stock_qty"])
+    assert versions.get_version(versions.VOCABULARY) == version
+
+    product.name = "Сироп ванильный"
+    product.save(update_fields=["name"])
+    assert versions.get_version(versions.VOCABULARY) == version + 1
+
+
+def test_rebuild_runs_in_background_and_keeps_serving_the_old_index(settings, monkeypatch):
+    settings.SEARCH_SPELLING_REBUILD_SECONDS = 0
+    settings.SEARCH_SPELLING_REBUILD_ASYNC = True
+    first = spelling.get_index()
+    release = threading.Event()
+    built = spelling.SpellingIndex(["Новинка"], [], version=first.version + 1)
+
+    def slow_build(version):
+        release.wait(5)
+        return built
+
+    monkeypatch.setattr(spelling, "build_index", slow_build)
+    versions.bump_version(versions.VOCABULARY)
+
+    assert spelling.get_index() is first
+    assert spelling.get_index() is first
+    threads = [thread for thread in threading.enumerate() if thread.name == "spelling-index"]
+    assert len(threads) == 1
+
+    release.set()
+    threads[0].join(5)
+    assert spelling.get_index() is built
+
+
+def test_version_helpers_survive_cache_errors(monkeypatch):
+    cache.clear()
+    assert versions.get_version("x") == 0
+    versions.bump_version("x")
+    assert versions.get_version("x") == 1
+
+    def _down(*args, **kwargs):
+        raise RuntimeError("cache down")
+
+    monkeypatch.setattr(cache, "get", _down)
+    monkeypatch.setattr(cache, "add", _down)
+    versions.bump_version("x")
+    assert versions.get_version("x") == 0
@@ -0,0 +1,89 @@
+import time
+
+import pytest
+from django.core.exceptions import ValidationError
+
+from catalog import es_index, synonyms
+from catalog.models import SearchSynonym
+from shopfront.search_service import build_query_variants, rewrite_query, semantic_query_variants
+
+pytestmark = pytest.mark.django_db
+
+
+def test_automaton_reports_overlaps_and_picks_leftmost_longest():
+    automaton = synonyms.Automaton(["he", "she", "his", "hers", ""])
+
+    assert sorted(automaton.matches("ushers")) == [(1, "she"), (2, "he"), (2, "hers")]
+    assert automaton.leftmost_longest("ushers") == [(1, "she")]
+    assert automaton.leftmost_longest("hershis") == [(0, "hers"), (4, "his")]
+    assert list(synonyms.Automaton([]).matches("abc")) == []
+
+
+def test_seeded_dictionary_keeps_existing_query_expansion():
+    assert build_query_variants(" Сиропы  Monin ") == ["сиропы monin", "сироп monin"]
+    assert build_query_variants("одноразка") == ["одноразка", "одноразовая посуда"]
+    assert build_query_variants("стаканы и бокалы") == ["стаканы и бокалы", "стакан и бокалы", "стаканы и бокал"]
+    assert build_query_variants("  ") == []
+    assert rewrite_query("Барный сироп и хозка") == "сироп для бара и расходные материалы"
+    assert "сироп для бара" in semantic_query_variants("барный сироп")
+
+
+def test_admin_edits_reload_the_worker_dictionary():
+    first = synonyms.get_dictionary()
+    assert synonyms.get_dictionary() is first
+
+    SearchSynonym.objects.create(kind=SearchSynonym.Kind.REWRITE, phrase="  Капуч ", replacement="Капучино")
+    assert rewrite_query("капуч на вынос") == "капучино на вынос"
+    assert synonyms.get_dictionary() is not first
+
+    entry = SearchSynonym.objects.get(phrase="капуч")
+    entry.is_active = False
+    entry.save()
+    assert rewrite_query("капуч") == "капуч"
+
+    # The longest phrase wins where rewrites overlap.
+    SearchSynonym.objects.create(kind=SearchSynonym.Kind.REWRITE, phrase="кофе", replacement="кофе в зернах")
+    assert rewrite_query("кофе для эспрессо") == "зерновой кофе эспрессо"
+
+
+def test_entries_are_validated_for_es_rule_syntax():
+    with pytest.raises(ValidationError):
+        SearchSynonym.objects.create(phrase="a, b", replacement="c")
+    with pytest.raises(ValidationError):
+        SearchSynonym.objects.create(phrase="a", replacement="b => c")
+    with pytest.raises(ValidationError):
+        SearchSynonym.objects.create(phrase="Тот же", replacement="тот же")
+    assert str(SearchSynonym(phrase="a", replacement="b")) == "a → b"
+
+
+def test_index_body_carries_the_synonym_filter():
+    body = es_index.products_index_body()
+    analysis = body["settings"]["analysis"]
+    assert "сиропы => сиропы, сироп" in analysis["filter"]["catalog_synonyms"]["synonyms"]
+    assert analysis["analyzer"]["folding_search"]["filter"][-1] == "catalog_synonyms"
+    assert body["mappings"]["properties"]["name"]["search_analyzer"] == "folding_search"
+    assert "search_analyzer" not in body["mappings"]["properties"]["sku"]
+
+    SearchSynonym.objects.filter(kind=SearchSynonym.Kind.SYNONYM).delete()
+    body = es_index.products_index_body()
+    assert "filter" not in body["settings"]["analysis"]
+    assert "search_analyzer" not in body["mappings"]["properties"]["name"]
+
+
+def test_lookup_cost_does_not_grow_with_the_dictionary():
+    dictionary = synonyms.SynonymDictionary(
+        {f"товар{i}": f"изделие{i}" for i in range(5000)},
+        {f"сленг{i}": f"термин{i}" for i in range(5000)},
+    )
+    assert dictionary.variants("товар42 синий") == ["товар42 синий", "изделие42 синий"]
+    assert dictionary.rewrite("сленг4999 и сленг7") == "термин4999 и термин7"
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        dictionary.rewrite("сленг4999 красный стакан")
+    assert (time.perf_counter() - started) / 1000 < 0.0005
+
+
+def test_load_failures_fall_back_to_an_empty_dictionary(monkeypatch):
+    monkeypatch.setattr(synonyms, "load_dictionary", lambda version=0: (_ for _ in ()).throw(RuntimeError("db down")))
+    assert rewrite_query("хозка") == "хозка"
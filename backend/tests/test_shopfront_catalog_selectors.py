@@ -1,7 +1,14 @@
 import pytest
+from django.core.exceptions import ValidationError
 
-from shopfront.catalog_selectors import category_descendant_ids, category_option_rows
-from catalog.models import Category
+from catalog import category_tree, versions
+from catalog.models import Category, Product
+from shopfront.catalog_selectors import (
+    category_breadcrumbs,
+    category_descendant_ids,
+    category_option_rows,
+    category_subtree_q,
+)
 
 
 pytestmark = pytest.mark.django_db
@@ -29,3 +36,59 @@ def test_category_option_rows_preserves_depth_labels():
     assert rows[0]["name"] == "Root"
     assert rows[1]["depth"] == 1
     assert rows[1]["name"] == "Child"
+
+
+def test_category_paths_follow_moves_of_whole_subtrees():
+    root = Category.objects.create(name="Root", slug="root")
+    child = Category.objects.create(name="Child", slug="child", parent=root)
+    grand = Category.objects.create(name="Grand", slug="grand", parent=child)
+    other = Category.objects.create(name="Other", slug="other")
+
+    assert grand.path == f"/{root.id}/{child.id}/{grand.id}/"
+
+    child.parent = other
+    child.save()
+    grand.refresh_from_db()
+    assert grand.path == f"/{other.id}/{child.id}/{grand.id}/"
+
+    root.parent = grand
+    root.save()
+    other.parent = grand
+    with pytest.raises(ValidationError):
+        other.full_clean()
+    with pytest.raises(ValidationError):
+        other.save()
+
+
+def test_tree_answers_descendants_and_breadcrumbs_without_queries(django_assert_num_queries):
+    root = Category.objects.create(name="Root", slug="root")
+    child = Category.objects.create(name="Child", slug="child", parent=root)
+    grand = Category.objects.create(name="Grand", slug="grand", parent=child)
+    sibling = Category.objects.create(name="Sibling", slug="sibling", parent=root)
+    category_descendant_ids(root)
+
+    with django_assert_num_queries(0):
+        assert category_descendant_ids(root) == [root.id, child.id, sibling.id, grand.id]
+        assert category_descendant_ids(child) == [child.id, grand.id]
+        assert [crumb.slug for crumb in category_breadcrumbs(grand)] == ["root", "child", "grand"]
+        assert category_breadcrumbs(None) == [] and category_descendant_ids(None) == []
+
+    tree = category_tree.get_tree()
+    Category.objects.create(name="Late", slug="late", parent=grand)
+    assert category_tree.get_tree() is not tree
+    assert category_tree.get_tree().version == versions.get_version(versions.CATEGORY_TREE)
+
+
+def test_subtree_filter_is_one_prefix_match_and_paths_can_be_rebuilt():
+    root = Category.objects.create(name="Root", slug="root")
+    child = Category.objects.create(name="Child", slug="child", parent=root)
+    other = Category.objects.create(name="Other", slug="other")
+    inside = Product.objects.create(sku="81000001", name="Inside", price=1, category=child)
+    Product.objects.create(sku="81000002", name="Outside", price=1, category=other)
+
+    assert list(Product.objects.filter(category_subtree_q(root)).values_list("id", flat=True)) == [inside.id]
+
+    Category.objects.update(path="")
+    assert category_tree.rebuild_paths() == 3
+    assert Category.objects.get(pk=child.pk).path == f"/{root.id}/{child.id}/"
+    assert category_tree.rebuild_paths() == 0
@@ -0,0 +1,139 @@
+import pytest
+from django.core.cache import cache
+
+from catalog.models import Brand, Category, Product, ProductImage
+from core import tagged_cache
+from shopfront import catalog_selectors
+from shopfront.context_processors import header_categories
+
+pytestmark = pytest.mark.django_db
+
+
+def test_entries_live_until_one_of_their_tags_moves():
+    tagged_cache.store("t:a", "A", ("product:1", "brand:*"), timeout=3600)
+    tagged_cache.store("t:b", "B", ("product:2",), timeout=3600)
+    assert (tagged_cache.lookup("t:a"), tagged_cache.lookup("t:b")) == ("A", "B")
+
+    tagged_cache.invalidate("brand:*")
+    assert tagged_cache.lookup("t:a") is None and tagged_cache.lookup("t:b") == "B"
+
+    # An evicted generation restarts from the clock, never from an old stamp.
+    cache.delete("cache:tag:product:2")
+    assert tagged_cache.lookup("t:b", "gone") == "gone"
+
+    cache.set("t:raw", "not an entry")
+    assert tagged_cache.lookup("t:raw") is None
+
+
+def test_get_or_compute_stamps_generations_seen_before_computing():
+    calls = []
+
+    def compute():
+        calls.append(1)
+        # A write lands while the value is being built from the old rows.
+        tagged_cache.invalidate("tag:*")
+        return len(calls)
+
+    assert tagged_cache.get_or_compute("t:race", ("tag:*",), compute, timeout=3600) == 1
+    assert tagged_cache.get_or_compute("t:race", ("tag:*",), lambda: 99, timeout=3600) == 99
+    assert tagged_cache.get_or_compute("t:race", ("tag:*",), lambda: 100, timeout=3600) == 99
+
+
+def test_cache_failures_degrade_to_misses(monkeypatch):
+    def _broken(*args, **kwargs):
+        raise ConnectionError("cache down")
+
+    monkeypatch.setattr(cache, "get", _broken)
+    monkeypatch.setattr(cache, "get_many", _broken)
+    monkeypatch.setattr(cache, "add", _broken)
+    assert tagged_cache.get_or_compute("t:down", ("product:*",), lambda: "fresh", timeout=60) == "fresh"
+    tagged_cache.invalidate("product:*")
+
+
+def test_model_writes_retire_listing_and_filter_caches():
+    first = Product.objects.create(sku="82300001", name="B tagged", price=1)
+    assert catalog_selectors.cached_home_product_ids() == [first.id]
+    assert catalog_selectors.cached_catalog_default_page_ids(page=1, page_size=16) == [first.id]
+    assert catalog_selectors.cached_catalog_default_total_count() == 1
+
+    second = Product.objects.create(sku="82300002", name="A tagged", price=1)
+    assert catalog_selectors.cached_home_product_ids() == [second.id, first.id]
+    assert catalog_selectors.cached_catalog_default_page_ids(page=1, page_size=16) == [second.id, first.id]
+    assert catalog_selectors.cached_catalog_default_total_count() == 2
+
+    root = Category.objects.create(name="Tagged root", slug="tagged-root")
+    assert header_categories(None)["header_categories"] == [{"slug": "tagged-root", "name": "Tagged root"}]
+    assert catalog_selectors.cached_home_category_ids() == [root.id]
+    root.name = "Renamed root"
+    root.save()
+    assert header_categories(None)["header_categories"][0]["name"] == "Renamed root"
+
+    # Child rows retire the product's entries but leave listing order alone.
+    tagged_cache.store("t:listing", "L", (tagged_cache.CATALOG_LISTING,), timeout=3600)
+    tagged_cache.store("t:card", "C", tagged_cache.object_tags("product", first.id), timeout=3600)
+    ProductImage.objects.create(product=first, url="https://example.com/tagged.jpg")
+    assert tagged_cache.lookup("t:listing") == "L" and tagged_cache.lookup("t:card") is None
+
+
+def test_catalog_filter_lists_follow_brand_changes(client):
+    Product.objects.create(sku="82300011", name="Brand cup", price=1)
+    client.get("/catalog/?sort=name")
+    Brand.objects.create(name="Fresh Brand")
+
+    r = client.get("/catalog/?sort=name")
+    assert [brand.name for brand in r.context["brands"]] == ["Fresh Brand"]
+
+
+def test_xfetch_refreshes_slow_entries_before_they_expire(monkeypatch, settings):
+    tagged_cache.store("t:slow", "old", ("product:*",), timeout=5, delta=10.0)
+    monkeypatch.setattr(tagged_cache.random, "random", lambda: 0.99)
+
+    settings.CACHE_XFETCH_BETA = 0
+    assert tagged_cache.get_or_compute("t:slow", ("product:*",), lambda: "new", timeout=5) == "old"
+    settings.CACHE_XFETCH_BETA = 1.0
+    assert tagged_cache.get_or_compute("t:slow", ("product:*",), lambda: "new", timeout=5) == "new"
+    assert cache.get("t:slow:lock") is None
+
+
+def test_one_worker_rebuilds_while_others_serve_stale_or_wait(settings):
+    settings.CACHE_WAIT_SECONDS = 0.05
+    tagged_cache.store("t:hot", "stale", ("product:*",), timeout=0)
+    cache.add("t:hot:lock", 1)
+
+    # Another worker holds the rebuild lock: an entry that only timed out is served as is.
+    assert tagged_cache.get_or_compute("t:hot", ("product:*",), lambda: "fresh", timeout=60) == "stale"
+    # Changed data is never served stale; after a short wait the caller computes it itself.
+    tagged_cache.invalidate("product:*")
+    assert tagged_cache.get_or_compute("t:hot", ("product:*",), lambda: "fresh", timeout=60) == "fresh"
+    assert cache.get("t:hot:lock") == 1
+
+    cache.delete("t:cold:lock")
+    tagged_cache.store("t:cold", "ready", ("product:*",), timeout=60)
+    cache.add("t:cold:lock", 1)
+    assert tagged_cache.get_or_compute("t:cold", ("product:*",), lambda: "unused", timeout=60) == "ready"
+
+
+def test_failed_rebuilds_fall_back_to_the_stale_value():
+    def _db_down():
+        raise RuntimeError("database unavailable")
+
+    tagged_cache.store("t:fallback", "last good", ("product:*",), timeout=0)
+    tagged_cache.invalidate("product:*")
+    assert tagged_cache.get_or_compute("t:fallback", ("product:*",), _db_down, timeout=60) == "last good"
+    assert cache.get("t:fallback:lock") is None
+
+    with pytest.raises(RuntimeError):
+        tagged_cache.get_or_compute("t:never", ("product:*",), _db_down, timeout=60)
+
+
+def test_default_catalog_html_is_shared_until_the_listing_changes(client):
+    Product.objects.create(sku="82300021", name="Shared page cup", price=1)
+    first = client.get("/catalog/").content.decode()
+    assert "Shared page cup" in first
+
+    Product.objects.filter(sku="82300021").update(name="Renamed quietly")
+    assert client.get("/catalog/").content.decode() == first
+
+    Product.objects.create(sku="82300022", name="Announced cup", price=1)
+    again = client.get("/catalog/").content.decode()
+    assert "Renamed quietly" in again and "Announced cup" in again
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from catalog import tasks as catalog_tasks
+from catalog import vector_index
+from catalog.models import Category, Product
+from shopfront import search_service
+
+pytestmark = pytest.mark.django_db
+
+TEXTS = [
+    (1, "Сироп ванильный | Monin | Сиропы для кофе"),
+    (2, "Стакан для латте | Стекло | Барная посуда"),
+    (3, "Сироп карамельный | Monin | Сиропы"),
+    (4, "Салфетки бумажные | Расходные материалы"),
+]
+
+
+@pytest.fixture
+def index_dir(settings, tmp_path):
+    settings.SEMANTIC_INDEX_DIR = str(tmp_path)
+    settings.SEMANTIC_INDEX_DIM = 128
+    settings.SEMANTIC_SEARCH_BACKEND = "vector"
+    return tmp_path
+
+
+def test_embedding_is_normalized_and_typo_tolerant():
+    idf = vector_index.fit_idf(vector_index.text_features(text) for _, text in TEXTS)
+    vectors = vector_index.embed([vector_index.text_features(text) for _, text in TEXTS], idf, 128)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+
+    query = vector_index.embed([vector_index.text_features("сиропп ванилный")], idf, 128)[0]
+    scores = vectors @ query
+    assert int(np.argmax(scores)) == 0
+    assert not vector_index.embed([vector_index.text_features("!!")], idf, 128).any()
+
+
+def test_build_publishes_and_workers_reload(index_dir):
+    assert vector_index.get_index() is None
+    first = vector_index.build_index(TEXTS)
+    assert first["count"] == 4 and first["nlist"] == 1
+    assert not list(index_dir.glob("*/vectors.raw"))
+
+    index = vector_index.get_index()
+    assert vector_index.get_index() is index
+    assert set(index.search("сироп monin", k=2)) == {1, 3}
+    assert index.search("салфетка", k=3)[0] == 4
+    assert index.search("!!") == []
+
+    vector_index.build_index([(9, "Шейкер бостон")])
+    assert vector_index.get_index() is not index
+    assert vector_index.semantic_candidate_ids("шейкер", limit=5) == [9]
+    # Only the live build and one previous build stay on disk.
+    vector_index.build_index([(10, "Джиггер")])
+    assert len([path for path in index_dir.iterdir() if path.is_dir()]) == 2
+
+
+def test_inverted_lists_find_neighbours_at_scale(index_dir, monkeypatch):
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(3000, 32)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = np.arange(100, 3100, dtype=np.int64)
+    meta = vector_index.write_index(index_dir / "synthetic", ids, vectors, np.ones(vector_index.FEATURE_SPACE, np.float32))
+    assert meta["nlist"] == 54
+
+    index = vector_index.VectorIndex(index_dir / "synthetic")
+    assert len(index) == 3000
+    assert index.offsets[-1] == 3000
+    monkeypatch.setattr(index, "embed_query", lambda text: vectors[7])
+    assert index.search("ignored", k=5, nprobe=54)[0] == 107
+
+
+def test_build_from_products_and_task(index_dir, monkeypatch):
+    category = Category.objects.create(name="Барный инвентарь")
+    product = Product.objects.create(sku="78000001", name="Шейкер", category=category, price=5)
+    Product.objects.create(sku="78000002", name="Полотенце", price=5)
+
+    assert catalog_tasks.rebuild_semantic_index.run()["count"] == 2
+    assert vector_index.semantic_candidate_ids("барный шейкер", limit=1) == [product.id]
+    assert search_service._semantic_candidate_ids("барный шейкер", limit=1) == [product.id]
+
+    def _down(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(vector_index, "write_index", _down)
+    assert catalog_tasks.rebuild_semantic_index.run() is None
+    # The failed build leaves no partial directory behind.
+    assert len([path for path in index_dir.iterdir() if path.is_dir()]) == 1
+
+
+def test_broken_build_is_not_loaded(index_dir):
+    (index_dir / "broken").mkdir()
+    (index_dir / vector_index.CURRENT_FILE).write_text("broken")
+    assert vector_index.get_index() is None
+
+
+def test_missing_index_warns_once_per_interval(index_dir, monkeypatch, caplog):
+    monkeypatch.setattr(vector_index, "_missing_warned_at", None)
+    with caplog.at_level("WARNING", logger="catalog"):
+        assert vector_index.semantic_candidate_ids("сироп") == []
+        assert vector_index.semantic_candidate_ids("сироп") == []
+    assert [record.message for record in caplog.records].count("semantic_index_missing") == 1